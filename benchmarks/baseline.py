@@ -0,0 +1,81 @@
+"""
+Stored benchmark baselines and regression checks shared by the suites.
+
+Results are nested dictionaries ``{target: {metric: value}}``; a baseline
+file stores the parameters of the run next to them.
+"""
+
+import json
+from pathlib import Path
+from typing import Dict, Iterable, List
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+
+def load_baseline(path: Path) -> dict:
+    """Results of a stored baseline, or an empty dict if there is none."""
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text(encoding="utf-8")).get("results", {})
+
+
+def save_baseline(path: Path, parameters: dict, results: dict) -> None:
+    """Store results (and the parameters that produced them) as the baseline."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(
+        json.dumps({"parameters": parameters, "results": results}, indent=2, default=str),
+        encoding="utf-8",
+    )
+    print(f"\nBaseline saved to {path}")
+
+
+def compare(
+    results: dict,
+    baseline: dict,
+    tolerance: float,
+    checked: Iterable[str],
+    higher_is_better: Iterable[str] = (),
+    min_delta: Dict[str, float] = None,
+) -> List[str]:
+    """
+    Print results next to the baseline and find regressions.
+
+    Args:
+        results: ``{target: {metric: value}}``
+        baseline: Results of the baseline run (same shape)
+        tolerance: Allowed relative change for the worse
+        checked: Metrics that can regress; the rest are only printed
+        higher_is_better: Checked metrics where larger values are better
+        min_delta: Absolute change below which a metric never regresses
+            (keeps millisecond-scale noise from failing the check)
+
+    Returns:
+        ``target.metric`` names that regressed beyond the tolerance
+    """
+    checked = set(checked)
+    higher_is_better = set(higher_is_better)
+    min_delta = min_delta or {}
+    regressions = []
+
+    for target, metrics in results.items():
+        print(f"\n[{target}]")
+        print(f"{'metric':<22} {'value':>14} {'baseline':>14} {'change':>9}")
+        for name, value in metrics.items():
+            base = baseline.get(target, {}).get(name)
+            if not isinstance(value, (int, float)) or not isinstance(base, (int, float)) or not base:
+                shown = f"{value:,}" if isinstance(value, (int, float)) else str(value)
+                print(f"{name:<22} {shown:>14} {'-':>14} {'':>9}")
+                continue
+
+            change = (value - base) / base
+            worse = -change if name in higher_is_better else change
+            regressed = (
+                name in checked
+                and worse > tolerance
+                and abs(value - base) > min_delta.get(name, 0)
+            )
+            if regressed:
+                regressions.append(f"{target}.{name}")
+            print(f"{name:<22} {value:>14,} {base:>14,} {change:>+8.1%}{' !' if regressed else ''}")
+
+    return regressions
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Ingest throughput of /api/save-points and /api/save-tasklogs.
+
+Generates synthetic sessions (see synthetic.py) and sends them the way the
+browser client does: points in batches of 20 and task logs in batches of 5.
+
+- ``client``: in-process through the Flask test client, one request at a
+  time. This measures the cost of the Python ingest path alone.
+- ``http``: against a real server (src/app.py), with one concurrent client
+  per subject, like several tracking stations at once.
+
+Reports samples/second, save-points and save-tasklogs p50/p99 latency and
+the database size. Results are compared with a stored baseline; save one
+with --save-baseline before a change, then rerun after it.
+
+Usage: python benchmarks/ingest.py [--targets client http] [--subjects 8]
+                                   [--duration 120] [--rate 30] [--tasks 8]
+                                   [--server waitress] [--save-baseline]
+                                   [--check --tolerance 0.2]
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from baseline import RESULTS_DIR, compare, load_baseline, save_baseline
+from serve_throughput import ROOT, create_subject, percentile, start_server, stop_server
+from synthetic import SessionConfig, generate_sessions
+
+DEFAULT_BASELINE = RESULTS_DIR / "ingest_baseline.json"
+
+CHECKED = (
+    "samples_per_second",
+    "points_p50_ms",
+    "points_p99_ms",
+    "tasklogs_p50_ms",
+    "tasklogs_p99_ms",
+    "db_bytes_per_sample",
+)
+
+
+def database_size(path):
+    """Size of the SQLite database including its WAL file."""
+    return sum(
+        os.path.getsize(path + suffix) for suffix in ("", "-wal") if os.path.exists(path + suffix)
+    )
+
+
+def summarize(sessions, elapsed, point_latencies, tasklog_latencies, errors, database):
+    samples = sum(session.sample_count for session in sessions)
+    size = database_size(database)
+    return {
+        "samples": samples,
+        "seconds": round(elapsed, 3),
+        "samples_per_second": round(samples / elapsed, 1),
+        "points_p50_ms": round(percentile(point_latencies, 0.50) * 1000, 3),
+        "points_p99_ms": round(percentile(point_latencies, 0.99) * 1000, 3),
+        "tasklogs_p50_ms": round(percentile(tasklog_latencies, 0.50) * 1000, 3),
+        "tasklogs_p99_ms": round(percentile(tasklog_latencies, 0.99) * 1000, 3),
+        "db_bytes": size,
+        "db_bytes_per_sample": round(size / samples, 1),
+        "errors": errors,
+    }
+
+
+def run_client(sessions, database):
+    """Send every session through the Flask test client."""
+    sys.path.insert(0, str(ROOT / "src"))
+    os.environ["GAZETRACK_DATABASE_PATH"] = database
+    from app import create_app
+    from app.startup import prepare_app
+
+    app = prepare_app(create_app({"METRICS_ENABLED": False, "SWAGGER_ENABLED": False}))
+    client = app.test_client()
+
+    point_latencies, tasklog_latencies, errors = [], [], 0
+    start = time.perf_counter()
+    for session in sessions:
+        response = client.post("/", data={"nombre": "Bench", "apellido": "Ingest", "edad": 30})
+        subject_id = int(response.location.rsplit("id=", 1)[1])
+
+        for points in session.point_payloads():
+            t = time.perf_counter()
+            response = client.post("/api/save-points", json={"id": subject_id, "points": points})
+            point_latencies.append(time.perf_counter() - t)
+            errors += response.status_code != 200
+
+        for task_logs in session.tasklog_payloads():
+            t = time.perf_counter()
+            response = client.post(
+                "/api/save-tasklogs", json={"subject_id": subject_id, "taskLogs": task_logs}
+            )
+            tasklog_latencies.append(time.perf_counter() - t)
+            errors += response.status_code != 200
+    elapsed = time.perf_counter() - start
+
+    return summarize(sessions, elapsed, point_latencies, tasklog_latencies, errors, database)
+
+
+def post_json(url, payload):
+    """POST a JSON payload and return (latency in seconds, ok)."""
+    request = urllib.request.Request(
+        url, data=json.dumps(payload).encode(), headers={"Content-Type": "application/json"}
+    )
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=60) as response:
+            response.read()
+            ok = response.status == 200
+    except (urllib.error.URLError, ConnectionError, OSError):
+        ok = False
+    return time.perf_counter() - start, ok
+
+
+def stream_session(base_url, session):
+    """Play one session as a tracking station would; return the latencies."""
+    subject_id = create_subject(base_url)
+    point_latencies, tasklog_latencies, errors = [], [], 0
+
+    for points in session.point_payloads():
+        latency, ok = post_json(f"{base_url}/api/save-points", {"id": subject_id, "points": points})
+        point_latencies.append(latency)
+        errors += not ok
+
+    for task_logs in session.tasklog_payloads():
+        latency, ok = post_json(
+            f"{base_url}/api/save-tasklogs", {"subject_id": subject_id, "taskLogs": task_logs}
+        )
+        tasklog_latencies.append(latency)
+        errors += not ok
+
+    return point_latencies, tasklog_latencies, errors
+
+
+def run_http(sessions, database, args):
+    """Send the sessions concurrently to a real server."""
+    process = start_server(args.server, args.port, database, args.workers, args.threads)
+    try:
+        base_url = f"http://127.0.0.1:{args.port}"
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(sessions)) as pool:
+            results = list(pool.map(lambda session: stream_session(base_url, session), sessions))
+        elapsed = time.perf_counter() - start
+    finally:
+        stop_server(process)
+
+    point_latencies = [latency for points, _, _ in results for latency in points]
+    tasklog_latencies = [latency for _, task_logs, _ in results for latency in task_logs]
+    errors = sum(errors for _, _, errors in results)
+    return summarize(sessions, elapsed, point_latencies, tasklog_latencies, errors, database)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--targets", nargs="+", choices=["client", "http"], default=["client", "http"])
+    parser.add_argument("--subjects", type=int, default=8, help="Sessions (concurrent clients over HTTP)")
+    parser.add_argument("--duration", type=float, default=120, help="Seconds per session")
+    parser.add_argument("--rate", type=float, default=30, help="Samples per second")
+    parser.add_argument("--tasks", type=int, default=8, help="Tasks per session")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--server", default="waitress", help="Server mode for the http target")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--port", type=int, default=5911)
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the baseline")
+    parser.add_argument("--check", action="store_true", help="Exit with status 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression")
+    args = parser.parse_args()
+
+    config = SessionConfig(duration_s=args.duration, rate_hz=args.rate, tasks=args.tasks)
+    sessions = generate_sessions(args.subjects, config, seed=args.seed)
+    total = sum(session.sample_count for session in sessions)
+    print(f"{len(sessions)} sessions, {total:,} samples")
+
+    results = {}
+    for target in args.targets:
+        with tempfile.TemporaryDirectory() as tmp:
+            database = os.path.join(tmp, f"{target}.db")
+            if target == "client":
+                results[target] = run_client(sessions, database)
+            else:
+                results[target] = run_http(sessions, database, args)
+
+    regressions = compare(
+        results,
+        load_baseline(args.baseline),
+        args.tolerance,
+        checked=CHECKED,
+        higher_is_better=("samples_per_second",),
+    )
+
+    if args.save_baseline:
+        save_baseline(args.baseline, vars(args), results)
+
+    if regressions:
+        print(f"\nRegressions beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+        if args.check:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""
+Load test: many tracking stations running the full subject flow at once.
+
+Starts the application (src/app.py) on a throwaway database and simulates N
+stations with asyncio. Each station registers a subject through the home
+form, opens the tracking page, loads /api/config and /api/tasks, streams its
+synthetic session (see synthetic.py) to /api/save-points in batches of 20 at
+the session's own pace, queues task logs the way main.js does (batches of 5,
+flushed 3 s after the last one and before leaving) and finishes on
+/fin-medicion. Stations start spread over --ramp seconds; --speed plays the
+sessions faster than real time.
+
+Reports per-request error rates and latency percentiles, the samples that
+reached the database, and SQLite write-lock contention: a probe connection
+repeatedly takes the write lock (BEGIN IMMEDIATE) and records how long it
+waited, and the server log is searched for "database is locked" errors.
+
+Runs fully offline: the HTTP client is a small keep-alive client on asyncio
+streams, so nothing beyond the application's own requirements is needed.
+
+Usage: python benchmarks/load_test.py [--stations 20] [--duration 60]
+                                      [--speed 1] [--ramp 10]
+                                      [--server waitress] [--workers 4]
+                                      [--max-error-rate 0.01]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from collections import Counter, defaultdict
+
+from serve_throughput import percentile, start_server, stop_server
+from synthetic import CLIENT_BATCH_SIZE, SessionConfig, generate_sessions
+
+# main.js: task logs are sent 5 at a time, or 3 s after the last one queued
+TASKLOG_BATCH_SIZE = 5
+TASKLOG_FLUSH_DELAY_MS = 3000
+# Seconds between write-lock probes
+LOCK_PROBE_INTERVAL = 0.05
+# Lock waits longer than this count as contended
+CONTENDED_WAIT_MS = 10
+# Browsers open at most this many connections per host
+CONNECTIONS_PER_STATION = 6
+
+
+class HttpError(Exception):
+    """Malformed response or closed connection."""
+
+    def __init__(self, message, before_response=False):
+        super().__init__(message)
+        self.before_response = before_response
+
+
+class HttpConnection:
+    """Minimal keep-alive HTTP/1.1 client on asyncio streams."""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def request(self, method, path, body=b"", content_type=None):
+        """
+        Send a request and return ``(status, headers, body)``.
+
+        Like a browser, a request that finds its idle keep-alive connection
+        closed by the server is sent again once on a new connection.
+        """
+        reused = self.writer is not None
+        try:
+            return await self._exchange(method, path, body, content_type)
+        except (HttpError, asyncio.IncompleteReadError, ConnectionError) as e:
+            await self.close()
+            closed_idle = isinstance(e, ConnectionError) or getattr(e, "before_response", False)
+            if not (reused and closed_idle):
+                raise
+        return await self._exchange(method, path, body, content_type)
+
+    async def _exchange(self, method, path, body, content_type):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host}:{self.port}", "Connection: keep-alive"]
+        if body or method == "POST":
+            lines.append(f"Content-Length: {len(body)}")
+        if content_type:
+            lines.append(f"Content-Type: {content_type}")
+        self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        await self.writer.drain()
+
+        status, headers, content = await self._read_response()
+        if headers.get("connection", "").lower() == "close":
+            await self.close()
+        return status, headers, content
+
+    async def _read_response(self):
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise HttpError("connection closed by the server", before_response=True)
+        parts = status_line.decode("latin-1").split(" ", 2)
+        if len(parts) < 2 or not parts[1].isdigit():
+            raise HttpError(f"bad status line {status_line!r}")
+
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            content = bytearray()
+            while True:
+                size = int((await self.reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    await self.reader.readline()
+                    break
+                content += await self.reader.readexactly(size)
+                await self.reader.readline()
+        elif "content-length" in headers:
+            content = await self.reader.readexactly(int(headers["content-length"]))
+        else:
+            content = await self.reader.read()
+            headers["connection"] = "close"
+        return int(parts[1]), headers, bytes(content)
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+        self.reader = self.writer = None
+
+
+class Stats:
+    """Latencies and outcomes of every request, by request name."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.requests = Counter()
+        self.errors = defaultdict(Counter)
+        self.stations = Counter()
+
+    def record(self, name, latency, error=None):
+        self.requests[name] += 1
+        self.latencies[name].append(latency)
+        if error:
+            self.errors[name][error] += 1
+
+
+async def call(connection, stats, name, method, path, timeout, body=b"", content_type=None, expect=(200,)):
+    """Make one request, record it and return the response (None on failure)."""
+    start = time.perf_counter()
+    try:
+        status, headers, content = await asyncio.wait_for(
+            connection.request(method, path, body, content_type), timeout
+        )
+    except asyncio.TimeoutError:
+        await connection.close()
+        stats.record(name, time.perf_counter() - start, "timeout")
+        return None
+    except (HttpError, asyncio.IncompleteReadError, ConnectionError, OSError) as e:
+        stats.record(name, time.perf_counter() - start, type(e).__name__)
+        return None
+
+    error = None if status in expect else f"HTTP {status}"
+    stats.record(name, time.perf_counter() - start, error)
+    return None if error else (status, headers, content)
+
+
+def station_timeline(session):
+    """
+    Requests of one session after registration, in the order a browser sends them.
+
+    Returns:
+        Sorted ``(due_ms, name, path, payload)`` tuples, ``due_ms`` relative to
+        the first sample
+    """
+    origin = int(session.timestamps[0])
+    events = []
+    timestamps = session.timestamps.tolist()
+    for index, points in enumerate(session.point_payloads()):
+        last = timestamps[min(len(timestamps) - 1, (index + 1) * CLIENT_BATCH_SIZE - 1)]
+        events.append((last - origin, "save-points", "/api/save-points", {"points": points}))
+
+    logs = session.task_logs
+    queue = []
+    for index, log in enumerate(logs):
+        queue.append(log)
+        end = log["endTime"] - origin
+        if len(queue) >= TASKLOG_BATCH_SIZE or index == len(logs) - 1:
+            flush_at = end
+        elif logs[index + 1]["endTime"] - origin > end + TASKLOG_FLUSH_DELAY_MS:
+            flush_at = end + TASKLOG_FLUSH_DELAY_MS
+        else:
+            continue
+        events.append((flush_at, "save-tasklogs", "/api/save-tasklogs", {"taskLogs": queue}))
+        queue = []
+
+    return sorted(events, key=lambda event: event[0])
+
+
+async def run_station(number, session, args, stats):
+    """
+    Play the full flow of one station.
+
+    Like the browser, the station does not wait for one save request to
+    finish before sending the next: requests due while others are in flight
+    go out on another of its connections.
+    """
+    await asyncio.sleep(args.ramp * number / max(1, args.stations - 1))
+    stats.stations["started"] += 1
+    connections = asyncio.Queue()
+    for _ in range(CONNECTIONS_PER_STATION):
+        connections.put_nowait(HttpConnection("127.0.0.1", args.port))
+
+    async def send(name, method, path, body=b"", content_type=None, expect=(200,)):
+        connection = await connections.get()
+        try:
+            return await call(connection, stats, name, method, path, args.timeout, body, content_type, expect)
+        finally:
+            connections.put_nowait(connection)
+
+    try:
+        await send("home", "GET", "/")
+        form = urllib.parse.urlencode({"nombre": f"Estación {number}", "apellido": "Carga", "edad": 30})
+        response = await send(
+            "register", "POST", "/", form.encode(), "application/x-www-form-urlencoded", expect=(302, 303)
+        )
+        if response is None:
+            stats.stations["failed"] += 1
+            return
+        query = urllib.parse.urlparse(response[1].get("location", "")).query
+        subject_id = int(urllib.parse.parse_qs(query)["id"][0])
+
+        await send("tracking-page", "GET", f"/gaze-tracking?id={subject_id}")
+        await asyncio.gather(send("config", "GET", "/api/config"), send("tasks", "GET", "/api/tasks"))
+
+        pending = []
+        started = time.perf_counter()
+        for due_ms, name, path, payload in station_timeline(session):
+            delay = started + due_ms / 1000 / args.speed - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            key = "id" if name == "save-points" else "subject_id"
+            body = json.dumps({key: subject_id, **payload}).encode()
+            pending.append(asyncio.create_task(send(name, "POST", path, body, "application/json")))
+
+        # main.js waits for the last task logs before leaving the page
+        await asyncio.gather(*pending)
+        await send("finish", "GET", "/fin-medicion")
+        stats.stations["completed"] += 1
+    finally:
+        while not connections.empty():
+            await connections.get_nowait().close()
+
+
+def probe_write_lock(database, stop, waits):
+    """Take SQLite's write lock repeatedly and record how long each attempt waited."""
+    connection = sqlite3.connect(database, timeout=60, isolation_level=None)
+    try:
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                connection.execute("BEGIN IMMEDIATE")
+                waits.append(time.perf_counter() - start)
+                connection.execute("ROLLBACK")
+            except sqlite3.OperationalError:
+                waits.append(time.perf_counter() - start)
+            stop.wait(LOCK_PROBE_INTERVAL)
+    finally:
+        connection.close()
+
+
+def stored_samples(database):
+    connection = sqlite3.connect(database)
+    try:
+        return connection.execute("SELECT COUNT(*) FROM measurement").fetchone()[0]
+    finally:
+        connection.close()
+
+
+def milliseconds(values, fraction):
+    return percentile(values, fraction) * 1000 if values else 0.0
+
+
+def report(stats, elapsed, sessions, stored, waits, locked_errors):
+    """Print the results; return the overall error rate."""
+    print(f"\nStations: {stats.stations['started']} started, {stats.stations['completed']} completed, "
+          f"{stats.stations['failed']} failed to register ({elapsed:.1f} s)")
+
+    print(f"\n{'request':<15} {'count':>7} {'errors':>7} {'err %':>7} {'p50 ms':>9} "
+          f"{'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for name, latencies in stats.latencies.items():
+        errors = sum(stats.errors[name].values())
+        print(f"{name:<15} {stats.requests[name]:>7} {errors:>7} {errors / stats.requests[name]:>7.2%} "
+              f"{milliseconds(latencies, 0.50):>9.1f} {milliseconds(latencies, 0.95):>9.1f} "
+              f"{milliseconds(latencies, 0.99):>9.1f} {max(latencies) * 1000:>9.1f}")
+
+    total = sum(stats.requests.values())
+    total_errors = sum(sum(errors.values()) for errors in stats.errors.values())
+    error_rate = total_errors / total if total else 1.0
+    print(f"\nRequests: {total} ({total / elapsed:.1f}/s), errors: {total_errors} ({error_rate:.2%})")
+    for name, errors in stats.errors.items():
+        for error, count in errors.most_common():
+            print(f"  {name}: {error} x{count}")
+
+    expected = sum(session.sample_count for session in sessions)
+    print(f"Samples stored: {stored:,} of {expected:,} sent ({expected - stored:,} lost)")
+
+    contended = sum(wait * 1000 > CONTENDED_WAIT_MS for wait in waits)
+    print(f"\nWrite lock: {len(waits)} probes, wait p50 {milliseconds(waits, 0.50):.1f} ms, "
+          f"p99 {milliseconds(waits, 0.99):.1f} ms, max {max(waits, default=0) * 1000:.1f} ms, "
+          f"{contended / len(waits) if waits else 0:.1%} waited over {CONTENDED_WAIT_MS} ms")
+    print(f"'database is locked' errors in the server log: {locked_errors}")
+    return error_rate
+
+
+async def run_stations(sessions, args, stats):
+    await asyncio.gather(*(run_station(number, session, args, stats) for number, session in enumerate(sessions)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stations", type=int, default=20, help="Concurrent tracking stations")
+    parser.add_argument("--duration", type=float, default=60, help="Seconds of tracking per station")
+    parser.add_argument("--rate", type=float, default=30, help="Samples per second")
+    parser.add_argument("--tasks", type=int, default=8, help="Tasks per session")
+    parser.add_argument("--speed", type=float, default=1.0, help="Playback speed (2 = twice real time)")
+    parser.add_argument("--ramp", type=float, default=10, help="Seconds over which the stations start")
+    parser.add_argument("--timeout", type=float, default=30, help="Seconds before a request counts as failed")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--server", default="waitress", help="Server mode (see src/app.py --server)")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--port", type=int, default=5912)
+    parser.add_argument("--max-error-rate", type=float, default=0.01,
+                        help="Exit with status 1 when more requests than this fail")
+    args = parser.parse_args()
+
+    config = SessionConfig(duration_s=args.duration, rate_hz=args.rate, tasks=args.tasks)
+    sessions = generate_sessions(args.stations, config, seed=args.seed)
+    print(f"{args.stations} stations, {sum(s.sample_count for s in sessions):,} samples, "
+          f"{args.server} server, playback x{args.speed:g}")
+
+    stats = Stats()
+    waits = []
+    with tempfile.TemporaryDirectory() as tmp:
+        database = os.path.join(tmp, "load.db")
+        log_path = os.path.join(tmp, "server.log")
+        with open(log_path, "w") as log:
+            process = start_server(args.server, args.port, database, args.workers, args.threads, log)
+            stop = threading.Event()
+            probe = threading.Thread(target=probe_write_lock, args=(database, stop, waits), daemon=True)
+            probe.start()
+            try:
+                start = time.perf_counter()
+                asyncio.run(run_stations(sessions, args, stats))
+                elapsed = time.perf_counter() - start
+            finally:
+                stop.set()
+                probe.join()
+                stop_server(process)
+
+        with open(log_path, encoding="utf-8", errors="replace") as log:
+            locked_errors = log.read().count("database is locked")
+        error_rate = report(stats, elapsed, sessions, stored_samples(database), waits, locked_errors)
+
+    if error_rate > args.max_error_rate:
+        print(f"\nError rate {error_rate:.2%} is above {args.max_error_rate:.2%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Read-path and export benchmarks.
+
+Seeds databases of 10k, 1M and (optionally) 10M samples with synthetic
+sessions (see synthetic.py) and requests the read side of the application
+through the Flask test client:
+
+- ``user-points``: /api/get-user-points for one subject
+- ``resultados``: the /resultados page (heatmap data) for one subject
+- ``download-points``: /api/download-points (CSV) for one subject
+- ``download-all``: /api/download-all (CSV of every subject)
+- ``sujetos``: the /sujetos subject list
+
+For each one it reports the wall time (median of --repeat runs), the peak
+Python memory of one run under tracemalloc and the number of SQL statements.
+Results are compared with a stored baseline; save one with --save-baseline
+before a change, then rerun after it with --check.
+
+Seeded databases are written with raw executemany (a 10M sample database
+takes a few minutes instead of hours through the API) and cached under
+benchmarks/results/seeds; pass --reseed to build them again.
+
+Usage: python benchmarks/read_paths.py [--sizes 10k 1m] [--repeat 3]
+                                       [--save-baseline]
+                                       [--check --tolerance 0.25]
+"""
+
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+from baseline import RESULTS_DIR, compare, load_baseline, save_baseline
+from serve_throughput import ROOT
+from synthetic import SessionConfig, generate_session
+
+DEFAULT_BASELINE = RESULTS_DIR / "read_baseline.json"
+SEEDS_DIR = RESULTS_DIR / "seeds"
+
+SIZES = {"10k": 10_000, "1m": 1_000_000, "10m": 10_000_000}
+# Samples of one subject: a 25 minute session at 30 Hz at most
+MAX_SUBJECT_SAMPLES = 50_000
+# Stored times are naive local time (Buenos Aires, UTC-3)
+LOCAL_OFFSET = np.timedelta64(-3, "h")
+
+CASES = {
+    "user-points": "/api/get-user-points?id={subject_id}",
+    "resultados": "/resultados?id={subject_id}",
+    "download-points": "/api/download-points?id={subject_id}",
+    "download-all": "/api/download-all",
+    "sujetos": "/sujetos",
+}
+
+CHECKED = ("seconds", "peak_mb", "queries")
+# Differences below these never count as regressions (timer and allocator noise)
+MIN_DELTA = {"seconds": 0.005, "peak_mb": 1.0}
+
+
+def create_app_for(database):
+    """Create the application on a database file, creating the schema if needed."""
+    sys.path.insert(0, str(ROOT / "src"))
+    os.environ["GAZETRACK_DATABASE_PATH"] = str(database)
+    from app import create_app
+    from app.startup import prepare_app
+
+    return prepare_app(create_app({
+        "METRICS_ENABLED": False,
+        "SWAGGER_ENABLED": False,
+        "SQL_PROFILING": False,
+    }))
+
+
+def stored_dates(timestamps):
+    """Epoch milliseconds as the text SQLAlchemy stores for DateTime columns."""
+    local = timestamps.astype("datetime64[ms]") + LOCAL_OFFSET
+    return np.char.replace(np.datetime_as_string(local.astype("datetime64[us]")), "T", " ").tolist()
+
+
+def insert_session(cursor, subject_id, session, first_point_id):
+    """Insert one session's samples and task logs; return the next free point ID."""
+    count = session.sample_count
+    gaze_ids = first_point_id + np.arange(count)
+    mouse_ids = gaze_ids + count
+
+    points = np.vstack([session.gaze.round(2), session.mouse.round(0)])
+    point_ids = np.concatenate([gaze_ids, mouse_ids])
+    cursor.executemany(
+        "INSERT INTO point (id, x, y) VALUES (?, ?, ?)",
+        zip(point_ids.tolist(), points[:, 0].tolist(), points[:, 1].tolist()),
+    )
+    cursor.executemany(
+        "INSERT INTO measurement (date, subject_id, gaze_point_id, mouse_point_id) VALUES (?, ?, ?, ?)",
+        zip(stored_dates(session.timestamps), [subject_id] * count, gaze_ids.tolist(), mouse_ids.tolist()),
+    )
+
+    starts = stored_dates(np.array([log["startTime"] for log in session.task_logs]))
+    ends = stored_dates(np.array([log["endTime"] for log in session.task_logs]))
+    cursor.executemany(
+        "INSERT INTO task_log (start_time, end_time, response, subject_id, task_description, task_type, task_version)"
+        " VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [
+            (start, end, log["response"], subject_id, log["task"], log["type"], log["version"])
+            for start, end, log in zip(starts, ends, session.task_logs)
+        ],
+    )
+    return first_point_id + 2 * count
+
+
+def seed(database, samples, seed_value):
+    """
+    Fill a new database with ``samples`` samples split into subjects.
+
+    The schema (and the active study) are created by the application itself,
+    so the seeded file matches what the code under test expects.
+    """
+    app = create_app_for(database)
+    study_id = app.config.get("ACTIVE_STUDY_ID")
+    from db import db
+
+    with app.app_context():
+        db.engine.dispose()
+
+    rng = np.random.default_rng(seed_value)
+    config = SessionConfig(duration_s=MAX_SUBJECT_SAMPLES / 30 * 1.05, rate_hz=30)
+    connection = sqlite3.connect(database)
+    connection.execute("PRAGMA synchronous=OFF")
+    cursor = connection.cursor()
+
+    start_ms = 1_700_000_000_000
+    remaining = samples
+    point_id = 1
+    subject_number = 0
+    while remaining > 0:
+        session = generate_session(rng, config, start_ms)
+        count = min(remaining, MAX_SUBJECT_SAMPLES, session.sample_count)
+        session.timestamps, session.gaze, session.mouse = (
+            session.timestamps[:count], session.gaze[:count], session.mouse[:count]
+        )
+        session.task_logs = [log for log in session.task_logs if log["startTime"] <= session.timestamps[-1]]
+
+        subject_number += 1
+        cursor.execute(
+            "INSERT INTO subject (name, surname, age, study_id) VALUES (?, ?, ?, ?)",
+            (f"Sujeto {subject_number}", "Bench", 20 + subject_number % 50, study_id),
+        )
+        point_id = insert_session(cursor, cursor.lastrowid, session, point_id)
+        connection.commit()
+
+        remaining -= count
+        start_ms = int(session.timestamps[-1]) + 60_000
+        print(f"\r  {samples - max(remaining, 0):,}/{samples:,} samples", end="", flush=True)
+    print()
+    connection.close()
+
+    from api.services import SummaryService
+
+    with app.app_context():
+        SummaryService().rebuild()
+        db.engine.dispose()
+
+
+def seeded_database(label, seed_value, reseed):
+    """Path of the cached seed database for a size, building it if needed."""
+    database = SEEDS_DIR / f"read_{label}_seed{seed_value}.db"
+    if database.exists() and not reseed:
+        return database
+
+    SEEDS_DIR.mkdir(parents=True, exist_ok=True)
+    partial = database.with_suffix(".partial")
+    for path in (database, partial):
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(f"{path}{suffix}"):
+                os.remove(f"{path}{suffix}")
+
+    print(f"Seeding {label} ({SIZES[label]:,} samples)...")
+    start = time.perf_counter()
+    seed(partial, SIZES[label], seed_value)
+    os.replace(partial, database)
+    print(f"  done in {time.perf_counter() - start:.1f} s")
+    return database
+
+
+class QueryCounter:
+    """Counts the SQL statements an engine executes."""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+
+def request(client, url):
+    """GET a URL and read the whole body chunk by chunk, as a browser download would."""
+    response = client.get(url, buffered=False)
+    size = sum(len(chunk) for chunk in response.iter_encoded())
+    status = response.status_code
+    response.close()
+    return status, size
+
+
+def measure(client, counter, url, repeat):
+    """Wall time, peak memory and statement count of one read path."""
+    request(client, url)  # warm up the page cache and the statement cache
+
+    timings = []
+    counter.count = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        status, size = request(client, url)
+        timings.append(time.perf_counter() - start)
+    queries = counter.count // repeat
+
+    tracemalloc.start()
+    request(client, url)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "seconds": round(statistics.median(timings), 4),
+        "peak_mb": round(peak / 2**20, 2),
+        "queries": queries,
+        "bytes": size,
+        "status": status,
+    }
+
+
+def run(database, cases, repeat):
+    """Measure every case against one seeded database."""
+    app = create_app_for(database)
+    from db import db
+    from repositories import SubjectRepository
+
+    with app.app_context():
+        subject_id = SubjectRepository().get_all_subjects()[0].id
+        counter = QueryCounter(db.engine)
+
+    client = app.test_client()
+    results = {}
+    for case in cases:
+        url = CASES[case].format(subject_id=subject_id)
+        results[case] = measure(client, counter, url, repeat)
+        print(f"  {case:<16} {results[case]['seconds']:>9.4f} s {results[case]['peak_mb']:>9.2f} MB "
+              f"{results[case]['queries']:>7} queries  HTTP {results[case]['status']}")
+
+    with app.app_context():
+        db.engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=["10k", "1m"])
+    parser.add_argument("--cases", nargs="+", choices=list(CASES), default=list(CASES))
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per case (the median is reported)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--reseed", action="store_true", help="Rebuild the cached seed databases")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the baseline")
+    parser.add_argument("--check", action="store_true", help="Exit with status 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative regression")
+    args = parser.parse_args()
+
+    results = {}
+    for label in args.sizes:
+        database = seeded_database(label, args.seed, args.reseed)
+        print(f"{label}: {database}")
+        for case, metrics in run(database, args.cases, args.repeat).items():
+            results[f"{label} {case}"] = metrics
+
+    # A request that failed in the baseline has no numbers to compare with
+    baseline = {
+        target: metrics for target, metrics in load_baseline(args.baseline).items()
+        if metrics.get("status") == 200
+    }
+    regressions = compare(
+        results,
+        baseline,
+        args.tolerance,
+        checked=CHECKED,
+        min_delta=MIN_DELTA,
+    )
+    failed = [target for target, metrics in results.items() if metrics["status"] != 200]
+
+    if args.save_baseline:
+        save_baseline(args.baseline, vars(args), results)
+
+    if failed:
+        print(f"\nFailed requests: {', '.join(failed)}")
+    if regressions:
+        print(f"\nRegressions beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+    if args.check and (regressions or failed):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
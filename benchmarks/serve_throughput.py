@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Request throughput of each serving mode.
+
+Starts src/app.py once per server mode against a throwaway database, fires
+the same mix of /api/save-points and /api/get-subject-summary requests from
+several concurrent clients and prints requests/second and latency
+percentiles, so the production servers can be compared with the dev server.
+
+Usage: python benchmarks/serve_throughput.py [--modes development waitress gunicorn]
+                                             [--requests 2000] [--concurrency 16]
+"""
+
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+APP = ROOT / "src" / "app.py"
+
+
+def start_server(mode, port, database, workers, threads, log=None):
+    """
+    Start the application in a subprocess and wait until it answers.
+
+    Server output goes to ``log`` (an open file) or is discarded.
+    """
+    env = dict(os.environ, GAZETRACK_DATABASE_PATH=database)
+    command = [
+        sys.executable, str(APP), "--server", mode, "--port", str(port),
+        "--workers", str(workers), "--threads", str(threads), "--no-tls",
+    ]
+    process = subprocess.Popen(
+        command,
+        cwd=ROOT,
+        env=env,
+        stdin=subprocess.DEVNULL,
+        stdout=log or subprocess.DEVNULL,
+        stderr=log or subprocess.DEVNULL,
+        start_new_session=(os.name != "nt"),
+    )
+
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/fin-medicion", timeout=1)
+            return process
+        except (urllib.error.URLError, ConnectionError, OSError):
+            if process.poll() is not None:
+                raise RuntimeError(f"{mode} server exited with code {process.returncode}")
+            time.sleep(0.2)
+
+    stop_server(process)
+    raise RuntimeError(f"{mode} server did not start within 60 s")
+
+
+def stop_server(process):
+    """Stop the server and every process it started (reloader, workers)."""
+    if os.name != "nt":
+        os.killpg(process.pid, signal.SIGTERM)
+    else:
+        process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def create_subject(base_url):
+    """Register a subject through the home form and return its ID."""
+    form = urllib.parse.urlencode({"nombre": "Bench", "apellido": "Mark", "edad": 30}).encode()
+    response = urllib.request.urlopen(f"{base_url}/", data=form, timeout=10)
+    query = urllib.parse.urlparse(response.geturl()).query
+    return int(urllib.parse.parse_qs(query)["id"][0])
+
+
+def make_request(base_url, subject_id, i):
+    """Send one request of the mix and return (latency in seconds, ok)."""
+    if i % 2 == 0:
+        now = int(time.time() * 1000)
+        points = [
+            {"date": now + k * 33, "gaze": {"x": 100.0 + k, "y": 200.0}, "mouse": {"x": 50.0, "y": 60.0}}
+            for k in range(20)
+        ]
+        request = urllib.request.Request(
+            f"{base_url}/api/save-points",
+            data=json.dumps({"id": subject_id, "points": points}).encode(),
+            headers={"Content-Type": "application/json"},
+        )
+    else:
+        request = urllib.request.Request(f"{base_url}/api/get-subject-summary?id={subject_id}")
+
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=30) as response:
+            response.read()
+            ok = response.status == 200
+    except (urllib.error.URLError, ConnectionError, OSError):
+        ok = False
+    return time.perf_counter() - start, ok
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run_mode(mode, args, port):
+    with tempfile.TemporaryDirectory() as tmp:
+        process = start_server(mode, port, os.path.join(tmp, "bench.db"), args.workers, args.threads)
+        try:
+            base_url = f"http://127.0.0.1:{port}"
+            subject_id = create_subject(base_url)
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+                results = list(pool.map(
+                    lambda i: make_request(base_url, subject_id, i), range(args.requests)
+                ))
+            elapsed = time.perf_counter() - start
+        finally:
+            stop_server(process)
+
+    latencies = [latency for latency, ok in results if ok]
+    errors = sum(1 for _, ok in results if not ok)
+    return {
+        "mode": mode,
+        "requests_per_second": len(results) / elapsed,
+        "p50_ms": percentile(latencies, 0.50) * 1000 if latencies else None,
+        "p99_ms": percentile(latencies, 0.99) * 1000 if latencies else None,
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    default_modes = ["development", "waitress"] + (["gunicorn"] if os.name != "nt" else [])
+    parser.add_argument("--modes", nargs="+", default=default_modes)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--port", type=int, default=5901)
+    args = parser.parse_args()
+
+    print(f"{'mode':<12} {'req/s':>10} {'p50 ms':>10} {'p99 ms':>10} {'errors':>8}")
+    for offset, mode in enumerate(args.modes):
+        result = run_mode(mode, args, args.port + offset)
+        print(
+            f"{result['mode']:<12} {result['requests_per_second']:>10.1f} "
+            f"{result['p50_ms'] or 0:>10.2f} {result['p99_ms'] or 0:>10.2f} {result['errors']:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
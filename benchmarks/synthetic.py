@@ -0,0 +1,153 @@
+"""
+Synthetic tracking sessions shaped like the ones the browser client sends.
+
+Gaze follows a fixation/saccade pattern (fixations of 150-500 ms with
+jitter, jumps between them), the mouse trails the gaze, samples arrive at
+the configured rate with timing jitter and WebGazer's occasional dropouts,
+and the session is split into tasks with their task logs. Payloads use the
+same JSON shapes as gazeTracking.js and main.js.
+"""
+
+from dataclasses import dataclass
+from typing import Iterator, List
+import numpy as np
+
+# gazeTracking.js sends points in batches of this size
+CLIENT_BATCH_SIZE = 20
+# main.js sends task logs in batches of this size
+TASKLOG_BATCH_SIZE = 5
+
+SCREEN_WIDTH = 1920
+SCREEN_HEIGHT = 1080
+
+
+@dataclass
+class SessionConfig:
+    """Shape of the generated sessions."""
+
+    duration_s: float = 300.0
+    rate_hz: float = 30.0
+    tasks: int = 8
+    dropout: float = 0.03
+    width: int = SCREEN_WIDTH
+    height: int = SCREEN_HEIGHT
+
+
+@dataclass
+class Session:
+    """One subject's samples and task logs."""
+
+    timestamps: np.ndarray  # int64 epoch milliseconds
+    gaze: np.ndarray  # (n, 2)
+    mouse: np.ndarray  # (n, 2)
+    task_logs: List[dict]
+
+    @property
+    def sample_count(self) -> int:
+        return len(self.timestamps)
+
+    def point_payloads(self, batch_size: int = CLIENT_BATCH_SIZE) -> Iterator[List[dict]]:
+        """Yield the ``points`` list of each /api/save-points request."""
+        timestamps = self.timestamps.tolist()
+        gaze = self.gaze.round(2).tolist()
+        mouse = self.mouse.round(0).tolist()
+        for start in range(0, len(timestamps), batch_size):
+            yield [
+                {"date": date, "gaze": {"x": gx, "y": gy}, "mouse": {"x": mx, "y": my}}
+                for date, (gx, gy), (mx, my) in zip(
+                    timestamps[start:start + batch_size],
+                    gaze[start:start + batch_size],
+                    mouse[start:start + batch_size],
+                )
+            ]
+
+    def tasklog_payloads(self, batch_size: int = TASKLOG_BATCH_SIZE) -> Iterator[List[dict]]:
+        """Yield the ``taskLogs`` list of each /api/save-tasklogs request."""
+        for start in range(0, len(self.task_logs), batch_size):
+            yield self.task_logs[start:start + batch_size]
+
+
+def generate_session(
+    rng: np.random.Generator, config: SessionConfig, start_ms: int
+) -> Session:
+    """
+    Generate one session.
+
+    Args:
+        rng: Random generator (seed it for reproducible runs)
+        config: Session shape
+        start_ms: Epoch milliseconds of the first sample
+
+    Returns:
+        The session
+    """
+    count = int(config.duration_s * config.rate_hz)
+    interval = 1000.0 / config.rate_hz
+
+    # Sample times: nominal interval with jitter, minus dropped frames
+    steps = np.clip(rng.normal(interval, interval * 0.15, count), interval * 0.3, None)
+    timestamps = start_ms + np.cumsum(steps).astype(np.int64)
+    kept = rng.random(count) >= config.dropout
+    timestamps = timestamps[kept]
+    count = len(timestamps)
+
+    # Fixations: a target per fixation, held for 150-500 ms
+    fixation_samples = np.maximum(1, (rng.uniform(150, 500, count) / interval).astype(int))
+    boundaries = np.cumsum(fixation_samples)
+    fixations = int(np.searchsorted(boundaries, count)) + 1
+    targets = np.column_stack([
+        rng.uniform(0, config.width, fixations),
+        rng.uniform(0, config.height, fixations),
+    ])
+    fixation_index = np.searchsorted(boundaries[:fixations], np.arange(count), side="right")
+    gaze = targets[np.minimum(fixation_index, fixations - 1)]
+    gaze = gaze + rng.normal(0, 25, gaze.shape)  # WebGazer jitter
+    gaze[:, 0] = gaze[:, 0].clip(0, config.width)
+    gaze[:, 1] = gaze[:, 1].clip(0, config.height)
+
+    # The mouse trails the gaze by about half a second, with its own offset
+    lag = max(1, int(500 / interval))
+    mouse = np.vstack([np.repeat(gaze[:1], lag, axis=0), gaze[:-lag]]) + rng.normal(0, 40, gaze.shape)
+    mouse[:, 0] = mouse[:, 0].clip(0, config.width)
+    mouse[:, 1] = mouse[:, 1].clip(0, config.height)
+
+    # Tasks split the session in uneven parts
+    task_count = max(1, min(config.tasks, count // 2))
+    cuts = np.sort(rng.choice(np.arange(1, count - 1), size=task_count - 1, replace=False))
+    edges = np.concatenate([[0], cuts, [count - 1]]).astype(int)
+    task_logs = []
+    for number, (first, last) in enumerate(zip(edges[:-1], edges[1:]), start=1):
+        task_logs.append({
+            "startTime": int(timestamps[first]),
+            "endTime": int(timestamps[last]),
+            "response": str(int(rng.integers(0, 100))),
+            "task": f"Tarea sintética {number}",
+            "type": "numeric",
+            "version": 1,
+        })
+
+    return Session(timestamps=timestamps, gaze=gaze, mouse=mouse, task_logs=task_logs)
+
+
+def generate_sessions(
+    subjects: int, config: SessionConfig, seed: int = 0, start_ms: int = 1_700_000_000_000
+) -> List[Session]:
+    """
+    Generate the sessions of several subjects, one after another in time.
+
+    Args:
+        subjects: Number of sessions
+        config: Session shape
+        seed: Random seed
+        start_ms: Epoch milliseconds of the first session
+
+    Returns:
+        The sessions
+    """
+    rng = np.random.default_rng(seed)
+    sessions = []
+    for _ in range(subjects):
+        session = generate_session(rng, config, start_ms)
+        sessions.append(session)
+        start_ms = int(session.timestamps[-1]) + 60_000
+    return sessions
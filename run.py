@@ -1,7 +1,17 @@
 #!/usr/bin/env python3
 """
 Cross-platform script to configure and run User Gaze Track
-Usage: python run.py [--venv]
+Usage: python run.py [--venv] [--fast] [--server development|waitress|gunicorn]
+                     [--host HOST] [--port PORT] [--workers N] [--threads N] [--no-tls]
+
+--venv  Use a Python venv even if conda is available.
+--fast  Skip the configuration and certificate prompts.
+
+Options other than --venv and --fast are passed on to src/app.py.
+
+Once an environment has been prepared, its fingerprint (a hash of the
+dependency files and the interpreter path) is stored in .gaze-track-env.json
+and later launches go straight to the application while it still matches.
 """
 
 import subprocess
@@ -9,6 +19,10 @@ import sys
 import os
 import platform
 import shutil
+import hashlib
+import json
+import time
+from contextlib import contextmanager
 from pathlib import Path
 from datetime import datetime, timedelta
 import ipaddress
@@ -22,11 +36,79 @@ class GazeTrackRunner:
         self.is_windows = platform.system() == "Windows"
         self.cert_file = "cert.pem"
         self.key_file = "key.pem"
+        self.fingerprint_file = Path(".gaze-track-env.json")
+        self.static_dir = Path("src/app/static")
+        self.assets_manifest = Path("src/app/dist/manifest.json")
+        self.dependency_files = ("requirements.txt", "environment.yml")
+        self.timings = []
         
     def print_step(self, message, emoji="🔧"):
         """Print a formatted message"""
         print(f"{emoji} {message}")
         
+    @contextmanager
+    def phase(self, name):
+        """Time a startup phase and print how long it took"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.timings.append((name, elapsed))
+            self.print_step(f"{name}: {elapsed:.2f}s", "⏱️")
+
+    def print_timings(self):
+        """Print the total time spent before launching the application"""
+        total = sum(elapsed for _, elapsed in self.timings)
+        self.print_step(f"Startup took {total:.2f}s", "⏱️")
+
+    def compute_fingerprint(self, python_path):
+        """Hash the dependency files together with the interpreter path"""
+        digest = hashlib.sha256()
+        digest.update(str(Path(python_path).absolute()).encode())
+        for name in self.dependency_files:
+            path = Path(name)
+            digest.update(name.encode())
+            digest.update(path.read_bytes() if path.exists() else b"")
+        return digest.hexdigest()
+
+    def load_fingerprint(self):
+        """Return the cached environment description, or None"""
+        try:
+            with open(self.fingerprint_file, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save_fingerprint(self, python_path):
+        """Remember that the environment behind python_path is ready"""
+        cached = {
+            "python_path": python_path,
+            "use_conda": self.use_conda,
+            "fingerprint": self.compute_fingerprint(python_path),
+            "prepared_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        try:
+            with open(self.fingerprint_file, "w", encoding="utf-8") as f:
+                json.dump(cached, f, indent=2)
+        except OSError as e:
+            print(f"⚠️  Could not save the environment fingerprint: {e}")
+
+    def cached_python(self, force_venv=False):
+        """Interpreter of a prepared environment whose fingerprint still matches"""
+        cached = self.load_fingerprint()
+        if not cached:
+            return None
+        python_path = cached.get("python_path")
+        if not python_path or not Path(python_path).exists():
+            return None
+        if force_venv and cached.get("use_conda"):
+            return None
+        if cached.get("fingerprint") != self.compute_fingerprint(python_path):
+            return None
+        self.use_conda = bool(cached.get("use_conda"))
+        return python_path
+
     def run_command(self, command, shell=True, check=True, capture_output=False):
         """Run a system command"""
         try:
@@ -72,10 +154,14 @@ class GazeTrackRunner:
         except:
             return False
             
-    def setup_conda_environment(self):
-        """Set up the conda environment"""
+    def setup_conda_environment(self, update=False):
+        """Set up the conda environment, updating it if environment.yml changed"""
         if self.conda_env_exists():
             self.print_step(f"Conda environment '{self.env_name}' already exists.", "✅")
+            if update:
+                self.print_step("Dependency files changed, updating the conda environment...", "⚙️")
+                if not self.run_command(f"conda env update -n {self.env_name} -f environment.yml"):
+                    return False
         else:
             self.print_step(f"Creating conda environment '{self.env_name}' from environment.yml...", "⚙️")
             if not self.run_command(f"conda env create -n {self.env_name} -f environment.yml"):
@@ -293,6 +379,8 @@ print("- key.pem (clave privada)")
             self.print_step("   From requirements.txt...")
             if not self.run_command(f'"{python_path}" -m pip install -r requirements.txt'):
                 return False
+            self.print_step("Dependencies installed.", "✅")
+            return True
         else:
             self.print_step("   Installing core dependencies...")
             deps = [
@@ -301,7 +389,12 @@ print("- key.pem (clave privada)")
                 "flasgger==0.9.7.1",
                 "numpy==1.26.4",
                 "ttkbootstrap==1.10.1",
-                "cryptography"
+                "cryptography",
+                "tzdata",
+                "waitress",
+                "rjsmin",
+                "rcssmin",
+                "brotli"
             ]
             for dep in deps:
                 if not self.run_command(f'"{python_path}" -m pip install {dep}'):
@@ -327,56 +420,108 @@ print("- key.pem (clave privada)")
             return False
         return True
         
-    def run_application(self, python_path):
+    def assets_outdated(self):
+        """Check whether a static file changed after the last asset build"""
+        if not self.assets_manifest.exists():
+            return True
+        built_at = self.assets_manifest.stat().st_mtime
+        return any(
+            path.stat().st_mtime > built_at
+            for path in self.static_dir.rglob("*") if path.is_file()
+        )
+
+    def build_assets(self, python_path):
+        """Build the fingerprinted and precompressed static assets if needed"""
+        if not self.assets_outdated():
+            self.print_step("Static assets up to date.", "✅")
+            return True
+        self.print_step("Building static assets...", "📦")
+        return self.run_command(f'"{python_path}" src/build_assets.py --quiet')
+
+    def run_application(self, python_path, app_args=()):
         """Run the main application"""
         self.print_step("Running the application...", "🚀")
-        return self.run_command(f'"{python_path}" src/app.py')
+        args = " ".join(f'"{arg}"' for arg in app_args)
+        return self.run_command(f'"{python_path}" src/app.py {args}'.strip())
         
+    def prepare_environment(self, force_venv=False):
+        """Create or update the environment and return its Python interpreter"""
+        # A stale fingerprint means the dependency files changed since the last setup
+        stale = self.load_fingerprint() is not None
+
+        with self.phase("Environment detection"):
+            self.detect_environment_manager(force_venv)
+
+        if self.use_conda:
+            # Flujo conda
+            with self.phase("Conda environment"):
+                if not self.setup_conda_environment(update=stale):
+                    return None
+
+                python_path = self.get_conda_python()
+                if not python_path:
+                    print("❌ Could not get the conda Python path")
+                    return None
+
+                # Verificar que cryptography esté disponible para conda
+                self.install_cryptography(python_path)
+
+        else:
+            # Flujo venv
+            with self.phase("Virtual environment"):
+                success, is_new_env = self.setup_venv_environment()
+                if not success:
+                    return None
+
+                python_path = self.get_venv_python()
+
+            # Instalar dependencias si es necesario
+            with self.phase("Dependencies"):
+                if is_new_env or stale or not self.check_flask_installed(python_path):
+                    if not self.install_dependencies(python_path):
+                        return None
+                else:
+                    self.print_step("Dependencies already installed, skipping installation.", "✅")
+
+        self.save_fingerprint(python_path)
+        return python_path
+
     def run(self):
         """Main method that runs the full setup and execution flow"""
         # Detectar argumentos
         force_venv = "--venv" in sys.argv
-        
-        # Detectar gestor de entornos
-        self.detect_environment_manager(force_venv)
-        
-        if self.use_conda:
-            # Flujo conda
-            if not self.setup_conda_environment():
-                sys.exit(1)
-                
-            python_path = self.get_conda_python()
-            if not python_path:
-                print("❌ Could not get the conda Python path")
-                sys.exit(1)
-                
-            # Verificar que cryptography esté disponible para conda
-            self.install_cryptography(python_path)
-                
+        fast = "--fast" in sys.argv
+        app_args = [arg for arg in sys.argv[1:] if arg not in ("--venv", "--fast")]
+
+        with self.phase("Environment fingerprint"):
+            python_path = self.cached_python(force_venv)
+
+        if python_path:
+            self.print_step(f"Environment unchanged, using {python_path}", "✅")
         else:
-            # Flujo venv
-            success, is_new_env = self.setup_venv_environment()
-            if not success:
+            python_path = self.prepare_environment(force_venv)
+            if not python_path:
                 sys.exit(1)
-                
-            python_path = self.get_venv_python()
-            
-            # Instalar dependencias si es necesario
-            if is_new_env or not self.check_flask_installed(python_path):
-                if not self.install_dependencies(python_path):
-                    sys.exit(1)
-            else:
-                self.print_step("Dependencies already installed, skipping installation.", "✅")
-                
+
         # Configurar certificados SSL
-        self.setup_ssl_certificates(python_path)
-                
+        with self.phase("Certificates"):
+            if fast:
+                self.check_certificates_exist()
+            else:
+                self.setup_ssl_certificates(python_path)
+
+        with self.phase("Static assets"):
+            if not self.build_assets(python_path):
+                print("⚠️  Could not build the static assets; serving the plain files")
+
         # Optional configuration
-        if not self.ask_for_configuration(python_path):
+        if not fast and not self.ask_for_configuration(python_path):
             sys.exit(1)
-            
+
+        self.print_timings()
+
         # Ejecutar aplicación
-        if not self.run_application(python_path):
+        if not self.run_application(python_path, app_args):
             sys.exit(1)
 
 
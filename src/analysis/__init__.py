@@ -0,0 +1,25 @@
+"""
+Analysis module for gaze data.
+
+Contains vectorized (NumPy) routines that operate on whole sample arrays
+rather than on ORM objects.
+"""
+
+from .alignment import align_samples_to_tasks, group_by_task, gaze_heatmap
+from .calibration import calibration_quality, quality_weight
+from .filters import GazeFilter
+from .fixations import detect_fixations, fixation_statistics
+from .scanpath import SCANPATH_METHODS, similarity_matrix
+
+__all__ = [
+    'align_samples_to_tasks',
+    'group_by_task',
+    'gaze_heatmap',
+    'calibration_quality',
+    'quality_weight',
+    'GazeFilter',
+    'detect_fixations',
+    'fixation_statistics',
+    'SCANPATH_METHODS',
+    'similarity_matrix',
+]
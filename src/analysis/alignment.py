@@ -0,0 +1,128 @@
+"""
+Alignment of gaze samples with the task intervals recorded in task logs.
+"""
+
+from typing import List, Optional, Tuple
+import numpy as np
+
+
+def align_samples_to_tasks(
+    sample_times: np.ndarray,
+    start_times: np.ndarray,
+    end_times: np.ndarray,
+) -> np.ndarray:
+    """
+    Tag each sample with the task whose interval contains it.
+
+    The interval boundaries split time into at most 2m segments, each
+    covered by a fixed set of tasks, and every sample is located in them
+    with a single ``searchsorted`` call, so the cost is O(n log m + m^2)
+    for n samples and m tasks and no per-row queries are issued. Tasks
+    without an end time are treated as lasting until the next task starts.
+    When intervals overlap, the most recently started task still open at
+    the sample wins, so a sample inside an earlier task is not lost when a
+    later, shorter task has already ended.
+
+    Args:
+        sample_times: Sample timestamps (int64 milliseconds)
+        start_times: Task start timestamps (int64 milliseconds)
+        end_times: Task end timestamps (int64 milliseconds, -1 if open)
+
+    Returns:
+        Array with the index (into the input task arrays) of the task of
+        each sample, or -1 for samples outside every task
+    """
+    sample_times = np.asarray(sample_times, dtype=np.int64)
+    start_times = np.asarray(start_times, dtype=np.int64)
+    end_times = np.asarray(end_times, dtype=np.int64)
+
+    if len(start_times) == 0:
+        return np.full(len(sample_times), -1, dtype=np.int64)
+
+    order = np.argsort(start_times, kind="stable")
+    starts = start_times[order]
+    ends = end_times[order].copy()
+
+    # Open intervals last until the next task starts (or forever)
+    open_ends = ends < 0
+    next_starts = np.append(starts[1:], np.iinfo(np.int64).max - 1)
+    ends[open_ends] = next_starts[open_ends]
+
+    # Segment k spans [bounds[k], bounds[k + 1]); the winner of a segment is
+    # the latest started interval covering it (ends are inclusive)
+    bounds = np.unique(np.concatenate((starts, np.minimum(ends, np.iinfo(np.int64).max - 1) + 1)))
+    covered = (starts[:, None] <= bounds[None, :]) & (ends[:, None] >= bounds[None, :])
+    winner = len(starts) - 1 - np.argmax(covered[::-1], axis=0)
+    winner = np.where(covered.any(axis=0), order[winner], -1)
+
+    segment = np.searchsorted(bounds, sample_times, side="right") - 1
+    return np.where(segment >= 0, winner[np.maximum(segment, 0)], -1)
+
+
+def group_by_task(task_index: np.ndarray, task_count: int) -> List[np.ndarray]:
+    """
+    Split sample positions by task.
+
+    Args:
+        task_index: Task of each sample as returned by ``align_samples_to_tasks``
+        task_count: Number of tasks
+
+    Returns:
+        For each task, the positions of its samples in ascending order
+    """
+    task_index = np.asarray(task_index, dtype=np.int64)
+    order = np.argsort(task_index, kind="stable")
+    boundaries = np.searchsorted(task_index[order], np.arange(task_count + 1), side="left")
+    return [order[boundaries[i]:boundaries[i + 1]] for i in range(task_count)]
+
+
+def gaze_heatmap(
+    x: np.ndarray,
+    y: np.ndarray,
+    bins: Tuple[int, int] = (64, 36),
+    extent: Optional[Tuple[float, float, float, float]] = None,
+    weights: Optional[np.ndarray] = None,
+) -> dict:
+    """
+    Compute a 2D histogram of gaze positions.
+
+    Args:
+        x: X coordinates
+        y: Y coordinates
+        bins: Number of bins along x and y
+        extent: (min_x, max_x, min_y, max_y); defaults to the data range
+        weights: Optional weight of each sample; the counts are then the
+            summed weights
+
+    Returns:
+        Dictionary with the bin edges and the counts as nested lists,
+        indexed as counts[row (y)][column (x)]
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    finite = np.isfinite(x) & np.isfinite(y)
+    x, y = x[finite], y[finite]
+    if weights is not None:
+        weights = np.asarray(weights, dtype=float)[finite]
+
+    if extent is None:
+        if len(x):
+            extent = (float(x.min()), float(x.max()), float(y.min()), float(y.max()))
+        else:
+            extent = (0.0, 1.0, 0.0, 1.0)
+    min_x, max_x, min_y, max_y = extent
+    if max_x <= min_x:
+        max_x = min_x + 1.0
+    if max_y <= min_y:
+        max_y = min_y + 1.0
+
+    counts, x_edges, y_edges = np.histogram2d(
+        x, y, bins=bins, range=[[min_x, max_x], [min_y, max_y]], weights=weights
+    )
+
+    return {
+        "x_edges": x_edges.tolist(),
+        "y_edges": y_edges.tolist(),
+        "counts": (counts.T.astype(int) if weights is None else counts.T.round(3)).tolist(),
+        "total": int(len(x)),
+    }
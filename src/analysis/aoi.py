@@ -0,0 +1,271 @@
+"""
+Areas of Interest (AOI) hit-testing and dwell metrics.
+
+AOIs are rectangles or polygons in prototype (page) coordinates. Hit-testing
+is vectorized over samples; the metrics are kept in a small state dictionary
+that can be updated with new samples without revisiting the old ones. The
+time to first fixation comes from the fixations of ``detect_fixations``,
+whose centroid decides the AOI they fall in.
+"""
+
+from typing import List, Optional, Sequence
+import numpy as np
+
+from .fixations import DEFAULT_MIN_FIXATION_MS, detect_fixations, open_run_start
+
+# Gaps between consecutive samples longer than this are not counted as dwell
+# time (tracking paused, task bar open, tab hidden...).
+MAX_SAMPLE_GAP_MS = 1000
+
+
+def _inside_rect(x, y, rect):
+    left, top, width, height = rect
+    return (x >= left) & (x <= left + width) & (y >= top) & (y <= top + height)
+
+
+def _inside_polygon(x, y, vertices):
+    """Even-odd ray casting, vectorized over samples and looped over edges."""
+    vertices = np.asarray(vertices, dtype=float)
+    inside = np.zeros(len(x), dtype=bool)
+    x1, y1 = vertices[:, 0], vertices[:, 1]
+    x2, y2 = np.roll(x1, -1), np.roll(y1, -1)
+
+    for ax, ay, bx, by in zip(x1, y1, x2, y2):
+        if ay == by:
+            continue
+        crosses = (ay > y) != (by > y)
+        x_cross = ax + (y - ay) * (bx - ax) / (by - ay)
+        inside ^= crosses & (x < x_cross)
+
+    return inside
+
+
+def hit_test(x: np.ndarray, y: np.ndarray, aois: Sequence[dict]) -> np.ndarray:
+    """
+    Find the AOI that contains each sample.
+
+    Args:
+        x: X coordinates
+        y: Y coordinates
+        aois: AOI definitions, each with ``shape`` ("rect" or "polygon") and
+            either ``rect`` ([x, y, width, height]) or ``points`` ([[x, y], ...])
+
+    Returns:
+        Index into ``aois`` of the AOI containing each sample, or -1. When
+        AOIs overlap, the first one in definition order wins.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    result = np.full(len(x), -1, dtype=np.int64)
+    unassigned = np.isfinite(x) & np.isfinite(y)
+
+    for i, aoi in enumerate(aois):
+        if not unassigned.any():
+            break
+        if aoi["shape"] == "rect":
+            inside = _inside_rect(x, y, aoi["rect"])
+        else:
+            inside = _inside_polygon(x, y, aoi["points"])
+        hit = unassigned & inside
+        result[hit] = i
+        unassigned &= ~hit
+
+    return result
+
+
+def empty_state(aoi_count: int) -> dict:
+    """Metrics state before any sample has been processed."""
+    return {
+        "sample_count": 0,
+        "session_start": None,
+        "last_timestamp": None,
+        "last_aoi": -1,
+        "last_visited_aoi": -1,
+        "dwell_ms": [0.0] * aoi_count,
+        "sample_hits": [0] * aoi_count,
+        "visits": [0] * aoi_count,
+        "first_hit": [None] * aoi_count,
+        "first_fixation": [None] * aoi_count,
+        # Valid samples ([t, x, y]) of the run of slow samples ending the
+        # last block, and the AOI and start of its fixation if it is one
+        "fixation_tail": [],
+        "open_fixation": None,
+        "transitions": [[0] * aoi_count for _ in range(aoi_count)],
+    }
+
+
+def update_state(
+    state: dict,
+    timestamps: np.ndarray,
+    aoi_index: np.ndarray,
+    max_gap_ms: float = MAX_SAMPLE_GAP_MS,
+) -> dict:
+    """
+    Fold a block of time-ordered samples into the metrics state.
+
+    The interval between the last sample already processed and the first
+    new one is attributed to the AOI of the former, so updating in several
+    blocks gives the same result as processing all samples at once.
+
+    Args:
+        state: State as returned by ``empty_state`` or a previous update
+        timestamps: Sample timestamps (int64 milliseconds), ascending
+        aoi_index: AOI of each sample as returned by ``hit_test``
+        max_gap_ms: Longest gap between samples still counted as dwell time
+
+    Returns:
+        The updated state (the input dictionary is modified in place)
+    """
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    aoi_index = np.asarray(aoi_index, dtype=np.int64)
+    if len(timestamps) == 0:
+        return state
+
+    aoi_count = len(state["dwell_ms"])
+    if state["session_start"] is None:
+        state["session_start"] = int(timestamps[0])
+        previous_aoi = np.append(-1, aoi_index[:-1])
+        times = timestamps
+        owners = aoi_index
+    else:
+        previous_aoi = np.append(state["last_aoi"], aoi_index[:-1])
+        times = np.append(state["last_timestamp"], timestamps)
+        owners = np.append(state["last_aoi"], aoi_index)
+
+    # Dwell: each inter-sample interval belongs to the AOI of its first sample
+    gaps = np.diff(times).astype(float)
+    gap_owners = owners[:-1]
+    counted = (gap_owners >= 0) & (gaps >= 0) & (gaps <= max_gap_ms)
+    dwell = np.bincount(gap_owners[counted], weights=gaps[counted], minlength=aoi_count)
+
+    in_aoi = aoi_index >= 0
+    sample_hits = np.bincount(aoi_index[in_aoi], minlength=aoi_count)
+    entries = in_aoi & (aoi_index != previous_aoi)
+    visits = np.bincount(aoi_index[entries], minlength=aoi_count)
+
+    # First hit of each AOI within this block
+    hit_aois, first_positions = np.unique(aoi_index[in_aoi], return_index=True)
+    hit_times = timestamps[np.flatnonzero(in_aoi)[first_positions]]
+
+    # Transitions between consecutive distinct AOIs, ignoring samples outside every AOI
+    sequence = np.append(state["last_visited_aoi"], aoi_index[in_aoi])
+    sequence = sequence[sequence >= 0]
+    changes = np.flatnonzero(sequence[1:] != sequence[:-1])
+    transitions = np.zeros((aoi_count, aoi_count), dtype=np.int64)
+    np.add.at(transitions, (sequence[changes], sequence[changes + 1]), 1)
+
+    state["sample_count"] += int(len(timestamps))
+    state["dwell_ms"] = (np.asarray(state["dwell_ms"]) + dwell).tolist()
+    state["sample_hits"] = (np.asarray(state["sample_hits"]) + sample_hits).astype(int).tolist()
+    state["visits"] = (np.asarray(state["visits"]) + visits).astype(int).tolist()
+    state["transitions"] = (np.asarray(state["transitions"], dtype=np.int64) + transitions).tolist()
+    for aoi, hit_time in zip(hit_aois.tolist(), hit_times.tolist()):
+        if state["first_hit"][aoi] is None:
+            state["first_hit"][aoi] = int(hit_time)
+    state["last_timestamp"] = int(timestamps[-1])
+    state["last_aoi"] = int(aoi_index[-1])
+    if len(sequence):
+        state["last_visited_aoi"] = int(sequence[-1])
+
+    return state
+
+
+def update_first_fixations(
+    state: dict,
+    timestamps: np.ndarray,
+    x: np.ndarray,
+    y: np.ndarray,
+    aois: Sequence[dict],
+) -> dict:
+    """
+    Fold a block of time-ordered samples into the first fixation of each AOI.
+
+    The run of slow samples that ends a block may continue in the next
+    one, so its samples are kept in the state and detected again together
+    with the next block; until then its fixation counts as provisional.
+    Updating in several blocks therefore finds the same fixations as
+    processing all samples at once.
+
+    Args:
+        state: State as returned by ``empty_state`` or a previous update
+        timestamps: Sample timestamps (int64 milliseconds), ascending
+        x: Gaze X coordinates (NaN where missing)
+        y: Gaze Y coordinates
+        aois: AOI definitions as accepted by ``hit_test``
+
+    Returns:
+        The updated state (the input dictionary is modified in place)
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    valid = np.isfinite(x) & np.isfinite(y)
+    tail = np.asarray(state["fixation_tail"], dtype=float).reshape(-1, 3)
+    t = np.concatenate((tail[:, 0].astype(np.int64), np.asarray(timestamps, dtype=np.int64)[valid]))
+    x = np.concatenate((tail[:, 1], x[valid]))
+    y = np.concatenate((tail[:, 2], y[valid]))
+    if len(t) == 0:
+        return state
+
+    fixations = detect_fixations(t, x, y)
+    fixation_aoi = hit_test(fixations["x"], fixations["y"], aois)
+    tail_start = open_run_start(t, x, y)
+    # The trailing run is the last fixation when it is long enough
+    is_open = tail_start < len(t) - 1 and t[-1] - t[tail_start] >= DEFAULT_MIN_FIXATION_MS
+    closed = len(fixation_aoi) - int(is_open)
+
+    inside = np.flatnonzero(fixation_aoi[:closed] >= 0)
+    hit_aois, first_positions = np.unique(fixation_aoi[inside], return_index=True)
+    for aoi, start in zip(hit_aois.tolist(), fixations["start"][inside[first_positions]].tolist()):
+        if state["first_fixation"][aoi] is None:
+            state["first_fixation"][aoi] = int(start)
+
+    state["open_fixation"] = (
+        [int(fixation_aoi[-1]), int(fixations["start"][-1])] if is_open and fixation_aoi[-1] >= 0 else None
+    )
+    state["fixation_tail"] = np.column_stack((t, x, y))[tail_start:].tolist()
+    return state
+
+
+def metrics_from_state(state: dict, aoi_names: List[str]) -> dict:
+    """
+    Build the public metrics of a subject from its state.
+
+    Args:
+        state: Metrics state
+        aoi_names: Name of each AOI, in definition order
+
+    Returns:
+        Dictionary with per-AOI dwell time, sample hits, visits, time to
+        first hit (from the first sample of the session to the first sample
+        inside the AOI) and time to first fixation (to the start of the
+        first fixation whose centroid is inside the AOI), plus the AOI
+        transition matrix
+    """
+    session_start: Optional[int] = state["session_start"]
+    open_fixation = state["open_fixation"]
+    aois = []
+    for i, name in enumerate(aoi_names):
+        first_hit = state["first_hit"][i]
+        first_fixation = state["first_fixation"][i]
+        if first_fixation is None and open_fixation is not None and open_fixation[0] == i:
+            first_fixation = open_fixation[1]
+        aois.append(
+            {
+                "name": name,
+                "dwell_ms": round(state["dwell_ms"][i], 3),
+                "sample_hits": state["sample_hits"][i],
+                "visits": state["visits"][i],
+                "time_to_first_hit_ms": (
+                    first_hit - session_start if first_hit is not None else None
+                ),
+                "time_to_first_fixation_ms": (
+                    first_fixation - session_start if first_fixation is not None else None
+                ),
+            }
+        )
+
+    return {
+        "sample_count": state["sample_count"],
+        "aois": aois,
+        "transitions": state["transitions"],
+    }
@@ -0,0 +1,108 @@
+"""
+Calibration quality from the validation phase of the tracking page.
+
+After calibrating, the page shows a few targets and records the gaze
+predicted while the subject looks at each one. Accuracy is the mean
+distance between the predictions and the target; precision is the root
+mean square of the distance between successive predictions (how much the
+estimate jitters while the eyes are still). Both are also given as a
+fraction of the viewport diagonal so sessions on different screens can be
+compared against one threshold.
+"""
+
+from typing import Optional, Tuple
+import numpy as np
+
+# Subjects whose accuracy is worse than this fraction of the viewport
+# diagonal are considered poorly calibrated
+DEFAULT_MAX_CALIBRATION_ERROR = 0.15
+# The same threshold in pixels, for runs whose viewport is unknown (about
+# 0.15 of the diagonal of a 1366x768 screen)
+DEFAULT_MAX_CALIBRATION_ERROR_PX = 250.0
+
+
+def calibration_quality(
+    target: np.ndarray,
+    target_x: np.ndarray,
+    target_y: np.ndarray,
+    gaze_x: np.ndarray,
+    gaze_y: np.ndarray,
+    viewport: Optional[Tuple[int, int]] = None,
+) -> dict:
+    """
+    Compute the accuracy and precision of a validation run.
+
+    Args:
+        target: Index of the target shown for each sample
+        target_x: X coordinate of the target of each sample
+        target_y: Y coordinate of the target of each sample
+        gaze_x: Predicted gaze X of each sample (NaN where missing)
+        gaze_y: Predicted gaze Y of each sample
+        viewport: (width, height) of the viewport, for the relative values
+
+    Returns:
+        Dictionary with ``accuracy_px`` and ``precision_px`` (means over the
+        targets), ``accuracy`` and ``precision`` (the same as a fraction of
+        the viewport diagonal, None without a viewport), ``sample_count``
+        and one entry per target in ``targets``. Values are None when no
+        sample has a gaze prediction.
+    """
+    gaze_x = np.asarray(gaze_x, dtype=float)
+    gaze_y = np.asarray(gaze_y, dtype=float)
+    valid = np.isfinite(gaze_x) & np.isfinite(gaze_y)
+    target = np.asarray(target, dtype=np.int64)[valid]
+    target_x = np.asarray(target_x, dtype=float)[valid]
+    target_y = np.asarray(target_y, dtype=float)[valid]
+    gaze_x, gaze_y = gaze_x[valid], gaze_y[valid]
+
+    targets, inverse, counts = np.unique(target, return_inverse=True, return_counts=True)
+    error = np.hypot(gaze_x - target_x, gaze_y - target_y)
+    accuracy = np.bincount(inverse, weights=error, minlength=len(targets)) / np.maximum(counts, 1)
+
+    # Successive samples of the same target
+    steps = np.hypot(np.diff(gaze_x), np.diff(gaze_y))
+    same = inverse[1:] == inverse[:-1]
+    step_counts = np.bincount(inverse[1:][same], minlength=len(targets))
+    squared = np.bincount(inverse[1:][same], weights=steps[same] ** 2, minlength=len(targets))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        precision = np.sqrt(squared / step_counts)
+
+    # Position of each target (from its first sample)
+    first = np.unique(inverse, return_index=True)[1]
+    accuracy_px = float(accuracy.mean()) if len(targets) else None
+    precision_px = float(np.nanmean(precision)) if np.isfinite(precision).any() else None
+    diagonal = float(np.hypot(*viewport)) if viewport else None
+
+    return {
+        "accuracy_px": accuracy_px,
+        "precision_px": precision_px,
+        "accuracy": accuracy_px / diagonal if diagonal and accuracy_px is not None else None,
+        "precision": precision_px / diagonal if diagonal and precision_px is not None else None,
+        "sample_count": int(valid.sum()),
+        "targets": [
+            {
+                "target": int(index),
+                "x": float(x),
+                "y": float(y),
+                "samples": int(count),
+                "accuracy_px": round(float(mean_error), 3),
+                "precision_px": round(float(rms), 3) if np.isfinite(rms) else None,
+            }
+            for index, x, y, count, mean_error, rms in zip(
+                targets, target_x[first], target_y[first], counts, accuracy, precision
+            )
+        ],
+    }
+
+
+def quality_weight(accuracy: Optional[float], max_error: float = DEFAULT_MAX_CALIBRATION_ERROR) -> float:
+    """
+    Weight of a subject in aggregates, from the accuracy of its validation run.
+
+    Falls linearly from 1 (perfect accuracy) to 0 at ``max_error``, both in
+    the same unit (fraction of the diagonal or pixels). A run without any
+    gaze prediction (accuracy None) gets 0.
+    """
+    if accuracy is None:
+        return 0.0
+    return float(min(max(1.0 - accuracy / max_error, 0.0), 1.0))
@@ -0,0 +1,322 @@
+"""
+Server-side cleanup of the gaze signal.
+
+WebGazer smooths its predictions in the browser only, and the server stores
+whatever arrives: predictions far outside the page, isolated jumps and
+jitter. Stored samples are never modified; the filters are applied to a
+session's sample arrays when they are read for analysis, so heatmaps, task
+samples and filtered exports share one cleanup. Every step works on whole
+arrays and marks the samples it rejects as NaN, which the downstream code
+already skips.
+"""
+
+from typing import Optional, Tuple
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Samples up to this many pixels outside the viewport are clipped to its
+# edge; samples further out are rejected
+DEFAULT_BOUNDS_MARGIN = 50.0
+# Speed (pixels per millisecond) above which a jump away from both
+# neighbours is treated as a spike
+DEFAULT_MAX_VELOCITY = 10.0
+# Samples in the median window (odd)
+DEFAULT_MEDIAN_WINDOW = 5
+# One-Euro parameters: minimum cutoff (Hz), speed coefficient and cutoff of
+# the speed estimate (Hz). Speeds are in pixels per second.
+DEFAULT_MIN_CUTOFF = 1.0
+DEFAULT_BETA = 0.007
+DEFAULT_D_CUTOFF = 1.0
+
+SMOOTHING_METHODS = ("none", "median", "one_euro")
+
+# Samples per block of the vectorized exponential smoothing
+_SCAN_BLOCK = 64
+
+
+def clip_to_bounds(
+    x: np.ndarray,
+    y: np.ndarray,
+    width: float,
+    height: float,
+    margin: float = DEFAULT_BOUNDS_MARGIN,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Clip samples to the viewport and reject the ones far outside it.
+
+    Args:
+        x: X coordinates
+        y: Y coordinates
+        width: Viewport width
+        height: Viewport height
+        margin: Distance outside the viewport still accepted
+
+    Returns:
+        (x, y) with samples within ``margin`` clipped to the edges and the
+        rest set to NaN
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    outside = (x < -margin) | (x > width + margin) | (y < -margin) | (y > height + margin)
+    x = np.where(outside, np.nan, np.clip(x, 0.0, width))
+    y = np.where(outside, np.nan, np.clip(y, 0.0, height))
+    return x, y
+
+
+def _speed(distance: np.ndarray, dt: np.ndarray) -> np.ndarray:
+    """Distance over time, 0 where no time elapsed."""
+    return np.divide(distance, dt, out=np.zeros(len(distance)), where=dt > 0)
+
+
+def reject_spikes(
+    timestamp: np.ndarray,
+    x: np.ndarray,
+    y: np.ndarray,
+    max_velocity: float = DEFAULT_MAX_VELOCITY,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Reject isolated samples that jump away from both neighbours.
+
+    A sample is a spike when the speed from the previous valid sample and to
+    the next one both exceed ``max_velocity`` while its neighbours are close
+    to each other. A saccade (one fast step followed by slow ones) is kept.
+    Samples that share a timestamp (legacy sessions stored with one-second
+    resolution) have no measurable speed between them and are never
+    rejected as spikes.
+
+    Args:
+        timestamp: Sample timestamps (milliseconds, ascending)
+        x: X coordinates
+        y: Y coordinates
+        max_velocity: Speed threshold in pixels per millisecond
+
+    Returns:
+        (x, y) with the spikes set to NaN
+    """
+    x = np.array(x, dtype=float)
+    y = np.array(y, dtype=float)
+    valid = np.flatnonzero(np.isfinite(x) & np.isfinite(y))
+    if len(valid) < 3:
+        return x, y
+
+    t = np.asarray(timestamp, dtype=float)[valid]
+    vx, vy = x[valid], y[valid]
+    step = _speed(np.hypot(np.diff(vx), np.diff(vy)), np.diff(t))
+    across = _speed(np.hypot(vx[2:] - vx[:-2], vy[2:] - vy[:-2]), t[2:] - t[:-2])
+
+    spike = (step[:-1] > max_velocity) & (step[1:] > max_velocity) & (across <= max_velocity)
+    rejected = valid[1:-1][spike]
+    x[rejected] = np.nan
+    y[rejected] = np.nan
+    return x, y
+
+
+def median_smooth(values: np.ndarray, window: int = DEFAULT_MEDIAN_WINDOW) -> np.ndarray:
+    """
+    Running median over the finite values, leaving NaN in place.
+
+    Args:
+        values: Signal to smooth
+        window: Samples in the window (rounded up to an odd number)
+
+    Returns:
+        Smoothed copy of ``values``
+    """
+    values = np.array(values, dtype=float)
+    finite = np.flatnonzero(np.isfinite(values))
+    half = max(int(window), 1) // 2
+    if half == 0 or len(finite) < 2:
+        return values
+
+    padded = np.pad(values[finite], half, mode="edge")
+    values[finite] = np.median(sliding_window_view(padded, 2 * half + 1), axis=1)
+    return values
+
+
+def _smoothing_factor(dt: np.ndarray, cutoff) -> np.ndarray:
+    tau = 1.0 / (2 * np.pi * cutoff)
+    return 1.0 / (1.0 + tau / dt)
+
+
+def _linear_recurrence(decay: np.ndarray, drive: np.ndarray, initial: float) -> np.ndarray:
+    """
+    ``s[i] = decay[i] * s[i - 1] + drive[i]``, starting at ``initial``.
+
+    The samples are cut into blocks of ``_SCAN_BLOCK``: the recurrence runs
+    within every block at once from a zero state, the states at the block
+    ends follow the same recurrence one level up, and each block adds its
+    start state times the running product of its decays. Python loops over
+    ``_SCAN_BLOCK`` columns per level instead of over the samples, and the
+    result only involves products of factors in [0, 1], so nothing overflows.
+    """
+    count = len(decay)
+    if count <= _SCAN_BLOCK:
+        smoothed = np.empty(count)
+        previous = initial
+        for i, (d, value) in enumerate(zip(decay.tolist(), drive.tolist())):
+            previous = d * previous + value
+            smoothed[i] = previous
+        return smoothed
+
+    blocks = -(-count // _SCAN_BLOCK)
+    padding = blocks * _SCAN_BLOCK - count
+    decay = np.pad(decay, (0, padding), constant_values=1.0).reshape(blocks, _SCAN_BLOCK)
+    drive = np.pad(drive, (0, padding)).reshape(blocks, _SCAN_BLOCK)
+
+    local = np.empty_like(drive)
+    local[:, 0] = drive[:, 0]
+    for column in range(1, _SCAN_BLOCK):
+        local[:, column] = decay[:, column] * local[:, column - 1] + drive[:, column]
+    gain = np.cumprod(decay, axis=1)
+
+    ends = _linear_recurrence(gain[:, -1], local[:, -1], initial)
+    starts = np.concatenate(([initial], ends[:-1]))
+    return (gain * starts[:, None] + local).ravel()[:count]
+
+
+def _exponential_smooth(values: np.ndarray, alpha: np.ndarray, initial: float) -> np.ndarray:
+    """``s[i] = alpha[i] * values[i] + (1 - alpha[i]) * s[i - 1]``, starting at ``initial``."""
+    return _linear_recurrence(1.0 - alpha, alpha * values, initial)
+
+
+def one_euro_smooth(
+    timestamp: np.ndarray,
+    values: np.ndarray,
+    min_cutoff: float = DEFAULT_MIN_CUTOFF,
+    beta: float = DEFAULT_BETA,
+    d_cutoff: float = DEFAULT_D_CUTOFF,
+) -> np.ndarray:
+    """
+    One-Euro filter over the finite values, leaving NaN in place.
+
+    The cutoff frequency grows with the signal speed, so fixations are
+    smoothed strongly and saccades follow with little lag. The speed is
+    estimated from the raw signal, so the smoothing factors are computed on
+    whole arrays, and the exponential smoothing is a blocked scan over them.
+    Long gaps between samples reset the filter naturally, since the
+    smoothing factor tends to 1.
+
+    Args:
+        timestamp: Sample timestamps (milliseconds, ascending)
+        values: Signal to smooth
+        min_cutoff: Cutoff frequency at rest (Hz)
+        beta: Increase of the cutoff per unit of speed
+        d_cutoff: Cutoff frequency of the speed estimate (Hz)
+
+    Returns:
+        Smoothed copy of ``values``
+    """
+    values = np.array(values, dtype=float)
+    finite = np.flatnonzero(np.isfinite(values))
+    if len(finite) < 2:
+        return values
+
+    t = np.asarray(timestamp, dtype=float)[finite] / 1000.0
+    signal = values[finite]
+    dt = np.maximum(np.diff(t), 1e-3)
+
+    speed = _exponential_smooth(np.diff(signal) / dt, _smoothing_factor(dt, d_cutoff), 0.0)
+    alpha = _smoothing_factor(dt, min_cutoff + beta * np.abs(speed))
+    values[finite[1:]] = _exponential_smooth(signal[1:], alpha, signal[0])
+    return values
+
+
+class GazeFilter:
+    """Configured sequence of filters applied to a session's gaze samples."""
+
+    def __init__(
+        self,
+        bounds_margin: Optional[float] = DEFAULT_BOUNDS_MARGIN,
+        max_velocity: Optional[float] = DEFAULT_MAX_VELOCITY,
+        smoothing: str = "median",
+        median_window: int = DEFAULT_MEDIAN_WINDOW,
+        min_cutoff: float = DEFAULT_MIN_CUTOFF,
+        beta: float = DEFAULT_BETA,
+        d_cutoff: float = DEFAULT_D_CUTOFF,
+    ):
+        if smoothing not in SMOOTHING_METHODS:
+            raise ValueError(
+                f"Unknown gaze smoothing '{smoothing}' (expected one of {', '.join(SMOOTHING_METHODS)})."
+            )
+        self.bounds_margin = bounds_margin
+        self.max_velocity = max_velocity
+        self.smoothing = smoothing
+        self.median_window = median_window
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+
+    @classmethod
+    def from_config(cls, config_manager) -> Optional["GazeFilter"]:
+        """
+        Build the filter from the ``gaze_filter*`` configuration keys.
+
+        Args:
+            config_manager: Loaded ConfigManager
+
+        Returns:
+            The filter, or None when ``gaze_filter`` is disabled (the default)
+        """
+        if not config_manager.get_bool("gaze_filter", False):
+            return None
+        return cls(
+            bounds_margin=config_manager.get_float("gaze_filter_margin", DEFAULT_BOUNDS_MARGIN),
+            max_velocity=config_manager.get_float("gaze_filter_max_velocity", DEFAULT_MAX_VELOCITY),
+            smoothing=config_manager.get_str("gaze_filter_smoothing", "median"),
+            median_window=config_manager.get_int("gaze_filter_median_window", DEFAULT_MEDIAN_WINDOW),
+            min_cutoff=config_manager.get_float("gaze_filter_min_cutoff", DEFAULT_MIN_CUTOFF),
+            beta=config_manager.get_float("gaze_filter_beta", DEFAULT_BETA),
+            d_cutoff=config_manager.get_float("gaze_filter_d_cutoff", DEFAULT_D_CUTOFF),
+        )
+
+    def apply(
+        self,
+        timestamp: np.ndarray,
+        x: np.ndarray,
+        y: np.ndarray,
+        viewport: Optional[Tuple[float, float]] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Filter the gaze samples of one session.
+
+        Steps, in order: non-finite predictions are rejected, samples are
+        clipped to the viewport (only when it is known), spikes are rejected
+        and the remaining samples are smoothed.
+
+        Args:
+            timestamp: Sample timestamps (milliseconds, ascending)
+            x: Gaze X coordinates
+            y: Gaze Y coordinates
+            viewport: (width, height) of the session's viewport (optional)
+
+        Returns:
+            Filtered (x, y) arrays of the same length; rejected samples are NaN
+        """
+        x = np.array(x, dtype=float)
+        y = np.array(y, dtype=float)
+        invalid = ~(np.isfinite(x) & np.isfinite(y))
+        x[invalid] = np.nan
+        y[invalid] = np.nan
+
+        if viewport is not None and self.bounds_margin is not None:
+            x, y = clip_to_bounds(x, y, viewport[0], viewport[1], self.bounds_margin)
+        if self.max_velocity:
+            x, y = reject_spikes(timestamp, x, y, self.max_velocity)
+
+        if self.smoothing == "median":
+            x, y = median_smooth(x, self.median_window), median_smooth(y, self.median_window)
+        elif self.smoothing == "one_euro":
+            x = one_euro_smooth(timestamp, x, self.min_cutoff, self.beta, self.d_cutoff)
+            y = one_euro_smooth(timestamp, y, self.min_cutoff, self.beta, self.d_cutoff)
+        return x, y
+
+    def __json__(self) -> dict:
+        return {
+            "bounds_margin": self.bounds_margin,
+            "max_velocity": self.max_velocity,
+            "smoothing": self.smoothing,
+            "median_window": self.median_window,
+            "min_cutoff": self.min_cutoff,
+            "beta": self.beta,
+            "d_cutoff": self.d_cutoff,
+        }
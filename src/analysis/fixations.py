@@ -0,0 +1,153 @@
+"""
+Fixation detection on gaze samples.
+
+Fixations are found with a velocity threshold (I-VT): consecutive samples
+moving slower than the threshold belong to the same fixation, faster ones
+are saccades. Runs are found with array operations, so a session of any
+length is processed without a Python loop over samples.
+"""
+
+from typing import Dict
+import numpy as np
+
+# Speed (pixels per millisecond) below which the gaze is fixating
+DEFAULT_FIXATION_VELOCITY = 1.0
+# Shortest run of slow samples reported as a fixation
+DEFAULT_MIN_FIXATION_MS = 100
+# Longer gaps between samples end a fixation
+DEFAULT_MAX_FIXATION_GAP_MS = 250
+
+
+def detect_fixations(
+    timestamp: np.ndarray,
+    x: np.ndarray,
+    y: np.ndarray,
+    max_velocity: float = DEFAULT_FIXATION_VELOCITY,
+    min_duration_ms: float = DEFAULT_MIN_FIXATION_MS,
+    max_gap_ms: float = DEFAULT_MAX_FIXATION_GAP_MS,
+) -> Dict[str, np.ndarray]:
+    """
+    Detect fixations with a velocity threshold.
+
+    Samples without a valid gaze position are skipped. Two consecutive valid
+    samples are part of the same fixation when the speed between them is at
+    most ``max_velocity`` and they are at most ``max_gap_ms`` apart.
+
+    Args:
+        timestamp: Sample timestamps (milliseconds, ascending)
+        x: Gaze X coordinates (NaN where missing)
+        y: Gaze Y coordinates
+        max_velocity: Speed threshold in pixels per millisecond
+        min_duration_ms: Shortest fixation kept
+        max_gap_ms: Longest gap between samples within a fixation
+
+    Returns:
+        Dictionary of arrays with one entry per fixation, in time order:
+        ``start`` and ``end`` (timestamps of its first and last sample),
+        ``duration`` (milliseconds), ``x`` and ``y`` (centroid) and
+        ``samples`` (number of samples)
+    """
+    valid = np.isfinite(np.asarray(x, dtype=float)) & np.isfinite(np.asarray(y, dtype=float))
+    t = np.asarray(timestamp, dtype=np.int64)[valid]
+    x = np.asarray(x, dtype=float)[valid]
+    y = np.asarray(y, dtype=float)[valid]
+    empty = {
+        "start": np.empty(0, dtype=np.int64),
+        "end": np.empty(0, dtype=np.int64),
+        "duration": np.empty(0, dtype=float),
+        "x": np.empty(0, dtype=float),
+        "y": np.empty(0, dtype=float),
+        "samples": np.empty(0, dtype=np.int64),
+    }
+    if len(t) < 2:
+        return empty
+
+    dt = np.diff(t).astype(float)
+    speed = np.hypot(np.diff(x), np.diff(y)) / np.maximum(dt, 1.0)
+    # linked[i]: samples i and i + 1 belong to the same fixation
+    linked = (speed <= max_velocity) & (dt <= max_gap_ms)
+
+    # Runs of linked pairs: a run from pair a to pair b covers samples a..b+1
+    edges = np.diff(np.concatenate(([0], linked.astype(np.int8), [0])))
+    first_pair = np.flatnonzero(edges == 1)
+    last_pair = np.flatnonzero(edges == -1) - 1
+    first, last = first_pair, last_pair + 1
+
+    duration = (t[last] - t[first]).astype(float)
+    kept = duration >= min_duration_ms
+    if not kept.any():
+        return empty
+    first, last, duration = first[kept], last[kept], duration[kept]
+
+    samples = last - first + 1
+    # Centroids from cumulative sums: sum over first..last is cs[last + 1] - cs[first]
+    cumulative_x = np.concatenate(([0.0], np.cumsum(x)))
+    cumulative_y = np.concatenate(([0.0], np.cumsum(y)))
+    return {
+        "start": t[first],
+        "end": t[last],
+        "duration": duration,
+        "x": (cumulative_x[last + 1] - cumulative_x[first]) / samples,
+        "y": (cumulative_y[last + 1] - cumulative_y[first]) / samples,
+        "samples": samples.astype(np.int64),
+    }
+
+
+def open_run_start(
+    timestamp: np.ndarray,
+    x: np.ndarray,
+    y: np.ndarray,
+    max_velocity: float = DEFAULT_FIXATION_VELOCITY,
+    max_gap_ms: float = DEFAULT_MAX_FIXATION_GAP_MS,
+) -> int:
+    """
+    Position of the first sample of the run of linked samples that ends a block.
+
+    The run may continue with the samples that follow the block, so a
+    fixation detected on it is not final yet.
+
+    Args:
+        timestamp: Timestamps of valid samples (milliseconds, ascending)
+        x: Gaze X coordinates (all finite)
+        y: Gaze Y coordinates
+        max_velocity: As in ``detect_fixations``
+        max_gap_ms: As in ``detect_fixations``
+
+    Returns:
+        Index of the first sample of the trailing run (the last sample when
+        it is not linked to the one before)
+    """
+    if len(timestamp) < 2:
+        return 0
+    dt = np.diff(np.asarray(timestamp, dtype=np.int64)).astype(float)
+    speed = np.hypot(np.diff(x), np.diff(y)) / np.maximum(dt, 1.0)
+    unlinked = np.flatnonzero((speed > max_velocity) | (dt > max_gap_ms))
+    return int(unlinked[-1]) + 1 if len(unlinked) else 0
+
+
+def fixation_statistics(fixations: Dict[str, np.ndarray], session_ms: float) -> dict:
+    """
+    Summarize the fixations of a session.
+
+    Args:
+        fixations: Output of ``detect_fixations``
+        session_ms: Duration of the session in milliseconds
+
+    Returns:
+        Dictionary with the fixation count, rate (per second), mean and
+        median duration, total fixation time, share of the session spent
+        fixating and mean saccade amplitude (distance between consecutive
+        fixations, pixels)
+    """
+    count = len(fixations["duration"])
+    durations = fixations["duration"]
+    amplitudes = np.hypot(np.diff(fixations["x"]), np.diff(fixations["y"]))
+    return {
+        "count": count,
+        "rate_per_second": count / (session_ms / 1000.0) if session_ms > 0 else None,
+        "mean_duration_ms": float(durations.mean()) if count else None,
+        "median_duration_ms": float(np.median(durations)) if count else None,
+        "total_duration_ms": float(durations.sum()),
+        "fixation_ratio": float(durations.sum() / session_ms) if session_ms > 0 else None,
+        "mean_saccade_amplitude_px": float(amplitudes.mean()) if len(amplitudes) else None,
+    }
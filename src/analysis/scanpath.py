@@ -0,0 +1,281 @@
+"""
+Scanpath comparison between subjects.
+
+A scanpath is the sequence of a subject's fixations. Two representations
+are compared:
+
+- ``levenshtein``: the sequence of AOIs the fixations fall in (repeated
+  AOIs collapsed), compared with the string-edit distance.
+- ``dtw``: the fixation centroids in viewport-normalized coordinates,
+  compared with dynamic time warping.
+
+Both give a similarity between 0 (unrelated) and 1 (identical), and NaN
+when either scanpath is empty (no fixations, or none inside an AOI), since
+there is nothing to compare. Pairs are
+compared in batches: the dynamic programming loops over one axis of the
+distance table while all pairs advance together as array operations. The
+edit distance also packs 64 cells of the table in each word.
+"""
+
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+
+from .aoi import hit_test
+
+SCANPATH_METHODS = ("levenshtein", "dtw")
+# Longest fixation sequence compared with DTW; longer ones are resampled
+DEFAULT_MAX_DTW_POINTS = 100
+
+_MAX_DISTANCE = np.sqrt(2.0)
+
+
+def aoi_sequence(x: np.ndarray, y: np.ndarray, aois: Sequence[dict]) -> np.ndarray:
+    """
+    AOI sequence of a list of fixations.
+
+    Args:
+        x: Fixation X coordinates (same space as the AOIs)
+        y: Fixation Y coordinates
+        aois: AOI definitions as accepted by ``hit_test``
+
+    Returns:
+        AOI indices of the fixations inside an AOI, with consecutive
+        fixations in the same AOI collapsed into one
+    """
+    sequence = hit_test(x, y, aois)
+    sequence = sequence[sequence >= 0]
+    if len(sequence) == 0:
+        return sequence.astype(np.int64)
+    keep = np.append(True, sequence[1:] != sequence[:-1])
+    return sequence[keep].astype(np.int64)
+
+
+def resample_points(points: np.ndarray, max_points: int = DEFAULT_MAX_DTW_POINTS) -> np.ndarray:
+    """Keep at most ``max_points`` evenly spaced rows of a (n, 2) array."""
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    if len(points) <= max_points:
+        return points
+    return points[np.linspace(0, len(points) - 1, max_points).round().astype(np.int64)]
+
+
+def levenshtein_distances(
+    sequences: List[np.ndarray], first: np.ndarray, second: np.ndarray
+) -> np.ndarray:
+    """
+    Edit distance between pairs of integer sequences.
+
+    Uses the bit-vector algorithm of Myers (in Hyyrö's formulation): the
+    column of the distance table is kept as bits of vertical differences,
+    so 64 cells are updated per word operation, and every pair advances
+    one character of its second sequence per step.
+
+    Args:
+        sequences: Integer sequences (values >= 0)
+        first: Index in ``sequences`` of the first sequence of each pair
+        second: Index of the second sequence of each pair
+
+    Returns:
+        Array with the distance of each pair
+    """
+    first = np.asarray(first, dtype=np.int64)
+    second = np.asarray(second, dtype=np.int64)
+    lengths = np.array([len(sequence) for sequence in sequences], dtype=np.int64)
+    pattern_lengths, text_lengths = lengths[first], lengths[second]
+    result = np.maximum(pattern_lengths, text_lengths).astype(float)
+    compared = (pattern_lengths > 0) & (text_lengths > 0)
+    if not compared.any():
+        return result
+    pairs = np.flatnonzero(compared)
+    first, second = first[pairs], second[pairs]
+    pattern_lengths, text_lengths = pattern_lengths[pairs], text_lengths[pairs]
+
+    # Match bits of each sequence used as a pattern: bit i of word w of
+    # match[k, symbol] is set if sequences[k][64 * w + i] == symbol. The
+    # last symbol is the text padding, which matches nothing.
+    symbol_count = max(int(sequence.max()) + 1 for sequence in sequences if len(sequence)) + 1
+    words = int((lengths.max() + 63) // 64)
+    match = np.zeros((len(sequences), symbol_count, words), dtype=np.uint64)
+    owner = np.repeat(np.arange(len(sequences)), lengths)
+    position = np.concatenate([np.arange(length) for length in lengths])
+    symbols = np.concatenate([np.asarray(sequence, dtype=np.int64) for sequence in sequences])
+    np.bitwise_or.at(
+        match, (owner, symbols, position // 64), np.left_shift(np.uint64(1), (position % 64).astype(np.uint64))
+    )
+    texts = np.full((len(sequences), int(lengths.max())), symbol_count - 1, dtype=np.int64)
+    texts[owner, position] = symbols
+
+    count = len(pairs)
+    one, zero = np.uint64(1), np.uint64(0)
+    positive = np.full((count, words), ~zero)  # Pv: vertical +1 differences
+    negative = np.zeros((count, words), dtype=np.uint64)  # Mv: vertical -1 differences
+    score = pattern_lengths.copy()
+    # Bit of the last pattern row, where the distance is tracked
+    last_word = (pattern_lengths - 1) // 64
+    last_bit = np.left_shift(one, ((pattern_lengths - 1) % 64).astype(np.uint64))
+
+    for j in range(int(text_lengths.max())):
+        equal = match[first, texts[second, j]]
+        active = j < text_lengths
+        add_carry = np.zeros(count, dtype=np.uint64)
+        # The first row of the table grows by one per column
+        positive_carry = np.ones(count, dtype=np.uint64)
+        negative_carry = np.zeros(count, dtype=np.uint64)
+        for w in range(words):
+            eq, pv, mv = equal[:, w], positive[:, w], negative[:, w]
+            xv = eq | mv
+            masked = eq & pv
+            total = masked + pv
+            carried = total + add_carry
+            add_carry = ((total < masked) | (carried < total)).astype(np.uint64)
+            xh = (carried ^ pv) | eq
+            ph = mv | ~(xh | pv)
+            mh = pv & xh
+
+            tracked = active & (last_word == w)
+            score += tracked & ((ph & last_bit) != 0)
+            score -= tracked & ((mh & last_bit) != 0)
+
+            ph_out, mh_out = ph >> np.uint64(63), mh >> np.uint64(63)
+            ph = (ph << one) | positive_carry
+            mh = (mh << one) | negative_carry
+            positive_carry, negative_carry = ph_out, mh_out
+            positive[:, w] = mh | ~(xv | ph)
+            negative[:, w] = ph & xv
+
+    result[pairs] = score
+    return result
+
+
+def dtw_distances(points: np.ndarray, others: List[np.ndarray]) -> np.ndarray:
+    """
+    Dynamic time warping distance between a point sequence and each of several others.
+
+    The table is filled one anti-diagonal at a time: every cell of a
+    diagonal depends only on the two previous ones, so a diagonal is
+    computed for all the other sequences in one operation.
+
+    Args:
+        points: (n, 2) array of points
+        others: (m, 2) arrays to compare it with
+
+    Returns:
+        Array with the distance to each sequence of ``others``: the summed
+        point distances along the warping path divided by the lengths of
+        both sequences. NaN when either sequence is empty.
+    """
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    lengths = np.array([len(other) for other in others], dtype=np.int64)
+    result = np.full(len(others), np.nan)
+    if len(others) == 0 or len(points) == 0 or lengths.max() == 0:
+        return result
+
+    rows, width = len(points), int(lengths.max())
+    # Points as complex numbers, so a distance is one abs(); the others are
+    # padded with infinity on both sides so every diagonal is a plain slice
+    # and cells outside a sequence cost infinity. Single precision is plenty
+    # for normalized coordinates and halves the memory traffic.
+    point = (points[:, 0] + 1j * points[:, 1]).astype(np.complex64)
+    padded = np.full((len(others), width + 2 * rows), np.inf + 0j, dtype=np.complex64)
+    for row, other in enumerate(others):
+        other = np.asarray(other, dtype=float).reshape(-1, 2)
+        padded[row, rows : rows + len(other)] = other[:, 0] + 1j * other[:, 1]
+
+    # Diagonal s holds D[i][s - i] for i = 0..rows; D[0][0] = 0 and the
+    # first row and column are infinite
+    before = np.full((len(others), rows + 1), np.inf, dtype=np.float32)
+    last = np.full((len(others), rows + 1), np.inf, dtype=np.float32)
+    before[:, 0] = 0.0
+    cost = np.empty((len(others), rows), dtype=np.float32)
+    for s in range(2, rows + width + 1):
+        # Column j - 1 = s - 1 - i of the other sequence for i = 1..rows (offset by the padding)
+        np.abs(padded[:, s - 1 : rows + s - 1][:, ::-1] - point, out=cost)
+        current = np.empty_like(last)
+        current[:, 0] = np.inf
+        np.minimum(last[:, :-1], last[:, 1:], out=current[:, 1:])
+        np.minimum(current[:, 1:], before[:, :-1], out=current[:, 1:])
+        current[:, 1:] += cost
+        # D[rows][length] of the sequences ending on this diagonal
+        ending = lengths == s - rows
+        result[ending] = current[ending, rows]
+        before, last = last, current
+
+    # Empty sequences "end" on diagonal ``rows`` with an infinite cell
+    result[lengths == 0] = np.nan
+    return result / (rows + lengths)
+
+
+def compare_rows(
+    sequences: List[Optional[np.ndarray]], method: str, rows: Sequence[int]
+) -> List[Tuple[int, np.ndarray]]:
+    """
+    Similarities of some sequences to the ones after them.
+
+    Args:
+        sequences: AOI sequences (``levenshtein``) or normalized fixation
+            points (``dtw``); None for subjects without a scanpath
+        method: One of ``SCANPATH_METHODS``
+        rows: Indices of the sequences to compare
+
+    Returns:
+        List of (row, similarities to sequences row + 1 onwards), NaN where
+        either sequence is missing or empty
+    """
+    if method not in SCANPATH_METHODS:
+        raise ValueError(f"Unknown scanpath method '{method}' (expected {', '.join(SCANPATH_METHODS)}).")
+
+    missing = np.array([sequence is None for sequence in sequences], dtype=bool)
+    if method == "levenshtein":
+        # All pairs of all rows are compared in one batch
+        sequences = [np.empty(0, dtype=np.int64) if sequence is None else sequence for sequence in sequences]
+        first = np.concatenate([np.full(len(sequences) - row - 1, row) for row in rows] + [np.empty(0)])
+        second = np.concatenate([np.arange(row + 1, len(sequences)) for row in rows] + [np.empty(0)])
+        first, second = first.astype(np.int64), second.astype(np.int64)
+        lengths = np.array([len(sequence) for sequence in sequences], dtype=np.int64)
+        compared = (lengths[first] > 0) & (lengths[second] > 0)
+        similarity = np.full(len(first), np.nan)
+        distances = levenshtein_distances(sequences, first[compared], second[compared])
+        similarity[compared] = 1 - distances / np.maximum(lengths[first], lengths[second])[compared]
+        ends = np.cumsum([len(sequences) - row - 1 for row in rows])
+        return list(zip(rows, np.split(similarity, ends[:-1])))
+
+    results = []
+    for row in rows:
+        similarity = np.full(len(sequences) - row - 1, np.nan)
+        present = [k for k in range(row + 1, len(sequences)) if not missing[k] and len(sequences[k])]
+        if not missing[row] and len(sequences[row]) and present:
+            distances = dtw_distances(sequences[row], [sequences[k] for k in present])
+            similarity[np.array(present) - row - 1] = 1 - distances / _MAX_DISTANCE
+        results.append((row, similarity))
+    return results
+
+
+def assemble_matrix(sequences: List[Optional[np.ndarray]], rows: List[Tuple[int, np.ndarray]]) -> np.ndarray:
+    """
+    Build the symmetric similarity matrix from the output of ``compare_rows``.
+
+    The diagonal is 1 for the sequences present and not empty, NaN like
+    their other pairs for the rest.
+    """
+    count = len(sequences)
+    matrix = np.full((count, count), np.nan)
+    for row, similarity in rows:
+        matrix[row, row + 1 :] = similarity
+        matrix[row + 1 :, row] = similarity
+    present = np.array([sequence is not None and len(sequence) > 0 for sequence in sequences], dtype=bool)
+    matrix[np.diag_indices(count)] = np.where(present, 1.0, np.nan)
+    return matrix
+
+
+def similarity_matrix(sequences: List[Optional[np.ndarray]], method: str) -> np.ndarray:
+    """
+    Pairwise scanpath similarity of a list of subjects.
+
+    Args:
+        sequences: As in ``compare_rows``
+        method: One of ``SCANPATH_METHODS``
+
+    Returns:
+        (n, n) symmetric matrix of similarities between 0 and 1, NaN for
+        pairs (the diagonal included) where a scanpath is missing or empty
+    """
+    return assemble_matrix(sequences, compare_rows(sequences, method, range(len(sequences))))
@@ -0,0 +1,219 @@
+"""
+Offline analysis of a study: per-subject summary statistics, fixations, AOI
+dwell metrics and heatmaps, computed in parallel by a pool of processes
+that each read directly from the database, and consolidated into one
+JSON report.
+
+    python src/analyze_study.py 3 [--workers 8] [--output report.json] [--csv subjects.csv]
+    python src/analyze_study.py 3 --scanpaths levenshtein [--scanpath-task 2]
+    python src/analyze_study.py 3 --calibration exclude
+
+With ``--scanpaths`` the report also holds the pairwise scanpath similarity
+of the subjects, whose rows are compared by the same pool of processes.
+With ``--calibration`` poorly calibrated subjects are left out of (or
+down-weighted in) the study means and heatmap.
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import nullcontext
+
+basedir = os.path.abspath(os.path.dirname(__file__))
+if basedir not in sys.path:
+    sys.path.insert(0, basedir)
+
+import numpy as np
+from analysis.scanpath import SCANPATH_METHODS, assemble_matrix, compare_rows
+from api.services import CALIBRATION_MODES, ScanpathService, StudyAnalysisService
+from app import create_app, get_db_manager
+from state import get_component
+
+APP_CONFIG = {"SWAGGER_ENABLED": False, "METRICS_ENABLED": False}
+
+# App of a worker process, created by _init_worker
+_worker_app = None
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze every subject of a study")
+    parser.add_argument("study_id", type=int)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Worker processes (default: one per CPU; 1 analyzes in this process)")
+    parser.add_argument("--output", help="JSON report (default: study_<ID>_report.json)")
+    parser.add_argument("--csv", help="Also write one row of metrics per subject to this CSV file")
+    parser.add_argument("--bins", default="64x36", metavar="COLUMNSxROWS", help="Heatmap bins")
+    parser.add_argument("--raw", action="store_true", help="Analyze the gaze without the gaze filter")
+    parser.add_argument("--calibration", choices=CALIBRATION_MODES, default="all",
+                        help="Keep every subject in the aggregates (default), exclude poorly "
+                             "calibrated ones or weight subjects by calibration accuracy")
+    parser.add_argument("--scanpaths", choices=SCANPATH_METHODS,
+                        help="Also compare the scanpaths of every pair of subjects with this method")
+    parser.add_argument("--scanpath-task", type=int, metavar="TASK",
+                        help="Only compare the fixations made during this task")
+    return parser.parse_args(argv)
+
+
+def _init_worker(config):
+    global _worker_app
+    _worker_app = create_app(config)
+
+
+def _analyze(subject_id, options):
+    with _worker_app.app_context():
+        return get_component(StudyAnalysisService).analyze_subject(subject_id, **options)
+
+
+def analyze_subjects(pool, subject_ids, options, progress):
+    """Analyze subjects in the process pool (or here without one), yielding each result as it completes."""
+    if pool is None:
+        for subject_id in subject_ids:
+            try:
+                yield _analyze(subject_id, options)
+            except Exception as e:
+                yield {"subject_id": subject_id, "error": str(e)}
+            progress()
+        return
+
+    futures = {pool.submit(_analyze, subject_id, options): subject_id for subject_id in subject_ids}
+    for future in as_completed(futures):
+        try:
+            yield future.result()
+        except Exception as e:
+            yield {"subject_id": futures[future], "error": str(e)}
+        progress()
+
+
+def compare_scanpaths(pool, sequences, method, workers):
+    """
+    Pairwise scanpath similarity, with the rows split between the workers.
+
+    Row r is compared with the rows after it, so rows are dealt out in turn
+    (0, workers, 2 * workers...) to give every worker a similar share.
+    """
+    if pool is None:
+        return assemble_matrix(sequences, compare_rows(sequences, method, range(len(sequences))))
+    chunks = [range(start, len(sequences), workers) for start in range(workers)]
+    futures = [pool.submit(compare_rows, sequences, method, chunk) for chunk in chunks]
+    return assemble_matrix(sequences, [row for future in futures for row in future.result()])
+
+
+def write_csv(path, report):
+    header = ["subject_id", "name", "surname", "age", "samples", "valid_gaze", "gaze_loss",
+              "duration_s", "sampling_rate_hz", "tasks", "calibration_accuracy_px",
+              "calibration_precision_px", "fixations", "fixation_rate_per_second",
+              "mean_fixation_ms", "fixation_ratio", "mean_saccade_amplitude_px"]
+    header += [f"dwell_ms:{aoi['name']}" for aoi in report["aois"]]
+
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for result in report["subjects"]:
+            if "error" in result:
+                continue
+            summary, fixations = result["summary"], result["fixations"]
+            calibration = result["calibration"] or {}
+            writer.writerow([
+                result["subject_id"], result["name"], result["surname"], result["age"],
+                summary["samples"], summary["valid_gaze"], summary["gaze_loss"],
+                summary["duration_s"], summary["sampling_rate_hz"], summary["tasks"],
+                calibration.get("accuracy_px"), calibration.get("precision_px"),
+                fixations["count"], fixations["rate_per_second"], fixations["mean_duration_ms"],
+                fixations["fixation_ratio"], fixations["mean_saccade_amplitude_px"],
+                *[aoi["dwell_ms"] for aoi in result["aois"]],
+            ])
+
+
+def main(args):
+    bins = tuple(int(value) for value in args.bins.lower().split("x"))
+    app = create_app(dict(APP_CONFIG))
+    get_db_manager(app).create_all()
+
+    with app.app_context():
+        service = get_component(StudyAnalysisService)
+        plan = service.plan(args.study_id, args.calibration)
+        if plan is None:
+            sys.exit(f"❌ Study {args.study_id} not found")
+
+        options = {"bins": bins, "filtered": not args.raw}
+        if args.scanpaths:
+            try:
+                get_component(ScanpathService).get_definitions(plan["study_id"], args.scanpaths)
+            except ValueError as e:
+                sys.exit(f"❌ {e}")
+            options.update(scanpath=args.scanpaths, scanpath_task=args.scanpath_task)
+
+        # Workers open their own connections
+        config = {**APP_CONFIG, "SQLALCHEMY_DATABASE_URI": app.config["SQLALCHEMY_DATABASE_URI"]}
+        get_db_manager(app).dispose_engine()
+
+        total = len(plan["subject_ids"])
+        workers = max(1, min(args.workers, total))
+        print(f"🔬 Analyzing {total} subjects of study {plan['study_id']} ('{plan['name']}') "
+              f"with {workers} worker(s)")
+        started = time.perf_counter()
+        done = 0
+
+        def progress():
+            nonlocal done
+            done += 1
+            print(f"\r⏳ {done}/{total} subjects ({time.perf_counter() - started:.1f} s)", end="", flush=True)
+
+        pool = None
+        if workers > 1:
+            pool = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(config,))
+        else:
+            _init_worker(config)
+        with pool or nullcontext():
+            results = list(analyze_subjects(pool, plan["subject_ids"], options, progress))
+            if total:
+                print()
+            results = [result for result in results if result is not None]
+
+            similarity = None
+            if args.scanpaths:
+                results.sort(key=lambda result: result["subject_id"])
+                sequences = [
+                    None if "error" in result or result["scanpath"] is None
+                    else np.array(result.pop("scanpath"))
+                    for result in results
+                ]
+                compared = time.perf_counter()
+                matrix = compare_scanpaths(pool, sequences, args.scanpaths, workers)
+                similarity = ScanpathService.format_similarity(
+                    plan["study_id"], args.scanpaths, args.scanpath_task,
+                    [result["subject_id"] for result in results], sequences, matrix,
+                )
+                print(f"🔗 Compared {len(sequences) * (len(sequences) - 1) // 2:,} scanpath pairs "
+                      f"({time.perf_counter() - compared:.1f} s)")
+                for result in results:
+                    result.pop("scanpath", None)
+
+        report = service.build_report(plan, results, bins)
+        if similarity is not None:
+            report["scanpath_similarity"] = similarity
+
+    output = args.output or f"study_{plan['study_id']}_report.json"
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False)
+    print(f"📄 Report written to {output} ({report['subjects_analyzed']} subjects, "
+          f"{report['totals']['samples']:,} samples, {report['totals']['fixations']:,} fixations)")
+    if report["subjects_excluded"]:
+        print(f"🎯 {len(report['subjects_excluded'])} poorly calibrated subject(s) left out of the aggregates")
+    if args.csv:
+        write_csv(args.csv, report)
+        print(f"📄 Per-subject metrics written to {args.csv}")
+    for result in report["subjects"]:
+        if "error" in result:
+            print(f"❌ Subject {result['subject_id']}: {result['error']}")
+
+
+if __name__ == "__main__":
+    try:
+        main(parse_args())
+    except KeyboardInterrupt:
+        pass
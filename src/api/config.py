@@ -23,6 +23,14 @@ SWAGGER_CONFIG = {
     ],
 }
 
+# Timezone the tracking page uses for its timestamps. Numeric (epoch
+# milliseconds) timestamps are converted to naive datetimes in this zone so
+# they line up with rows stored from the older string format.
+CLIENT_TIMEZONE = "America/Argentina/Buenos_Aires"
+
+# Format of the string timestamps produced by toLocaleString("en-US")
+CLIENT_DATE_FORMAT = "%m/%d/%Y, %I:%M:%S %p"
+
 # Response messages
 API_RESPONSES = {
     "SUBJECT_NOT_FOUND": "Subject not found",
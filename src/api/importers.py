@@ -0,0 +1,266 @@
+"""
+Streaming readers for importing recorded sessions from CSV and Parquet files.
+
+Files are read a chunk of rows at a time, so memory use does not depend on
+the file size. Each chunk is converted to the values the ingest path takes:
+sample dates and optional (x, y) gaze and mouse coordinates, plus the
+subject key of each row when the file holds several subjects. Values that
+cannot be read (a malformed date or coordinate) do not stop the import: the
+row is flagged as invalid, with its line in the file, and skipped by the
+caller. The files written by ``/api/download-points`` are read as they are.
+"""
+
+import csv
+import os
+import re
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+import numpy as np
+from .timestamps import parse_timestamps
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+# Rows read and stored per transaction
+CHUNK_ROWS = 50000
+
+# Accepted column names (case-insensitive) for each imported field
+COLUMN_ALIASES = {
+    "subject": ("subject", "subject_id", "participant"),
+    "date": ("date", "timestamp", "time"),
+    "x_gaze": ("x_gaze", "gaze_x"),
+    "y_gaze": ("y_gaze", "gaze_y"),
+    "x_mouse": ("x_mouse", "mouse_x"),
+    "y_mouse": ("y_mouse", "mouse_y"),
+}
+
+FILE_FORMATS = ("csv", "parquet")
+
+# Invalid rows whose line numbers are reported
+REPORTED_INVALID_ROWS = 10
+
+_ISO_DATE = re.compile(r"^\d{4}-\d{2}-\d{2}")
+
+
+def detect_format(path: str) -> str:
+    """File format from the extension: "parquet" for .parquet/.pq, "csv" otherwise."""
+    return "parquet" if os.path.splitext(path)[1].lower() in (".parquet", ".pq") else "csv"
+
+
+def resolve_columns(header: Sequence[str], mapping: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """
+    Match the columns of a file to the imported fields.
+
+    Args:
+        header: Column names of the file
+        mapping: Explicit field -> column names, overriding the aliases
+
+    Returns:
+        Dictionary mapping each field found to its column name
+
+    Raises:
+        ValueError: If a mapped column is missing, there is no date column or
+            no complete gaze or mouse coordinate pair
+    """
+    mapping = dict(mapping or {})
+    unknown = set(mapping) - set(COLUMN_ALIASES)
+    if unknown:
+        raise ValueError(f"Unknown field(s) {', '.join(sorted(unknown))} (expected {', '.join(COLUMN_ALIASES)}).")
+
+    by_name = {name.strip().lower(): name for name in header}
+    columns = {}
+    for field, aliases in COLUMN_ALIASES.items():
+        if field in mapping:
+            if mapping[field] not in header:
+                raise ValueError(f"Column '{mapping[field]}' not found in the file.")
+            columns[field] = mapping[field]
+            continue
+        for alias in aliases:
+            if alias in by_name:
+                columns[field] = by_name[alias]
+                break
+
+    if "date" not in columns:
+        raise ValueError("The file has no date column (map one with date=COLUMN).")
+    pairs = [("x_gaze", "y_gaze"), ("x_mouse", "y_mouse")]
+    if not any(x in columns and y in columns for x, y in pairs):
+        raise ValueError("The file has no gaze or mouse coordinate columns.")
+    return columns
+
+
+def _parse_date(value) -> Optional[datetime]:
+    """Parse one date the way ``parse_dates`` does, None if it cannot be read."""
+    try:
+        if isinstance(value, str) and _ISO_DATE.match(value):
+            date = np.datetime64(value, "us").tolist()
+        else:
+            date = parse_timestamps([value])[0]
+    except (ValueError, OverflowError, OSError):
+        return None
+    return date if isinstance(date, datetime) else None
+
+
+def parse_dates(values: Sequence) -> List[Optional[datetime]]:
+    """
+    Parse the dates of a chunk.
+
+    ISO strings ("YYYY-MM-DD HH:MM:SS[.ffffff]", as exported) are converted
+    by numpy in one operation; epoch milliseconds and the client's locale
+    strings go through the ingest parser. When a group holds a value that
+    cannot be read, its values are parsed one at a time instead. Empty and
+    unreadable values become None.
+    """
+    parsed = [value if isinstance(value, datetime) else None for value in values]
+    iso, other = [], []
+    for index, value in enumerate(values):
+        if value in (None, "") or isinstance(value, datetime):
+            continue
+        (iso if isinstance(value, str) and _ISO_DATE.match(value) else other).append(index)
+
+    for indexes, convert in (
+        (iso, lambda group: np.array(group, dtype="datetime64[us]").tolist()),
+        (other, parse_timestamps),
+    ):
+        if not indexes:
+            continue
+        group = [values[index] for index in indexes]
+        try:
+            dates = convert(group)
+        except (ValueError, OverflowError, OSError):
+            dates = [_parse_date(value) for value in group]
+        for index, date in zip(indexes, dates):
+            parsed[index] = date if isinstance(date, datetime) else None
+    return parsed
+
+
+def _floats(values: Sequence) -> Tuple[np.ndarray, np.ndarray]:
+    """Values as floats (NaN where empty or unreadable) and a mask of the unreadable ones."""
+    values = [np.nan if value in (None, "") else value for value in values]
+    try:
+        return np.array(values, dtype=float), np.zeros(len(values), dtype=bool)
+    except (TypeError, ValueError):
+        pass
+    floats = np.full(len(values), np.nan)
+    unreadable = np.zeros(len(values), dtype=bool)
+    for index, value in enumerate(values):
+        try:
+            floats[index] = float(value)
+        except (TypeError, ValueError):
+            unreadable[index] = True
+    return floats, unreadable
+
+
+def _pairs(x: np.ndarray, y: np.ndarray) -> List[Optional[Tuple[float, float]]]:
+    valid = np.isfinite(x) & np.isfinite(y)
+    return [(a, b) if ok else None for a, b, ok in zip(x.tolist(), y.tolist(), valid.tolist())]
+
+
+def to_coordinates(x_values: Optional[Sequence], y_values: Optional[Sequence], count: int) -> List[Optional[Tuple[float, float]]]:
+    """(x, y) pairs of a chunk, None where either coordinate is missing, unreadable or not finite."""
+    if x_values is None or y_values is None:
+        return [None] * count
+    return _pairs(_floats(x_values)[0], _floats(y_values)[0])
+
+
+def _convert(columns: Dict[str, str], values: Dict[str, Sequence], lines: List[int]) -> Dict[str, list]:
+    count = len(lines)
+    raw_dates = values[columns["date"]]
+    dates = parse_dates(raw_dates)
+    invalid = np.array([date is None and raw not in (None, "") for raw, date in zip(raw_dates, dates)], dtype=bool)
+
+    coordinates = {}
+    for field in ("gaze", "mouse"):
+        x_column, y_column = columns.get(f"x_{field}"), columns.get(f"y_{field}")
+        if x_column is None or y_column is None:
+            coordinates[field] = [None] * count
+            continue
+        (x, x_unreadable), (y, y_unreadable) = _floats(values[x_column]), _floats(values[y_column])
+        invalid |= x_unreadable | y_unreadable
+        coordinates[field] = _pairs(x, y)
+
+    return {
+        "subject": (
+            [None if key in (None, "") else str(key) for key in values[columns["subject"]]]
+            if "subject" in columns else None
+        ),
+        "date": dates,
+        "gaze": coordinates["gaze"],
+        "mouse": coordinates["mouse"],
+        "line": lines,
+        "invalid": np.flatnonzero(invalid).tolist(),
+    }
+
+
+def iter_csv_chunks(
+    path: str, mapping: Optional[Dict[str, str]] = None, chunk_rows: int = CHUNK_ROWS
+) -> Iterator[Dict[str, list]]:
+    """
+    Read a CSV file with a header row in chunks.
+
+    Args:
+        path: Path of the file
+        mapping: Field -> column names overriding the aliases
+        chunk_rows: Rows per chunk
+
+    Returns:
+        Iterator of chunks with ``subject`` (None when the file has no
+        subject column), ``date``, ``gaze`` and ``mouse`` lists, the
+        ``line`` of each row in the file and the ``invalid`` rows (indexes
+        into the chunk) holding a value that could not be read
+    """
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        columns = resolve_columns(header, mapping)
+        positions = {name: header.index(name) for name in columns.values()}
+
+        while True:
+            chunk = [(reader.line_num, row) for _, row in zip(range(chunk_rows), reader)]
+            if not chunk:
+                return
+            rows = [row for _, row in chunk if row]
+            if not rows:
+                continue
+            values = {
+                name: [row[position] if position < len(row) else "" for row in rows]
+                for name, position in positions.items()
+            }
+            yield _convert(columns, values, [line for line, row in chunk if row])
+
+
+def iter_parquet_chunks(
+    path: str, mapping: Optional[Dict[str, str]] = None, chunk_rows: int = CHUNK_ROWS
+) -> Iterator[Dict[str, list]]:
+    """
+    Read a Parquet file in record batches (same output as ``iter_csv_chunks``,
+    with the row number, counted from 1, as the ``line``).
+
+    Raises:
+        RuntimeError: If the ``pyarrow`` package is not installed
+    """
+    if pq is None:
+        raise RuntimeError("Reading Parquet files needs the 'pyarrow' package.")
+    parquet_file = pq.ParquetFile(path)
+    columns = resolve_columns(parquet_file.schema_arrow.names, mapping)
+    first = 1
+    for batch in parquet_file.iter_batches(batch_size=chunk_rows, columns=sorted(set(columns.values()))):
+        yield _convert(columns, batch.to_pydict(), list(range(first, first + batch.num_rows)))
+        first += batch.num_rows
+
+
+def read_chunks(
+    path: str,
+    mapping: Optional[Dict[str, str]] = None,
+    chunk_rows: int = CHUNK_ROWS,
+    file_format: Optional[str] = None,
+) -> Iterator[Dict[str, list]]:
+    """Read a CSV or Parquet file in chunks (format detected from the extension if not given)."""
+    file_format = file_format or detect_format(path)
+    if file_format not in FILE_FORMATS:
+        raise ValueError(f"Unknown file format '{file_format}' (expected {', '.join(FILE_FORMATS)}).")
+    reader = iter_parquet_chunks if file_format == "parquet" else iter_csv_chunks
+    return reader(path, mapping, chunk_rows)
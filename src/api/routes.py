@@ -2,17 +2,67 @@
 API routes for the user gaze tracking application.
 """
 
-from flask import Blueprint, request, jsonify, send_file, send_from_directory
-from .services import SubjectService, MeasurementService, TaskLogService, ExportService
-import os
+import hmac
+from functools import wraps
+from flask import (
+    Blueprint,
+    Response,
+    current_app,
+    request,
+    jsonify,
+    send_file,
+    send_from_directory,
+    stream_with_context,
+)
+from .services import (
+    SubjectService,
+    MeasurementService,
+    TaskLogService,
+    SummaryService,
+    CalibrationService,
+    AlignmentService,
+    AoiService,
+    ScanpathService,
+    ArchiveService,
+    BackupService,
+    ExportService,
+    ARCHIVE_IDLE_MINUTES,
+    CALIBRATION_MODES,
+)
+from state import get_component, get_config_manager
 
 api_bp = Blueprint("api", __name__, url_prefix="/api")
 
-# Initialize service instances
-subject_service = SubjectService()
-measurement_service = MeasurementService()
-tasklog_service = TaskLogService()
-export_service = ExportService()
+
+def maintenance_required(view):
+    """
+    Restrict a maintenance endpoint to requests carrying the maintenance token.
+
+    The token is the ``maintenance_token`` config key, sent as
+    ``Authorization: Bearer <token>``. Without a configured token the
+    endpoint is disabled; use ``manage.py`` instead.
+    """
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        token = current_app.config.get("MAINTENANCE_TOKEN")
+        if not token:
+            return "Maintenance endpoints are disabled; use manage.py or set maintenance_token", 403
+        scheme, _, given = request.headers.get("Authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not hmac.compare_digest(given.encode(), token.encode()):
+            return "Invalid maintenance token", 403
+        return view(*args, **kwargs)
+
+    return wrapper
+
+
+def _csv_download(chunks, filename):
+    """Stream CSV chunks as a file download without building it in memory."""
+    return Response(
+        stream_with_context(chunks),
+        mimetype="text/csv",
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
 
 
 @api_bp.route("/get-subjects", methods=["GET"])
@@ -24,7 +74,7 @@ def api_subjects():
         200:
             description: JSON with subjects information.
     """
-    subjects_info = subject_service.get_all_subjects()
+    subjects_info = get_component(SubjectService).get_all_subjects()
     return jsonify(subjects_info)
 
 
@@ -47,7 +97,7 @@ def get_user_points():
     """
     subject_id = request.args.get("id", type=int)
 
-    result = measurement_service.get_user_points(subject_id)
+    result = get_component(MeasurementService).get_user_points(subject_id)
     if result:
         return jsonify(result)
     return "Subject not found", 404
@@ -72,12 +122,455 @@ def get_user_tasklogs():
     """
     subject_id = request.args.get("id", type=int)
 
-    result = tasklog_service.get_user_tasklogs(subject_id)
+    result = get_component(TaskLogService).get_user_tasklogs(subject_id)
+    if result:
+        return jsonify(result)
+    return "Subject not found", 404
+
+
+@api_bp.route("/get-subject-summary")
+def get_subject_summary():
+    """
+    Returns precomputed summary statistics for a specific subject.
+    ---
+    parameters:
+        - name: id
+          in: query
+          type: integer
+          required: true
+          description: Subject ID to get the summary.
+    responses:
+        200:
+            description: JSON with sample count, session bounds, gaze bounding box, sampling rate and task count.
+        404:
+            description: Subject not found.
+    """
+    subject_id = request.args.get("id", type=int)
+
+    result = get_component(SummaryService).get_summary(subject_id)
+    if result:
+        return jsonify(result)
+    return "Subject not found", 404
+
+
+@api_bp.route("/rebuild-summaries", methods=["POST"])
+@maintenance_required
+def rebuild_summaries():
+    """
+    Recomputes subject summaries from the stored measurements and task logs.
+    ---
+    parameters:
+        - name: id
+          in: query
+          type: integer
+          required: false
+          description: Subject ID to rebuild. All subjects are rebuilt if omitted.
+    responses:
+        200:
+            description: Number of summaries rebuilt.
+        403:
+            description: Missing or invalid maintenance token.
+    """
+    subject_id = request.args.get("id", type=int)
+    result = get_component(SummaryService).rebuild(subject_id)
+    return jsonify(result)
+
+
+@api_bp.route("/archive-samples", methods=["POST"])
+@maintenance_required
+def archive_samples():
+    """
+    Packs the samples of completed sessions into compressed blocks.
+    ---
+    parameters:
+        - name: id
+          in: query
+          type: integer
+          required: false
+          description: Subject ID to archive. If omitted, every subject without new data for idle_minutes is archived.
+        - name: idle_minutes
+          in: query
+          type: integer
+          required: false
+          description: Minutes without new data after which a session counts as completed (default 60).
+    responses:
+        200:
+            description: Number of subjects and samples archived.
+        403:
+            description: Missing or invalid maintenance token.
+        404:
+            description: Subject not found.
+    """
+    subject_id = request.args.get("id", type=int)
+    idle_minutes = max(request.args.get("idle_minutes", ARCHIVE_IDLE_MINUTES, type=int), 0)
+
+    result = get_component(ArchiveService).archive(subject_id, idle_minutes)
+    if result:
+        return jsonify(result)
+    return "Subject not found", 404
+
+
+@api_bp.route("/create-backup", methods=["POST"])
+@maintenance_required
+def create_backup():
+    """
+    Backs up the database while it is in use and verifies the copy.
+    ---
+    parameters:
+        - name: compress
+          in: query
+          type: boolean
+          required: false
+          description: Gzip the backup (default from the backup_compress config key).
+    responses:
+        200:
+            description: Backup file, size, row counts per study and rotated-out files.
+        403:
+            description: Missing or invalid maintenance token.
+        409:
+            description: Another backup started at the same time and took the file name.
+        500:
+            description: The backup failed verification and was discarded.
+    """
+    compress = request.args.get("compress")
+    if compress is not None:
+        compress = compress.lower() in ("1", "true")
+
+    try:
+        result = get_component(BackupService).backup(compress=compress)
+    except FileExistsError as e:
+        return str(e), 409
+    except RuntimeError as e:
+        return str(e), 500
+    return jsonify(result)
+
+
+@api_bp.route("/get-task-alignment")
+def get_task_alignment():
+    """
+    Returns the task logs of a subject with the samples recorded during each task.
+    ---
+    parameters:
+        - name: id
+          in: query
+          type: integer
+          required: true
+          description: Subject ID.
+    responses:
+        200:
+            description: JSON with the sample count and time span of each task.
+        404:
+            description: Subject not found.
+    """
+    subject_id = request.args.get("id", type=int)
+
+    result = get_component(AlignmentService).get_task_alignment(subject_id)
+    if result:
+        return jsonify(result)
+    return "Subject not found", 404
+
+
+@api_bp.route("/get-task-samples")
+def get_task_samples():
+    """
+    Returns the gaze and mouse points recorded while a subject performed a task.
+    ---
+    parameters:
+        - name: id
+          in: query
+          type: integer
+          required: true
+          description: Subject ID.
+        - name: task
+          in: query
+          type: integer
+          required: true
+          description: Task index, as returned by /api/get-task-alignment.
+    responses:
+        200:
+            description: JSON with the points of the task.
+        404:
+            description: Subject or task not found.
+    """
+    subject_id = request.args.get("id", type=int)
+    task = request.args.get("task", type=int)
+
+    result = get_component(AlignmentService).get_task_samples(subject_id, task)
+    if result:
+        return jsonify(result)
+    return "Subject or task not found", 404
+
+
+@api_bp.route("/get-task-heatmap")
+def get_task_heatmap():
+    """
+    Returns a gaze heatmap of the samples recorded while a subject performed a task.
+    ---
+    parameters:
+        - name: id
+          in: query
+          type: integer
+          required: true
+          description: Subject ID.
+        - name: task
+          in: query
+          type: integer
+          required: true
+          description: Task index, as returned by /api/get-task-alignment.
+        - name: bins_x
+          in: query
+          type: integer
+          required: false
+          description: Number of horizontal bins (default 64).
+        - name: bins_y
+          in: query
+          type: integer
+          required: false
+          description: Number of vertical bins (default 36).
+    responses:
+        200:
+            description: JSON with bin edges and counts (counts[row][column]).
+        404:
+            description: Subject or task not found.
+    """
+    subject_id = request.args.get("id", type=int)
+    task = request.args.get("task", type=int)
+    bins_x = min(max(request.args.get("bins_x", 64, type=int), 1), 512)
+    bins_y = min(max(request.args.get("bins_y", 36, type=int), 1), 512)
+
+    result = get_component(AlignmentService).get_task_heatmap(subject_id, task, bins=(bins_x, bins_y))
+    if result:
+        return jsonify(result)
+    return "Subject or task not found", 404
+
+
+@api_bp.route("/get-study-heatmap")
+def get_study_heatmap():
+    """
+    Returns a gaze heatmap of every subject of a study in viewport-normalized coordinates.
+    ---
+    parameters:
+        - name: study_id
+          in: query
+          type: integer
+          required: true
+          description: Study ID.
+        - name: bins_x
+          in: query
+          type: integer
+          required: false
+          description: Number of horizontal bins (default 64).
+        - name: bins_y
+          in: query
+          type: integer
+          required: false
+          description: Number of vertical bins (default 36).
+        - name: calibration
+          in: query
+          type: string
+          enum: [all, exclude, weight]
+          required: false
+          description: Keep every subject (default), leave out poorly calibrated subjects or weight each subject's samples by its calibration accuracy.
+    responses:
+        200:
+            description: JSON with bin edges (0-1) and counts (counts[row][column]; summed weights with calibration=weight).
+        400:
+            description: Unknown calibration mode.
+        404:
+            description: Study not found.
+    """
+    study_id = request.args.get("study_id", type=int)
+    bins_x = min(max(request.args.get("bins_x", 64, type=int), 1), 512)
+    bins_y = min(max(request.args.get("bins_y", 36, type=int), 1), 512)
+    calibration = request.args.get("calibration", "all")
+    if calibration not in CALIBRATION_MODES:
+        return jsonify({"status": "error", "message": f"Unknown calibration mode '{calibration}'."}), 400
+
+    result = get_component(MeasurementService).get_study_heatmap(
+        study_id, bins=(bins_x, bins_y), calibration=calibration
+    )
+    if result:
+        return jsonify(result)
+    return "Study not found", 404
+
+
+@api_bp.route("/get-aois")
+def get_aois():
+    """
+    Returns the Areas of Interest defined for a study.
+    ---
+    parameters:
+        - name: study_id
+          in: query
+          type: integer
+          required: true
+          description: Study ID.
+    responses:
+        200:
+            description: JSON with the AOIs of the study.
+        404:
+            description: Study not found.
+    """
+    study_id = request.args.get("study_id", type=int)
+
+    result = get_component(AoiService).get_aois(study_id)
+    if result:
+        return jsonify(result)
+    return "Study not found", 404
+
+
+@api_bp.route("/save-aois", methods=["POST"])
+def save_aois():
+    """
+    Replaces the Areas of Interest of a study.
+    ---
+    parameters:
+        - name: aois
+          in: body
+          required: true
+          schema:
+            type: object
+            properties:
+                study_id:
+                    type: integer
+                aois:
+                    type: array
+                    items:
+                        type: object
+                        properties:
+                            name:
+                                type: string
+                            shape:
+                                type: string
+                                enum: [rect, polygon]
+                            x:
+                                type: number
+                            y:
+                                type: number
+                            width:
+                                type: number
+                            height:
+                                type: number
+                            points:
+                                type: array
+                                items:
+                                    type: array
+                                    items:
+                                        type: number
+    responses:
+        200:
+            description: JSON with the saved AOIs.
+        400:
+            description: Invalid AOI definition.
+        404:
+            description: Study not found.
+    """
+    data = request.get_json()
+
+    try:
+        result = get_component(AoiService).save_aois(data)
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    if result:
+        return jsonify(result)
+    return "Study not found", 404
+
+
+@api_bp.route("/get-aoi-metrics")
+def get_aoi_metrics():
+    """
+    Returns dwell time, hits, visits, time to first fixation and AOI transitions for a subject.
+    ---
+    parameters:
+        - name: id
+          in: query
+          type: integer
+          required: true
+          description: Subject ID.
+    responses:
+        200:
+            description: JSON with the AOI metrics of the subject.
+        404:
+            description: Subject not found.
+    """
+    subject_id = request.args.get("id", type=int)
+
+    result = get_component(AoiService).get_subject_metrics(subject_id)
     if result:
         return jsonify(result)
     return "Subject not found", 404
 
 
+@api_bp.route("/get-study-aoi-metrics")
+def get_study_aoi_metrics():
+    """
+    Returns the AOI metrics of every subject of a study.
+    ---
+    parameters:
+        - name: study_id
+          in: query
+          type: integer
+          required: true
+          description: Study ID.
+    responses:
+        200:
+            description: JSON with the AOI metrics of each subject.
+        404:
+            description: Study not found.
+    """
+    study_id = request.args.get("study_id", type=int)
+
+    result = get_component(AoiService).get_study_metrics(study_id)
+    if result:
+        return jsonify(result)
+    return "Study not found", 404
+
+
+@api_bp.route("/get-scanpath-similarity")
+def get_scanpath_similarity():
+    """
+    Returns the pairwise scanpath similarity of the subjects of a study.
+    ---
+    parameters:
+        - name: study_id
+          in: query
+          type: integer
+          required: true
+          description: Study ID.
+        - name: method
+          in: query
+          type: string
+          enum: [levenshtein, dtw]
+          required: false
+          description: Edit distance between the AOI sequences of the fixations (default, needs AOIs) or dynamic time warping between the fixation positions (needs the viewport).
+        - name: task
+          in: query
+          type: integer
+          required: false
+          description: Only compare the fixations made during this task (index as returned by /api/get-task-alignment).
+    responses:
+        200:
+            description: JSON with the subject IDs, scanpath lengths and a symmetric matrix of similarities between 0 and 1 (null where a scanpath is missing).
+        400:
+            description: Unknown method, or levenshtein for a study without AOIs.
+        404:
+            description: Study not found.
+    """
+    study_id = request.args.get("study_id", type=int)
+    method = request.args.get("method", "levenshtein")
+    task = request.args.get("task", type=int)
+
+    try:
+        result = get_component(ScanpathService).get_similarity(study_id, method, task)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    if result:
+        return jsonify(result)
+    return "Study not found", 404
+
+
 @api_bp.route("/save-points", methods=["POST"])
 def save_points():
     """
@@ -99,7 +592,7 @@ def save_points():
                         properties:
                             date:
                                 type: string
-                                format: date-time
+                                description: Epoch milliseconds or "MM/DD/YYYY, HH:MM:SS AM/PM".
                             gaze:
                                 type: object
                                 properties:
@@ -119,40 +612,181 @@ def save_points():
             description: status success
     """
     data = request.get_json()
-    result = measurement_service.save_points(data)
+    result = get_component(MeasurementService).save_points(data)
     return jsonify(result)
 
 
+@api_bp.route("/save-screen", methods=["POST"])
+def save_screen():
+    """
+    Saves the viewport and screen size of a subject's session.
+    ---
+    parameters:
+        - name: screen
+          in: body
+          required: true
+          schema:
+            type: object
+            properties:
+                subject_id:
+                    type: integer
+                viewport:
+                    type: object
+                    properties:
+                        width:
+                            type: integer
+                        height:
+                            type: integer
+                screen:
+                    type: object
+                    properties:
+                        width:
+                            type: integer
+                        height:
+                            type: integer
+                devicePixelRatio:
+                    type: number
+    responses:
+        200:
+            description: status success
+        400:
+            description: Invalid viewport.
+        404:
+            description: Subject not found.
+    """
+    data = request.get_json()
+
+    try:
+        result = get_component(SubjectService).save_screen(data)
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    if result:
+        return jsonify(result)
+    return "Subject not found", 404
+
+
+@api_bp.route("/save-calibration", methods=["POST"])
+def save_calibration():
+    """
+    Saves the validation run made after calibrating and returns its accuracy and precision.
+    ---
+    parameters:
+        - name: calibration
+          in: body
+          required: true
+          schema:
+            type: object
+            properties:
+                subject_id:
+                    type: integer
+                viewport:
+                    type: object
+                    properties:
+                        width:
+                            type: integer
+                        height:
+                            type: integer
+                samples:
+                    type: array
+                    items:
+                        type: object
+                        properties:
+                            target:
+                                type: integer
+                            target_x:
+                                type: number
+                            target_y:
+                                type: number
+                            x:
+                                type: number
+                            y:
+                                type: number
+    responses:
+        200:
+            description: JSON with the accuracy and precision (pixels and fraction of the viewport diagonal), per-target results and whether the calibration is poor.
+        400:
+            description: Invalid or empty validation run.
+        404:
+            description: Subject not found.
+    """
+    data = request.get_json()
+
+    try:
+        result = get_component(CalibrationService).save_calibration(data)
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    if result:
+        return jsonify(result)
+    return "Subject not found", 404
+
+
+@api_bp.route("/get-calibration")
+def get_calibration():
+    """
+    Returns the calibration quality of a subject.
+    ---
+    parameters:
+        - name: id
+          in: query
+          type: integer
+          required: true
+          description: Subject ID.
+    responses:
+        200:
+            description: JSON with the accuracy, precision, per-target results, whether the calibration is poor and the subject's weight in weighted aggregates (attempts is 0 if no validation was run).
+        404:
+            description: Subject not found.
+    """
+    subject_id = request.args.get("id", type=int)
+
+    result = get_component(CalibrationService).get_calibration(subject_id)
+    if result:
+        return jsonify(result)
+    return "Subject not found", 404
+
+
 @api_bp.route("/save-tasklogs", methods=["POST"])
 def save_tasklogs():
     """
     Saves task logs (taskLogs) to the database.
+    Accepts one payload or a list of payloads so clients can send logs in batches.
     ---
     parameters:
         - name: taskLogs
           in: body
           required: true
           schema:
-            type: array
-            items:
-                type: object
-                properties:
-                    start_time:
-                        type: string
-                        format: date-time
-                    end_time:
-                        type: string
-                        format: date-time
-                    response:
-                        type: string
-                    subject_id:
-                        type: integer
+            type: object
+            properties:
+                subject_id:
+                    type: integer
+                taskLogs:
+                    type: array
+                    items:
+                        type: object
+                        properties:
+                            startTime:
+                                type: string
+                                description: Epoch milliseconds or "MM/DD/YYYY, HH:MM:SS AM/PM".
+                            endTime:
+                                type: string
+                                description: Epoch milliseconds or "MM/DD/YYYY, HH:MM:SS AM/PM".
+                            response:
+                                type: string
+                            task:
+                                type: string
+                            type:
+                                type: string
+                            version:
+                                type: integer
     responses:
         200:
             description: TaskLogs saved successfully.
     """
     data = request.get_json()
-    result = tasklog_service.save_tasklogs(data)
+    result = get_component(TaskLogService).save_tasklogs(data)
     return jsonify(result)
 
 
@@ -165,8 +799,7 @@ def config():
         200:
             description: Configuration file.
     """
-    config_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "config")
-    return send_from_directory(config_dir, "config.json")
+    return send_from_directory(get_config_manager().config_dir, "config.json")
 
 
 @api_bp.route("/tasks")
@@ -178,7 +811,7 @@ def tasks():
         200:
             description: Tasks file.
     """
-    return send_from_directory("config", "tasks.json")
+    return send_from_directory(get_config_manager().config_dir, "tasks.json")
 
 
 @api_bp.route("/download-points")
@@ -192,6 +825,11 @@ def download_points():
           type: integer
           required: true
           description: Subject ID to download points.
+        - name: filtered
+          in: query
+          type: boolean
+          required: false
+          description: Export the gaze columns after the server-side gaze filter (default false).
     responses:
         200:
             description: CSV file with recorded points.
@@ -199,15 +837,11 @@ def download_points():
             description: Subject not found.
     """
     subject_id = request.args.get("id", type=int)
+    filtered = request.args.get("filtered", "false").lower() in ("1", "true")
 
-    csv_data = export_service.export_points_csv(subject_id)
-    if csv_data:
-        return send_file(
-            csv_data,
-            as_attachment=True,
-            download_name=f"points_subject_{subject_id}.csv",
-            mimetype="text/csv",
-        )
+    csv_chunks = get_component(ExportService).export_points_csv(subject_id, filtered=filtered)
+    if csv_chunks:
+        return _csv_download(csv_chunks, f"points_subject_{subject_id}.csv")
 
     return "Subject not found", 404
 
@@ -231,7 +865,7 @@ def download_tasklogs():
     """
     subject_id = request.args.get("id", type=int)
 
-    csv_data = export_service.export_tasklogs_csv(subject_id)
+    csv_data = get_component(ExportService).export_tasklogs_csv(subject_id)
     if csv_data:
         return send_file(
             csv_data,
@@ -254,13 +888,8 @@ def download_all():
         404:
             description: No registered subjects.
     """
-    csv_data = export_service.export_all_points_csv()
-    if csv_data:
-        return send_file(
-            csv_data,
-            as_attachment=True,
-            download_name="points_all.csv",
-            mimetype="text/csv",
-        )
+    csv_chunks = get_component(ExportService).export_all_points_csv()
+    if csv_chunks:
+        return _csv_download(csv_chunks, "points_all.csv")
     else:
         return "No registered subjects", 404
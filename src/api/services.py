@@ -4,16 +4,113 @@ Contains business logic for data processing and database operations.
 """
 
 import csv
+import glob
+import gzip
+import hashlib
 import io
-from datetime import datetime
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime, timedelta
 import numpy as np
-from db import db, Subject, Point, Measurement, TaskLog
+from flask import current_app
+from db import db, Subject, Measurement, TaskLog
 from repositories import (
     SubjectRepository,
     MeasurementRepository,
-    PointRepository,
-    TaskLogRepository
+    TaskLogRepository,
+    SubjectSummaryRepository,
+    StudyRepository,
+    AoiRepository,
+    CalibrationRepository,
+    MaintenanceRepository,
 )
+from monitoring import record_samples, record_tasklogs
+from analysis import align_samples_to_tasks, group_by_task, gaze_heatmap
+from analysis.aoi import (
+    MAX_SAMPLE_GAP_MS,
+    hit_test,
+    empty_state,
+    update_state,
+    update_first_fixations,
+    metrics_from_state,
+)
+from analysis.calibration import calibration_quality, quality_weight
+from analysis.fixations import (
+    DEFAULT_FIXATION_VELOCITY,
+    DEFAULT_MAX_FIXATION_GAP_MS,
+    DEFAULT_MIN_FIXATION_MS,
+    detect_fixations,
+    fixation_statistics,
+)
+from analysis.scanpath import (
+    SCANPATH_METHODS,
+    aoi_sequence,
+    resample_points,
+    similarity_matrix,
+)
+from state import get_config_manager
+from .importers import CHUNK_ROWS, REPORTED_INVALID_ROWS, read_chunks
+from .timestamps import parse_timestamps
+
+# Rows per chunk of a streamed CSV export
+CSV_CHUNK_ROWS = 5000
+# Subjects without new data for this many minutes count as completed sessions
+ARCHIVE_IDLE_MINUTES = 60
+# Studies without new data for this many days can be archived to a file
+STUDY_RETENTION_DAYS = 180
+# Name of backup files, followed by the date and ".db" or ".db.gz"
+BACKUP_PREFIX = "usergazetrack_"
+# How study aggregates treat subjects by calibration quality: keep everyone,
+# leave out the poorly calibrated ones or weight subjects by their accuracy
+CALIBRATION_MODES = ("all", "exclude", "weight")
+
+
+def _epoch_ms(date):
+    """Convert a stored (naive) datetime to int64 milliseconds, -1 if missing."""
+    if date is None:
+        return -1
+    return int(np.datetime64(date, "ms").astype(np.int64))
+
+
+def _format_ms(timestamps):
+    """Format int64 millisecond timestamps as "YYYY-MM-DD HH:MM:SS.mmm" strings."""
+    strings = np.datetime_as_string(np.asarray(timestamps).astype("datetime64[ms]"))
+    return [string.replace("T", " ") for string in strings.tolist()]
+
+
+def _filter_gaze(samples, viewport):
+    """Replace the gaze arrays of a session's samples with the filtered ones."""
+    gaze_filter = current_app.config.get("GAZE_FILTER")
+    if gaze_filter is not None:
+        samples["gaze_x"], samples["gaze_y"] = gaze_filter.apply(
+            samples["timestamp"], samples["gaze_x"], samples["gaze_y"], viewport
+        )
+    return samples
+
+
+def _valid_xy(point):
+    """(x, y) of a gaze or mouse point, or None if it is missing or not finite."""
+    try:
+        x, y = float(point["x"]), float(point["y"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    return (x, y) if np.isfinite(x) and np.isfinite(y) else None
+
+
+def _csv_chunks(header, rows):
+    """Yield CSV text for a header and rows, one chunk per CSV_CHUNK_ROWS rows."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    for count, row in enumerate(rows, start=1):
+        writer.writerow(row)
+        if count % CSV_CHUNK_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
 
 
 class SubjectService:
@@ -21,16 +118,25 @@ class SubjectService:
 
     def __init__(self):
         self.repository = SubjectRepository()
+        self.summary_repository = SubjectSummaryRepository()
 
     def get_all_subjects(self):
-        """Get all subjects with their basic information."""
+        """Get all subjects with their basic information and summary statistics."""
         subjects = self.repository.get_all_subjects()
+        summaries = self.summary_repository.get_for_subjects(
+            subject.id for subject in subjects
+        )
         return [
             {
                 "id": subject.id,
                 "name": subject.name,
                 "surname": subject.surname,
                 "age": subject.age,
+                "summary": (
+                    summaries[subject.id].__json__()
+                    if subject.id in summaries
+                    else None
+                ),
             }
             for subject in subjects
         ]
@@ -39,42 +145,89 @@ class SubjectService:
         """Get a subject by its ID."""
         return self.repository.get_subject_by_id(subject_id)
 
+    def save_screen(self, data):
+        """
+        Store the viewport and screen a subject's session runs on.
+
+        Samples stored before the viewport was known get their normalized
+        coordinates now; later samples are normalized when they are stored.
+        """
+        viewport = data.get("viewport") or {}
+        screen = data.get("screen") or {}
+        width, height = int(viewport["width"]), int(viewport["height"])
+        if width <= 0 or height <= 0:
+            raise ValueError("The viewport must have a positive width and height.")
+        ratio = data.get("devicePixelRatio")
+
+        subject = self.repository.update_screen(
+            data.get("subject_id"),
+            width,
+            height,
+            int(screen["width"]) if screen.get("width") else None,
+            int(screen["height"]) if screen.get("height") else None,
+            float(ratio) if ratio else None,
+        )
+        if subject is None:
+            return None
+
+        MeasurementRepository().normalize_points(subject.id, (width, height))
+        self.repository.commit()
+        return {"status": "success"}
+
 
 class MeasurementService:
     """Service class for managing measurements."""
 
     def __init__(self):
         self.repository = MeasurementRepository()
-        self.point_repository = PointRepository()
+        self.summary_repository = SubjectSummaryRepository()
+        self.subject_repository = SubjectRepository()
+        self.study_repository = StudyRepository()
 
     def save_points(self, data):
-        """Save measurement points to the database."""
+        """Save measurement points to the database through the bulk insert path."""
         points = data["points"]
         subject_id = data["id"]
 
-        for point in points:
-            date = datetime.strptime(point["date"], "%m/%d/%Y, %I:%M:%S %p")
+        if not points:
+            return {"status": "success"}
 
-            gaze_point = self.point_repository.create_point(
-                x=point["gaze"]["x"],
-                y=point["gaze"]["y"],
-            )
-
-            mouse_point = self.point_repository.create_point(
-                x=point["mouse"]["x"],
-                y=point["mouse"]["y"],
-            )
+        dates = parse_timestamps([point["date"] for point in points])
+        # Failed predictions (null or NaN) are stored without a gaze point
+        gaze = [_valid_xy(point.get("gaze")) for point in points]
+        mouse = [_valid_xy(point.get("mouse")) for point in points]
 
-            self.repository.create_measurement(
-                date=date,
-                subject_id=subject_id,
-                gaze_point=gaze_point,
-                mouse_point=mouse_point,
-            )
+        self.store_samples(subject_id, dates, gaze, mouse)
 
         self.repository.commit()
+        record_samples(len(dates))
         return {"status": "success"}
 
+    def store_samples(self, subject_id, dates, gaze, mouse):
+        """
+        Insert samples with the bulk insert path and fold them into the
+        subject's summary. The caller commits.
+        """
+        viewport = self.subject_repository.get_viewport(subject_id)
+        self.repository.bulk_create_measurements(subject_id, dates, gaze, mouse, viewport)
+
+        gaze_xy = np.asarray([xy for xy in gaze if xy is not None], dtype=float).reshape(-1, 2)
+        bbox = {}
+        if len(gaze_xy):
+            bbox = {
+                "min_gaze_x": float(gaze_xy[:, 0].min()),
+                "max_gaze_x": float(gaze_xy[:, 0].max()),
+                "min_gaze_y": float(gaze_xy[:, 1].min()),
+                "max_gaze_y": float(gaze_xy[:, 1].max()),
+            }
+        self.summary_repository.record_samples(
+            subject_id=subject_id,
+            count=len(dates),
+            first_at=min(dates),
+            last_at=max(dates),
+            **bbox,
+        )
+
     def get_user_points(self, subject_id):
         """Get measurement points for a specific subject."""
         subject_service = SubjectService()
@@ -83,25 +236,68 @@ class MeasurementService:
         if not subject:
             return None
 
-        measurements = self.repository.get_measurements_by_subject(subject.id)
-
-        points = []
-        for measurement in measurements:
-            point = {
-                "date": measurement.date.strftime("%Y-%m-%d %H:%M:%S"),
-                "x_mouse": (
-                    measurement.mouse_point.x if measurement.mouse_point else None
-                ),
-                "y_mouse": (
-                    measurement.mouse_point.y if measurement.mouse_point else None
-                ),
-                "x_gaze": measurement.gaze_point.x if measurement.gaze_point else None,
-                "y_gaze": measurement.gaze_point.y if measurement.gaze_point else None,
+        points = [
+            {
+                "date": date[:19],
+                "x_mouse": x_mouse,
+                "y_mouse": y_mouse,
+                "x_gaze": x_gaze,
+                "y_gaze": y_gaze,
             }
-            points.append(point)
+            for _, date, x_mouse, y_mouse, x_gaze, y_gaze in self.repository.iter_sample_rows(subject.id)
+        ]
+
+        return {
+            "subject_id": subject_id,
+            "viewport": subject.viewport,
+            "screen": (
+                [subject.screen_width, subject.screen_height]
+                if subject.screen_width and subject.screen_height
+                else None
+            ),
+            "device_pixel_ratio": subject.device_pixel_ratio,
+            "points": points,
+        }
 
-        return {"subject_id": subject_id, "points": points}
+    def get_filtered_samples(self, subject):
+        """Get a subject's samples as arrays with the gaze filter applied."""
+        samples = self.repository.get_sample_arrays(subject.id)
+        return _filter_gaze(samples, subject.viewport)
 
+    def get_study_heatmap(self, study_id, bins=(64, 36), calibration="all"):
+        """
+        Get a gaze heatmap of every subject of a study in normalized coordinates.
+
+        Each sample is a fraction of its own subject's viewport, so sessions
+        recorded on different screens share one histogram. Samples of subjects
+        whose viewport is unknown are left out. ``calibration`` selects how
+        subjects are treated by calibration quality (see ``CALIBRATION_MODES``);
+        with ``weight`` the counts are summed weights.
+        """
+        study = self.study_repository.get_study_by_id(study_id)
+
+        if not study:
+            return None
+
+        samples = self.repository.get_study_normalized_gaze(study.id)
+        subject_ids, inverse = np.unique(samples["subject_id"], return_inverse=True)
+        weights = CalibrationService().get_weights(subject_ids.tolist(), calibration)
+        sample_weights = np.array([weights[subject_id] for subject_id in subject_ids.tolist()])[inverse]
+        nx, ny = samples["nx"], samples["ny"]
+        normalized = np.isfinite(nx) & np.isfinite(ny) & (sample_weights > 0)
+        heatmap = gaze_heatmap(
+            nx[normalized], ny[normalized], bins=bins, extent=(0.0, 1.0, 0.0, 1.0),
+            weights=sample_weights[normalized] if calibration == "weight" else None,
+        )
+        return {
+            "study_id": study.id,
+            "calibration": calibration,
+            "samples": len(nx),
+            "normalized_samples": int(normalized.sum()),
+            "subjects": len(np.unique(samples["subject_id"][normalized])),
+            "excluded_subjects": [subject_id for subject_id, weight in weights.items() if weight == 0],
+            **heatmap,
+        }
 
 
 class TaskLogService:
@@ -109,26 +305,55 @@ class TaskLogService:
 
     def __init__(self):
         self.repository = TaskLogRepository()
+        self.summary_repository = SubjectSummaryRepository()
 
     def save_tasklogs(self, data):
-        """Save task logs to the database."""
-        task_logs = data["taskLogs"]
-        subject_id = data["subject_id"]
+        """
+        Save task logs to the database through the bulk insert path.
 
-        for log in task_logs:
-            self.repository.create_tasklog(
-                start_time=datetime.strptime(log["startTime"], "%m/%d/%Y, %I:%M:%S %p"),
-                end_time=(
-                    datetime.strptime(log["endTime"], "%m/%d/%Y, %I:%M:%S %p")
-                    if log["endTime"]
-                    else None
-                ),
-                response=log["response"],
-                subject_id=subject_id,
+        Accepts a single ``{"subject_id", "taskLogs"}`` payload or a list of
+        them, so clients can coalesce logs into one request.
+        """
+        payloads = data if isinstance(data, list) else [data]
+
+        rows = []
+        counts = {}
+        for payload in payloads:
+            subject_id = payload["subject_id"]
+            task_logs = payload["taskLogs"]
+
+            start_times = parse_timestamps(
+                [log.get("startTime", log.get("start_time")) for log in task_logs]
+            )
+            end_times = parse_timestamps(
+                [log.get("endTime", log.get("end_time")) for log in task_logs]
             )
 
+            for log, start_time, end_time in zip(task_logs, start_times, end_times):
+                rows.append(
+                    {
+                        "start_time": start_time,
+                        "end_time": end_time,
+                        "response": log.get("response"),
+                        "subject_id": subject_id,
+                        "task_description": log.get("task"),
+                        "task_type": log.get("type"),
+                        "task_version": log.get("version"),
+                    }
+                )
+            counts[subject_id] = counts.get(subject_id, 0) + len(task_logs)
+
+        self.repository.bulk_create_tasklogs(rows)
+        for subject_id, count in counts.items():
+            self.summary_repository.record_tasklogs(subject_id, count)
+
         self.repository.commit()
-        return {"status": "success", "message": "TaskLogs saved successfully."}
+        record_tasklogs(len(rows))
+        return {
+            "status": "success",
+            "message": "TaskLogs saved successfully.",
+            "saved": len(rows),
+        }
 
     def get_user_tasklogs(self, subject_id):
         """Get task logs for a specific subject."""
@@ -153,40 +378,1020 @@ class TaskLogService:
 
 
 
-class ExportService:
-    """Service class for data export functionality."""
+class SummaryService:
+    """Service class for per-subject summary statistics."""
+
+    def __init__(self):
+        self.repository = SubjectSummaryRepository()
+        self.subject_repository = SubjectRepository()
+
+    def get_summary(self, subject_id):
+        """Get the summary statistics of a subject."""
+        subject = self.subject_repository.get_subject_by_id(subject_id)
+
+        if not subject:
+            return None
+
+        summary = self.repository.get_by_subject(subject.id)
+        if summary is None:
+            return {"subject_id": subject.id, "sample_count": 0, "task_count": 0}
+        return summary.__json__()
+
+    def rebuild(self, subject_id=None):
+        """Recompute summaries from the stored samples and task logs."""
+        subject_ids = [subject_id] if subject_id is not None else None
+        rebuilt = self.repository.rebuild(subject_ids)
+        self.repository.commit()
+        return {"status": "success", "rebuilt": rebuilt}
+
+    def ensure_built(self):
+        """Build summaries for databases created before the summary table existed."""
+        if self.repository.count_summaries() == 0 and Measurement.query.first():
+            return self.rebuild()
+        return None
+
+
+class CalibrationService:
+    """Service class for the calibration quality of subjects."""
+
+    def __init__(self):
+        self.repository = CalibrationRepository()
+        self.subject_repository = SubjectRepository()
+
+    @staticmethod
+    def _describe(subject_id, quality):
+        """
+        Calibration quality as JSON, with its status, whether it is poor and
+        the subject's weight.
+
+        ``status`` is ``missing`` without a validation run (full weight, as
+        nothing says the calibration is bad), ``failed`` for a run without
+        any gaze prediction (weight 0), and otherwise ``good`` or ``poor``
+        from the accuracy: relative to the viewport diagonal when the
+        viewport is known, in pixels when it is not.
+        """
+        thresholds = {
+            "max_error": current_app.config["CALIBRATION_MAX_ERROR"],
+            "max_error_px": current_app.config["CALIBRATION_MAX_ERROR_PX"],
+        }
+        if quality is None:
+            return {
+                "subject_id": subject_id, "attempts": 0, "status": "missing", "poor": None, "weight": 1.0,
+                **thresholds,
+            }
+
+        if not quality.sample_count or quality.accuracy_px is None:
+            status, weight = "failed", 0.0
+        else:
+            if quality.accuracy is not None:
+                error, max_error = quality.accuracy, thresholds["max_error"]
+            else:
+                error, max_error = quality.accuracy_px, thresholds["max_error_px"]
+            status = "poor" if error > max_error else "good"
+            weight = quality_weight(error, max_error)
+        return {**quality.__json__(), "status": status, "poor": status != "good", "weight": weight, **thresholds}
+
+    def save_calibration(self, data):
+        """
+        Score the validation run sent by the tracking page and store it.
+
+        Each sample holds the target shown (index and position) and the
+        gaze predicted meanwhile; a new run replaces the previous one.
+        """
+        subject = self.subject_repository.get_subject_by_id(data.get("subject_id"))
+
+        if not subject:
+            return None
+
+        samples = data.get("samples") or []
+        if not samples:
+            raise ValueError("The validation run has no samples.")
+        values = np.array(
+            [
+                [sample["target"], sample["target_x"], sample["target_y"], sample.get("x"), sample.get("y")]
+                for sample in samples
+            ],
+            dtype=float,
+        )
+
+        viewport = data.get("viewport") or {}
+        if viewport.get("width") and viewport.get("height"):
+            viewport = (int(viewport["width"]), int(viewport["height"]))
+        else:
+            viewport = subject.viewport
+
+        quality = calibration_quality(
+            values[:, 0].astype(np.int64), values[:, 1], values[:, 2], values[:, 3], values[:, 4], viewport
+        )
+        row = self.repository.save_quality(subject.id, quality)
+        self.repository.commit()
+        return self._describe(subject.id, row)
+
+    def get_calibration(self, subject_id):
+        """Get the calibration quality of a subject."""
+        subject = self.subject_repository.get_subject_by_id(subject_id)
+
+        if not subject:
+            return None
+
+        return self._describe(subject.id, self.repository.get_by_subject(subject.id))
+
+    def get_weights(self, subject_ids, mode="all"):
+        """
+        Get the weight of each subject in study aggregates.
+
+        ``all`` gives everyone 1, ``exclude`` gives poorly calibrated
+        subjects 0 and ``weight`` uses ``quality_weight``. Subjects without
+        a validation run always get 1; a run without any gaze prediction
+        counts as poor and gets 0 (see ``_describe``).
+        """
+        if mode not in CALIBRATION_MODES:
+            raise ValueError(f"Unknown calibration mode '{mode}' (expected {', '.join(CALIBRATION_MODES)}).")
+        subject_ids = list(subject_ids)
+        if mode == "all":
+            return {subject_id: 1.0 for subject_id in subject_ids}
+
+        qualities = self.repository.get_for_subjects(subject_ids)
+        weights = {}
+        for subject_id in subject_ids:
+            description = self._describe(subject_id, qualities.get(subject_id))
+            if mode == "exclude":
+                weights[subject_id] = 0.0 if description["poor"] else 1.0
+            else:
+                weights[subject_id] = description["weight"]
+        return weights
+
+
+class ArchiveService:
+    """Service class for packing completed sessions into compressed sample blocks."""
+
+    def __init__(self):
+        self.repository = MeasurementRepository()
+        self.subject_repository = SubjectRepository()
+        self.summary_repository = SubjectSummaryRepository()
+
+    def archive(self, subject_id=None, idle_minutes=ARCHIVE_IDLE_MINUTES):
+        """
+        Archive the samples of one subject, or of every subject whose session
+        has had no new data for ``idle_minutes`` (None if the subject does not exist).
+        """
+        if subject_id is not None:
+            subject = self.subject_repository.get_subject_by_id(subject_id)
+            if not subject:
+                return None
+            subject_ids = [subject.id]
+        else:
+            cutoff = datetime.now() - timedelta(minutes=idle_minutes)
+            subject_ids = self.summary_repository.get_idle_subject_ids(cutoff)
+
+        archived = {}
+        for archived_id in subject_ids:
+            # One transaction per subject keeps the write lock short
+            count = self.repository.archive_subject(archived_id)
+            self.repository.commit()
+            if count:
+                archived[archived_id] = count
+
+        return {
+            "status": "success",
+            "archived_subjects": len(archived),
+            "archived_samples": sum(archived.values()),
+        }
+
+
+class MaintenanceService:
+    """Service class for retention, cleanup and compaction jobs (see ``src/manage.py``)."""
+
+    def __init__(self):
+        self.repository = MaintenanceRepository()
+        self.study_repository = StudyRepository()
+        self.subject_repository = SubjectRepository()
+        self.archive_service = ArchiveService()
+
+    def delete_study(self, study_id):
+        """Delete a study and everything recorded for it (None if it does not exist)."""
+        if not self.study_repository.get_study_by_id(study_id):
+            return None
+        return self.repository.delete_study(study_id)
+
+    def delete_subject(self, subject_id):
+        """Delete a subject and everything recorded for it (None if it does not exist)."""
+        if not self.subject_repository.get_subject_by_id(subject_id):
+            return None
+        return self.repository.delete_subjects([subject_id])
+
+    def cleanup(self):
+        """Delete orphaned measurements and points."""
+        return self.repository.delete_orphans()
+
+    def compact(self, full=False):
+        """Release unused database pages (see ``MaintenanceRepository.compact``)."""
+        return self.repository.compact(full=full)
+
+    def analyze(self):
+        """Refresh the query planner statistics."""
+        self.repository.analyze()
+
+    def get_active_study(self):
+        """The study of the current prototype configuration, if it exists."""
+        config_manager = get_config_manager()
+        return self.study_repository.get_study_by_config(
+            config_manager.get_str('url_path'), config_manager.get_str('img_path')
+        )
+
+    def get_archivable_studies(self, older_than_days=STUDY_RETENTION_DAYS):
+        """Studies without new data for ``older_than_days``, except the active one."""
+        active = self.get_active_study()
+        cutoff = datetime.now() - timedelta(days=older_than_days)
+        return [
+            study for study in self.study_repository.get_inactive_studies(cutoff)
+            if active is None or study.id != active.id
+        ]
+
+    def archive_study(self, study_id, directory, delete=True):
+        """
+        Copy a study to its own SQLite file in ``directory`` and, once the
+        copy's row counts match, delete it from the database (None if the
+        study does not exist).
+        """
+        if not self.study_repository.get_study_by_id(study_id):
+            return None
+
+        # Pack the samples first: the file gets compact blocks instead of rows
+        for subject_id in self.subject_repository.get_subject_ids_by_study(study_id):
+            self.archive_service.archive(subject_id)
+
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"study_{study_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db")
+        counts = self.repository.copy_study(study_id, path)
+
+        copied = self.repository.count_file_rows(path, study_id).get(study_id)
+        if copied != counts:
+            raise RuntimeError(f"Archive '{path}' does not match study {study_id}: {copied} != {counts}")
+
+        deleted = None
+        if delete:
+            current = self.repository.count_rows_by_study(study_id=study_id).get(study_id)
+            if current != counts:
+                raise RuntimeError(
+                    f"Study {study_id} received data while it was archived; it was kept. Archive again."
+                )
+            deleted = self.repository.delete_study(study_id)
+
+        return {"study_id": study_id, "path": path, "rows": counts, "deleted": deleted}
+
+    def run(self, idle_minutes=ARCHIVE_IDLE_MINUTES, full_vacuum=False):
+        """
+        Periodic maintenance: archive idle sessions, delete orphans, release
+        free pages and refresh the planner statistics.
+        """
+        result = {
+            "archive": self.archive_service.archive(idle_minutes=idle_minutes),
+            "orphans": self.cleanup(),
+            "compact": self.compact(full=full_vacuum),
+        }
+        self.analyze()
+        return result
+
+
+class BackupService:
+    """Service class for online backups of the database."""
+
+    def __init__(self):
+        self.repository = MaintenanceRepository()
+
+    def backup(self, directory=None, compress=None, keep=None):
+        """
+        Back up the database while it is in use, verify the copy, optionally
+        gzip it and delete the oldest backups beyond ``keep``. Defaults come
+        from the ``BACKUP_DIR``, ``BACKUP_COMPRESS`` and ``BACKUP_KEEP`` settings.
+        File names have microsecond resolution; FileExistsError is raised
+        if one is taken anyway.
+        """
+        directory = directory or current_app.config["BACKUP_DIR"]
+        compress = current_app.config["BACKUP_COMPRESS"] if compress is None else compress
+        keep = current_app.config["BACKUP_KEEP"] if keep is None else keep
+
+        os.makedirs(directory, exist_ok=True)
+        name = f"{BACKUP_PREFIX}{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
+        path = os.path.join(directory, name + ".db")
+        for taken in (path, path + ".gz", os.path.join(directory, name + ".json")):
+            if os.path.exists(taken):
+                raise FileExistsError(f"Backup '{os.path.basename(taken)}' already exists.")
+        counts = self.repository.backup(path)
+
+        problems = self._check(path, counts)
+        if problems:
+            os.remove(path)
+            raise RuntimeError(f"Backup failed verification: {'; '.join(problems)}")
+
+        if compress:
+            with open(path, "rb") as source, gzip.open(path + ".gz", "wb", compresslevel=6) as target:
+                shutil.copyfileobj(source, target)
+            os.remove(path)
+            path += ".gz"
+
+        manifest = {
+            "file": os.path.basename(path),
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "size_bytes": os.path.getsize(path),
+            "studies": {str(study_id): study_counts for study_id, study_counts in counts.items()},
+        }
+        with open(os.path.join(directory, name + ".json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+
+        return {**manifest, "path": path, "removed": self.rotate(directory, keep)}
+
+    def rotate(self, directory, keep):
+        """Delete all but the newest ``keep`` backups of a directory; returns the deleted files."""
+        manifests = sorted(glob.glob(os.path.join(directory, f"{BACKUP_PREFIX}*.json")))
+        removed = []
+        for manifest in manifests[:-keep] if keep > 0 else []:
+            with open(manifest, encoding="utf-8") as f:
+                backup_file = os.path.join(directory, json.load(f)["file"])
+            for path in (backup_file, manifest):
+                if os.path.exists(path):
+                    os.remove(path)
+                    removed.append(os.path.basename(path))
+        return removed
+
+    def verify(self, path):
+        """
+        Restore a backup into a temporary file and compare its row counts per
+        study with the ones recorded in its manifest.
+        """
+        name = os.path.basename(path).split(".")[0]
+        with open(os.path.join(os.path.dirname(path), name + ".json"), encoding="utf-8") as f:
+            expected = {int(study_id): counts for study_id, counts in json.load(f)["studies"].items()}
+
+        if not path.endswith(".gz"):
+            problems = self._check(path, expected)
+        else:
+            with tempfile.TemporaryDirectory() as scratch:
+                restored = os.path.join(scratch, name + ".db")
+                with gzip.open(path, "rb") as source, open(restored, "wb") as target:
+                    shutil.copyfileobj(source, target)
+                problems = self._check(restored, expected)
+        return {"path": path, "studies": len(expected), "ok": not problems, "problems": problems}
+
+    def _check(self, path, expected):
+        """Integrity and per-study row count problems of a backup file."""
+        integrity = self.repository.check_file_integrity(path)
+        if integrity != "ok":
+            return [f"integrity check: {integrity}"]
+        actual = self.repository.count_file_rows(path)
+        return [
+            f"study {study_id}: expected {expected.get(study_id)}, found {actual.get(study_id)}"
+            for study_id in sorted(set(expected) | set(actual))
+            if expected.get(study_id) != actual.get(study_id)
+        ]
+
+
+class ImportService:
+    """Service class for importing recorded sessions from CSV and Parquet files."""
+
+    def __init__(self):
+        self.measurement_service = MeasurementService()
+        self.subject_repository = SubjectRepository()
+        self.study_repository = StudyRepository()
+
+    def import_points(self, path, study_id, subject_id=None, mapping=None, viewport=None,
+                      chunk_rows=CHUNK_ROWS, file_format=None, progress=None):
+        """
+        Stream a file of samples into a study, one transaction per chunk.
+
+        Rows go to ``subject_id`` when given. Otherwise each distinct value
+        of the file's subject column becomes a new subject of the study
+        (named after the value), or the whole file does when it has none.
+        New subjects get ``viewport`` (width, height) so their samples are
+        normalized. ``progress`` is called with the rows read so far after
+        every chunk. Rows without a date are skipped, and so are rows with a
+        date or coordinate that cannot be read; the lines of the first of
+        those are reported in ``invalid_lines``.
+        """
+        if not self.study_repository.get_study_by_id(study_id):
+            raise ValueError(f"Study {study_id} not found.")
+        if subject_id is not None and not self.subject_repository.get_subject_by_id(subject_id):
+            raise ValueError(f"Subject {subject_id} not found.")
+
+        source = os.path.splitext(os.path.basename(path))[0]
+        subjects = {}
+
+        def subject_for(key):
+            if subject_id is not None:
+                return subject_id
+            if key not in subjects:
+                subject = self.subject_repository.create_subject(
+                    name=(key or source)[:50], surname=source[:50], age=0, study_id=study_id
+                )
+                if viewport:
+                    subject.viewport_width, subject.viewport_height = viewport
+                self.subject_repository.commit()
+                subjects[key] = subject.id
+            return subjects[key]
+
+        rows = stored = invalid = 0
+        invalid_lines = []
+        for chunk in read_chunks(path, mapping, chunk_rows, file_format):
+            skipped = set(chunk["invalid"])
+            invalid += len(skipped)
+            invalid_lines.extend(
+                chunk["line"][i] for i in chunk["invalid"][:REPORTED_INVALID_ROWS - len(invalid_lines)]
+            )
+
+            keys = chunk["subject"] or [None] * len(chunk["date"])
+            groups = {}
+            for index, (key, date) in enumerate(zip(keys, chunk["date"])):
+                if date is not None and index not in skipped:
+                    groups.setdefault(key, []).append(index)
+
+            for key, indexes in groups.items():
+                self.measurement_service.store_samples(
+                    subject_for(key),
+                    [chunk["date"][i] for i in indexes],
+                    [chunk["gaze"][i] for i in indexes],
+                    [chunk["mouse"][i] for i in indexes],
+                )
+                stored += len(indexes)
+            self.subject_repository.commit()
+
+            rows += len(chunk["date"])
+            if progress:
+                progress(rows)
+
+        return {
+            "status": "success",
+            "rows": rows,
+            "imported": stored,
+            "skipped": rows - stored,
+            "invalid": invalid,
+            "invalid_lines": invalid_lines,
+            "subjects": {key or source: imported for key, imported in subjects.items()},
+        }
+
+
+class AlignmentService:
+    """Service class for aligning gaze samples with task intervals."""
 
     def __init__(self):
         self.subject_repository = SubjectRepository()
         self.measurement_repository = MeasurementRepository()
         self.tasklog_repository = TaskLogRepository()
 
-    def export_points_csv(self, subject_id):
-        """Export measurement points for a subject as CSV."""
+    def align(self, subject_id):
+        """Load a subject's samples and task logs and tag each sample with its task."""
         subject = self.subject_repository.get_subject_by_id(subject_id)
 
         if not subject:
             return None
 
-        measurements = self.measurement_repository.get_measurements_by_subject(subject.id)
+        samples = self.measurement_repository.get_sample_arrays(subject.id)
+        samples = _filter_gaze(samples, subject.viewport)
+        task_logs = self.tasklog_repository.get_tasklogs_by_subject(subject.id)
 
-        si = io.StringIO()
-        csv_writer = csv.writer(si)
+        starts = np.array([_epoch_ms(log.start_time) for log in task_logs], dtype=np.int64)
+        ends = np.array([_epoch_ms(log.end_time) for log in task_logs], dtype=np.int64)
+        task_index = align_samples_to_tasks(samples["timestamp"], starts, ends)
 
-        csv_writer.writerow(["date", "x_mouse", "y_mouse", "x_gaze", "y_gaze"])
+        return samples, task_logs, task_index
 
-        for measurement in measurements:
-            row = [
-                measurement.date.strftime("%Y-%m-%d %H:%M:%S"),
-                measurement.mouse_point.x if measurement.mouse_point else None,
-                measurement.mouse_point.y if measurement.mouse_point else None,
-                measurement.gaze_point.x if measurement.gaze_point else None,
-                measurement.gaze_point.y if measurement.gaze_point else None,
+    def get_task_alignment(self, subject_id):
+        """Get every task of a subject with the number and span of its samples."""
+        aligned = self.align(subject_id)
+
+        if aligned is None:
+            return None
+
+        samples, task_logs, task_index = aligned
+        groups = group_by_task(task_index, len(task_logs))
+        timestamps = samples["timestamp"]
+
+        tasks = []
+        for i, (log, positions) in enumerate(zip(task_logs, groups)):
+            first, last = (
+                _format_ms(timestamps[positions[[0, -1]]]) if len(positions) else (None, None)
+            )
+            tasks.append(
+                {
+                    "task": i,
+                    "description": log.task_description,
+                    "type": log.task_type,
+                    "version": log.task_version,
+                    "response": log.response,
+                    "start_time": log.start_time.strftime("%Y-%m-%d %H:%M:%S"),
+                    "end_time": (
+                        log.end_time.strftime("%Y-%m-%d %H:%M:%S") if log.end_time else None
+                    ),
+                    "sample_count": int(len(positions)),
+                    "first_sample": first,
+                    "last_sample": last,
+                }
+            )
+
+        return {
+            "subject_id": subject_id,
+            "sample_count": int(len(task_index)),
+            "unassigned_count": int(np.count_nonzero(task_index < 0)),
+            "tasks": tasks,
+        }
+
+    def get_task_samples(self, subject_id, task):
+        """Get the samples recorded while a subject performed a task."""
+        aligned = self.align(subject_id)
+
+        if aligned is None:
+            return None
+
+        samples, task_logs, task_index = aligned
+        if task is None or not 0 <= task < len(task_logs):
+            return None
+
+        positions = np.flatnonzero(task_index == task)
+        dates = _format_ms(samples["timestamp"][positions])
+        columns = [
+            np.where(np.isnan(values), None, values).tolist()
+            for values in (
+                samples["mouse_x"][positions],
+                samples["mouse_y"][positions],
+                samples["gaze_x"][positions],
+                samples["gaze_y"][positions],
+            )
+        ]
+
+        points = [
+            {"date": date, "x_mouse": x_mouse, "y_mouse": y_mouse, "x_gaze": x_gaze, "y_gaze": y_gaze}
+            for date, x_mouse, y_mouse, x_gaze, y_gaze in zip(dates, *columns)
+        ]
+        return {"subject_id": subject_id, "task": task, "points": points}
+
+    def get_task_heatmap(self, subject_id, task, bins=(64, 36)):
+        """
+        Get a gaze heatmap of the samples recorded during a task.
+
+        All tasks of a subject share the same extent (the range of all of the
+        subject's gaze samples), so their heatmaps can be compared directly.
+        """
+        aligned = self.align(subject_id)
+
+        if aligned is None:
+            return None
+
+        samples, task_logs, task_index = aligned
+        if task is None or not 0 <= task < len(task_logs):
+            return None
+
+        gaze_x, gaze_y = samples["gaze_x"], samples["gaze_y"]
+        finite = np.isfinite(gaze_x) & np.isfinite(gaze_y)
+        extent = None
+        if finite.any():
+            extent = (
+                float(gaze_x[finite].min()),
+                float(gaze_x[finite].max()),
+                float(gaze_y[finite].min()),
+                float(gaze_y[finite].max()),
+            )
+
+        in_task = task_index == task
+        heatmap = gaze_heatmap(gaze_x[in_task], gaze_y[in_task], bins=bins, extent=extent)
+        return {"subject_id": subject_id, "task": task, **heatmap}
+
+
+class AoiService:
+    """Service class for Areas of Interest and their dwell metrics."""
+
+    def __init__(self):
+        self.repository = AoiRepository()
+        self.study_repository = StudyRepository()
+        self.subject_repository = SubjectRepository()
+        self.measurement_repository = MeasurementRepository()
+
+    @staticmethod
+    def _parse_aoi(aoi):
+        """Validate an AOI from a request and normalize its coordinates."""
+        name = (aoi.get("name") or "").strip()
+        if not name:
+            raise ValueError("Every AOI needs a name.")
+
+        shape = aoi.get("shape", "rect")
+        if shape == "rect":
+            coordinates = [float(aoi[key]) for key in ("x", "y", "width", "height")]
+            if coordinates[2] <= 0 or coordinates[3] <= 0:
+                raise ValueError(f"AOI '{name}' must have a positive width and height.")
+        elif shape == "polygon":
+            coordinates = [[float(x), float(y)] for x, y in aoi["points"]]
+            if len(coordinates) < 3:
+                raise ValueError(f"AOI '{name}' needs at least 3 points.")
+        else:
+            raise ValueError(f"AOI '{name}' has an unknown shape '{shape}'.")
+
+        return {"name": name, "shape": shape, "coordinates": coordinates}
+
+    @staticmethod
+    def _signature(definitions, gaze_filter=None):
+        """Hash of the AOI definitions, gaze filter and engine parameters a metrics state depends on."""
+        parameters = [
+            MAX_SAMPLE_GAP_MS, DEFAULT_FIXATION_VELOCITY, DEFAULT_MIN_FIXATION_MS, DEFAULT_MAX_FIXATION_GAP_MS,
+            gaze_filter.__json__() if gaze_filter is not None else None,
+        ]
+        payload = json.dumps([definitions, parameters], sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get_aois(self, study_id):
+        """Get the AOIs defined for a study."""
+        study = self.study_repository.get_study_by_id(study_id)
+
+        if not study:
+            return None
+
+        aois = self.repository.get_aois_by_study(study.id)
+        return {"study_id": study.id, "aois": [aoi.__json__() for aoi in aois]}
+
+    def save_aois(self, data):
+        """Replace the AOIs of a study. Cached metrics are recomputed on next read."""
+        study = self.study_repository.get_study_by_id(data.get("study_id"))
+
+        if not study:
+            return None
+
+        aois = [self._parse_aoi(aoi) for aoi in data.get("aois", [])]
+        self.repository.replace_aois(study.id, aois)
+        self.repository.commit()
+        return self.get_aois(study.id)
+
+    def get_subject_metrics(self, subject_id):
+        """
+        Get the AOI metrics of a subject.
+
+        Only samples stored since the last computation are read and folded
+        into the cached state; the state is rebuilt from scratch when the
+        study's AOIs or the gaze filter change. With the gaze filter enabled
+        the gaze is filtered as everywhere else, and since the filter depends
+        on neighbouring samples, new samples rebuild the state from the whole
+        session.
+        """
+        subject = self.subject_repository.get_subject_by_id(subject_id)
+
+        if not subject:
+            return None
+
+        aois = self.repository.get_aois_by_study(subject.study_id) if subject.study_id else []
+        definitions = [aoi.definition() for aoi in aois]
+        gaze_filter = current_app.config.get("GAZE_FILTER")
+        signature = self._signature(definitions, gaze_filter)
+
+        cache = self.repository.get_metrics_cache(subject.id)
+        if cache is not None and cache.aoi_signature == signature:
+            state = json.loads(cache.state)
+            last_measurement_id = cache.last_measurement_id
+        else:
+            state = empty_state(len(aois))
+            last_measurement_id = 0
+
+        samples = self.measurement_repository.get_sample_arrays(
+            subject.id, after_id=last_measurement_id
+        )
+        if len(samples["id"]) and last_measurement_id and gaze_filter is not None:
+            state = empty_state(len(aois))
+            samples = self.measurement_repository.get_sample_arrays(subject.id)
+        _filter_gaze(samples, subject.viewport)
+        if len(samples["id"]) or cache is None or cache.aoi_signature != signature:
+            if len(samples["id"]):
+                aoi_index = hit_test(samples["gaze_x"], samples["gaze_y"], definitions)
+                update_state(state, samples["timestamp"], aoi_index)
+                update_first_fixations(state, samples["timestamp"], samples["gaze_x"], samples["gaze_y"], definitions)
+                last_measurement_id = int(samples["id"].max())
+            self.repository.save_metrics_cache(subject.id, signature, last_measurement_id, state)
+            self.repository.commit()
+
+        return {
+            "subject_id": subject.id,
+            "study_id": subject.study_id,
+            **metrics_from_state(state, [aoi.name for aoi in aois]),
+        }
+
+    def get_study_metrics(self, study_id):
+        """Get the AOI metrics of every subject of a study."""
+        study = self.study_repository.get_study_by_id(study_id)
+
+        if not study:
+            return None
+
+        aois = self.repository.get_aois_by_study(study.id)
+        return {
+            "study_id": study.id,
+            "aois": [aoi.name for aoi in aois],
+            "subjects": [self.get_subject_metrics(subject.id) for subject in study.subjects],
+        }
+
+
+class StudyAnalysisService:
+    """Service class for the offline per-subject analysis of a study (see ``analyze_study.py``)."""
+
+    def __init__(self):
+        self.study_repository = StudyRepository()
+        self.subject_repository = SubjectRepository()
+        self.measurement_repository = MeasurementRepository()
+        self.summary_repository = SubjectSummaryRepository()
+        self.aoi_repository = AoiRepository()
+
+    def plan(self, study_id, calibration="all"):
+        """
+        Get the subjects of a study to analyze, those with the most samples first.
+
+        Starting the longest sessions first keeps every worker busy until the
+        end. The plan also holds each subject's weight for the ``calibration``
+        mode (see ``CalibrationService.get_weights``).
+        """
+        study = self.study_repository.get_study_by_id(study_id)
+
+        if not study:
+            return None
+
+        subject_ids = self.subject_repository.get_subject_ids_by_study(study.id)
+        summaries = self.summary_repository.get_for_subjects(subject_ids)
+        subject_ids.sort(
+            key=lambda subject_id: summaries[subject_id].sample_count if subject_id in summaries else 0,
+            reverse=True,
+        )
+        return {
+            "study_id": study.id,
+            "name": study.name,
+            "aois": [aoi.name for aoi in self.aoi_repository.get_aois_by_study(study.id)],
+            "subject_ids": subject_ids,
+            "calibration": calibration,
+            "weights": CalibrationService().get_weights(subject_ids, calibration),
+        }
+
+    def analyze_subject(self, subject_id, bins=(64, 36), filtered=True, scanpath=None, scanpath_task=None):
+        """
+        Compute the summary statistics, fixations, AOI metrics and heatmap of a subject.
+
+        The heatmap is in normalized coordinates (fractions of the viewport),
+        so heatmaps of different subjects can be added; it is None when the
+        viewport is unknown. With a ``scanpath`` method, the subject's
+        scanpath for ``ScanpathService`` comparisons is included as well.
+        """
+        subject = self.subject_repository.get_subject_by_id(subject_id)
+
+        if not subject:
+            return None
+
+        samples = self.measurement_repository.get_sample_arrays(subject.id)
+        if filtered:
+            _filter_gaze(samples, subject.viewport)
+        timestamps, gaze_x, gaze_y = samples["timestamp"], samples["gaze_x"], samples["gaze_y"]
+        valid = np.isfinite(gaze_x) & np.isfinite(gaze_y)
+        session_ms = float(timestamps[-1] - timestamps[0]) if len(timestamps) else 0.0
+        summary = self.summary_repository.get_by_subject(subject.id)
+
+        aois = self.aoi_repository.get_aois_by_study(subject.study_id) if subject.study_id else []
+        definitions = [aoi.definition() for aoi in aois]
+        state = update_state(empty_state(len(aois)), timestamps, hit_test(gaze_x, gaze_y, definitions))
+        update_first_fixations(state, timestamps, gaze_x, gaze_y, definitions)
+        fixations = detect_fixations(timestamps, gaze_x, gaze_y)
+
+        heatmap = None
+        if subject.viewport is not None:
+            width, height = subject.viewport
+            heatmap = gaze_heatmap(
+                gaze_x / width, gaze_y / height, bins=bins, extent=(0.0, 1.0, 0.0, 1.0)
+            )["counts"]
+
+        result = {
+            "subject_id": subject.id,
+            "name": subject.name,
+            "surname": subject.surname,
+            "age": subject.age,
+            "viewport": list(subject.viewport) if subject.viewport else None,
+            "calibration": (
+                {
+                    key: getattr(subject.calibration, key)
+                    for key in ("accuracy_px", "precision_px", "accuracy", "precision")
+                }
+                if subject.calibration else None
+            ),
+            "summary": {
+                "samples": len(timestamps),
+                "valid_gaze": int(valid.sum()),
+                "gaze_loss": float(1 - valid.mean()) if len(valid) else None,
+                "duration_s": session_ms / 1000.0,
+                "sampling_rate_hz": (len(timestamps) - 1) / (session_ms / 1000.0) if session_ms > 0 else None,
+                "tasks": summary.task_count if summary else 0,
+            },
+            "fixations": fixation_statistics(fixations, session_ms),
+            **metrics_from_state(state, [aoi.name for aoi in aois]),
+            "heatmap": heatmap,
+        }
+        if scanpath is not None:
+            scanpath_service = ScanpathService()
+            if scanpath_task is None:
+                sequence = scanpath_service.sequence_from_fixations(fixations, scanpath, definitions, subject.viewport)
+            else:
+                sequence = scanpath_service.get_sequence(subject, scanpath, definitions, scanpath_task)
+            result["scanpath"] = None if sequence is None else sequence.tolist()
+        return result
+
+    @staticmethod
+    def build_report(plan, results, bins=(64, 36)):
+        """
+        Consolidate the per-subject results of a study into one report.
+
+        Subjects whose analysis failed are listed with their error and left
+        out of the aggregates, as are subjects with a calibration weight of
+        0 (see ``plan``). Other weights scale each subject's contribution to
+        the heatmap and the means.
+        """
+        results = sorted(results, key=lambda result: result["subject_id"])
+        weights = plan.get("weights", {})
+        analyzed = [result for result in results if "error" not in result]
+        excluded = [result["subject_id"] for result in analyzed if weights.get(result["subject_id"], 1.0) == 0]
+        analyzed = [result for result in analyzed if result["subject_id"] not in excluded]
+        subject_weights = [weights.get(result["subject_id"], 1.0) for result in analyzed]
+        weighted = plan.get("calibration") == "weight"
+
+        with_heatmap = [
+            (result["heatmap"], weight) for result, weight in zip(analyzed, subject_weights)
+            if result["heatmap"] is not None
+        ]
+        heatmap = np.zeros((bins[1], bins[0]))
+        for counts, weight in with_heatmap:
+            heatmap += np.asarray(counts) * weight
+
+        def mean(values):
+            pairs = [(value, weight) for value, weight in zip(values, subject_weights) if value is not None]
+            if not pairs or not sum(weight for _, weight in pairs):
+                return None
+            return float(np.average([value for value, _ in pairs], weights=[weight for _, weight in pairs]))
+
+        aois = []
+        for i, name in enumerate(plan["aois"]):
+            per_subject = [result["aois"][i] for result in analyzed]
+            aois.append({
+                "name": name,
+                "mean_dwell_ms": mean([aoi["dwell_ms"] for aoi in per_subject]),
+                "mean_visits": mean([aoi["visits"] for aoi in per_subject]),
+                "subjects_visited": sum(1 for aoi in per_subject if aoi["visits"]),
+                "mean_time_to_first_fixation_ms": mean([aoi["time_to_first_fixation_ms"] for aoi in per_subject]),
+            })
+
+        return {
+            "study_id": plan["study_id"],
+            "name": plan["name"],
+            "generated_at": datetime.now().isoformat(timespec="seconds"),
+            "calibration": plan.get("calibration", "all"),
+            "subjects_analyzed": len(analyzed),
+            "subjects_failed": sum(1 for result in results if "error" in result),
+            "subjects_excluded": excluded,
+            "totals": {
+                "samples": int(sum(result["summary"]["samples"] for result in analyzed)),
+                "valid_gaze": int(sum(result["summary"]["valid_gaze"] for result in analyzed)),
+                "duration_s": float(sum(result["summary"]["duration_s"] for result in analyzed)),
+                "fixations": int(sum(result["fixations"]["count"] for result in analyzed)),
+            },
+            "means": {
+                "gaze_loss": mean([result["summary"]["gaze_loss"] for result in analyzed]),
+                "sampling_rate_hz": mean([result["summary"]["sampling_rate_hz"] for result in analyzed]),
+                "fixation_rate_per_second": mean([result["fixations"]["rate_per_second"] for result in analyzed]),
+                "fixation_duration_ms": mean([result["fixations"]["mean_duration_ms"] for result in analyzed]),
+                "fixation_ratio": mean([result["fixations"]["fixation_ratio"] for result in analyzed]),
+                "saccade_amplitude_px": mean([result["fixations"]["mean_saccade_amplitude_px"] for result in analyzed]),
+                "calibration_accuracy_px": mean([
+                    result["calibration"]["accuracy_px"] if result.get("calibration") else None
+                    for result in analyzed
+                ]),
+            },
+            "aois": aois,
+            "heatmap": {
+                "bins": list(bins),
+                "subjects": len(with_heatmap),
+                "counts": (heatmap.round(3) if weighted else heatmap.astype(np.int64)).tolist(),
+            },
+            "subjects": results,
+        }
+
+
+class ScanpathService:
+    """Service class for comparing the scanpaths (fixation sequences) of the subjects of a study."""
+
+    def __init__(self):
+        self.study_repository = StudyRepository()
+        self.subject_repository = SubjectRepository()
+        self.measurement_repository = MeasurementRepository()
+        self.aoi_repository = AoiRepository()
+        self.alignment_service = AlignmentService()
+
+    @staticmethod
+    def sequence_from_fixations(fixations, method, definitions, viewport):
+        """
+        Scanpath of a subject in the form a method compares.
+
+        AOI sequences for ``levenshtein``; fixation centroids as fractions of
+        the viewport for ``dtw``. None when there are no fixations or, for
+        ``dtw``, the viewport is unknown.
+        """
+        if len(fixations["x"]) == 0:
+            return None
+        if method == "levenshtein":
+            return aoi_sequence(fixations["x"], fixations["y"], definitions)
+        if viewport is None:
+            return None
+        width, height = viewport
+        return resample_points(np.column_stack((fixations["x"] / width, fixations["y"] / height)))
+
+    def get_sequence(self, subject, method, definitions, task=None):
+        """Detect a subject's fixations, optionally during one task only, and build its scanpath."""
+        if task is None:
+            samples = _filter_gaze(self.measurement_repository.get_sample_arrays(subject.id), subject.viewport)
+        else:
+            samples, task_logs, task_index = self.alignment_service.align(subject.id)
+            if not 0 <= task < len(task_logs):
+                return None
+            in_task = task_index == task
+            samples = {key: values[in_task] for key, values in samples.items()}
+
+        fixations = detect_fixations(samples["timestamp"], samples["gaze_x"], samples["gaze_y"])
+        return self.sequence_from_fixations(fixations, method, definitions, subject.viewport)
+
+    def get_definitions(self, study_id, method):
+        """AOI definitions of a study, checking the method can be used."""
+        if method not in SCANPATH_METHODS:
+            raise ValueError(f"Unknown scanpath method '{method}' (expected {', '.join(SCANPATH_METHODS)}).")
+        definitions = [aoi.definition() for aoi in self.aoi_repository.get_aois_by_study(study_id)]
+        if method == "levenshtein" and not definitions:
+            raise ValueError("The study has no AOIs; define them or use the 'dtw' method.")
+        return definitions
+
+    def get_similarity(self, study_id, method="levenshtein", task=None):
+        """
+        Get the pairwise scanpath similarity of the subjects of a study.
+
+        Raises:
+            ValueError: If the method is unknown, or is ``levenshtein`` and the
+                study has no AOIs
+        """
+        study = self.study_repository.get_study_by_id(study_id)
+
+        if not study:
+            return None
+
+        definitions = self.get_definitions(study.id, method)
+        subjects = sorted(study.subjects, key=lambda subject: subject.id)
+        sequences = [self.get_sequence(subject, method, definitions, task) for subject in subjects]
+        return self.format_similarity(
+            study.id, method, task, [subject.id for subject in subjects], sequences,
+            similarity_matrix(sequences, method),
+        )
+
+    @staticmethod
+    def format_similarity(study_id, method, task, subject_ids, sequences, matrix):
+        """JSON-ready similarity matrix, with None for pairs that could not be compared."""
+        matrix = np.round(matrix, 4)
+        return {
+            "study_id": study_id,
+            "method": method,
+            "task": task,
+            "subject_ids": subject_ids,
+            "lengths": [None if sequence is None else len(sequence) for sequence in sequences],
+            "matrix": np.where(np.isnan(matrix), None, matrix).tolist(),
+        }
+
+
+class ExportService:
+    """Service class for data export functionality."""
+
+    def __init__(self):
+        self.subject_repository = SubjectRepository()
+        self.measurement_repository = MeasurementRepository()
+        self.tasklog_repository = TaskLogRepository()
+
+    def export_points_csv(self, subject_id, filtered=False):
+        """
+        Export measurement points for a subject as CSV text chunks (None if not found).
+
+        With ``filtered`` the gaze columns hold the output of the gaze filter
+        (empty where a sample was rejected) instead of the stored values.
+        """
+        subject = self.subject_repository.get_subject_by_id(subject_id)
+
+        if not subject:
+            return None
+
+        if filtered:
+            samples = _filter_gaze(self.measurement_repository.get_sample_arrays(subject.id), subject.viewport)
+            columns = [
+                np.where(np.isnan(values), None, values).tolist()
+                for values in (samples["mouse_x"], samples["mouse_y"], samples["gaze_x"], samples["gaze_y"])
             ]
-            csv_writer.writerow(row)
+            dates = [date[:19] for date in _format_ms(samples["timestamp"])]
+            rows = zip(dates, *columns)
+            return _csv_chunks(["date", "x_mouse", "y_mouse", "x_gaze", "y_gaze"], rows)
 
-        si.seek(0)
-        return io.BytesIO(si.getvalue().encode("utf-8"))
+        rows = (
+            (date[:19], x_mouse, y_mouse, x_gaze, y_gaze)
+            for _, date, x_mouse, y_mouse, x_gaze, y_gaze
+            in self.measurement_repository.iter_sample_rows(subject.id)
+        )
+        return _csv_chunks(["date", "x_mouse", "y_mouse", "x_gaze", "y_gaze"], rows)
 
     def export_tasklogs_csv(self, subject_id):
         """Export task logs for a subject as CSV."""
@@ -214,27 +1419,18 @@ class ExportService:
         return io.BytesIO(si.getvalue().encode("utf-8"))
 
     def export_all_points_csv(self):
-        """Export measurement points for all subjects as CSV."""
-        all_subjects = self.subject_repository.get_all_subjects()
-
-        if len(all_subjects) == 0:
+        """
+        Export the mouse and gaze points of all subjects as CSV text chunks
+        (None if there are no subjects).
+        """
+        if not self.subject_repository.count_by_study():
             return None
 
-        si = io.StringIO()
-        csv_writer = csv.DictWriter(si, fieldnames=["id", "x", "y"])
-        csv_writer.writeheader()
-
-        for subject in all_subjects:
-            points = Point.query.filter_by(subject_id=subject.id).all()
-            points_dict = [point.__json__() for point in points]
-
-            subject_id = int(subject.id)
-
-            points_np = np.array([[subject_id, p["x"], p["y"]] for p in points_dict])
-
-            for point in points_np:
-                csv_writer.writerow({"id": point[0], "x": point[1], "y": point[2]})
-
-        si.seek(0)
-        return io.BytesIO(si.getvalue().encode("utf-8"))
+        def rows():
+            for subject_id, _, x_mouse, y_mouse, x_gaze, y_gaze in self.measurement_repository.iter_sample_rows():
+                if x_mouse is not None:
+                    yield (subject_id, x_mouse, y_mouse)
+                if x_gaze is not None:
+                    yield (subject_id, x_gaze, y_gaze)
 
+        return _csv_chunks(["id", "x", "y"], rows())
@@ -0,0 +1,71 @@
+"""
+Timestamp parsing for ingestion payloads.
+
+The tracking page historically sent ``toLocaleString`` strings with second
+resolution; newer clients send epoch milliseconds. Both are accepted and
+converted to naive datetimes in ``CLIENT_TIMEZONE``.
+"""
+
+from datetime import datetime
+from numbers import Number
+from zoneinfo import ZoneInfo
+import numpy as np
+from .config import CLIENT_TIMEZONE, CLIENT_DATE_FORMAT
+
+_client_tz = ZoneInfo(CLIENT_TIMEZONE)
+
+
+def _utc_offset_ms(epoch_ms):
+    """UTC offset of the client timezone at the given instant, in milliseconds."""
+    offset = datetime.fromtimestamp(epoch_ms / 1000, _client_tz).utcoffset()
+    return int(offset.total_seconds() * 1000)
+
+
+def parse_timestamp(value):
+    """Parse a single client timestamp (epoch ms or locale string)."""
+    if value is None or value == "":
+        return None
+    return parse_timestamps([value])[0]
+
+
+def parse_timestamps(values):
+    """
+    Parse a batch of client timestamps.
+
+    Numeric values are converted with a single vectorized operation per
+    batch; string values are parsed once per distinct string, since
+    consecutive samples share the same second-resolution string.
+    """
+    parsed = [None] * len(values)
+    numeric_idx = []
+    numeric_ms = []
+    string_cache = {}
+
+    for i, value in enumerate(values):
+        if value is None or value == "":
+            continue
+        if isinstance(value, Number) and not isinstance(value, bool):
+            numeric_idx.append(i)
+            numeric_ms.append(value)
+            continue
+        if isinstance(value, str) and value.replace(".", "", 1).isdigit():
+            numeric_idx.append(i)
+            numeric_ms.append(float(value))
+            continue
+        if value not in string_cache:
+            string_cache[value] = datetime.strptime(value, CLIENT_DATE_FORMAT)
+        parsed[i] = string_cache[value]
+
+    if numeric_idx:
+        ms = np.asarray(numeric_ms, dtype=np.float64).round().astype(np.int64)
+        first_offset = _utc_offset_ms(int(ms.min()))
+        if first_offset == _utc_offset_ms(int(ms.max())):
+            offsets = first_offset
+        else:
+            # The batch spans a DST change; resolve the offset per value
+            offsets = np.array([_utc_offset_ms(int(v)) for v in ms], dtype=np.int64)
+        local = (ms + offsets).astype("datetime64[ms]").tolist()
+        for i, date in zip(numeric_idx, local):
+            parsed[i] = date
+
+    return parsed
@@ -0,0 +1,160 @@
+"""
+Flask application package: application factory, web routes, templates and
+static files.
+
+    from app import create_app
+    app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://"})
+
+Creating an app has no side effects beyond configuring it: tables, summaries
+and the active study are set up by ``prepare_app`` (see ``startup.py``), and
+services/repositories are built on first use (see ``state.registry``).
+"""
+
+import os
+from flask import Flask
+from flasgger import Swagger
+from analysis import GazeFilter
+from analysis.calibration import DEFAULT_MAX_CALIBRATION_ERROR, DEFAULT_MAX_CALIBRATION_ERROR_PX
+from db import DatabaseConfig, DatabaseManager, db
+from monitoring import init_metrics, init_profiler, live_bp
+from state import ConfigManager, set_config_manager
+
+SWAGGER_CONFIG = {
+    "headers": [],
+    "specs": [
+        {
+            "endpoint": "apispec_1",
+            "route": "/apispec_1.json",
+            "rule_filter": lambda rule: True,
+            "model_filter": lambda tag: True,
+        }
+    ],
+    "static_url_path": "/flasgger_static",
+    "swagger_ui": True,
+    "specs_route": "/apidocs/",
+}
+
+SWAGGER_TEMPLATE = {
+    "swagger": "2.0",
+    "info": {
+        "title": "User Gaze Track API",
+        "description": "API for user gaze tracking and data management",
+        "version": "1.0.0",
+        "contact": {
+            "name": "User Gaze Track Team",
+        },
+    },
+    "host": "localhost:5001",
+    "basePath": "/",
+    "schemes": ["https", "http"],
+    "securityDefinitions": {},
+    "tags": [
+        {"name": "web", "description": "Web interface routes"},
+        {"name": "api", "description": "REST API endpoints"},
+    ],
+}
+
+
+def create_app(config=None):
+    """
+    Create and configure a Flask application.
+
+    Args:
+        config: Optional Flask configuration overrides. Besides the usual
+            Flask keys, ``SQLALCHEMY_DATABASE_URI`` selects the database
+            (``"sqlite://"`` for an in-memory one), ``GAZETRACK_CONFIG_DIR``
+            the directory containing config.json/tasks.json,
+            ``SWAGGER_ENABLED`` whether to serve the API docs and
+            ``METRICS_ENABLED`` whether to record request metrics and serve
+            them at ``/metrics`` (both default True; the latter also follows
+            the ``metrics`` key of config.json). ``METRICS_DIR`` (config key
+            ``metrics_dir``, default ``instance/metrics``) is where worker
+            processes share their metrics; None keeps them per process.
+            ``SQL_PROFILING`` (config key ``sql_profiling``, default False)
+            counts and times the statements of each request and logs those
+            slower than ``SLOW_QUERY_MS`` (config key ``slow_query_ms``,
+            default 100) with their plan.
+            ``BACKUP_DIR``, ``BACKUP_COMPRESS`` and ``BACKUP_KEEP`` (config
+            keys ``backup_dir``, ``backup_compress``, ``backup_keep``;
+            defaults ``instance/backups``, True and 7) configure backups.
+            ``MAINTENANCE_TOKEN`` (config key ``maintenance_token``) is the
+            bearer token of the maintenance endpoints under ``/api``; they
+            are disabled when it is unset.
+            ``CALIBRATION_MAX_ERROR`` (config key ``calibration_max_error``,
+            default 0.15) is the calibration accuracy, as a fraction of the
+            viewport diagonal, above which a subject is poorly calibrated;
+            ``CALIBRATION_MAX_ERROR_PX`` (config key
+            ``calibration_max_error_px``, default 250) is the threshold in
+            pixels for runs whose viewport is unknown.
+
+    Returns:
+        The Flask application
+    """
+    from api.routes import api_bp
+    from .assets import asset_url, assets_bp
+    from .views import web_bp
+
+    config = dict(config or {})
+    app = Flask(__name__, template_folder="templates", static_folder="static")
+
+    config_manager = ConfigManager(config.get("GAZETRACK_CONFIG_DIR"))
+    config_manager.load_config()
+    set_config_manager(app, config_manager)
+
+    basedir = os.path.dirname(app.root_path)
+    database_uri = config.get("SQLALCHEMY_DATABASE_URI") or config_manager.get_database_uri(basedir)
+    DatabaseConfig(basedir).configure_app(app, database_uri)
+    app.config.update(config)
+
+    app.extensions["gaze_track.db_manager"] = DatabaseManager(app)
+
+    app.register_blueprint(web_bp)
+    app.register_blueprint(api_bp)
+    app.register_blueprint(assets_bp)
+    app.register_blueprint(live_bp)
+    app.add_template_global(asset_url)
+
+    # Cleanup applied to gaze samples read for analysis (None disables it)
+    app.config.setdefault("GAZE_FILTER", GazeFilter.from_config(config_manager))
+
+    # Online backups (see api.services.BackupService)
+    app.config.setdefault(
+        "BACKUP_DIR", os.path.join(basedir, config_manager.get_str("backup_dir", "instance/backups"))
+    )
+    app.config.setdefault("BACKUP_COMPRESS", config_manager.get_bool("backup_compress", True))
+    app.config.setdefault("BACKUP_KEEP", config_manager.get_int("backup_keep", 7))
+
+    # Bearer token of the /api maintenance endpoints (None disables them)
+    app.config.setdefault("MAINTENANCE_TOKEN", config_manager.get_str("maintenance_token", None))
+
+    # Calibration quality threshold (see api.services.CalibrationService)
+    app.config.setdefault(
+        "CALIBRATION_MAX_ERROR",
+        config_manager.get_float("calibration_max_error", DEFAULT_MAX_CALIBRATION_ERROR),
+    )
+    app.config.setdefault(
+        "CALIBRATION_MAX_ERROR_PX",
+        config_manager.get_float("calibration_max_error_px", DEFAULT_MAX_CALIBRATION_ERROR_PX),
+    )
+
+    if app.config.get("METRICS_ENABLED", config_manager.get_bool("metrics", True)):
+        # Snapshots shared by the worker processes (see monitoring.metrics)
+        metrics_dir = config_manager.get_str("metrics_dir", "instance/metrics")
+        app.config.setdefault("METRICS_DIR", os.path.join(basedir, metrics_dir))
+        with app.app_context():
+            init_metrics(app, db.engine, app.config["METRICS_DIR"])
+
+    if app.config.get("SQL_PROFILING", config_manager.get_bool("sql_profiling", False)):
+        app.config.setdefault("SLOW_QUERY_MS", config_manager.get_int("slow_query_ms", 100))
+        with app.app_context():
+            init_profiler(app, db.engine)
+
+    if app.config.get("SWAGGER_ENABLED", True):
+        Swagger(app, config=SWAGGER_CONFIG, template=SWAGGER_TEMPLATE)
+
+    return app
+
+
+def get_db_manager(app):
+    """Get the DatabaseManager an app was created with."""
+    return app.extensions["gaze_track.db_manager"]
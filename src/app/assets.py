@@ -0,0 +1,319 @@
+"""
+Static asset pipeline: build step and long-cached serving.
+
+``build_assets`` copies the files of ``static/`` into ``dist/`` under
+content-hashed names (``main.3f2a9c1b0d.js``), minifying JavaScript and CSS
+when rjsmin/rcssmin are installed and storing precompressed ``.gz`` (and
+``.br`` when Brotli is installed) variants next to them. A manifest maps each
+original name to its build.
+
+Templates call ``asset_url('main.js')``, which points to the hashed build
+served by ``/assets/`` (precompressed variant, immutable cache headers) and
+falls back to the plain static file when no build exists.
+"""
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+from flask import Blueprint, abort, current_app, request, send_from_directory, url_for
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+
+try:
+    import rcssmin
+except ImportError:
+    rcssmin = None
+
+PACKAGE_DIR = os.path.abspath(os.path.dirname(__file__))
+STATIC_DIR = os.path.join(PACKAGE_DIR, "static")
+DIST_DIR = os.path.join(PACKAGE_DIR, "dist")
+MANIFEST_NAME = "manifest.json"
+
+# Extensions worth compressing; images are already compressed
+COMPRESSIBLE = {".js", ".css", ".svg", ".json", ".txt", ".html"}
+# Variants are only kept when they save at least this fraction of the size
+MIN_SAVING = 0.1
+# Lines longer than this mean the file was minified by its vendor
+MINIFIED_LINE_LENGTH = 500
+HASH_LENGTH = 10
+CACHE_MAX_AGE = 365 * 24 * 3600
+
+# Content-Encoding -> file suffix, in order of preference
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+# Changes whenever a rebuild would give different outputs for the same source
+BUILD_OPTIONS = "v1;js={};css={};br={}".format(
+    rjsmin is not None, rcssmin is not None, brotli is not None
+)
+
+assets_bp = Blueprint("assets", __name__, url_prefix="/assets")
+
+
+def _is_minified(content: bytes) -> bool:
+    lines = content.splitlines() or [b""]
+    return len(content) / len(lines) > MINIFIED_LINE_LENGTH or b".min." in content[:200]
+
+
+def _minify(name: str, content: bytes) -> bytes:
+    """
+    Minify JavaScript/CSS if the minifier is installed and the file needs it.
+    ``/*! ... */`` license comments are kept.
+    """
+    extension = os.path.splitext(name)[1]
+    if name.endswith((".min.js", ".min.css")) or _is_minified(content):
+        return content
+    if extension == ".js" and rjsmin is not None:
+        return rjsmin.jsmin(content.decode("utf-8"), keep_bang_comments=True).encode("utf-8")
+    if extension == ".css" and rcssmin is not None:
+        return rcssmin.cssmin(content.decode("utf-8"), keep_bang_comments=True).encode("utf-8")
+    return content
+
+
+def _compress(content: bytes):
+    """Yield (encoding, suffix, compressed bytes) for each available encoder."""
+    for encoding, suffix in ENCODINGS:
+        if encoding == "br":
+            if brotli is None:
+                continue
+            yield encoding, suffix, brotli.compress(content, quality=11)
+        else:
+            yield encoding, suffix, gzip.compress(content, compresslevel=9, mtime=0)
+
+
+def _hashed_name(name: str, content: bytes) -> str:
+    root, extension = os.path.splitext(name)
+    digest = hashlib.sha256(content).hexdigest()[:HASH_LENGTH]
+    return f"{root}.{digest}{extension}"
+
+
+def _source_stamp(path: str) -> list:
+    stat = os.stat(path)
+    return [stat.st_size, int(stat.st_mtime)]
+
+
+def load_manifest(dist_dir: str = DIST_DIR) -> dict:
+    """
+    Read the manifest of a build.
+
+    Args:
+        dist_dir: Build directory
+
+    Returns:
+        Mapping of original static name to its build entry (empty if there
+        is no build)
+    """
+    try:
+        with open(os.path.join(dist_dir, MANIFEST_NAME), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def build_assets(static_dir: str = STATIC_DIR, dist_dir: str = DIST_DIR, log=print) -> dict:
+    """
+    Build fingerprinted, minified and precompressed copies of the static files.
+
+    Files whose source has not changed since the previous build are reused,
+    and outputs no longer referenced by the manifest are removed.
+
+    Args:
+        static_dir: Source directory
+        dist_dir: Output directory
+        log: Callable used to report progress (None for silence)
+
+    Returns:
+        The new manifest
+    """
+    log = log or (lambda message: None)
+    os.makedirs(dist_dir, exist_ok=True)
+    previous = load_manifest(dist_dir)
+    manifest = {}
+    built = reused = 0
+
+    for root, _, files in os.walk(static_dir):
+        for filename in sorted(files):
+            source = os.path.join(root, filename)
+            name = os.path.relpath(source, static_dir).replace(os.sep, "/")
+            stamp = _source_stamp(source)
+
+            entry = previous.get(name)
+            if entry and entry["source"] == stamp and entry.get("options") == BUILD_OPTIONS and all(
+                os.path.exists(os.path.join(dist_dir, output)) for output in _outputs(entry)
+            ):
+                manifest[name] = entry
+                reused += 1
+                continue
+
+            with open(source, "rb") as f:
+                content = f.read()
+            extension = os.path.splitext(name)[1].lower()
+            if extension in COMPRESSIBLE:
+                content = _minify(name, content)
+
+            hashed = _hashed_name(name, content)
+            _write(dist_dir, hashed, content)
+            entry = {
+                "path": hashed,
+                "source": stamp,
+                "options": BUILD_OPTIONS,
+                "size": len(content),
+                "encodings": {},
+            }
+
+            if extension in COMPRESSIBLE:
+                for encoding, suffix, compressed in _compress(content):
+                    if len(compressed) <= len(content) * (1 - MIN_SAVING):
+                        _write(dist_dir, hashed + suffix, compressed)
+                        entry["encodings"][encoding] = len(compressed)
+
+            manifest[name] = entry
+            built += 1
+            sizes = ", ".join(f"{encoding} {size:,}" for encoding, size in entry["encodings"].items())
+            log(f"   {name} -> {hashed} ({len(content):,} bytes{', ' + sizes if sizes else ''})")
+
+    with open(os.path.join(dist_dir, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+    removed = _remove_stale(dist_dir, manifest)
+    log(f"📦 Assets: {built} built, {reused} unchanged, {removed} stale files removed")
+    return manifest
+
+
+def _outputs(entry: dict):
+    yield entry["path"]
+    for encoding, suffix in ENCODINGS:
+        if encoding in entry["encodings"]:
+            yield entry["path"] + suffix
+
+
+def _write(dist_dir: str, name: str, content: bytes) -> None:
+    path = os.path.join(dist_dir, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(content)
+
+
+def _remove_stale(dist_dir: str, manifest: dict) -> int:
+    keep = {MANIFEST_NAME}
+    for entry in manifest.values():
+        keep.update(_outputs(entry))
+
+    removed = 0
+    for root, _, files in os.walk(dist_dir):
+        for filename in files:
+            path = os.path.join(root, filename)
+            if os.path.relpath(path, dist_dir).replace(os.sep, "/") not in keep:
+                os.remove(path)
+                removed += 1
+    return removed
+
+
+def clean_assets(dist_dir: str = DIST_DIR) -> None:
+    """Delete the build so templates go back to the plain static files."""
+    shutil.rmtree(dist_dir, ignore_errors=True)
+
+
+class AssetManifest:
+    """Manifest of an app's build, reloaded when the build changes."""
+
+    def __init__(self, static_dir: str = STATIC_DIR, dist_dir: str = DIST_DIR):
+        self.static_dir = static_dir
+        self.dist_dir = dist_dir
+        self.loaded = False
+        self._mtime = None
+        self.entries = {}
+        self.by_path = {}
+
+    def refresh(self) -> None:
+        """Reload the manifest if it was rebuilt."""
+        self.loaded = True
+        try:
+            mtime = os.stat(os.path.join(self.dist_dir, MANIFEST_NAME)).st_mtime
+        except OSError:
+            mtime = None
+        if mtime == self._mtime:
+            return
+        self._mtime = mtime
+        self.entries = load_manifest(self.dist_dir)
+        self.by_path = {entry["path"]: entry for entry in self.entries.values()}
+
+    def lookup(self, filename: str, check_source: bool = False):
+        """
+        Get the build entry of a static file.
+
+        Args:
+            filename: Name relative to the static folder
+            check_source: Ignore the entry if the source changed after the
+                build (used while developing)
+
+        Returns:
+            The entry, or None if the file has no up-to-date build
+        """
+        entry = self.entries.get(filename)
+        if entry is None or not check_source:
+            return entry
+        try:
+            if _source_stamp(os.path.join(self.static_dir, filename)) != entry["source"]:
+                return None
+        except OSError:
+            return None
+        return entry
+
+
+def _manifest() -> AssetManifest:
+    manifest = current_app.extensions.get("gaze_track.assets")
+    if manifest is None:
+        manifest = current_app.extensions["gaze_track.assets"] = AssetManifest()
+    if current_app.debug or not manifest.loaded:
+        manifest.refresh()
+    return manifest
+
+
+def asset_url(filename: str) -> str:
+    """URL of a static file, pointing to its fingerprinted build if there is one."""
+    entry = _manifest().lookup(filename, check_source=current_app.debug)
+    if entry is None:
+        return url_for("static", filename=filename)
+    return url_for("assets.asset", filename=entry["path"])
+
+
+def _preferred_encoding(entry: dict):
+    accepted = request.accept_encodings
+    for encoding, suffix in ENCODINGS:
+        if encoding in entry["encodings"] and accepted[encoding] > 0:
+            return encoding, suffix
+    return None, ""
+
+
+@assets_bp.route("/<path:filename>")
+def asset(filename):
+    """Serve a fingerprinted asset, precompressed when the client accepts it."""
+    entry = _manifest().by_path.get(filename)
+    if entry is None:
+        abort(404)
+
+    encoding, suffix = _preferred_encoding(entry)
+    mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    response = send_from_directory(
+        current_app.extensions["gaze_track.assets"].dist_dir,
+        filename + suffix,
+        mimetype=mimetype,
+        max_age=CACHE_MAX_AGE,
+    )
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
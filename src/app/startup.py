@@ -0,0 +1,86 @@
+"""
+One-off setup run before an application starts serving requests.
+"""
+
+from datetime import datetime
+from api.services import SummaryService
+from repositories import StudyRepository
+from state import get_config_manager
+from . import get_db_manager
+
+
+def resolve_active_study(config_manager, name=None, description=None):
+    """
+    Find the Study matching the current prototype configuration, or create it.
+
+    The lookup is an indexed query on the study's config hash and never
+    prompts, so it works under WSGI servers and with several workers
+    starting at once.
+
+    Args:
+        config_manager: Loaded ConfigManager
+        name: Name for a new study (falls back to the ``study_name`` key,
+            then to an automatic name)
+        description: Description for a new study (falls back to the
+            ``study_description`` key)
+
+    Returns:
+        The active Study
+    """
+    url_path = config_manager.get_str('url_path')
+    img_path = config_manager.get_str('img_path')
+
+    study_repository = StudyRepository()
+    if study_repository.backfill_config_hashes():
+        print("📊 Indexed existing studies by configuration")
+
+    name = name or config_manager.get_str('study_name')
+    name = name or f"Study - {datetime.now().strftime('%Y-%m-%d %H:%M')}"
+    description = description or config_manager.get_str('study_description', "Created from configuration")
+
+    active_study, created = study_repository.get_or_create_study(
+        url_path, img_path, name=name, description=description
+    )
+    if created:
+        print(f"✅ Created new study: '{active_study.name}' (ID: {active_study.id})")
+        if url_path:
+            print(f"   Prototype URL: {url_path}")
+        if img_path:
+            print(f"   Prototype Image: {img_path}")
+    else:
+        print(f"📊 Using existing study: '{active_study.name}' (ID: {active_study.id})")
+    return active_study
+
+
+def prepare_app(app, study_name=None, study_description=None):
+    """
+    Get an app ready to serve: create missing tables and indexes, backfill
+    summaries and select the active study. Table rebuilds that would block
+    ingestion are only reported; ``manage.py migrate`` runs them.
+
+    Args:
+        app: Application returned by ``create_app``
+        study_name: Name for the study if the configuration is new
+        study_description: Description for the study if the configuration is new
+
+    Returns:
+        The same application
+    """
+    db_manager = get_db_manager(app)
+    db_manager.create_all()
+    pending = db_manager.pending_autoincrement()
+    if pending:
+        print(f"⚠️  Tables {', '.join(pending)} can reuse deleted IDs; "
+              f"run 'python src/manage.py migrate' to rebuild them (it blocks writers while it runs)")
+
+    with app.app_context():
+        if SummaryService().ensure_built():
+            print("📊 Subject summaries built from existing measurements")
+
+        # Store the active study ID in the app config for easy access
+        active_study = resolve_active_study(
+            get_config_manager(app), study_name, study_description
+        )
+        app.config['ACTIVE_STUDY_ID'] = active_study.id
+
+    return app
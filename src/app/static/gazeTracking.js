@@ -12,16 +12,32 @@ class GazeTracker {
     this.calibrationPoints = {};
     this.calibrated = false;
 
+    // Validation state: after calibrating, targets are shown one at a time
+    // and the gaze predicted while the subject looks at them is recorded
+    this.validationTarget = null;
+    this.validationSamples = [];
+
     // Data collection
     this.points = [];
     this.mousePosition = { x: 0, y: 0 };
 
     // Configuration
     this.batchSize = 20; // Number of points to collect before sending
+    // Validation targets as fractions of the viewport (center and four around it)
+    this.validationTargets = [
+      [0.5, 0.5],
+      [0.2, 0.2],
+      [0.8, 0.2],
+      [0.2, 0.8],
+      [0.8, 0.8],
+    ];
+    this.validationDwellMs = 1500; // Time each target is shown
+    this.validationSettleMs = 500; // Ignored while the eyes move to the target
 
     // Callbacks
     this.onCalibrationComplete = null;
     this.onPointsBatchReady = null;
+    this.onValidationComplete = null;
   }
 
   /**
@@ -73,16 +89,28 @@ class GazeTracker {
       }
       webgazer.util.bound(data);
 
+      if (this.validationTarget) {
+        const target = this.validationTarget;
+        if (Date.now() - target.shownAt >= this.validationSettleMs) {
+          this.validationSamples.push({
+            target: target.index,
+            target_x: target.x,
+            target_y: target.y,
+            x: data.x,
+            y: data.y,
+          });
+        }
+        return;
+      }
+
       const taskBar = document.getElementById("task-bar");
 
       if (this.calibrated && taskBar && taskBar.style.display !== "block") {
         const xprediction = data.x;
         const yprediction = data.y;
 
-        // Add the current timestamp to each point
-        const currentTimestamp = new Date().toLocaleString("en-US", {
-          timeZone: "America/Argentina/Buenos_Aires",
-        });
+        // Add the current timestamp (epoch milliseconds) to each point
+        const currentTimestamp = Date.now();
 
         this.points.push({
           date: currentTimestamp,
@@ -218,16 +246,67 @@ class GazeTracker {
         i.style.setProperty("display", "none");
       });
 
-      this.calibrated = true;
-
       // Hide video immediately after calibration
       this.hideWebgazerVideo();
 
-      // Trigger callback
-      if (this.onCalibrationComplete) {
-        this.onCalibrationComplete();
+      this.validate();
+    }
+  }
+
+  /**
+   * Show the validation targets and record the predicted gaze on each one.
+   * The samples are handed to onValidationComplete, which may ask to
+   * calibrate again (by resolving to false) if the accuracy is poor.
+   */
+  async validate() {
+    const element = document.getElementById("validation-point");
+    this.validationSamples = [];
+
+    // Mouse movements train the model; keep them out of the validation
+    webgazer.removeMouseEventListeners();
+
+    for (let index = 0; index < this.validationTargets.length; index++) {
+      const [fx, fy] = this.validationTargets[index];
+      const x = Math.round(fx * window.innerWidth);
+      const y = Math.round(fy * window.innerHeight);
+
+      if (element) {
+        element.style.left = `${x}px`;
+        element.style.top = `${y}px`;
+        element.style.display = "block";
+      }
+      this.validationTarget = { index, x, y, shownAt: Date.now() };
+
+      await new Promise((resolve) => setTimeout(resolve, this.validationDwellMs));
+    }
+
+    this.validationTarget = null;
+    if (element) {
+      element.style.display = "none";
+    }
+    webgazer.addMouseEventListeners();
+
+    let accepted = true;
+    if (this.onValidationComplete) {
+      try {
+        accepted = (await this.onValidationComplete([...this.validationSamples])) !== false;
+      } catch (error) {
+        console.error("Error sending the validation run:", error);
       }
     }
+    this.validationSamples = [];
+
+    if (!accepted) {
+      this.restart();
+      return;
+    }
+
+    this.calibrated = true;
+
+    // Trigger callback
+    if (this.onCalibrationComplete) {
+      this.onCalibrationComplete();
+    }
   }
 
   /**
@@ -300,6 +379,13 @@ class GazeTracker {
     this.onCalibrationComplete = callback;
   }
 
+  /**
+   * Set callback for when the validation run is recorded
+   */
+  setOnValidationComplete(callback) {
+    this.onValidationComplete = callback;
+  }
+
   /**
    * Set callback for when a batch of points is ready
    */
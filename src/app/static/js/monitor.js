@@ -0,0 +1,123 @@
+/**
+ * Monitor en vivo de las estaciones: recibe por server-sent events la
+ * frecuencia de ingesta, la última posición de la mirada y un mapa de calor
+ * reciente de cada sujeto.
+ */
+
+// Segundos sin datos para considerar que una estación dejó de transmitir
+const SEGUNDOS_INACTIVA = 5;
+
+const estaciones = new Map(); // subject_id -> { datos, recibido, elemento }
+
+/**
+ * Crea la tarjeta de un sujeto a partir de la plantilla
+ */
+function crearTarjeta(subjectId) {
+  const plantilla = document.getElementById("plantilla-estacion");
+  const elemento = plantilla.content.firstElementChild.cloneNode(true);
+  const enlace = elemento.querySelector(".sujeto");
+  enlace.textContent = `Sujeto ${subjectId}`;
+  enlace.href = `/resultados?id=${subjectId}`;
+  document.getElementById("estaciones").prepend(elemento);
+  return elemento;
+}
+
+/**
+ * Dibuja el mapa de calor (celdas 0-255) y la última posición de la mirada
+ */
+function dibujarMapa(canvas, datos) {
+  const ctx = canvas.getContext("2d");
+  const mapa = datos.heatmap;
+  const ancho = canvas.width / mapa.columns;
+  const alto = canvas.height / mapa.rows;
+
+  ctx.clearRect(0, 0, canvas.width, canvas.height);
+  mapa.cells.forEach((valor, indice) => {
+    if (valor === 0) {
+      return;
+    }
+    const columna = indice % mapa.columns;
+    const fila = Math.floor(indice / mapa.columns);
+    ctx.fillStyle = `rgba(220, 53, 69, ${(valor / 255).toFixed(3)})`;
+    ctx.fillRect(columna * ancho, fila * alto, ancho, alto);
+  });
+
+  if (datos.gaze) {
+    const x = (datos.gaze[0] / mapa.width) * canvas.width;
+    const y = (datos.gaze[1] / mapa.height) * canvas.height;
+    ctx.beginPath();
+    ctx.arc(x, y, 5, 0, 2 * Math.PI);
+    ctx.fillStyle = "#0d6efd";
+    ctx.fill();
+  }
+}
+
+/**
+ * Actualiza los textos de una tarjeta; el estado depende del tiempo sin datos
+ */
+function actualizarTarjeta(estacion) {
+  const { datos, recibido, elemento } = estacion;
+  const inactiva = datos.idle_seconds + (Date.now() - recibido) / 1000;
+  const transmitiendo = inactiva < SEGUNDOS_INACTIVA;
+
+  elemento.querySelector(".estacion").classList.toggle("inactiva", !transmitiendo);
+  const estado = elemento.querySelector(".estado");
+  estado.textContent = transmitiendo ? "Transmitiendo" : `Sin datos hace ${Math.round(inactiva)} s`;
+  estado.className = `badge estado ${transmitiendo ? "bg-success" : "bg-warning text-dark"}`;
+
+  elemento.querySelector(".frecuencia").textContent = `${(transmitiendo ? datos.rate : 0).toFixed(1)} Hz`;
+  elemento.querySelector(".muestras").textContent = datos.samples.toLocaleString("es-AR");
+  elemento.querySelector(".ultima").textContent = datos.last_sample_at
+    ? datos.last_sample_at.substring(11, 19)
+    : "-";
+  elemento.querySelector(".mirada").textContent = datos.gaze
+    ? `${Math.round(datos.gaze[0])}, ${Math.round(datos.gaze[1])} px`
+    : "-";
+}
+
+/**
+ * Incorpora el estado recibido de uno o más sujetos
+ */
+function recibir(sujetos) {
+  sujetos.forEach((datos) => {
+    let estacion = estaciones.get(datos.subject_id);
+    if (!estacion) {
+      estacion = { elemento: crearTarjeta(datos.subject_id) };
+      estaciones.set(datos.subject_id, estacion);
+    }
+    estacion.datos = datos;
+    estacion.recibido = Date.now();
+    dibujarMapa(estacion.elemento.querySelector(".mapa"), datos);
+    actualizarTarjeta(estacion);
+  });
+  actualizarResumen();
+}
+
+function actualizarResumen() {
+  let activas = 0;
+  estaciones.forEach((estacion) => {
+    actualizarTarjeta(estacion);
+    if (!estacion.elemento.querySelector(".estacion").classList.contains("inactiva")) {
+      activas += 1;
+    }
+  });
+  document.getElementById("resumen").textContent =
+    `${activas} de ${estaciones.size} estaciones transmitiendo`;
+  document.getElementById("sin-estaciones").style.display = estaciones.size ? "none" : "block";
+}
+
+function marcarConexion(texto, clase) {
+  const estado = document.getElementById("estado-conexion");
+  estado.textContent = texto;
+  estado.className = `badge ${clase}`;
+}
+
+// EventSource se reconecta solo; al reconectar llega un snapshot completo
+const fuente = new EventSource("/monitor/stream");
+fuente.addEventListener("open", () => marcarConexion("Conectado", "bg-success"));
+fuente.addEventListener("error", () => marcarConexion("Reconectando…", "bg-danger"));
+fuente.addEventListener("snapshot", (evento) => recibir(JSON.parse(evento.data).subjects));
+fuente.addEventListener("update", (evento) => recibir(JSON.parse(evento.data).subjects));
+
+// Los estados "sin datos hace N s" avanzan aunque no lleguen eventos
+setInterval(actualizarResumen, 1000);
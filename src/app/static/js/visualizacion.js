@@ -24,6 +24,9 @@ async function cargarDatos() {
             return;
         }
 
+        // Tamaño de la ventana del sujeto (1920x1080 si no se registró)
+        const [ancho, alto] = data.viewport || [1920, 1080];
+
         // === Animación Mouse ===
         let mouseFrames = data.points.map((p, i) => ({
             name: i.toString(),
@@ -42,8 +45,8 @@ async function cargarDatos() {
                 x: 0.5,
                 xanchor: 'center'
             },
-            xaxis: { range: [0, 1920], title: "X", fixedrange: true },
-            yaxis: { range: [1080, 0], title: "Y", scaleanchor: "x", fixedrange: true },
+            xaxis: { range: [0, ancho], title: "X", fixedrange: true },
+            yaxis: { range: [alto, 0], title: "Y", scaleanchor: "x", fixedrange: true },
             width: 700,
             height: 500,
             updatemenus: [{
@@ -110,8 +113,8 @@ async function cargarDatos() {
                 x: 0.5,
                 xanchor: 'center'
             },
-            xaxis: { range: [0, 1920], title: "X" ,fixedrange: true},
-            yaxis: { range: [1080, 0], title: "Y", scaleanchor: "x", fixedrange: true },
+            xaxis: { range: [0, ancho], title: "X", fixedrange: true },
+            yaxis: { range: [alto, 0], title: "Y", scaleanchor: "x", fixedrange: true },
             width: 700,
             height: 500,
             updatemenus: [{
@@ -20,6 +20,9 @@ document.addEventListener("DOMContentLoaded", function () {
     checkCalibrationAndShowButton();
   });
 
+  // Set up validation callback: calibrate again if the accuracy is poor
+  gazeTracker.setOnValidationComplete((samples) => enviarCalibracion(samples));
+
   // Set up points batch ready callback
   gazeTracker.setOnPointsBatchReady((points) => {
     enviarPuntos(points);
@@ -126,26 +129,157 @@ function enviarPuntos(puntos) {
     });
 }
 
-function enviarTaskLogIndividual(taskLog) {
-  fetch("/api/save-tasklogs", {
+/**
+ * Viewport and screen size of the session. Gaze and mouse coordinates are
+ * viewport pixels, so the server needs the size to normalize them. Sent on
+ * load and again after the window is resized.
+ */
+const PANTALLA_RESIZE_DELAY_MS = 1000;
+
+let pantallaTimer = null;
+
+function enviarPantalla() {
+  fetch("/api/save-screen", {
+    method: "POST",
+    headers: {
+      "Content-Type": "application/json",
+    },
+    body: JSON.stringify({
+      subject_id: parseInt(id, 10),
+      viewport: { width: window.innerWidth, height: window.innerHeight },
+      screen: { width: window.screen.width, height: window.screen.height },
+      devicePixelRatio: window.devicePixelRatio || 1,
+    }),
+  }).catch((error) => {
+    console.error("Error al enviar el tamaño de pantalla:", error);
+  });
+}
+
+document.addEventListener("DOMContentLoaded", enviarPantalla);
+
+window.addEventListener("resize", function () {
+  clearTimeout(pantallaTimer);
+  pantallaTimer = setTimeout(enviarPantalla, PANTALLA_RESIZE_DELAY_MS);
+});
+
+/**
+ * Validation run made after calibrating: the server scores it and answers
+ * whether the calibration is poor, in which case the subject may repeat it.
+ * Resolves to false to calibrate again.
+ */
+function enviarCalibracion(samples) {
+  return fetch("/api/save-calibration", {
+    method: "POST",
+    headers: {
+      "Content-Type": "application/json",
+    },
+    body: JSON.stringify({
+      subject_id: parseInt(id, 10),
+      viewport: { width: window.innerWidth, height: window.innerHeight },
+      samples: samples,
+    }),
+  })
+    .then((response) => (response.ok ? response.json() : null))
+    .then((result) => {
+      console.log("Calibración:", result);
+      if (!result || !result.poor) {
+        return true;
+      }
+      return !confirm(
+        "La calibración no es lo bastante precisa. ¿Quieres volver a calibrar?"
+      );
+    })
+    .catch((error) => {
+      console.error("Error al enviar la calibración:", error);
+      return true;
+    });
+}
+
+/**
+ * Task logs are queued and sent in batches instead of one request per log.
+ * The queue is flushed when it reaches TASKLOG_BATCH_SIZE, after
+ * TASKLOG_FLUSH_DELAY_MS without new logs, before leaving the page and
+ * when the last task is answered.
+ */
+const TASKLOG_BATCH_SIZE = 5;
+const TASKLOG_FLUSH_DELAY_MS = 3000;
+
+let taskLogQueue = [];
+let taskLogFlushTimer = null;
+
+function encolarTaskLog(taskLog) {
+  taskLogQueue.push(taskLog);
+
+  if (taskLogQueue.length >= TASKLOG_BATCH_SIZE) {
+    return enviarTaskLogs();
+  }
+
+  clearTimeout(taskLogFlushTimer);
+  taskLogFlushTimer = setTimeout(enviarTaskLogs, TASKLOG_FLUSH_DELAY_MS);
+  return Promise.resolve();
+}
+
+function enviarTaskLogs() {
+  clearTimeout(taskLogFlushTimer);
+  taskLogFlushTimer = null;
+
+  if (taskLogQueue.length === 0) {
+    return Promise.resolve();
+  }
+
+  const batch = taskLogQueue;
+  taskLogQueue = [];
+
+  return fetch("/api/save-tasklogs", {
     method: "POST",
     headers: {
       "Content-Type": "application/json",
     },
     body: JSON.stringify({
-      taskLogs: [taskLog],
+      taskLogs: batch,
       subject_id: parseInt(id, 10),
     }),
   })
     .then((response) => response.json())
     .then((result) => {
-      console.log("TaskLog enviado:", result);
+      console.log("TaskLogs enviados:", result);
     })
     .catch((error) => {
-      console.error("Error al enviar TaskLog:", error);
+      console.error("Error al enviar TaskLogs:", error);
+      // Reintentar con el próximo envío
+      taskLogQueue = batch.concat(taskLogQueue);
     });
 }
 
+// Enviar los logs pendientes si se abandona la página
+window.addEventListener("pagehide", function () {
+  if (taskLogQueue.length === 0) {
+    return;
+  }
+  const body = JSON.stringify({
+    taskLogs: taskLogQueue,
+    subject_id: parseInt(id, 10),
+  });
+  navigator.sendBeacon(
+    "/api/save-tasklogs",
+    new Blob([body], { type: "application/json" })
+  );
+  taskLogQueue = [];
+});
+
+function registrarFinDeTarea(response) {
+  const task = tasksArray[currentTaskIndex];
+  const taskLog = taskLogs[currentTaskIndex];
+
+  taskLog.endTime = Date.now();
+  taskLog.response = response;
+  taskLog.task = task.task;
+  taskLog.type = task.type;
+  taskLog.version = task.version;
+
+  encolarTaskLog(taskLog);
+}
+
 document.addEventListener("DOMContentLoaded", function () {
   fetch("/api/tasks")
     .then((response) => response.json())
@@ -174,12 +308,7 @@ document.addEventListener("DOMContentLoaded", function () {
     .addEventListener("click", function () {
       const userInput = document.getElementById("task-bar-input").value;
 
-      taskLogs[currentTaskIndex].endTime = new Date().toLocaleString("en-US", {
-        timeZone: "America/Argentina/Buenos_Aires",
-      });
-      taskLogs[currentTaskIndex].response = userInput;
-
-      enviarTaskLogIndividual(taskLogs[currentTaskIndex]);
+      registrarFinDeTarea(userInput);
 
       console.log(
         `Respuesta a "${tasksArray[currentTaskIndex]}": ${userInput}`
@@ -190,14 +319,7 @@ document.addEventListener("DOMContentLoaded", function () {
     });
 
   document.getElementById("skip-button").addEventListener("click", function () {
-    // Aquí puedes agregar la lógica para omitir la tarea actual
-
-    taskLogs[currentTaskIndex].endTime = new Date().toLocaleString("en-US", {
-      timeZone: "America/Argentina/Buenos_Aires",
-    });
-    taskLogs[currentTaskIndex].response = "skipped"; // Opción de omitir
-
-    enviarTaskLogIndividual(taskLogs[currentTaskIndex]);
+    registrarFinDeTarea("skipped"); // Opción de omitir
 
     document.getElementById("task-bar-input").value = ""; // Limpiar el input
     console.log("Tarea omitida");
@@ -223,9 +345,7 @@ document.addEventListener("DOMContentLoaded", function () {
     prototype.style.filter = "blur(5px)";
 
     if (!startTime) {
-      startTime = new Date().toLocaleString("en-US", {
-        timeZone: "America/Argentina/Buenos_Aires",
-      });
+      startTime = Date.now();
       console.log("Tiempos de inicio:", startTime);
     }
 
@@ -265,9 +385,7 @@ function showNextTaskInBar() {
       startTime:
         currentTaskIndex === 0
           ? startTime // Usar el tiempo global si es la primera tarea
-          : new Date().toLocaleString("en-US", {
-              timeZone: "America/Argentina/Buenos_Aires",
-            }),
+          : Date.now(),
       endTime: null,
       response: null,
     };
@@ -280,7 +398,10 @@ function showNextTaskInBar() {
       taskBarInput.style.display = "block"; // Muestra el input
     }
   } else {
-    window.location.href = "/fin-medicion";
+    // Enviar los logs pendientes antes de terminar
+    enviarTaskLogs().finally(() => {
+      window.location.href = "/fin-medicion";
+    });
   }
 }
 
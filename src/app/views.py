@@ -0,0 +1,223 @@
+"""
+Web interface routes: subject registration, tracking page and results.
+"""
+
+import numpy as np
+from flask import (
+    Blueprint,
+    current_app,
+    render_template,
+    request,
+    redirect,
+    url_for,
+)
+from api.services import MeasurementService
+from repositories import SubjectRepository, StudyRepository
+from state import get_component
+
+web_bp = Blueprint("web", __name__)
+
+
+@web_bp.route("/", methods=["GET", "POST"])
+def index():
+    """
+    Main page that allows registration of a new subject for gaze measurement.
+    ---
+    parameters:
+      - name: nombre
+        in: formData
+        type: string
+        required: true
+        description: Subject's name.
+      - name: apellido
+        in: formData
+        type: string
+        required: true
+        description: Subject's surname.
+      - name: edad
+        in: formData
+        type: integer
+        required: true
+        description: Subject's age.
+    responses:
+      200:
+        description: Home page or redirect to tracking page.
+    """
+    if request.method == "POST":
+        nombre = request.form["nombre"]
+        apellido = request.form["apellido"]
+        edad = request.form["edad"]
+
+        # Get the active study ID
+        active_study_id = current_app.config.get('ACTIVE_STUDY_ID')
+        
+        subject_repository = get_component(SubjectRepository)
+        subject = subject_repository.create_subject(
+            name=nombre,
+            surname=apellido,
+            age=edad,
+            study_id=active_study_id
+        )
+        subject_repository.commit()
+
+        return redirect(url_for("web.embed", id=subject.id))
+    return render_template("index.html")
+
+
+@web_bp.route("/gaze-tracking")
+def embed():
+    """
+    Shows the eye tracking page for the user with the ID passed as parameter.
+    ---
+    parameters:
+      - name: id
+        in: query
+        type: integer
+        required: true
+        description: Subject ID for eye tracking.
+    responses:
+      200:
+        description: Eye tracking page.
+    """
+    return render_template("embed.html", id=request.args.get("id"))
+
+
+@web_bp.route("/fin-medicion")
+def fin_medicion():
+    """
+    Shows the measurement completion page.
+    ---
+    responses:
+        200:
+            description: Measurement completion page.
+    """
+    return render_template("fin.html")
+
+
+@web_bp.route("/sujetos")
+def sujetos():
+    """
+    Shows the list of registered subjects in the database, grouped by study.
+    ---
+    parameters:
+        - name: study
+          in: query
+          type: string
+          required: false
+          description: Study ID to show, "none" for subjects without a study or "all".
+        - name: q
+          in: query
+          type: string
+          required: false
+          description: Text to search in the subject name or study name.
+        - name: page
+          in: query
+          type: integer
+          required: false
+          description: Page number.
+        - name: per_page
+          in: query
+          type: integer
+          required: false
+          description: Subjects per page (default 50).
+    responses:
+        200:
+            description: Page with the list of registered subjects.
+    """
+    search = request.args.get("q", "").strip()
+    page = request.args.get("page", 1, type=int)
+    per_page = request.args.get("per_page", 50, type=int)
+
+    subject_repository = get_component(SubjectRepository)
+    study_repository = get_component(StudyRepository)
+
+    # Tabs only need each study and its number of subjects
+    studies = study_repository.get_all_studies()
+    subject_counts = subject_repository.count_by_study()
+
+    selected = request.args.get("study")
+    if selected is None:
+        if search:
+            selected = "all"
+        elif studies:
+            # Studies are listed newest first; fall back to the newest one
+            selected = str(current_app.config.get('ACTIVE_STUDY_ID') or studies[0].id)
+        else:
+            selected = "none"
+
+    selected_study = None
+    if selected not in ("all", "none"):
+        selected_study = next((s for s in studies if str(s.id) == selected), None)
+        if selected_study is None:
+            selected = "all"
+
+    pagination = subject_repository.paginate_subjects(
+        page=page,
+        per_page=per_page,
+        search=search or None,
+        study_id=selected_study.id if selected_study else None,
+        without_study=selected == "none",
+    )
+
+    return render_template("sujetos.html",
+                          studies=studies,
+                          subject_counts=subject_counts,
+                          selected=selected,
+                          selected_study=selected_study,
+                          search=search,
+                          pagination=pagination)
+
+
+@web_bp.route("/resultados")
+def resultados():
+    """
+    Shows the results of registered points for a specific subject and allows download.
+    ---
+    parameters:
+        - name: id
+          in: query
+          type: integer
+          required: true
+          description: Subject ID to show results.
+    responses:
+        200:
+            description: Page with the registered points results.
+        404:
+            description: Subject not found.
+    """
+    subject_id = request.args.get("id", type=int)
+
+    subject = get_component(SubjectRepository).get_subject_by_id(subject_id)
+
+    if subject:
+        # Gaze goes through the server-side filter; mouse positions are exact
+        samples = get_component(MeasurementService).get_filtered_samples(subject)
+        points = []
+        for x, y in (("mouse_x", "mouse_y"), ("gaze_x", "gaze_y")):
+            finite = np.isfinite(samples[x]) & np.isfinite(samples[y])
+            points.extend(
+                {"x": px, "y": py}
+                for px, py in zip(samples[x][finite].tolist(), samples[y][finite].tolist())
+            )
+
+        return render_template("resultados.html", sujeto=subject, puntos=points)
+
+    return "Subject not found", 404
+
+
+@web_bp.route("/monitor")
+def monitor():
+    """
+    Live view of the stations streaming data: ingest rate, latest gaze
+    position and a recent gaze heatmap per subject.
+    ---
+    responses:
+        200:
+            description: Live monitoring page.
+    """
+    return render_template("monitor.html")
+
+
+@web_bp.route("/visualizacion")
+def visualizacion():
+    return render_template("visualizacion.html")
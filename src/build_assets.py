@@ -0,0 +1,36 @@
+"""
+Build the fingerprinted, minified and precompressed static assets.
+
+    python src/build_assets.py          # build (unchanged files are reused)
+    python src/build_assets.py --clean  # delete the build
+
+Minification needs rjsmin/rcssmin and Brotli variants need the brotli
+package; without them the files are only fingerprinted and gzipped.
+"""
+
+import argparse
+import os
+import sys
+
+basedir = os.path.abspath(os.path.dirname(__file__))
+if basedir not in sys.path:
+    sys.path.insert(0, basedir)
+
+from app.assets import DIST_DIR, build_assets, clean_assets
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Build the static assets")
+    parser.add_argument("--clean", action="store_true", help="Delete the build and exit")
+    parser.add_argument("--quiet", action="store_true", help="Only print the summary line")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.clean:
+        clean_assets()
+        print(f"🧹 Removed {DIST_DIR}")
+    else:
+        build_assets(log=(lambda message: None if message.startswith(" ") else print(message))
+                     if args.quiet else print)
@@ -45,7 +45,12 @@ def save_config():
         messagebox.showerror("Error", "Port must be a number.")
         return
 
-    config = {"url_path": url, "img_path": img, "port": port}
+    # Keep keys this form does not edit (server mode, workers, TLS files...)
+    config = {}
+    if os.path.exists(CONFIG_FILE):
+        with open(CONFIG_FILE, "r") as f:
+            config = json.load(f)
+    config.update({"url_path": url, "img_path": img, "port": port})
 
     os.makedirs(os.path.dirname(CONFIG_FILE), exist_ok=True)
     with open(CONFIG_FILE, "w") as f:
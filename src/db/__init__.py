@@ -4,14 +4,32 @@ Database initialization and configuration module.
 
 from .db_config import DatabaseConfig
 from .db_manager import DatabaseManager
-from .models import db, Subject, Measurement, Point, TaskLog
+from .models import (
+    db,
+    Study,
+    AreaOfInterest,
+    Subject,
+    SubjectSummary,
+    AoiMetricsCache,
+    CalibrationQuality,
+    Measurement,
+    Point,
+    SampleBlock,
+    TaskLog,
+)
 
 __all__ = [
     'DatabaseConfig',
     'DatabaseManager',
     'db',
+    'Study',
+    'AreaOfInterest',
     'Subject',
+    'SubjectSummary',
+    'AoiMetricsCache',
+    'CalibrationQuality',
     'Measurement',
     'Point',
+    'SampleBlock',
     'TaskLog',
 ]
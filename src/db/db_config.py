@@ -21,6 +21,8 @@ class DatabaseConfig:
         self.basedir = basedir
         self.database_uri = None
         self.track_modifications = False
+        # Seconds a connection waits for a lock held by another worker
+        self.busy_timeout = 30
     
     def get_sqlite_uri(self, db_path: str = None) -> str:
         """
@@ -54,5 +56,9 @@ class DatabaseConfig:
         
         app.config["SQLALCHEMY_DATABASE_URI"] = database_uri
         app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = self.track_modifications
+        if database_uri.startswith("sqlite"):
+            app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+                "connect_args": {"timeout": self.busy_timeout},
+            }
         
         self.database_uri = database_uri
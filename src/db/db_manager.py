@@ -2,8 +2,66 @@
 Database manager for initialization and operations.
 """
 
+import os
+import sqlite3
+from sqlalchemy import MetaData, event, inspect
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.schema import CreateTable
 from .models import db
 
+# Times schema creation is attempted when racing other workers
+SCHEMA_ATTEMPTS = 10
+
+# Real paths of the SQLite files of initialized apps, opened in WAL mode
+_wal_databases = set()
+
+
+def _sqlite_path(app):
+    """
+    Path of the app's SQLite database file, or None for other databases
+    and in-memory ones. Relative paths are resolved against the instance
+    folder, as Flask-SQLAlchemy does when it creates the engine.
+    """
+    url = make_url(app.config["SQLALCHEMY_DATABASE_URI"])
+    if url.get_backend_name() != "sqlite" or url.database in (None, "", ":memory:"):
+        return None
+    if url.database.startswith("file:"):
+        return None
+    if not os.path.isabs(url.database):
+        return os.path.realpath(os.path.join(app.instance_path, url.database))
+    return os.path.realpath(url.database)
+
+
+def _configure_sqlite_connection(dbapi_connection, connection_record):
+    """
+    Use write-ahead logging so readers do not block the writer.
+    
+    Required when several workers share the SQLite file: with the default
+    rollback journal a long read (e.g. an export) blocks every ingest.
+    Listens to new connections of every engine, so connections to other
+    databases are left untouched.
+    """
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    try:
+        main = next((row for row in cursor.execute("PRAGMA database_list") if row[1] == "main"), None)
+        if main is None or not main[2] or os.path.realpath(main[2]) not in _wal_databases:
+            return
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+    finally:
+        cursor.close()
+
+
+def _lacks_autoincrement(connection, table_name):
+    """Whether an existing SQLite table was created without AUTOINCREMENT."""
+    row = connection.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table_name,)
+    ).fetchone()
+    return row is not None and "AUTOINCREMENT" not in row[0].upper()
+
 
 class DatabaseManager:
     """Manager for database operations."""
@@ -29,14 +87,176 @@ class DatabaseManager:
         """
         self.app = app
         self.db.init_app(app)
+        
+        # No connection is opened here: the listener configures the
+        # database's connections as the pool opens them
+        path = _sqlite_path(app)
+        if path is not None:
+            _wal_databases.add(path)
+            if not event.contains(Engine, "connect", _configure_sqlite_connection):
+                event.listen(Engine, "connect", _configure_sqlite_connection)
+    
+    def dispose_engine(self):
+        """
+        Close pooled connections. Must be called in each worker after a fork,
+        since SQLite connections cannot be shared between processes.
+        """
+        with self.app.app_context():
+            self.db.engine.dispose()
     
     def create_all(self):
-        """Create all database tables."""
+        """Create all database tables and any indexes missing from existing ones."""
         if self.app is None:
             raise RuntimeError("Database manager not initialized with an app")
         
         with self.app.app_context():
-            self.db.create_all()
+            for attempt in range(SCHEMA_ATTEMPTS):
+                try:
+                    self._create_schema()
+                    return
+                except OperationalError as e:
+                    # Another worker booting at the same time created a table,
+                    # column or index between our existence check and CREATE.
+                    # Each retry skips what already exists.
+                    message = str(e)
+                    if attempt == SCHEMA_ATTEMPTS - 1 or (
+                        "already exists" not in message and "duplicate column" not in message
+                    ):
+                        raise
+    
+    def _create_schema(self):
+        self.db.create_all()
+        self.add_missing_columns()
+        self.create_missing_indexes()
+    
+    def add_missing_columns(self):
+        """
+        Add nullable columns declared on the models but absent from the database.
+        
+        This is a lightweight migration for databases created by older
+        versions: ``create_all`` never alters existing tables. Constraints
+        are not added (SQLite cannot add them to an existing table), so
+        unique columns must also declare a unique index.
+        """
+        engine = self.db.engine
+        inspector = inspect(engine)
+        with engine.begin() as connection:
+            for table in self.db.metadata.sorted_tables:
+                existing = {column["name"] for column in inspector.get_columns(table.name)}
+                for column in table.columns:
+                    if column.name in existing or not column.nullable:
+                        continue
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    connection.exec_driver_sql(
+                        f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}'
+                    )
+    
+    def _autoincrement_tables(self):
+        with self.app.app_context():
+            if self.db.engine.dialect.name != "sqlite":
+                return []
+        return [
+            table for table in self.db.metadata.sorted_tables
+            if table.dialect_options["sqlite"]["autoincrement"]
+        ]
+    
+    def pending_autoincrement(self):
+        """
+        Get the SQLite tables that ``add_autoincrement`` would rebuild.
+        
+        Returns:
+            Names of the tables whose model declares ``sqlite_autoincrement``
+            but which were created without it
+        """
+        tables = self._autoincrement_tables()
+        if not tables:
+            return []
+        with self.app.app_context():
+            pooled = self.db.engine.raw_connection()
+            try:
+                return [
+                    table.name for table in tables
+                    if _lacks_autoincrement(pooled.driver_connection, table.name)
+                ]
+            finally:
+                pooled.close()
+    
+    def add_autoincrement(self):
+        """
+        Rebuild SQLite tables whose model declares ``sqlite_autoincrement``
+        but which were created without it.
+        
+        Without AUTOINCREMENT SQLite hands out the highest rowid plus one,
+        so deleting the newest rows lets new rows reuse their IDs. SQLite
+        cannot change a primary key in place: the rows are copied to a new
+        table with the model's definition, which then replaces the old one,
+        all in one immediate transaction, and the indexes are recreated.
+        Writers are blocked while the tables are copied, so this is not run
+        on startup but by ``manage.py migrate``.
+        
+        Returns:
+            Names of the rebuilt tables
+        """
+        tables = self._autoincrement_tables()
+        if not tables:
+            return []
+        
+        rebuilt = []
+        with self.app.app_context():
+            pooled = self.db.engine.raw_connection()
+            connection = pooled.driver_connection
+            isolation_level = connection.isolation_level
+            try:
+                if not any(_lacks_autoincrement(connection, table.name) for table in tables):
+                    return []
+                # Manual transaction control, so the DDL is part of the transaction
+                connection.isolation_level = None
+                connection.execute("BEGIN IMMEDIATE")
+                try:
+                    # Checked again: another process may have rebuilt a table meanwhile
+                    for table in tables:
+                        if _lacks_autoincrement(connection, table.name):
+                            self._rebuild_table(connection, table)
+                            rebuilt.append(table.name)
+                    connection.execute("COMMIT")
+                except BaseException:
+                    connection.execute("ROLLBACK")
+                    raise
+            finally:
+                connection.isolation_level = isolation_level
+                pooled.close()
+            self.create_missing_indexes()
+        return rebuilt
+    
+    def _rebuild_table(self, connection, table):
+        """Replace an SQLite table by a copy created from its model definition."""
+        print(f"🔧 Rebuilding table '{table.name}' with AUTOINCREMENT IDs")
+        # Copies of every table resolve the foreign keys of the new definition
+        metadata = MetaData()
+        for model_table in self.db.metadata.sorted_tables:
+            model_table.to_metadata(metadata)
+        rebuilt = table.to_metadata(metadata, name=f"_{table.name}_rebuild")
+        
+        connection.execute(str(CreateTable(rebuilt).compile(dialect=self.db.engine.dialect)))
+        existing = [column[1] for column in connection.execute(f'PRAGMA table_info("{table.name}")')]
+        columns = ", ".join(f'"{name}"' for name in existing if name in table.columns)
+        connection.execute(
+            f'INSERT INTO "{rebuilt.name}" ({columns}) SELECT {columns} FROM "{table.name}"'
+        )
+        connection.execute(f'DROP TABLE "{table.name}"')
+        connection.execute(f'ALTER TABLE "{rebuilt.name}" RENAME TO "{table.name}"')
+    
+    def create_missing_indexes(self):
+        """
+        Create indexes declared on the models but absent from the database.
+        
+        ``create_all`` only creates indexes together with new tables, so
+        databases created by older versions would otherwise never get them.
+        """
+        engine = self.db.engine
+        for table in self.db.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=engine, checkfirst=True)
     
     def drop_all(self):
         """Drop all database tables."""
@@ -1,3 +1,5 @@
+import hashlib
+import json
 from flask_sqlalchemy import SQLAlchemy
 
 db = SQLAlchemy()
@@ -13,7 +15,9 @@ class Study(db.Model):
     description = db.Column(db.Text, nullable=True)
     prototype_url = db.Column(db.String(500), nullable=True)
     prototype_image_path = db.Column(db.String(500), nullable=True)
-    created_at = db.Column(db.DateTime, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, index=True)
+    # Identifies the prototype configuration (see ``config_hash_for``)
+    config_hash = db.Column(db.String(64), nullable=True, unique=True, index=True)
     
     # Relationship to subjects
     subjects = db.relationship("Subject", back_populates="study", lazy=True)
@@ -21,6 +25,12 @@ class Study(db.Model):
     def __str__(self):
         return f"Study {self.id} - {self.name}"
     
+    @staticmethod
+    def config_hash_for(prototype_url, prototype_image_path):
+        """Hash of a prototype configuration, used to find its study."""
+        key = json.dumps([prototype_url, prototype_image_path])
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+    
     def __json__(self):
         return {
             "id": self.id,
@@ -32,23 +42,194 @@ class Study(db.Model):
         }
 
 
+class AreaOfInterest(db.Model):
+    """Represents a region of a study's prototype (rectangle or polygon) used for dwell analysis."""
+
+    __tablename__ = 'area_of_interest'
+
+    id = db.Column(db.Integer, primary_key=True)
+    study_id = db.Column(db.Integer, db.ForeignKey("study.id"), nullable=False, index=True)
+    name = db.Column(db.String(100), nullable=False)
+    shape = db.Column(db.String(20), nullable=False)
+    # JSON: [x, y, width, height] for rectangles, [[x, y], ...] for polygons
+    coordinates = db.Column(db.Text, nullable=False)
+    position = db.Column(db.Integer, nullable=False, default=0)
+
+    study = db.relationship(
+        "Study",
+        backref=db.backref("aois", lazy=True, order_by="AreaOfInterest.position"),
+    )
+
+    def __str__(self):
+        return f"AOI {self.id} - {self.name} ({self.shape})"
+
+    def definition(self):
+        """Geometry in the format expected by ``analysis.aoi.hit_test``."""
+        coordinates = json.loads(self.coordinates)
+        if self.shape == "rect":
+            return {"shape": "rect", "rect": coordinates}
+        return {"shape": "polygon", "points": coordinates}
+
+    def __json__(self):
+        return {
+            "id": self.id,
+            "study_id": self.study_id,
+            "name": self.name,
+            **self.definition(),
+        }
+
+
 class Subject(db.Model):
     __tablename__ = 'subject'
+    # IDs of deleted subjects are never handed out again
+    __table_args__ = {'sqlite_autoincrement': True}
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(50), nullable=False)
     surname = db.Column(db.String(50), nullable=False)
     age = db.Column(db.Integer, nullable=False)
-    study_id = db.Column(db.Integer, db.ForeignKey("study.id"), nullable=True)
+    study_id = db.Column(db.Integer, db.ForeignKey("study.id"), nullable=True, index=True)
+    # Screen of the tracking session, reported by the tracking page. Gaze and
+    # mouse coordinates are CSS pixels relative to the viewport.
+    viewport_width = db.Column(db.Integer, nullable=True)
+    viewport_height = db.Column(db.Integer, nullable=True)
+    screen_width = db.Column(db.Integer, nullable=True)
+    screen_height = db.Column(db.Integer, nullable=True)
+    device_pixel_ratio = db.Column(db.Float, nullable=True)
     
     # Relationship to study
     study = db.relationship("Study", back_populates="subjects")
 
+    @property
+    def viewport(self):
+        """(width, height) of the viewport in CSS pixels, or None if unknown."""
+        if not self.viewport_width or not self.viewport_height:
+            return None
+        return self.viewport_width, self.viewport_height
+
+
+class SubjectSummary(db.Model):
+    """Precomputed per-subject statistics, maintained incrementally on ingest."""
+
+    __tablename__ = 'subject_summary'
+
+    subject_id = db.Column(db.Integer, db.ForeignKey("subject.id"), primary_key=True)
+    sample_count = db.Column(db.Integer, nullable=False, default=0)
+    first_sample_at = db.Column(db.DateTime, nullable=True)
+    last_sample_at = db.Column(db.DateTime, nullable=True)
+    min_gaze_x = db.Column(db.Float, nullable=True)
+    max_gaze_x = db.Column(db.Float, nullable=True)
+    min_gaze_y = db.Column(db.Float, nullable=True)
+    max_gaze_y = db.Column(db.Float, nullable=True)
+    task_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=True)
+
+    subject = db.relationship(
+        "Subject", backref=db.backref("summary", uselist=False, lazy=True)
+    )
+
+    @property
+    def duration_seconds(self):
+        """Session length in seconds, or None if there are no samples."""
+        if self.first_sample_at is None or self.last_sample_at is None:
+            return None
+        return (self.last_sample_at - self.first_sample_at).total_seconds()
+
+    @property
+    def mean_sampling_rate(self):
+        """Mean number of samples per second over the session."""
+        duration = self.duration_seconds
+        if not duration or self.sample_count < 2:
+            return None
+        return (self.sample_count - 1) / duration
+
+    def __str__(self):
+        return f"SubjectSummary {self.subject_id} - Samples: {self.sample_count}"
+
+    def __json__(self):
+        return {
+            "subject_id": self.subject_id,
+            "sample_count": self.sample_count,
+            "first_sample_at": (
+                self.first_sample_at.isoformat() if self.first_sample_at else None
+            ),
+            "last_sample_at": (
+                self.last_sample_at.isoformat() if self.last_sample_at else None
+            ),
+            "duration_seconds": self.duration_seconds,
+            "mean_sampling_rate": self.mean_sampling_rate,
+            "gaze_bbox": {
+                "min_x": self.min_gaze_x,
+                "max_x": self.max_gaze_x,
+                "min_y": self.min_gaze_y,
+                "max_y": self.max_gaze_y,
+            },
+            "task_count": self.task_count,
+        }
+
+
+class AoiMetricsCache(db.Model):
+    """Cached AOI metrics state of a subject, updated incrementally as samples arrive."""
+
+    __tablename__ = 'aoi_metrics_cache'
+
+    subject_id = db.Column(db.Integer, db.ForeignKey("subject.id"), primary_key=True)
+    # Hash of the AOI definitions the state was computed with
+    aoi_signature = db.Column(db.String(64), nullable=False)
+    last_measurement_id = db.Column(db.Integer, nullable=False, default=0)
+    state = db.Column(db.Text, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=True)
+
+
+class CalibrationQuality(db.Model):
+    """Accuracy and precision of a subject's calibration, from the validation run after calibrating."""
+
+    __tablename__ = 'calibration_quality'
+
+    subject_id = db.Column(db.Integer, db.ForeignKey("subject.id"), primary_key=True)
+    # Means over the validation targets, in CSS pixels
+    accuracy_px = db.Column(db.Float, nullable=True)
+    precision_px = db.Column(db.Float, nullable=True)
+    # The same as a fraction of the viewport diagonal
+    accuracy = db.Column(db.Float, nullable=True)
+    precision = db.Column(db.Float, nullable=True)
+    sample_count = db.Column(db.Integer, nullable=False, default=0)
+    # Per-target results (JSON)
+    targets = db.Column(db.Text, nullable=False, default="[]")
+    # Validation runs of the subject; only the last one is kept
+    attempts = db.Column(db.Integer, nullable=False, default=1)
+    updated_at = db.Column(db.DateTime, nullable=True)
+
+    subject = db.relationship(
+        "Subject", backref=db.backref("calibration", uselist=False, lazy=True)
+    )
+
+    def __str__(self):
+        return f"CalibrationQuality {self.subject_id} - Accuracy: {self.accuracy_px} px"
+
+    def __json__(self):
+        return {
+            "subject_id": self.subject_id,
+            "accuracy_px": self.accuracy_px,
+            "precision_px": self.precision_px,
+            "accuracy": self.accuracy,
+            "precision": self.precision,
+            "sample_count": self.sample_count,
+            "targets": json.loads(self.targets),
+            "attempts": self.attempts,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
+        }
+
 
 class Measurement(db.Model):
     """Represents a measurement associated with a subject, with specific points for mouse and gaze."""
     
     __tablename__ = 'measurement'
+    __table_args__ = (
+        db.Index('ix_measurement_subject_date', 'subject_id', 'date'),
+        # IDs of deleted or archived samples are never handed out again
+        {'sqlite_autoincrement': True},
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     date = db.Column(db.DateTime, nullable=False)
@@ -79,6 +260,10 @@ class Point(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     x = db.Column(db.Float, nullable=False)
     y = db.Column(db.Float, nullable=False)
+    # x and y as a fraction of the subject's viewport (0-1 inside it);
+    # NULL until the viewport is known
+    nx = db.Column(db.Float, nullable=True)
+    ny = db.Column(db.Float, nullable=True)
 
     def __str__(self):
         return f"Point ({self.x}, {self.y})"
@@ -87,10 +272,47 @@ class Point(db.Model):
         return {"x": self.x, "y": self.y}
 
 
+class SampleBlock(db.Model):
+    """
+    Archived samples of a subject, packed into one compressed block.
+
+    Blocks replace the measurement and point rows of completed sessions (see
+    ``db.sample_codec``). The columns besides ``data`` let reads and
+    summaries skip or aggregate blocks without decoding them.
+    """
+
+    __tablename__ = 'sample_block'
+    __table_args__ = (
+        db.Index('ix_sample_block_subject_first', 'subject_id', 'first_sample_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    subject_id = db.Column(db.Integer, db.ForeignKey("subject.id"), nullable=False)
+    codec = db.Column(db.String(16), nullable=False)
+    sample_count = db.Column(db.Integer, nullable=False)
+    first_sample_at = db.Column(db.DateTime, nullable=False)
+    last_sample_at = db.Column(db.DateTime, nullable=False)
+    # Range of the original measurement IDs, kept in the block
+    min_measurement_id = db.Column(db.Integer, nullable=False)
+    max_measurement_id = db.Column(db.Integer, nullable=False)
+    min_gaze_x = db.Column(db.Float, nullable=True)
+    max_gaze_x = db.Column(db.Float, nullable=True)
+    min_gaze_y = db.Column(db.Float, nullable=True)
+    max_gaze_y = db.Column(db.Float, nullable=True)
+    data = db.Column(db.LargeBinary, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False)
+
+    def __str__(self):
+        return f"SampleBlock {self.id} - Subject: {self.subject_id}, Samples: {self.sample_count}"
+
+
 class TaskLog(db.Model):
     """Represents a log of a task performed by a subject."""
     
     __tablename__ = 'task_log'
+    __table_args__ = (
+        db.Index('ix_task_log_subject_start', 'subject_id', 'start_time'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     start_time = db.Column(db.DateTime, nullable=False)
@@ -0,0 +1,182 @@
+"""
+Compact binary encoding of archived samples.
+
+A block holds the samples of one subject, ordered by time, as columns:
+measurement IDs and timestamps (microseconds) are delta-encoded, gaze and
+mouse coordinates are quantized to 1/``COORDINATE_SCALE`` pixels and
+delta-encoded over the samples that have them, and presence bitmaps mark
+the samples without a gaze or mouse point. The normalized gaze coordinates
+(relative to the viewport the sample was recorded with) are kept the same
+way, in units of 1/``NORMALIZED_SCALE`` of the viewport, with their own
+bitmap since samples recorded before the viewport was known have none
+(version 1 blocks have no normalized coordinates at all). Every column is byte-shuffled
+(all first bytes, then all second bytes...) so the mostly-zero high bytes
+of the small deltas end up together, and the whole payload is compressed
+with zstd when the ``zstandard`` package is installed, zlib otherwise.
+"""
+
+import struct
+import zlib
+from typing import Dict, Optional, Tuple
+import numpy as np
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Coordinates are stored as integers in units of 1/COORDINATE_SCALE pixels
+COORDINATE_SCALE = 100
+# Normalized coordinates are stored in units of 1/NORMALIZED_SCALE of the viewport
+NORMALIZED_SCALE = 1000000
+ZLIB_LEVEL = 9
+ZSTD_LEVEL = 19
+
+_MAGIC = b"GZB"
+_VERSION = 2
+_HEADER = struct.Struct("<3sBIII")  # magic, version, samples, gaze points, mouse points
+_NORMALIZED_COUNT = struct.Struct("<I")  # normalized gaze points (version 2)
+
+
+def _shuffle(values: np.ndarray) -> bytes:
+    return values.view(np.uint8).reshape(-1, values.itemsize).T.tobytes()
+
+
+def _unshuffle(buffer: bytes, offset: int, count: int, dtype: str) -> Tuple[np.ndarray, int]:
+    dtype = np.dtype(dtype)
+    size = count * dtype.itemsize
+    planes = np.frombuffer(buffer, dtype=np.uint8, count=size, offset=offset)
+    values = planes.reshape(dtype.itemsize, count).T.copy().view(dtype).ravel()
+    return values, offset + size
+
+
+def _delta(values: np.ndarray, dtype: str) -> np.ndarray:
+    return np.diff(values, prepend=0).astype(dtype)
+
+
+def _quantize(values: np.ndarray, scale: int = COORDINATE_SCALE) -> np.ndarray:
+    return np.round(values * scale).astype(np.int64)
+
+
+def encode_samples(
+    ids: np.ndarray,
+    timestamps: np.ndarray,
+    gaze_x: np.ndarray,
+    gaze_y: np.ndarray,
+    mouse_x: np.ndarray,
+    mouse_y: np.ndarray,
+    gaze_nx: Optional[np.ndarray] = None,
+    gaze_ny: Optional[np.ndarray] = None,
+) -> Tuple[str, bytes]:
+    """
+    Encode the samples of one block.
+
+    Args:
+        ids: Measurement IDs
+        timestamps: Sample times (int64 microseconds, ascending)
+        gaze_x: Gaze X coordinates (NaN where there is no gaze point)
+        gaze_y: Gaze Y coordinates
+        mouse_x: Mouse X coordinates (NaN where there is no mouse point)
+        mouse_y: Mouse Y coordinates
+        gaze_nx: Normalized gaze X coordinates (NaN where unknown; all
+            unknown if None)
+        gaze_ny: Normalized gaze Y coordinates
+
+    Returns:
+        (codec, data): the compression used ("zstd" or "zlib") and the
+        encoded block
+    """
+    ids = np.asarray(ids, dtype=np.int64)
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    gaze = np.isfinite(gaze_x) & np.isfinite(gaze_y)
+    mouse = np.isfinite(mouse_x) & np.isfinite(mouse_y)
+    if gaze_nx is None or gaze_ny is None:
+        gaze_nx = gaze_ny = np.full(len(ids), np.nan)
+    normalized = np.isfinite(gaze_nx) & np.isfinite(gaze_ny)
+
+    parts = [
+        _HEADER.pack(_MAGIC, _VERSION, len(ids), int(gaze.sum()), int(mouse.sum())),
+        _NORMALIZED_COUNT.pack(int(normalized.sum())),
+        np.packbits(gaze).tobytes(),
+        np.packbits(mouse).tobytes(),
+        np.packbits(normalized).tobytes(),
+        _shuffle(_delta(ids, "<i8")),
+        _shuffle(_delta(timestamps, "<i8")),
+    ]
+    for values, present, scale in (
+        (gaze_x, gaze, COORDINATE_SCALE),
+        (gaze_y, gaze, COORDINATE_SCALE),
+        (mouse_x, mouse, COORDINATE_SCALE),
+        (mouse_y, mouse, COORDINATE_SCALE),
+        (gaze_nx, normalized, NORMALIZED_SCALE),
+        (gaze_ny, normalized, NORMALIZED_SCALE),
+    ):
+        quantized = _quantize(np.asarray(values, dtype=float)[present], scale)
+        parts.append(_shuffle(_delta(quantized, "<i8")))
+    payload = b"".join(parts)
+
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(payload)
+    return "zlib", zlib.compress(payload, ZLIB_LEVEL)
+
+
+def decode_samples(codec: str, data: bytes) -> Dict[str, np.ndarray]:
+    """
+    Decode a block produced by ``encode_samples`` (of this or an earlier version).
+
+    Args:
+        codec: Compression of the block ("zstd" or "zlib")
+        data: The encoded block
+
+    Returns:
+        Dictionary with ``id``, ``timestamp`` (int64 microseconds),
+        ``gaze_x``, ``gaze_y``, ``mouse_x``, ``mouse_y``, ``gaze_nx`` and
+        ``gaze_ny`` arrays (NaN where a point, or its normalized
+        coordinates, are missing)
+    """
+    if codec == "zlib":
+        payload = zlib.decompress(data)
+    elif codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("This sample block is zstd-compressed; install the 'zstandard' package to read it.")
+        payload = zstandard.ZstdDecompressor().decompress(data)
+    else:
+        raise ValueError(f"Unknown sample block codec '{codec}'.")
+
+    magic, version, count, gaze_count, mouse_count = _HEADER.unpack_from(payload)
+    if magic != _MAGIC or not 1 <= version <= _VERSION:
+        raise ValueError("Not a sample block, or written by a newer version.")
+
+    offset = _HEADER.size
+    normalized_count = 0
+    if version >= 2:
+        (normalized_count,) = _NORMALIZED_COUNT.unpack_from(payload, offset)
+        offset += _NORMALIZED_COUNT.size
+    mask_size = (count + 7) // 8
+    gaze = np.unpackbits(np.frombuffer(payload, np.uint8, mask_size, offset), count=count).astype(bool)
+    offset += mask_size
+    mouse = np.unpackbits(np.frombuffer(payload, np.uint8, mask_size, offset), count=count).astype(bool)
+    offset += mask_size
+    normalized = np.zeros(count, dtype=bool)
+    if version >= 2:
+        normalized = np.unpackbits(np.frombuffer(payload, np.uint8, mask_size, offset), count=count).astype(bool)
+        offset += mask_size
+
+    ids, offset = _unshuffle(payload, offset, count, "<i8")
+    timestamps, offset = _unshuffle(payload, offset, count, "<i8")
+    samples = {"id": np.cumsum(ids), "timestamp": np.cumsum(timestamps)}
+
+    for name, present, present_count, scale in (
+        ("gaze_x", gaze, gaze_count, COORDINATE_SCALE),
+        ("gaze_y", gaze, gaze_count, COORDINATE_SCALE),
+        ("mouse_x", mouse, mouse_count, COORDINATE_SCALE),
+        ("mouse_y", mouse, mouse_count, COORDINATE_SCALE),
+        ("gaze_nx", normalized, normalized_count, NORMALIZED_SCALE),
+        ("gaze_ny", normalized, normalized_count, NORMALIZED_SCALE),
+    ):
+        deltas, offset = _unshuffle(payload, offset, present_count, "<i8")
+        values = np.full(count, np.nan)
+        values[present] = np.cumsum(deltas) / scale
+        samples[name] = values
+
+    return samples
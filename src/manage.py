@@ -0,0 +1,271 @@
+"""
+Database maintenance commands. Safe to run while the server is up: large
+deletions and cleanups are done in short transactions.
+
+    python src/manage.py delete-study 3
+    python src/manage.py delete-subject 42
+    python src/manage.py cleanup
+    python src/manage.py compact [--full]
+    python src/manage.py analyze
+    python src/manage.py rebuild-summaries [--subject-id 42]
+    python src/manage.py archive-samples [--idle-minutes 60]
+    python src/manage.py archive-study 3 [--output-dir DIR] [--keep]
+    python src/manage.py archive-studies [--older-than-days 180] [--output-dir DIR] [--dry-run]
+    python src/manage.py run [--interval 60] [--full-vacuum]
+    python src/manage.py backup [--output-dir DIR] [--no-compress] [--keep 7]
+    python src/manage.py verify-backup FILE
+    python src/manage.py import-points FILE [--study-id 3] [--subject-id 42] [--map date=Time ...]
+    python src/manage.py migrate
+"""
+
+import argparse
+import os
+import sys
+import time
+from flask import current_app
+
+basedir = os.path.abspath(os.path.dirname(__file__))
+if basedir not in sys.path:
+    sys.path.insert(0, basedir)
+
+from api.importers import CHUNK_ROWS, COLUMN_ALIASES, FILE_FORMATS
+from api.services import (
+    ARCHIVE_IDLE_MINUTES,
+    STUDY_RETENTION_DAYS,
+    BackupService,
+    ImportService,
+    MaintenanceService,
+    SummaryService,
+)
+from app import create_app, get_db_manager
+from state import get_component
+
+ARCHIVE_DIR = os.path.join(basedir, "instance", "archive")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="User Gaze Track database maintenance")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("delete-study", help="Delete a study with its subjects and samples")
+    command.add_argument("study_id", type=int)
+
+    command = commands.add_parser("delete-subject", help="Delete a subject with its samples")
+    command.add_argument("subject_id", type=int)
+
+    commands.add_parser("cleanup", help="Delete orphaned measurements and points")
+
+    command = commands.add_parser("compact", help="Release unused pages to the file system")
+    command.add_argument("--full", action="store_true",
+                         help="Run a full VACUUM (blocks writers; needed once per database "
+                              "to enable incremental compaction)")
+
+    commands.add_parser("analyze", help="Refresh the query planner statistics")
+
+    command = commands.add_parser("rebuild-summaries",
+                                  help="Recompute subject summaries from the stored samples and task logs")
+    command.add_argument("--subject-id", type=int, help="Only rebuild this subject")
+
+    command = commands.add_parser("archive-samples", help="Pack idle sessions into compressed blocks")
+    command.add_argument("--idle-minutes", type=int, default=ARCHIVE_IDLE_MINUTES)
+
+    command = commands.add_parser("archive-study", help="Move a study to its own database file")
+    command.add_argument("study_id", type=int)
+    command.add_argument("--output-dir", default=ARCHIVE_DIR)
+    command.add_argument("--keep", action="store_true", help="Write the file but keep the study")
+
+    command = commands.add_parser("archive-studies", help="Move inactive studies to their own files")
+    command.add_argument("--older-than-days", type=int, default=STUDY_RETENTION_DAYS)
+    command.add_argument("--output-dir", default=ARCHIVE_DIR)
+    command.add_argument("--dry-run", action="store_true", help="Only list the studies")
+
+    command = commands.add_parser("run", help="Archive idle sessions, clean up, compact and analyze")
+    command.add_argument("--idle-minutes", type=int, default=ARCHIVE_IDLE_MINUTES)
+    command.add_argument("--interval", type=float,
+                         help="Repeat every INTERVAL minutes until interrupted")
+    command.add_argument("--full-vacuum", action="store_true")
+
+    command = commands.add_parser("backup", help="Back up the database while the server is running")
+    command.add_argument("--output-dir", help="Directory of the backups (config key 'backup_dir')")
+    command.add_argument("--no-compress", dest="compress", action="store_false", default=None,
+                         help="Do not gzip the backup (config key 'backup_compress')")
+    command.add_argument("--keep", type=int, help="Backups to keep (config key 'backup_keep')")
+
+    command = commands.add_parser("verify-backup", help="Restore a backup to a temporary file and check it")
+    command.add_argument("path")
+
+    command = commands.add_parser("import-points", help="Import samples from a CSV or Parquet file")
+    command.add_argument("path")
+    command.add_argument("--study-id", type=int,
+                         help="Study to import into (default: the study of the current configuration)")
+    command.add_argument("--subject-id", type=int,
+                         help="Append every row to this subject instead of creating subjects")
+    command.add_argument("--map", action="append", default=[], metavar="FIELD=COLUMN",
+                         help=f"Column of a field ({', '.join(COLUMN_ALIASES)}) when its name differs")
+    command.add_argument("--viewport", metavar="WIDTHxHEIGHT",
+                         help="Viewport of the recorded sessions, to store normalized coordinates")
+    command.add_argument("--format", choices=FILE_FORMATS, help="File format (default: from the extension)")
+    command.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help="Rows per transaction")
+
+    commands.add_parser("migrate", help="Rebuild tables created by older versions without AUTOINCREMENT IDs "
+                                        "(blocks writers while it runs)")
+    return parser.parse_args(argv)
+
+
+def format_counts(counts):
+    return ", ".join(f"{count} {name}" for name, count in counts.items() if count) or "nothing"
+
+
+def format_size(size):
+    return f"{size / 1024 / 1024:.1f} MB"
+
+
+def print_compaction(result):
+    before, after = result["before"], result["after"]
+    if not before:
+        print("⚠️  Compaction is only supported for SQLite")
+    elif result["mode"] is None:
+        print(f"⚠️  {format_size(before['free_bytes'])} unused, but the database is not in incremental "
+              f"auto-vacuum mode. Run 'compact --full' once (it blocks writers while it runs).")
+    else:
+        print(f"🗜️  {format_size(before['size_bytes'])} -> {format_size(after['size_bytes'])} "
+              f"({result['mode']} vacuum)")
+
+
+def print_archived_study(result):
+    print(f"📦 Study {result['study_id']} written to {result['path']} ({format_counts(result['rows'])})")
+    if result["deleted"] is not None:
+        print(f"🗑️  Deleted {format_counts(result['deleted'])}")
+
+
+def import_points(args):
+    mapping = dict(item.split("=", 1) for item in args.map)
+    viewport = tuple(int(value) for value in args.viewport.lower().split("x")) if args.viewport else None
+    study_id = args.study_id
+    if study_id is None:
+        active = get_component(MaintenanceService).get_active_study()
+        if active is None:
+            sys.exit("❌ No study for the current configuration; pass --study-id")
+        study_id = active.id
+
+    started = time.perf_counter()
+
+    def progress(rows):
+        rate = rows / max(time.perf_counter() - started, 1e-9)
+        print(f"\r📥 {rows:,} rows ({rate:,.0f} rows/s)", end="", flush=True)
+
+    result = get_component(ImportService).import_points(
+        args.path, study_id, args.subject_id, mapping, viewport,
+        chunk_rows=args.chunk_rows, file_format=args.format, progress=progress,
+    )
+    print()
+    print(f"✅ Imported {result['imported']:,} samples into study {study_id} "
+          f"({result['skipped']:,} rows without a date or with invalid values skipped)")
+    if result["invalid"]:
+        lines = ", ".join(str(line) for line in result["invalid_lines"])
+        more = "..." if result["invalid"] > len(result["invalid_lines"]) else ""
+        print(f"⚠️  {result['invalid']:,} rows with invalid values (lines {lines}{more})")
+    for key, subject_id in result["subjects"].items():
+        print(f"   Subject {subject_id}: {key}")
+
+
+def run_command(args, service):
+    if args.command == "delete-study":
+        counts = service.delete_study(args.study_id)
+        if counts is None:
+            sys.exit(f"❌ Study {args.study_id} not found")
+        print(f"🗑️  Deleted {format_counts(counts)}")
+
+    elif args.command == "delete-subject":
+        counts = service.delete_subject(args.subject_id)
+        if counts is None:
+            sys.exit(f"❌ Subject {args.subject_id} not found")
+        print(f"🗑️  Deleted {format_counts(counts)}")
+
+    elif args.command == "cleanup":
+        print(f"🧹 Deleted {format_counts(service.cleanup())}")
+
+    elif args.command == "compact":
+        print_compaction(service.compact(full=args.full))
+
+    elif args.command == "analyze":
+        service.analyze()
+        print("📊 Planner statistics updated")
+
+    elif args.command == "rebuild-summaries":
+        result = get_component(SummaryService).rebuild(args.subject_id)
+        print(f"📊 Rebuilt {result['rebuilt']} summaries")
+
+    elif args.command == "archive-samples":
+        result = service.archive_service.archive(idle_minutes=args.idle_minutes)
+        print(f"📦 Archived {result['archived_samples']} samples of {result['archived_subjects']} subjects")
+
+    elif args.command == "archive-study":
+        result = service.archive_study(args.study_id, args.output_dir, delete=not args.keep)
+        if result is None:
+            sys.exit(f"❌ Study {args.study_id} not found")
+        print_archived_study(result)
+
+    elif args.command == "archive-studies":
+        studies = service.get_archivable_studies(args.older_than_days)
+        if not studies:
+            print(f"📊 No study without new data for {args.older_than_days} days")
+        for study in studies:
+            if args.dry_run:
+                print(f"📋 Study {study.id}: '{study.name}' (created {study.created_at:%Y-%m-%d})")
+            else:
+                print_archived_study(service.archive_study(study.id, args.output_dir))
+
+    elif args.command == "run":
+        while True:
+            result = service.run(idle_minutes=args.idle_minutes, full_vacuum=args.full_vacuum)
+            print(f"📦 Archived {result['archive']['archived_samples']} samples "
+                  f"of {result['archive']['archived_subjects']} subjects")
+            print(f"🧹 Deleted {format_counts(result['orphans'])}")
+            print_compaction(result["compact"])
+            print("📊 Planner statistics updated")
+            if not args.interval:
+                break
+            time.sleep(args.interval * 60)
+
+    elif args.command == "backup":
+        try:
+            result = get_component(BackupService).backup(args.output_dir, args.compress, args.keep)
+        except (FileExistsError, RuntimeError) as e:
+            sys.exit(f"❌ {e}")
+        print(f"💾 {result['path']} ({format_size(result['size_bytes'])}, "
+              f"{len(result['studies'])} studies verified)")
+        for name in result["removed"]:
+            print(f"🗑️  Rotated out {name}")
+
+    elif args.command == "verify-backup":
+        result = get_component(BackupService).verify(args.path)
+        for problem in result["problems"]:
+            print(f"❌ {problem}")
+        if not result["ok"]:
+            sys.exit(1)
+        print(f"✅ {result['path']}: {result['studies']} studies match the manifest")
+
+    elif args.command == "import-points":
+        try:
+            import_points(args)
+        except (ValueError, RuntimeError) as e:
+            sys.exit(f"\n❌ {e}")
+
+    elif args.command == "migrate":
+        rebuilt = get_db_manager(current_app).add_autoincrement()
+        if rebuilt:
+            print(f"✅ Rebuilt {', '.join(rebuilt)} with AUTOINCREMENT IDs")
+        else:
+            print("✅ Nothing to migrate")
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    app = create_app({"SWAGGER_ENABLED": False, "METRICS_ENABLED": False})
+    get_db_manager(app).create_all()
+    with app.app_context():
+        try:
+            run_command(args, get_component(MaintenanceService))
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,21 @@
+"""
+Runtime instrumentation: request/ingest metrics exposed at ``/metrics``,
+opt-in SQL profiling and the live ingest monitor.
+"""
+
+from .live import MONITOR, LiveMonitor, live_bp
+from .metrics import REGISTRY, init_metrics, record_samples, record_tasklogs
+from .profiler import QueryProfile, explain, init_profiler
+
+__all__ = [
+    'MONITOR',
+    'REGISTRY',
+    'LiveMonitor',
+    'QueryProfile',
+    'explain',
+    'init_metrics',
+    'init_profiler',
+    'live_bp',
+    'record_samples',
+    'record_tasklogs',
+]
@@ -0,0 +1,280 @@
+"""
+Live ingest monitor streamed as server-sent events.
+
+The monitor keeps, per subject, the sample count, the ingest rate over the
+last few seconds, the latest gaze position and a low-resolution gaze heatmap
+that fades over time. Browsers subscribe to ``/monitor/stream`` and receive
+the subjects that changed, at most once per interval.
+
+The state is fed from the database rather than from the ingest requests, so
+with several gunicorn workers every stream sees the batches stored by all of
+them. While a worker has subscribers, one feed thread reads the measurement
+rows stored since the previous interval (a range scan on the primary key);
+watching a study costs work proportional to the new samples and never
+re-reads a session. The counts of the subjects already active when the feed
+starts come from their ``subject_summary`` rows.
+
+Every open stream holds one server thread (a gunicorn ``gthread`` slot or a
+waitress thread) for as long as the page is open, which is one thread fewer
+for the stations.
+"""
+
+import json
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, Iterator, Optional
+import numpy as np
+from flask import Blueprint, Response, current_app
+from sqlalchemy.exc import SQLAlchemyError
+from db import db
+from repositories import MeasurementRepository, SubjectSummaryRepository
+
+# Heatmap cells (columns, rows) over the expected screen size in pixels
+HEATMAP_BINS = (32, 18)
+HEATMAP_EXTENT = (1920, 1080)
+# Seconds for old gaze to lose half of its weight in the heatmap
+HEATMAP_HALF_LIFE = 30.0
+# Seconds over which the ingest rate is averaged
+RATE_WINDOW = 10.0
+# Subjects without batches for this many seconds are dropped
+FORGET_AFTER = 600.0
+# Seconds between updates sent to one subscriber, and between keep-alives
+STREAM_INTERVAL = 1.0
+HEARTBEAT_INTERVAL = 15.0
+# Measurement rows read by the feed per query, and seconds a new subscriber
+# waits for the feed to load the active subjects
+FEED_BATCH_SIZE = 20000
+FEED_START_TIMEOUT = 5.0
+
+
+class SubjectActivity:
+    """Live ingest state of one subject."""
+
+    def __init__(self, subject_id: int, now: float):
+        self.subject_id = subject_id
+        self.samples = 0
+        self.first_seen = now
+        self.last_seen = now
+        self.last_sample_at = None
+        self.last_gaze = None
+        self.recent = deque()  # (time, samples) of the batches in the rate window
+        self.heatmap = np.zeros(HEATMAP_BINS[::-1])
+        self.heatmap_at = now
+
+    @classmethod
+    def from_summary(cls, summary, now: float) -> "SubjectActivity":
+        """Activity of a subject seen before the feed started, from its summary."""
+        activity = cls(summary.subject_id, now)
+        activity.samples = summary.sample_count
+        activity.last_seen = summary.updated_at.timestamp()
+        activity.last_sample_at = summary.last_sample_at
+        return activity
+
+    def update(self, now: float, gaze: np.ndarray, last_sample_at) -> None:
+        """Add one stored batch (``gaze`` is an (n, 2) array in pixels, NaN for failed predictions)."""
+        self.samples += len(gaze)
+        self.last_seen = now
+        self.last_sample_at = last_sample_at
+        self.recent.append((now, len(gaze)))
+        while self.recent and self.recent[0][0] < now - RATE_WINDOW:
+            self.recent.popleft()
+
+        gaze = gaze[np.isfinite(gaze).all(axis=1)]
+        if len(gaze):
+            self.last_gaze = (float(gaze[-1, 0]), float(gaze[-1, 1]))
+            self.heatmap *= 0.5 ** ((now - self.heatmap_at) / HEATMAP_HALF_LIFE)
+            self.heatmap_at = now
+            columns = np.clip((gaze[:, 0] / HEATMAP_EXTENT[0] * HEATMAP_BINS[0]).astype(int), 0, HEATMAP_BINS[0] - 1)
+            rows = np.clip((gaze[:, 1] / HEATMAP_EXTENT[1] * HEATMAP_BINS[1]).astype(int), 0, HEATMAP_BINS[1] - 1)
+            np.add.at(self.heatmap, (rows, columns), 1)
+
+    def rate(self, now: float) -> float:
+        """Samples per second stored over the last ``RATE_WINDOW`` seconds."""
+        recent = sum(count for at, count in self.recent if at >= now - RATE_WINDOW)
+        return recent / min(RATE_WINDOW, max(now - self.first_seen, 1.0))
+
+    def __json__(self, now: float) -> dict:
+        peak = self.heatmap.max()
+        heatmap = (self.heatmap / peak * 255).round().astype(int) if peak > 0 else self.heatmap.astype(int)
+        return {
+            "subject_id": self.subject_id,
+            "samples": self.samples,
+            "rate": round(self.rate(now), 1),
+            "idle_seconds": round(now - self.last_seen, 1),
+            "last_sample_at": self.last_sample_at.isoformat() if self.last_sample_at else None,
+            "gaze": self.last_gaze,
+            "heatmap": {
+                "columns": HEATMAP_BINS[0],
+                "rows": HEATMAP_BINS[1],
+                "width": HEATMAP_EXTENT[0],
+                "height": HEATMAP_EXTENT[1],
+                "cells": heatmap.ravel().tolist(),
+            },
+        }
+
+
+class _Subscription:
+    """Subjects changed since a subscriber's last update."""
+
+    def __init__(self):
+        self.changed = set()
+        self.wakeup = threading.Event()
+
+
+class LiveMonitor:
+    """In-memory publish/subscribe of per-subject ingest activity."""
+
+    def __init__(self):
+        self._subjects: Dict[int, SubjectActivity] = {}
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+        self._feed = None
+        self._feed_ready = None
+
+    def publish(self, subject_id: int, gaze, last_sample_at=None, now: Optional[float] = None) -> None:
+        """
+        Record a stored batch and notify the subscribers.
+
+        Args:
+            subject_id: The ID of the subject
+            gaze: (x, y) gaze coordinates of the batch
+            last_sample_at: Date/time of the newest sample in the batch
+            now: Current time (defaults to ``time.time()``)
+        """
+        now = time.time() if now is None else now
+        gaze = np.asarray(gaze, dtype=float).reshape(-1, 2)
+        with self._lock:
+            activity = self._subjects.get(subject_id)
+            if activity is None:
+                activity = self._subjects[subject_id] = SubjectActivity(subject_id, now)
+            activity.update(now, gaze, last_sample_at)
+            for subscription in self._subscriptions:
+                subscription.changed.add(subject_id)
+                subscription.wakeup.set()
+
+    def snapshot(self, subject_ids=None, now: Optional[float] = None) -> list:
+        """JSON state of the given subjects (all recently active ones if None)."""
+        now = time.time() if now is None else now
+        with self._lock:
+            for subject_id in [s for s, a in self._subjects.items() if now - a.last_seen > FORGET_AFTER]:
+                del self._subjects[subject_id]
+            ids = sorted(self._subjects) if subject_ids is None else sorted(subject_ids)
+            return [self._subjects[s].__json__(now) for s in ids if s in self._subjects]
+
+    def publish_rows(self, rows: Dict[str, np.ndarray], now: Optional[float] = None) -> None:
+        """Record measurement rows of any number of subjects (see ``MeasurementRepository.get_rows_after``)."""
+        gaze = np.column_stack([rows["gaze_x"], rows["gaze_y"]])
+        for subject_id in np.unique(rows["subject_id"]):
+            batch = rows["subject_id"] == subject_id
+            self.publish(int(subject_id), gaze[batch], max(rows["date"][batch]), now)
+
+    def _follow(self, app, interval: float, ready: threading.Event) -> None:
+        """Feed the monitor from the database until the last subscriber leaves."""
+        with app.app_context():
+            measurements = MeasurementRepository()
+            summaries = SubjectSummaryRepository()
+            try:
+                now = time.time()
+                active = summaries.get_updated_since(datetime.fromtimestamp(now - FORGET_AFTER))
+                cursor = measurements.get_max_id()
+                with self._lock:
+                    self._subjects = {s.subject_id: SubjectActivity.from_summary(s, now) for s in active}
+            finally:
+                db.session.remove()
+                ready.set()
+
+            while True:
+                with self._lock:
+                    if not self._subscriptions:
+                        self._feed = None
+                        return
+                try:
+                    rows = measurements.get_rows_after(cursor, FEED_BATCH_SIZE)
+                except SQLAlchemyError:
+                    app.logger.warning("Live monitor feed query failed", exc_info=True)
+                    rows = None
+                finally:
+                    # End the read so the next query sees newly committed batches
+                    db.session.remove()
+                if rows is not None and len(rows["id"]):
+                    cursor = int(rows["id"][-1])
+                    self.publish_rows(rows)
+                if rows is None or len(rows["id"]) < FEED_BATCH_SIZE:
+                    time.sleep(interval)
+
+    def stream(
+        self, app=None, interval: float = STREAM_INTERVAL, heartbeat: float = HEARTBEAT_INTERVAL
+    ) -> Iterator[str]:
+        """
+        Server-sent events for one subscriber.
+
+        Sends a ``snapshot`` event with every active subject, then an
+        ``update`` event with the subjects that changed, at most once per
+        ``interval``; a comment keeps idle connections open. With an
+        ``app``, the first subscriber starts the database feed and the last
+        one stops it; without one, only ``publish`` calls are streamed.
+        """
+        subscription = _Subscription()
+        with self._lock:
+            self._subscriptions.add(subscription)
+            if app is not None and self._feed is None:
+                self._feed_ready = threading.Event()
+                self._feed = threading.Thread(
+                    target=self._follow,
+                    args=(app, interval, self._feed_ready),
+                    name="live-monitor-feed",
+                    daemon=True,
+                )
+                self._feed.start()
+            ready = self._feed_ready if app is not None else None
+        if ready is not None:
+            ready.wait(FEED_START_TIMEOUT)
+        try:
+            yield _event("snapshot", {"interval": interval, "subjects": self.snapshot()})
+            sent_at = time.monotonic()
+            while True:
+                if not subscription.wakeup.wait(heartbeat):
+                    yield ": keep-alive\n\n"
+                    continue
+                # Let batches from other stations accumulate into one update
+                time.sleep(max(0.0, sent_at + interval - time.monotonic()))
+                with self._lock:
+                    changed, subscription.changed = subscription.changed, set()
+                    subscription.wakeup.clear()
+                yield _event("update", {"subjects": self.snapshot(changed)})
+                sent_at = time.monotonic()
+        finally:
+            with self._lock:
+                self._subscriptions.discard(subscription)
+
+
+def _event(name: str, data) -> str:
+    return f"event: {name}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+MONITOR = LiveMonitor()
+
+
+live_bp = Blueprint("live", __name__)
+
+
+@live_bp.route("/monitor/stream")
+def monitor_stream():
+    """
+    Live ingest activity per subject as server-sent events.
+    ---
+    tags:
+      - api
+    produces:
+      - text/event-stream
+    responses:
+        200:
+            description: "`snapshot` event with the active subjects, then `update` events with the subjects that changed."
+    """
+    return Response(
+        MONITOR.stream(current_app._get_current_object()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,443 @@
+"""
+Request metrics in Prometheus text format.
+
+A small in-process implementation (counters and cumulative histograms
+guarded by a lock) so the ingest hot path pays a few dictionary updates per
+request and nothing else.
+
+Gunicorn runs several worker processes and a scrape reaches only one of
+them. With a shared directory (``MetricsRegistry.share``), every process
+writes a snapshot of its metrics there every few seconds, and a scrape adds
+the snapshots of the other processes of the same server to its own values,
+so counters and histograms cover the whole server.
+
+Snapshots are named after the server run (the PID and start time of the
+process that called ``share``, i.e. the gunicorn master or the single
+server process), so a restarted server never adds the counts of earlier
+runs. Snapshots of earlier runs are deleted once their process is gone, or
+at once when it had the current process's PID (containers run every server
+as PID 1). Snapshots of workers of the current run that exited are kept as
+"retired", so counters and histograms never go backwards when gunicorn
+replaces a worker; their gauges are dropped.
+"""
+
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+from flask import Blueprint, Response, g, has_request_context, request
+from sqlalchemy import event
+
+# Seconds; tuned for SQLite-backed endpoints (sub-millisecond to a few seconds)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Bytes; a save-points batch is a few KB, exports are MB
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+# Samples per save-points request
+BATCH_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds between the snapshots each process writes to the shared directory
+SNAPSHOT_INTERVAL = 5.0
+# Snapshots of other runs not updated for this long are deleted even if
+# their server's PID is still in use (it may belong to another process now)
+STALE_SNAPSHOT_SECONDS = 60.0
+
+
+def _pid_alive(pid: int) -> bool:
+    """Whether a process with this PID exists (always True on Windows, where signal 0 is Ctrl-C)."""
+    if os.name == "nt":
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in zip(names, values)
+    ]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, *labels: str) -> None:
+        """Add ``amount`` to the series identified by ``labels``."""
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dump(self) -> list:
+        """Series as JSON-serializable ``[labels, value]`` pairs."""
+        with self._lock:
+            return [[list(labels), value] for labels, value in self._values.items()]
+
+    @staticmethod
+    def _combine(first: float, second: float) -> float:
+        return first + second
+
+    def samples(self, others: Iterable[list] = ()) -> Iterable[str]:
+        """Exposition lines, combined with the ``dump`` of other processes."""
+        with self._lock:
+            values = dict(self._values)
+        for dump in others:
+            for labels, value in dump:
+                labels = tuple(labels)
+                values[labels] = value if labels not in values else self._combine(values[labels], value)
+        for labels, value in sorted(values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class Gauge(Counter):
+    """Value that can go up and down. Across processes the smallest value is reported."""
+
+    kind = "gauge"
+
+    @staticmethod
+    def _combine(first: float, second: float) -> float:
+        return min(first, second)
+
+    def set(self, value: float, *labels: str) -> None:
+        """Set the series identified by ``labels`` to ``value``."""
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram:
+    """Cumulative histogram with optional labels."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (last one is +Inf), sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        """Record one observation in the series identified by ``labels``."""
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def dump(self) -> list:
+        """Series as JSON-serializable ``[labels, bucket counts, sum]`` triples."""
+        with self._lock:
+            return [[list(labels), list(counts), total] for labels, (counts, total) in self._series.items()]
+
+    def samples(self, others: Iterable[list] = ()) -> Iterable[str]:
+        """Exposition lines, combined with the ``dump`` of other processes."""
+        with self._lock:
+            merged = {labels: (list(counts), total) for labels, (counts, total) in self._series.items()}
+        for dump in others:
+            for labels, counts, total in dump:
+                labels = tuple(labels)
+                if len(counts) != len(self.buckets) + 1:
+                    continue
+                if labels in merged:
+                    own, own_total = merged[labels]
+                    counts, total = [a + b for a, b in zip(own, counts)], own_total + total
+                merged[labels] = (list(counts), total)
+        for labels, (counts, total) in sorted(merged.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="{}"'.format(_format_value(bound if bound == float("inf") else float(bound)))
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}"
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together."""
+
+    def __init__(self):
+        self._metrics = []
+        self._directory = None
+        self._run = None
+        self._writer_pid = None
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def share(self, directory: str) -> None:
+        """
+        Aggregate the metrics of every process of the server through ``directory``.
+
+        Starts a new server run: the processes forked from this one after
+        the call share its run and are told apart from other runs and other
+        servers using the same directory by it.
+
+        Args:
+            directory: Directory for the per-process snapshots (created if needed)
+        """
+        os.makedirs(directory, exist_ok=True)
+        self._directory = directory
+        self._run = f"{os.getpid()}.{time.time_ns()}"
+        self._other_snapshots()
+
+    def _prefix(self) -> str:
+        return f"{self._run}_"
+
+    def _expired(self, run: str, path: str, retired: bool) -> bool:
+        """Whether a snapshot of another run can be deleted."""
+        master, _, started = run.partition(".")
+        if not master.isdigit() or not started.isdigit():
+            return True  # not written by this version
+        if int(master) == os.getpid() or int(master) == int(self._run.partition(".")[0]):
+            return True  # an earlier run of this process (or of this PID)
+        if not _pid_alive(int(master)):
+            return True
+        # Retired snapshots are never rewritten, so their age says nothing
+        return not retired and time.time() - os.path.getmtime(path) > STALE_SNAPSHOT_SECONDS
+
+    def write_snapshot(self) -> None:
+        """Write this process's metrics to the shared directory."""
+        if self._directory is None:
+            return
+        path = os.path.join(self._directory, f"{self._prefix()}{os.getpid()}.json")
+        snapshot = {metric.name: metric.dump() for metric in self._metrics}
+        temporary = f"{path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f)
+        os.replace(temporary, path)
+
+    def start_snapshots(self, interval: float = SNAPSHOT_INTERVAL) -> None:
+        """
+        Write snapshots every ``interval`` seconds from a background thread.
+
+        Safe to call on every request: the thread is started once per
+        process, so forked workers each start their own.
+        """
+        if self._directory is None or self._writer_pid == os.getpid():
+            return
+        with self._lock:
+            if self._writer_pid == os.getpid():
+                return
+            self._writer_pid = os.getpid()
+
+        def write_periodically():
+            while True:
+                try:
+                    self.write_snapshot()
+                except OSError:
+                    pass
+                time.sleep(interval)
+
+        threading.Thread(target=write_periodically, name="metrics-snapshots", daemon=True).start()
+
+    def _other_snapshots(self) -> Dict[str, list]:
+        """
+        Dumps of the other processes of this run, by metric name.
+
+        Snapshots of exited workers are renamed to retired ones, and
+        snapshots of expired runs are deleted.
+        """
+        others: Dict[str, list] = {}
+        if self._directory is None:
+            return others
+        kinds = {metric.name: metric.kind for metric in self._metrics}
+        own = f"{self._prefix()}{os.getpid()}.json"
+        for name in os.listdir(self._directory):
+            path = os.path.join(self._directory, name)
+            if not name.endswith(".json") or name == own:
+                continue
+            run, _, process = name[:-len(".json")].partition("_")
+            retired = process.startswith("retired_")
+            try:
+                if run != self._run:
+                    if self._expired(run, path, retired):
+                        os.remove(path)
+                    continue
+                if not retired and process.isdigit() and not _pid_alive(int(process)):
+                    retired_path = os.path.join(self._directory, f"{run}_retired_{process}.json")
+                    os.replace(path, retired_path)
+                    path, retired = retired_path, True
+                with open(path, encoding="utf-8") as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for metric, dump in snapshot.items():
+                if retired and kinds.get(metric) == "gauge":
+                    continue
+                others.setdefault(metric, []).append(dump)
+        return others
+
+    def render(self) -> str:
+        """Render every metric in Prometheus text exposition format."""
+        others = self._other_snapshots()
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples(others.get(metric.name, ())))
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+REQUESTS = REGISTRY.register(Counter(
+    "gazetrack_http_requests_total", "HTTP requests handled.", ("endpoint", "method", "status")
+))
+REQUEST_LATENCY = REGISTRY.register(Histogram(
+    "gazetrack_http_request_duration_seconds", "Time to handle a request.", ("endpoint",)
+))
+REQUEST_SIZE = REGISTRY.register(Histogram(
+    "gazetrack_http_request_size_bytes", "Request body size.", ("endpoint",), SIZE_BUCKETS
+))
+RESPONSE_SIZE = REGISTRY.register(Histogram(
+    "gazetrack_http_response_size_bytes", "Response body size (when known).", ("endpoint",), SIZE_BUCKETS
+))
+DB_TIME = REGISTRY.register(Histogram(
+    "gazetrack_db_duration_seconds", "Time spent executing SQL statements per request.", ("endpoint",)
+))
+SAMPLES_INGESTED = REGISTRY.register(Counter(
+    "gazetrack_samples_ingested_total",
+    "Gaze/mouse samples stored; use rate() for samples per second.",
+))
+INGEST_BATCH = REGISTRY.register(Histogram(
+    "gazetrack_ingest_batch_samples", "Samples per save-points request.", (), BATCH_BUCKETS
+))
+TASKLOGS_INGESTED = REGISTRY.register(Counter(
+    "gazetrack_tasklogs_ingested_total", "Task logs stored.",
+))
+START_TIME = REGISTRY.register(Gauge(
+    "gazetrack_process_start_time_seconds", "Start time of the process since the Unix epoch.",
+))
+START_TIME.set(time.time())
+
+
+def record_samples(count: int) -> None:
+    """Count samples stored by the ingest path."""
+    SAMPLES_INGESTED.inc(count)
+    INGEST_BATCH.observe(count)
+
+
+def record_tasklogs(count: int) -> None:
+    """Count task logs stored by the ingest path."""
+    TASKLOGS_INGESTED.inc(count)
+
+
+def _endpoint() -> str:
+    # The route name keeps label cardinality bounded (no raw paths)
+    return request.endpoint or "unmatched"
+
+
+def _before_request():
+    REGISTRY.start_snapshots()
+    g._metrics_start = time.perf_counter()
+    g._metrics_db_time = 0.0
+
+
+def _after_request(response):
+    start = g.pop("_metrics_start", None)
+    if start is None:
+        return response
+
+    endpoint = _endpoint()
+    REQUEST_LATENCY.observe(time.perf_counter() - start, endpoint)
+    REQUESTS.inc(1, endpoint, request.method, str(response.status_code))
+    if request.content_length:
+        REQUEST_SIZE.observe(request.content_length, endpoint)
+    if response.content_length is not None:
+        RESPONSE_SIZE.observe(response.content_length, endpoint)
+    DB_TIME.observe(g.pop("_metrics_db_time", 0.0), endpoint)
+    return response
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("_metrics_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("_metrics_query_start")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    if has_request_context() and "_metrics_db_time" in g:
+        g._metrics_db_time += elapsed
+
+
+def _handle_error(context):
+    # A failed statement never reaches after_cursor_execute; its time still counts
+    if context.connection is not None:
+        _after_cursor_execute(context.connection, None, None, None, None, None)
+
+
+metrics_bp = Blueprint("metrics", __name__)
+
+
+@metrics_bp.route("/metrics")
+def metrics():
+    """
+    Request and ingest metrics in Prometheus text format.
+    ---
+    tags:
+      - api
+    responses:
+        200:
+            description: Metrics of every process of the server (of this process only without a shared metrics directory).
+    """
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
+
+
+def init_metrics(app, engine, directory: Optional[str] = None) -> None:
+    """
+    Instrument an app: request hooks, SQL timing and the ``/metrics`` endpoint.
+
+    Args:
+        app: Flask application instance
+        engine: SQLAlchemy engine of the app
+        directory: Shared directory to aggregate the metrics of every
+            worker process (see ``MetricsRegistry.share``); per process if None
+    """
+    if directory:
+        REGISTRY.share(directory)
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.register_blueprint(metrics_bp)
+
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _handle_error)
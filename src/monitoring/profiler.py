@@ -0,0 +1,162 @@
+"""
+Opt-in SQL profiling per request.
+
+Counts the statements a request issues and the time spent in them, logs
+slow statements together with their ``EXPLAIN QUERY PLAN`` and warns when
+the same statement runs many times in one request (the signature of an N+1
+pattern). In debug mode the summary is also attached to the response as
+``X-SQL-Profile`` and ``Server-Timing`` headers, so it shows up in the
+browser's network tab.
+"""
+
+import time
+from collections import Counter
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+
+DEFAULT_SLOW_QUERY_MS = 100
+# Executions of one statement within a request that suggest an N+1 pattern
+REPEATED_STATEMENT_THRESHOLD = 10
+
+
+class QueryProfile:
+    """Statements issued while handling one request."""
+
+    def __init__(self):
+        self.statements = 0
+        self.duration = 0.0
+        self.slow = 0
+        self.counts = Counter()
+
+    def record(self, statement: str, elapsed: float) -> None:
+        self.statements += 1
+        self.duration += elapsed
+        self.counts[statement] += 1
+
+    def repeated(self, threshold: int = REPEATED_STATEMENT_THRESHOLD):
+        """Statements executed at least ``threshold`` times, most frequent first."""
+        return [(statement, count) for statement, count in self.counts.most_common() if count >= threshold]
+
+    def summary(self) -> str:
+        return (
+            f"{self.statements} statements, {self.duration * 1000:.1f} ms, "
+            f"{self.slow} slow, {len(self.repeated())} repeated"
+        )
+
+
+def explain(connection, statement: str, parameters) -> list:
+    """
+    Get the SQLite query plan of a statement.
+
+    The plan is read through the raw DB-API connection so that it does not
+    go through (and get profiled by) the engine events.
+
+    Args:
+        connection: SQLAlchemy connection the statement ran on
+        statement: SQL text
+        parameters: Parameters the statement ran with
+
+    Returns:
+        Plan lines, empty if the database is not SQLite
+    """
+    if connection.dialect.name != "sqlite":
+        return []
+    try:
+        cursor = connection.connection.dbapi_connection.cursor()
+        try:
+            rows = cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters or ()).fetchall()
+        finally:
+            cursor.close()
+    except Exception as e:
+        return [f"(plan unavailable: {e})"]
+    return [row[-1] for row in rows]
+
+
+def _current_profile():
+    if not has_request_context():
+        return None
+    return g.get("_sql_profile")
+
+
+def _before_request():
+    g._sql_profile = QueryProfile()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("_profiler_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("_profiler_query_start")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+
+    profile = _current_profile()
+    if profile is None:
+        return
+    profile.record(statement, elapsed)
+
+    if elapsed * 1000 >= current_app.config["SLOW_QUERY_MS"]:
+        profile.slow += 1
+        plan = [] if executemany else explain(conn, statement, parameters)
+        current_app.logger.warning(
+            "Slow query (%.1f ms) in %s %s:\n%s\nPlan:\n%s",
+            elapsed * 1000,
+            request.method,
+            request.path,
+            statement,
+            "\n".join(f"  {line}" for line in plan) or "  (not available)",
+        )
+
+
+def _handle_error(context):
+    # A failed statement never reaches after_cursor_execute; drop its start time
+    if context.connection is None:
+        return
+    starts = context.connection.info.get("_profiler_query_start")
+    if starts:
+        starts.pop()
+
+
+def _after_request(response):
+    profile = g.pop("_sql_profile", None)
+    if profile is None:
+        return response
+
+    for statement, count in profile.repeated():
+        current_app.logger.warning(
+            "Statement executed %d times in %s %s (possible N+1):\n%s",
+            count,
+            request.method,
+            request.path,
+            statement,
+        )
+    current_app.logger.info("SQL %s %s: %s", request.method, request.path, profile.summary())
+
+    if current_app.debug:
+        response.headers["X-SQL-Profile"] = profile.summary()
+        response.headers.add(
+            "Server-Timing", f'db;dur={profile.duration * 1000:.1f};desc="{profile.statements} statements"'
+        )
+    return response
+
+
+def init_profiler(app, engine, slow_query_ms: float = DEFAULT_SLOW_QUERY_MS) -> None:
+    """
+    Enable SQL profiling for an app.
+
+    Args:
+        app: Flask application instance
+        engine: SQLAlchemy engine of the app
+        slow_query_ms: Statements taking at least this long are logged with
+            their query plan
+    """
+    app.config.setdefault("SLOW_QUERY_MS", slow_query_ms)
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _handle_error)
@@ -7,7 +7,12 @@ from .subject_repository import SubjectRepository
 from .measurement_repository import MeasurementRepository
 from .point_repository import PointRepository
 from .tasklog_repository import TaskLogRepository
-from .study_repository import StudyRepository
+from .study_repository import StudyConfigConflictError, StudyRepository
+from .subject_summary_repository import SubjectSummaryRepository
+from .aoi_repository import AoiRepository
+from .sample_block_repository import SampleBlockRepository
+from .calibration_repository import CalibrationRepository
+from .maintenance_repository import MaintenanceRepository
 
 __all__ = [
     'SubjectRepository',
@@ -15,4 +20,10 @@ __all__ = [
     'PointRepository',
     'TaskLogRepository',
     'StudyRepository',
+    'StudyConfigConflictError',
+    'SubjectSummaryRepository',
+    'AoiRepository',
+    'SampleBlockRepository',
+    'CalibrationRepository',
+    'MaintenanceRepository',
 ]
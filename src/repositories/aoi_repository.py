@@ -0,0 +1,101 @@
+"""
+Repository for AreaOfInterest and AoiMetricsCache entity operations.
+"""
+
+import json
+from typing import List, Optional
+from datetime import datetime
+from sqlalchemy import delete
+from db.models import AoiMetricsCache, AreaOfInterest, db
+from .base_repository import BaseRepository
+
+
+class AoiRepository(BaseRepository[AreaOfInterest]):
+    """Repository for managing AreaOfInterest entities and their metrics cache."""
+
+    def __init__(self):
+        super().__init__(AreaOfInterest)
+
+    def get_aois_by_study(self, study_id: int) -> List[AreaOfInterest]:
+        """
+        Get the AOIs of a study in definition order.
+
+        Args:
+            study_id: The ID of the study
+
+        Returns:
+            List of AOIs
+        """
+        return (
+            self.model.query.filter_by(study_id=study_id)
+            .order_by(AreaOfInterest.position, AreaOfInterest.id)
+            .all()
+        )
+
+    def replace_aois(self, study_id: int, aois: List[dict]) -> List[AreaOfInterest]:
+        """
+        Replace all AOIs of a study. The caller commits.
+
+        Args:
+            study_id: The ID of the study
+            aois: New AOIs, each with ``name``, ``shape`` and ``coordinates``
+
+        Returns:
+            The created AOIs
+        """
+        db.session.execute(delete(AreaOfInterest).where(AreaOfInterest.study_id == study_id))
+        created = []
+        for position, aoi in enumerate(aois):
+            created.append(
+                self.add(
+                    AreaOfInterest(
+                        study_id=study_id,
+                        name=aoi["name"],
+                        shape=aoi["shape"],
+                        coordinates=json.dumps(aoi["coordinates"]),
+                        position=position,
+                    )
+                )
+            )
+        return created
+
+    def get_metrics_cache(self, subject_id: int) -> Optional[AoiMetricsCache]:
+        """
+        Get the cached AOI metrics state of a subject.
+
+        Args:
+            subject_id: The ID of the subject
+
+        Returns:
+            The cache entry if one exists, None otherwise
+        """
+        return db.session.get(AoiMetricsCache, subject_id)
+
+    def save_metrics_cache(
+        self,
+        subject_id: int,
+        aoi_signature: str,
+        last_measurement_id: int,
+        state: dict,
+    ) -> AoiMetricsCache:
+        """
+        Create or update the cached AOI metrics state of a subject. The caller commits.
+
+        Args:
+            subject_id: The ID of the subject
+            aoi_signature: Hash of the AOI definitions used for the state
+            last_measurement_id: Highest measurement ID folded into the state
+            state: Metrics state
+
+        Returns:
+            The cache entry
+        """
+        cache = self.get_metrics_cache(subject_id)
+        if cache is None:
+            cache = AoiMetricsCache(subject_id=subject_id)
+            db.session.add(cache)
+        cache.aoi_signature = aoi_signature
+        cache.last_measurement_id = last_measurement_id
+        cache.state = json.dumps(state)
+        cache.updated_at = datetime.now()
+        return cache
@@ -2,11 +2,36 @@
 Base repository class providing common database operations.
 """
 
-from typing import Type, TypeVar, Generic, List, Optional
+from typing import Any, Dict, Type, TypeVar, Generic, List, Optional
+from sqlalchemy import insert
+from sqlalchemy.dialects import postgresql, sqlite
 from db.models import db
 
 T = TypeVar('T')
 
+# INSERT constructs with ON CONFLICT clauses, by dialect name
+_UPSERT_INSERTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+def upsert_insert(model):
+    """
+    INSERT statement for the dialect of the bound engine, supporting
+    ``on_conflict_do_nothing`` and ``on_conflict_do_update``.
+
+    Args:
+        model: The SQLAlchemy model class
+
+    Returns:
+        Dialect-specific Insert construct
+
+    Raises:
+        NotImplementedError: If the dialect has no ON CONFLICT clause
+    """
+    dialect = db.session.get_bind().dialect.name
+    if dialect not in _UPSERT_INSERTS:
+        raise NotImplementedError(f"INSERT ... ON CONFLICT is not supported by the '{dialect}' dialect.")
+    return _UPSERT_INSERTS[dialect](model)
+
 
 class BaseRepository(Generic[T]):
     """Base repository class with common CRUD operations."""
@@ -54,6 +79,36 @@ class BaseRepository(Generic[T]):
         db.session.add(entity)
         return entity
     
+    def bulk_insert(
+        self, rows: List[Dict[str, Any]], return_ids: bool = False
+    ) -> List[int]:
+        """
+        Insert many rows with a single executemany, bypassing the ORM unit of work.
+        
+        Args:
+            rows: Column values for each row
+            return_ids: Whether to return the generated primary keys
+            
+        Returns:
+            Generated IDs in the same order as ``rows`` if requested, else an empty list
+        """
+        if not rows:
+            return []
+        
+        statement = insert(self.model)
+        if return_ids:
+            if db.session.get_bind().dialect.name == "sqlite":
+                # SQLite cannot guarantee the order of RETURNING rows, so
+                # SQLAlchemy would fall back to one INSERT per row. Each
+                # multi-row INSERT assigns ascending rowids in VALUES order
+                # under the write lock, so sorting the IDs restores the order.
+                return sorted(db.session.execute(statement.returning(self.model.id), rows).scalars())
+            statement = statement.returning(self.model.id, sort_by_parameter_order=True)
+            return list(db.session.execute(statement, rows).scalars())
+        
+        db.session.execute(statement, rows)
+        return []
+    
     def delete(self, entity: T) -> None:
         """
         Delete an entity from the database.
@@ -0,0 +1,71 @@
+"""
+Repository for CalibrationQuality entity operations.
+"""
+
+import json
+from typing import Dict, Iterable, Optional
+from datetime import datetime
+from db.models import CalibrationQuality, db
+from .base_repository import BaseRepository
+
+
+class CalibrationRepository(BaseRepository[CalibrationQuality]):
+    """Repository for managing the calibration quality of subjects."""
+
+    def __init__(self):
+        super().__init__(CalibrationQuality)
+
+    def get_by_subject(self, subject_id: int) -> Optional[CalibrationQuality]:
+        """
+        Get the calibration quality of a subject.
+
+        Args:
+            subject_id: The ID of the subject
+
+        Returns:
+            The calibration quality if the subject ran a validation, None otherwise
+        """
+        return db.session.get(CalibrationQuality, subject_id)
+
+    def get_for_subjects(self, subject_ids: Iterable[int]) -> Dict[int, CalibrationQuality]:
+        """
+        Get the calibration quality of several subjects with a single query.
+
+        Args:
+            subject_ids: IDs of the subjects
+
+        Returns:
+            Dictionary mapping subject ID to its calibration quality
+        """
+        subject_ids = list(subject_ids)
+        if not subject_ids:
+            return {}
+        rows = CalibrationQuality.query.filter(
+            CalibrationQuality.subject_id.in_(subject_ids)
+        ).all()
+        return {row.subject_id: row for row in rows}
+
+    def save_quality(self, subject_id: int, quality: dict) -> CalibrationQuality:
+        """
+        Store the result of a validation run, replacing the previous one. The caller commits.
+
+        Args:
+            subject_id: The ID of the subject
+            quality: Output of ``analysis.calibration.calibration_quality``
+
+        Returns:
+            The calibration quality
+        """
+        row = self.get_by_subject(subject_id)
+        if row is None:
+            row = CalibrationQuality(subject_id=subject_id, attempts=0)
+            db.session.add(row)
+        row.accuracy_px = quality["accuracy_px"]
+        row.precision_px = quality["precision_px"]
+        row.accuracy = quality["accuracy"]
+        row.precision = quality["precision"]
+        row.sample_count = quality["sample_count"]
+        row.targets = json.dumps(quality["targets"])
+        row.attempts = (row.attempts or 0) + 1
+        row.updated_at = datetime.now()
+        return row
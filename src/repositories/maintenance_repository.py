@@ -0,0 +1,467 @@
+"""
+Repository for database maintenance: cascading deletion, orphan cleanup,
+compaction and copying studies to separate database files.
+
+Operations that touch many rows work in chunks and commit after each one,
+so they can run while the server is ingesting: the SQLite write lock is
+held for one chunk at a time instead of for the whole job.
+"""
+
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, Optional
+import numpy as np
+from sqlalchemy import create_engine, delete, func, select, true
+from db.models import (
+    AoiMetricsCache,
+    AreaOfInterest,
+    CalibrationQuality,
+    Measurement,
+    Point,
+    SampleBlock,
+    Study,
+    Subject,
+    SubjectSummary,
+    TaskLog,
+    db,
+)
+
+# Measurements deleted per transaction
+DELETE_BATCH_SIZE = 5000
+# Measurement/point rows read per chunk when looking for orphans
+SCAN_BATCH_SIZE = 50000
+# Free pages released per incremental vacuum step
+VACUUM_STEP_PAGES = 1000
+# Rows sampled per index by ANALYZE (0 analyzes every row)
+ANALYSIS_LIMIT = 1000
+# Pages copied per online backup step, and pause between steps (seconds)
+BACKUP_STEP_PAGES = 256
+BACKUP_STEP_SLEEP = 0.005
+
+# auto_vacuum modes reported by PRAGMA auto_vacuum
+_AUTO_VACUUM_INCREMENTAL = 2
+
+# Tables holding one or more rows per subject, deleted together with it
+_SUBJECT_TABLES = (SampleBlock, TaskLog, SubjectSummary, AoiMetricsCache, CalibrationQuality)
+
+
+class MaintenanceRepository:
+    """Repository for retention and compaction operations spanning several tables."""
+
+    def _is_sqlite(self) -> bool:
+        return db.engine.dialect.name == "sqlite"
+
+    @contextmanager
+    def _read_snapshot(self) -> Iterator:
+        """
+        Connection holding a single read transaction.
+
+        The sqlite3 driver only opens transactions before writes, so
+        consecutive SELECTs can see different data; an explicit BEGIN makes
+        every statement read the same snapshot. In WAL mode writers are not
+        blocked by it.
+        """
+        with db.engine.connect() as connection:
+            connection = connection.execution_options(isolation_level="AUTOCOMMIT")
+            connection.exec_driver_sql("BEGIN")
+            try:
+                yield connection
+            finally:
+                connection.exec_driver_sql("COMMIT")
+
+    def _delete_measurement_rows(self, rows) -> int:
+        """Delete measurements given as (id, gaze point ID, mouse point ID) rows, with their points."""
+        measurement_ids = [row[0] for row in rows]
+        point_ids = [point_id for row in rows for point_id in row[1:] if point_id is not None]
+        db.session.execute(delete(Measurement).where(Measurement.id.in_(measurement_ids)))
+        if point_ids:
+            db.session.execute(delete(Point).where(Point.id.in_(point_ids)))
+        return len(point_ids)
+
+    def delete_subjects(self, subject_ids: Iterable[int], batch_size: int = DELETE_BATCH_SIZE) -> Dict[str, int]:
+        """
+        Delete subjects with their samples, task logs, summaries and caches.
+
+        Measurements and their points are deleted ``batch_size`` at a time,
+        one transaction each. Subject and measurement IDs are AUTOINCREMENT,
+        so a new subject never gets the deleted one's ID.
+
+        Args:
+            subject_ids: IDs of the subjects to delete
+            batch_size: Measurements deleted per transaction
+
+        Returns:
+            Number of deleted rows per table
+        """
+        counts = {"subject": 0, "measurement": 0, "point": 0}
+        counts.update({model.__tablename__: 0 for model in _SUBJECT_TABLES})
+
+        for subject_id in subject_ids:
+            while True:
+                rows = db.session.execute(
+                    select(Measurement.id, Measurement.gaze_point_id, Measurement.mouse_point_id)
+                    .where(Measurement.subject_id == subject_id)
+                    .limit(batch_size)
+                ).all()
+                if not rows:
+                    break
+                counts["point"] += self._delete_measurement_rows(rows)
+                counts["measurement"] += len(rows)
+                db.session.commit()
+
+            for model in _SUBJECT_TABLES:
+                result = db.session.execute(delete(model).where(model.subject_id == subject_id))
+                counts[model.__tablename__] += result.rowcount
+            result = db.session.execute(delete(Subject).where(Subject.id == subject_id))
+            counts["subject"] += result.rowcount
+            db.session.commit()
+
+        return counts
+
+    def delete_study(self, study_id: int, batch_size: int = DELETE_BATCH_SIZE) -> Dict[str, int]:
+        """
+        Delete a study with its AOIs and subjects (see ``delete_subjects``).
+
+        Args:
+            study_id: ID of the study
+            batch_size: Measurements deleted per transaction
+
+        Returns:
+            Number of deleted rows per table
+        """
+        subject_ids = db.session.execute(
+            select(Subject.id).where(Subject.study_id == study_id).order_by(Subject.id)
+        ).scalars().all()
+        counts = self.delete_subjects(subject_ids, batch_size)
+
+        result = db.session.execute(delete(AreaOfInterest).where(AreaOfInterest.study_id == study_id))
+        counts[AreaOfInterest.__tablename__] = result.rowcount
+        result = db.session.execute(delete(Study).where(Study.id == study_id))
+        counts[Study.__tablename__] = result.rowcount
+        db.session.commit()
+        return counts
+
+    def delete_orphans(self, batch_size: int = SCAN_BATCH_SIZE) -> Dict[str, int]:
+        """
+        Delete measurements of subjects that no longer exist and points no
+        measurement refers to.
+
+        The measurement table is scanned once, in ID order, to find orphaned
+        measurements and mark the points still referenced in a bitmap; the
+        point table is then scanned and the unmarked points are deleted.
+        Only rows that existed when the job started are considered, so
+        samples stored while it runs are never touched.
+
+        Args:
+            batch_size: Rows read (and at most deleted) per transaction
+
+        Returns:
+            Number of deleted measurements and points
+        """
+        newest_measurement, newest_point = db.session.execute(
+            select(
+                select(func.max(Measurement.id)).scalar_subquery(),
+                select(func.max(Point.id)).scalar_subquery(),
+            )
+        ).one()
+        subject_ids = np.fromiter(db.session.execute(select(Subject.id)).scalars(), dtype=np.int64)
+        counts = {"measurement": 0, "point": 0}
+        if newest_point is None:
+            return counts
+
+        referenced = np.zeros(newest_point + 1, dtype=bool)
+        last_id = 0
+        while newest_measurement is not None and last_id < newest_measurement:
+            rows = db.session.execute(
+                select(Measurement.id, Measurement.subject_id, Measurement.gaze_point_id, Measurement.mouse_point_id)
+                .where(Measurement.id > last_id, Measurement.id <= newest_measurement)
+                .order_by(Measurement.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            # None (no point) becomes -1 and is skipped below
+            chunk = np.array([[-1 if value is None else value for value in row] for row in rows], dtype=np.int64)
+            last_id = int(chunk[-1, 0])
+
+            orphaned = ~np.isin(chunk[:, 1], subject_ids)
+            kept = chunk[~orphaned, 2:].ravel()
+            referenced[kept[(kept >= 0) & (kept <= newest_point)]] = True
+            if orphaned.any():
+                db.session.execute(
+                    delete(Measurement).where(Measurement.id.in_(chunk[orphaned, 0].tolist()))
+                )
+                counts["measurement"] += int(orphaned.sum())
+                db.session.commit()
+
+        last_id = 0
+        while last_id < newest_point:
+            point_ids = np.fromiter(
+                db.session.execute(
+                    select(Point.id)
+                    .where(Point.id > last_id, Point.id <= newest_point)
+                    .order_by(Point.id)
+                    .limit(batch_size)
+                ).scalars(),
+                dtype=np.int64,
+            )
+            if not len(point_ids):
+                break
+            last_id = int(point_ids[-1])
+            orphaned = point_ids[~referenced[point_ids]]
+            if len(orphaned):
+                db.session.execute(delete(Point).where(Point.id.in_(orphaned.tolist())))
+                counts["point"] += len(orphaned)
+                db.session.commit()
+
+        db.session.commit()
+        return counts
+
+    def get_file_stats(self) -> Dict[str, int]:
+        """
+        Get the size of the SQLite database and how much of it is unused.
+
+        Returns:
+            Dictionary with ``page_size``, ``page_count``, ``freelist_count``,
+            ``size_bytes`` and ``free_bytes``
+        """
+        if not self._is_sqlite():
+            return {}
+        with db.engine.connect() as connection:
+            stats = {
+                name: connection.exec_driver_sql(f"PRAGMA {name}").scalar()
+                for name in ("page_size", "page_count", "freelist_count")
+            }
+        stats["size_bytes"] = stats["page_size"] * stats["page_count"]
+        stats["free_bytes"] = stats["page_size"] * stats["freelist_count"]
+        return stats
+
+    def compact(self, full: bool = False, step_pages: int = VACUUM_STEP_PAGES) -> Dict[str, object]:
+        """
+        Return unused pages to the file system.
+
+        With ``auto_vacuum=INCREMENTAL`` free pages are released
+        ``step_pages`` at a time, each step its own short transaction. Other
+        databases need one full ``VACUUM`` to switch to that mode; it
+        rewrites the whole file and blocks writers until it finishes, so it
+        only runs when ``full`` is set. The write-ahead log is truncated
+        afterwards.
+
+        Args:
+            full: Run a full VACUUM (converting the database to incremental mode)
+            step_pages: Pages released per incremental step
+
+        Returns:
+            Dictionary with the ``mode`` used ("incremental", "full" or
+            None when nothing could be done) and the file stats before and after
+        """
+        before = self.get_file_stats()
+        if not before:
+            return {"mode": None, "before": before, "after": before}
+
+        db.session.commit()
+        with db.engine.connect() as connection:
+            connection = connection.execution_options(isolation_level="AUTOCOMMIT")
+            mode = None
+            if full:
+                connection.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+                connection.exec_driver_sql("VACUUM")
+                mode = "full"
+            elif connection.exec_driver_sql("PRAGMA auto_vacuum").scalar() == _AUTO_VACUUM_INCREMENTAL:
+                while connection.exec_driver_sql("PRAGMA freelist_count").scalar():
+                    connection.exec_driver_sql(f"PRAGMA incremental_vacuum({int(step_pages)})")
+                mode = "incremental"
+            connection.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+
+        return {"mode": mode, "before": before, "after": self.get_file_stats()}
+
+    def analyze(self, analysis_limit: int = ANALYSIS_LIMIT) -> None:
+        """
+        Refresh the statistics the query planner uses to choose indexes.
+
+        Args:
+            analysis_limit: Rows sampled per index (0 reads every row)
+        """
+        db.session.commit()
+        with db.engine.connect() as connection:
+            connection = connection.execution_options(isolation_level="AUTOCOMMIT")
+            if self._is_sqlite():
+                connection.exec_driver_sql(f"PRAGMA analysis_limit = {int(analysis_limit)}").fetchall()
+            connection.exec_driver_sql("ANALYZE")
+
+    def count_rows_by_study(self, connection=None, study_id: Optional[int] = None) -> Dict[int, Dict[str, int]]:
+        """
+        Count the rows stored for each study.
+
+        Args:
+            connection: Connection to count in (the application database if None)
+            study_id: Only count this study (optional)
+
+        Returns:
+            Dictionary mapping study ID to its number of ``subjects``,
+            ``aois``, ``task_logs`` and ``samples`` (stored and archived)
+        """
+        executor = connection if connection is not None else db.session
+        study_filter = (lambda column: column == study_id) if study_id is not None else (lambda column: true())
+
+        counts = {
+            study: {"subjects": 0, "aois": 0, "task_logs": 0, "samples": 0}
+            for study in executor.execute(select(Study.id).where(study_filter(Study.id))).scalars()
+        }
+        queries = {
+            "subjects": select(Subject.study_id, func.count()).where(study_filter(Subject.study_id))
+            .group_by(Subject.study_id),
+            "aois": select(AreaOfInterest.study_id, func.count()).where(study_filter(AreaOfInterest.study_id))
+            .group_by(AreaOfInterest.study_id),
+            "task_logs": select(Subject.study_id, func.count())
+            .join(TaskLog, TaskLog.subject_id == Subject.id)
+            .where(study_filter(Subject.study_id))
+            .group_by(Subject.study_id),
+            "measurements": select(Subject.study_id, func.count())
+            .join(Measurement, Measurement.subject_id == Subject.id)
+            .where(study_filter(Subject.study_id))
+            .group_by(Subject.study_id),
+            "archived": select(Subject.study_id, func.sum(SampleBlock.sample_count))
+            .join(SampleBlock, SampleBlock.subject_id == Subject.id)
+            .where(study_filter(Subject.study_id))
+            .group_by(Subject.study_id),
+        }
+        for name, query in queries.items():
+            key = "samples" if name in ("measurements", "archived") else name
+            for study, count in executor.execute(query):
+                if study in counts:
+                    counts[study][key] += int(count or 0)
+        return counts
+
+    def count_file_rows(self, path: str, study_id: Optional[int] = None) -> Dict[int, Dict[str, int]]:
+        """
+        Count the rows stored for each study in another database file.
+
+        Args:
+            path: Path of a SQLite file with the application's schema
+            study_id: Only count this study (optional)
+
+        Returns:
+            Same as ``count_rows_by_study``
+        """
+        engine = create_engine(f"sqlite:///{path}")
+        try:
+            with engine.connect() as connection:
+                return self.count_rows_by_study(connection, study_id)
+        finally:
+            engine.dispose()
+
+    def copy_study(self, study_id: int, path: str, batch_size: int = DELETE_BATCH_SIZE) -> Dict[str, int]:
+        """
+        Copy a study and everything recorded for it into a new SQLite file.
+
+        The file has the application's schema, so it can be opened by the
+        application (``SQLALCHEMY_DATABASE_URI``) or merged back. Everything
+        is read from one snapshot, so the copy is consistent even if samples
+        arrive meanwhile.
+
+        Args:
+            study_id: ID of the study
+            path: Path of the new database file (must not exist)
+            batch_size: Rows copied per statement
+
+        Returns:
+            The row counts of the study at the time of the copy (see
+            ``count_rows_by_study``), to compare with the file's
+        """
+        if os.path.exists(path):
+            raise FileExistsError(f"Refusing to overwrite '{path}'.")
+
+        subjects = select(Subject.id).where(Subject.study_id == study_id)
+        measurements = Measurement.subject_id.in_(subjects)
+        sources = (
+            (Study, Study.id == study_id),
+            (AreaOfInterest, AreaOfInterest.study_id == study_id),
+            (Subject, Subject.study_id == study_id),
+            (SubjectSummary, SubjectSummary.subject_id.in_(subjects)),
+            (AoiMetricsCache, AoiMetricsCache.subject_id.in_(subjects)),
+            (CalibrationQuality, CalibrationQuality.subject_id.in_(subjects)),
+            (TaskLog, TaskLog.subject_id.in_(subjects)),
+            (SampleBlock, SampleBlock.subject_id.in_(subjects)),
+            (Measurement, measurements),
+            (Point, Point.id.in_(
+                select(Measurement.gaze_point_id).where(measurements)
+                .union(select(Measurement.mouse_point_id).where(measurements))
+            )),
+        )
+
+        target = create_engine(f"sqlite:///{path}")
+        try:
+            db.metadata.create_all(target)
+            with self._read_snapshot() as source, target.begin() as connection:
+                counts = self.count_rows_by_study(source, study_id)
+                for model, condition in sources:
+                    table = model.__table__
+                    result = source.execute(
+                        select(table).where(condition).execution_options(yield_per=batch_size)
+                    )
+                    for rows in result.partitions():
+                        connection.execute(table.insert(), [dict(row._mapping) for row in rows])
+        finally:
+            target.dispose()
+        return counts.get(study_id, {})
+
+    def backup(
+        self,
+        path: str,
+        step_pages: int = BACKUP_STEP_PAGES,
+        sleep: float = BACKUP_STEP_SLEEP,
+    ) -> Dict[int, Dict[str, int]]:
+        """
+        Copy the whole database to a new file with SQLite's online backup API.
+
+        Pages are copied ``step_pages`` at a time. The source connection
+        holds one read transaction for the whole copy, so the backup is a
+        consistent snapshot: writes made meanwhile by the server neither
+        restart it nor wait for it (WAL mode), and they are simply not part
+        of the backup.
+
+        Args:
+            path: Path of the backup file (must not exist)
+            step_pages: Pages copied per step
+            sleep: Seconds to pause between steps
+
+        Returns:
+            The row counts per study of the snapshot (see
+            ``count_rows_by_study``), to verify the backup against
+        """
+        if os.path.exists(path):
+            raise FileExistsError(f"Refusing to overwrite '{path}'.")
+
+        with self._read_snapshot() as source:
+            counts = self.count_rows_by_study(source)
+            target = sqlite3.connect(path)
+            try:
+                # sqlite3 only sleeps between steps when the source is busy;
+                # pausing after every step keeps the copy from saturating the disk
+                source.connection.dbapi_connection.backup(
+                    target, pages=step_pages, progress=lambda status, remaining, total: time.sleep(sleep)
+                )
+                # A single self-contained file, without -wal/-shm companions
+                target.execute("PRAGMA journal_mode=DELETE")
+            finally:
+                target.close()
+        return counts
+
+    def check_file_integrity(self, path: str) -> str:
+        """
+        Check the structure of another SQLite file (``PRAGMA quick_check``).
+
+        Args:
+            path: Path of the database file
+
+        Returns:
+            "ok", or the problems found
+        """
+        connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            return "\n".join(row[0] for row in connection.execute("PRAGMA quick_check"))
+        finally:
+            connection.close()
@@ -2,10 +2,47 @@
 Repository for Measurement entity operations.
 """
 
-from typing import List, Optional
+import heapq
+from itertools import repeat
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
 from datetime import datetime
-from db.models import Measurement, Point
+import numpy as np
+from sqlalchemy import String, delete, func, select, type_coerce, union, update
+from sqlalchemy.orm import aliased
+from db.models import Measurement, Point, Subject, db
+from db.sample_codec import decode_samples, encode_samples
 from .base_repository import BaseRepository
+from .point_repository import PointRepository
+from .sample_block_repository import SampleBlockRepository
+
+# Samples per archived block
+SAMPLES_PER_BLOCK = 65536
+# Point rows deleted per statement when archiving
+DELETE_BATCH_SIZE = 10000
+
+_SAMPLE_COLUMNS = ("id", "timestamp", "gaze_x", "gaze_y", "mouse_x", "mouse_y", "gaze_nx", "gaze_ny")
+
+
+def _concat_samples(parts: List[Dict[str, np.ndarray]]) -> Dict[str, np.ndarray]:
+    """Concatenate sample arrays and sort them by time (then measurement ID)."""
+    samples = {
+        name: np.concatenate([part[name] for part in parts]) if parts else np.empty(0)
+        for name in _SAMPLE_COLUMNS
+    }
+    samples["id"] = samples["id"].astype(np.int64)
+    samples["timestamp"] = samples["timestamp"].astype(np.int64)
+    order = np.lexsort((samples["id"], samples["timestamp"]))
+    return {name: values[order] for name, values in samples.items()}
+
+
+def _format_us(timestamps: np.ndarray) -> List[str]:
+    """Format int64 microsecond timestamps like stored dates ("YYYY-MM-DD HH:MM:SS.ffffff")."""
+    strings = np.datetime_as_string(timestamps.astype("datetime64[us]"))
+    return [string.replace("T", " ") for string in strings.tolist()]
+
+
+def _to_datetime(timestamp: int) -> datetime:
+    return np.datetime64(int(timestamp), "us").astype(datetime)
 
 
 class MeasurementRepository(BaseRepository[Measurement]):
@@ -13,6 +50,8 @@ class MeasurementRepository(BaseRepository[Measurement]):
     
     def __init__(self):
         super().__init__(Measurement)
+        self.point_repository = PointRepository()
+        self.block_repository = SampleBlockRepository()
     
     def create_measurement(
         self,
@@ -42,6 +81,55 @@ class MeasurementRepository(BaseRepository[Measurement]):
         self.add(measurement)
         return measurement
     
+    def bulk_create_measurements(
+        self,
+        subject_id: int,
+        dates: Sequence[datetime],
+        gaze: Sequence[Optional[Sequence[float]]],
+        mouse: Sequence[Optional[Sequence[float]]],
+        viewport: Optional[Tuple[float, float]] = None,
+    ) -> int:
+        """
+        Create many measurements and their points with two bulk inserts.
+        
+        Args:
+            subject_id: The ID of the subject
+            dates: Date/time of each measurement
+            gaze: (x, y) gaze coordinates of each measurement, or None
+            mouse: (x, y) mouse coordinates of each measurement, or None
+            viewport: (width, height) of the subject's viewport; when given,
+                the normalized coordinates are stored with the points
+            
+        Returns:
+            Number of measurements created
+        """
+        width, height = viewport or (None, None)
+        point_rows = []
+        for xy in (*gaze, *mouse):
+            if xy is not None:
+                point_rows.append({
+                    "x": xy[0],
+                    "y": xy[1],
+                    "nx": xy[0] / width if width else None,
+                    "ny": xy[1] / height if height else None,
+                })
+        point_ids = iter(self.point_repository.bulk_insert(point_rows, return_ids=True))
+        
+        gaze_ids = [next(point_ids) if xy is not None else None for xy in gaze]
+        mouse_ids = [next(point_ids) if xy is not None else None for xy in mouse]
+        
+        rows = [
+            {
+                "date": date,
+                "subject_id": subject_id,
+                "gaze_point_id": gaze_id,
+                "mouse_point_id": mouse_id,
+            }
+            for date, gaze_id, mouse_id in zip(dates, gaze_ids, mouse_ids)
+        ]
+        self.bulk_insert(rows)
+        return len(rows)
+    
     def get_measurements_by_subject(self, subject_id: int) -> List[Measurement]:
         """
         Get all measurements for a specific subject.
@@ -54,6 +142,224 @@ class MeasurementRepository(BaseRepository[Measurement]):
         """
         return self.model.query.filter_by(subject_id=subject_id).all()
     
+    def _live_sample_arrays(self, subject_id: int, after_id: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """Samples of a subject still stored as rows, with microsecond timestamps."""
+        gaze = aliased(Point)
+        mouse = aliased(Point)
+        query = (
+            select(
+                Measurement.id,
+                type_coerce(Measurement.date, String),
+                gaze.x,
+                gaze.y,
+                mouse.x,
+                mouse.y,
+                gaze.nx,
+                gaze.ny,
+            )
+            .select_from(Measurement)
+            .outerjoin(gaze, gaze.id == Measurement.gaze_point_id)
+            .outerjoin(mouse, mouse.id == Measurement.mouse_point_id)
+            .where(Measurement.subject_id == subject_id)
+            .order_by(Measurement.date, Measurement.id)
+        )
+        if after_id is not None:
+            query = query.where(Measurement.id > after_id)
+        rows = db.session.execute(query).all()
+        columns = list(zip(*rows)) if rows else [()] * 8
+        
+        return {
+            "id": np.asarray(columns[0], dtype=np.int64),
+            "timestamp": np.asarray(columns[1], dtype="datetime64[us]").astype(np.int64),
+            "gaze_x": np.asarray(columns[2], dtype=float),
+            "gaze_y": np.asarray(columns[3], dtype=float),
+            "mouse_x": np.asarray(columns[4], dtype=float),
+            "mouse_y": np.asarray(columns[5], dtype=float),
+            "gaze_nx": np.asarray(columns[6], dtype=float),
+            "gaze_ny": np.asarray(columns[7], dtype=float),
+        }
+    
+    def _archived_sample_arrays(self, subject_id: int, after_id: Optional[int] = None) -> List[Dict[str, np.ndarray]]:
+        """Decoded archived blocks of a subject, with microsecond timestamps."""
+        parts = []
+        for block in self.block_repository.get_blocks(subject_id, after_id=after_id):
+            samples = decode_samples(block.codec, block.data)
+            if after_id is not None:
+                keep = samples["id"] > after_id
+                samples = {name: values[keep] for name, values in samples.items()}
+            parts.append(samples)
+        return parts
+    
+    def get_sample_arrays(
+        self, subject_id: int, after_id: Optional[int] = None
+    ) -> Dict[str, np.ndarray]:
+        """
+        Get all samples of a subject as column arrays, ordered by time.
+        
+        Reads the rows with a single joined query and converts them to NumPy
+        without building ORM objects. Dates are parsed by NumPy directly from
+        their stored text representation. Archived blocks of the subject are
+        decoded and merged in, so callers do not need to know whether a
+        session has been archived.
+        
+        Args:
+            subject_id: The ID of the subject
+            after_id: Only return measurements with a greater ID (optional)
+            
+        Returns:
+            Dictionary with ``id``, ``timestamp`` (int64 epoch milliseconds of
+            the stored local time), ``gaze_x``, ``gaze_y``, ``mouse_x``,
+            ``mouse_y``, ``gaze_nx`` and ``gaze_ny`` arrays (NaN where a
+            point, or its normalized coordinates, are missing)
+        """
+        samples = self._live_sample_arrays(subject_id, after_id=after_id)
+        archived = self._archived_sample_arrays(subject_id, after_id=after_id)
+        if archived:
+            samples = _concat_samples(archived + [samples])
+        samples["timestamp"] = samples["timestamp"] // 1000
+        return samples
+    
+    def iter_sample_rows(
+        self, subject_id: Optional[int] = None, batch_size: int = 10000
+    ) -> Iterator[tuple]:
+        """
+        Iterate over samples with their points, ordered by subject and time.
+        
+        A single joined query streamed in batches of ``batch_size`` rows, so
+        reading a subject (or the whole table) costs one statement and no
+        ORM objects, and memory does not grow with the number of samples.
+        
+        Args:
+            subject_id: The ID of the subject (all subjects if None)
+            batch_size: Rows fetched from the database at a time
+        
+        Returns:
+            Iterator of ``(subject_id, date, mouse_x, mouse_y, gaze_x,
+            gaze_y)`` tuples; ``date`` is the stored text
+            ("YYYY-MM-DD HH:MM:SS[.ffffff]") and coordinates are None where a
+            point is missing
+        """
+        gaze = aliased(Point)
+        mouse = aliased(Point)
+        query = (
+            select(
+                Measurement.subject_id,
+                type_coerce(Measurement.date, String),
+                mouse.x,
+                mouse.y,
+                gaze.x,
+                gaze.y,
+            )
+            .select_from(Measurement)
+            .outerjoin(mouse, mouse.id == Measurement.mouse_point_id)
+            .outerjoin(gaze, gaze.id == Measurement.gaze_point_id)
+            .order_by(Measurement.subject_id, Measurement.date, Measurement.id)
+            .execution_options(yield_per=batch_size)
+        )
+        if subject_id is not None:
+            query = query.where(Measurement.subject_id == subject_id)
+        rows = db.session.execute(query)
+        
+        if not self.block_repository.has_blocks(subject_id):
+            yield from rows
+            return
+        yield from heapq.merge(
+            rows, self._iter_archived_rows(subject_id), key=lambda row: (row[0], row[1])
+        )
+    
+    def _iter_archived_rows(self, subject_id: Optional[int] = None) -> Iterator[tuple]:
+        """Rows of the archived blocks, in the format of ``iter_sample_rows``."""
+        for block in self.block_repository.iter_blocks(subject_id):
+            samples = decode_samples(block.codec, block.data)
+            columns = [
+                np.where(np.isnan(samples[name]), None, samples[name]).tolist()
+                for name in ("mouse_x", "mouse_y", "gaze_x", "gaze_y")
+            ]
+            yield from zip(repeat(block.subject_id), _format_us(samples["timestamp"]), *columns)
+    
+    def normalize_points(self, subject_id: int, viewport: Tuple[float, float]) -> int:
+        """
+        Fill the normalized coordinates of a subject's points that lack them.
+        
+        Covers samples stored before the viewport was reported. Points that
+        already have normalized coordinates keep them, so a later viewport
+        change only applies to the samples recorded after it.
+        
+        Args:
+            subject_id: The ID of the subject
+            viewport: (width, height) of the viewport in CSS pixels
+            
+        Returns:
+            Number of points updated
+        """
+        width, height = viewport
+        point_ids = union(
+            select(Measurement.gaze_point_id).where(Measurement.subject_id == subject_id),
+            select(Measurement.mouse_point_id).where(Measurement.subject_id == subject_id),
+        )
+        result = db.session.execute(
+            update(Point)
+            .where(Point.nx.is_(None), Point.id.in_(point_ids))
+            .values(nx=Point.x / float(width), ny=Point.y / float(height))
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount
+    
+    def get_study_normalized_gaze(self, study_id: int) -> Dict[str, np.ndarray]:
+        """
+        Get the normalized gaze coordinates of every sample in a study.
+        
+        A single joined query, plus the archived blocks of the study; the
+        result feeds vectorized study-wide aggregation (e.g. one histogram
+        for the whole study).
+        
+        Args:
+            study_id: The ID of the study
+            
+        Returns:
+            Dictionary with ``subject_id``, ``nx`` and ``ny`` arrays (NaN where
+            the gaze point or the subject's viewport is missing)
+        """
+        gaze = aliased(Point)
+        rows = db.session.execute(
+            select(Measurement.subject_id, gaze.nx, gaze.ny)
+            .select_from(Measurement)
+            .join(Subject, Subject.id == Measurement.subject_id)
+            .outerjoin(gaze, gaze.id == Measurement.gaze_point_id)
+            .where(Subject.study_id == study_id)
+        ).all()
+        columns = list(zip(*rows)) if rows else [()] * 3
+        subject_ids = [np.asarray(columns[0], dtype=np.int64)]
+        nx = [np.asarray(columns[1], dtype=float)]
+        ny = [np.asarray(columns[2], dtype=float)]
+        
+        # Archived samples keep the normalized coordinates of their points;
+        # only those archived without any (before the viewport was reported,
+        # or by an older version) fall back to the subject's current viewport,
+        # as normalize_points would have filled them
+        blocks = self.block_repository.get_blocks_by_study(study_id)
+        if blocks:
+            viewports = {
+                subject_id: (width or np.nan, height or np.nan)
+                for subject_id, width, height in db.session.execute(
+                    select(Subject.id, Subject.viewport_width, Subject.viewport_height)
+                    .where(Subject.study_id == study_id)
+                )
+            }
+            for block in blocks:
+                samples = decode_samples(block.codec, block.data)
+                width, height = viewports[block.subject_id]
+                subject_ids.append(np.full(len(samples["id"]), block.subject_id, dtype=np.int64))
+                missing = np.isnan(samples["gaze_nx"])
+                nx.append(np.where(missing, samples["gaze_x"] / width, samples["gaze_nx"]))
+                ny.append(np.where(missing, samples["gaze_y"] / height, samples["gaze_ny"]))
+        
+        return {
+            "subject_id": np.concatenate(subject_ids),
+            "nx": np.concatenate(nx),
+            "ny": np.concatenate(ny),
+        }
+    
     def count_measurements_by_subject(self, subject_id: int) -> int:
         """
         Count measurements for a specific subject.
@@ -62,7 +368,108 @@ class MeasurementRepository(BaseRepository[Measurement]):
             subject_id: The ID of the subject
             
         Returns:
-            Number of measurements
+            Number of measurements, archived ones included
         """
-        return self.model.query.filter_by(subject_id=subject_id).count()
+        live = self.model.query.filter_by(subject_id=subject_id).count()
+        return live + self.block_repository.count_samples(subject_id)
+
+    def get_max_id(self) -> int:
+        """
+        Get the ID of the newest measurement row.
+
+        Returns:
+            The highest measurement ID, or 0 if the table is empty
+        """
+        return db.session.execute(select(func.max(Measurement.id))).scalar() or 0
+
+    def get_rows_after(self, after_id: int, limit: int) -> Dict[str, np.ndarray]:
+        """
+        Get the measurement rows stored after a given row, for every subject.
+
+        Args:
+            after_id: Only rows with a higher ID are returned
+            limit: Maximum number of rows
+
+        Returns:
+            Dictionary of ``id``, ``subject_id``, ``date`` (datetime objects),
+            ``gaze_x`` and ``gaze_y`` arrays ordered by ID
+        """
+        rows = db.session.execute(
+            select(Measurement.id, Measurement.subject_id, Measurement.date, Point.x, Point.y)
+            .select_from(Measurement)
+            .outerjoin(Point, Point.id == Measurement.gaze_point_id)
+            .where(Measurement.id > after_id)
+            .order_by(Measurement.id)
+            .limit(limit)
+        ).all()
+        columns = list(zip(*rows)) if rows else [()] * 5
+
+        return {
+            "id": np.asarray(columns[0], dtype=np.int64),
+            "subject_id": np.asarray(columns[1], dtype=np.int64),
+            "date": np.asarray(columns[2], dtype=object),
+            "gaze_x": np.asarray(columns[3], dtype=float),
+            "gaze_y": np.asarray(columns[4], dtype=float),
+        }
+
+    def archive_subject(self, subject_id: int, block_size: int = SAMPLES_PER_BLOCK) -> int:
+        """
+        Pack the samples of a subject into compressed blocks. The caller commits.
+        
+        The subject's measurement and point rows are replaced by
+        ``SampleBlock`` rows (see ``db.sample_codec``); blocks archived
+        earlier are re-packed together with the new samples, so a subject's
+        blocks never overlap in time. The normalized gaze coordinates of the
+        points are kept, so archived samples stay relative to the viewport
+        they were recorded with. Measurement IDs are kept in the blocks;
+        the table's AUTOINCREMENT keeps SQLite from handing them out again.
+        
+        Args:
+            subject_id: The ID of the subject
+            block_size: Samples per block
+            
+        Returns:
+            Number of samples moved out of the measurement table
+        """
+        live = self._live_sample_arrays(subject_id)
+        if not len(live["id"]):
+            return 0
+        
+        samples = _concat_samples(self._archived_sample_arrays(subject_id) + [live])
+        rows = []
+        for start in range(0, len(samples["id"]), block_size):
+            block = {name: values[start:start + block_size] for name, values in samples.items()}
+            codec, data = encode_samples(*(block[name] for name in _SAMPLE_COLUMNS))
+            gaze_x, gaze_y = block["gaze_x"], block["gaze_y"]
+            finite = np.isfinite(gaze_x) & np.isfinite(gaze_y)
+            rows.append({
+                "subject_id": subject_id,
+                "codec": codec,
+                "sample_count": len(block["id"]),
+                "first_sample_at": _to_datetime(block["timestamp"][0]),
+                "last_sample_at": _to_datetime(block["timestamp"][-1]),
+                "min_measurement_id": int(block["id"].min()),
+                "max_measurement_id": int(block["id"].max()),
+                "min_gaze_x": float(gaze_x[finite].min()) if finite.any() else None,
+                "max_gaze_x": float(gaze_x[finite].max()) if finite.any() else None,
+                "min_gaze_y": float(gaze_y[finite].min()) if finite.any() else None,
+                "max_gaze_y": float(gaze_y[finite].max()) if finite.any() else None,
+                "data": data,
+                "created_at": datetime.now(),
+            })
+        self.block_repository.replace_blocks(subject_id, rows)
+        
+        archived = (Measurement.subject_id == subject_id, Measurement.id <= int(live["id"].max()))
+        point_ids = db.session.execute(
+            union(
+                select(Measurement.gaze_point_id).where(*archived),
+                select(Measurement.mouse_point_id).where(*archived),
+            )
+        ).scalars().all()
+        db.session.execute(delete(Measurement).where(*archived))
+        point_ids = [point_id for point_id in point_ids if point_id is not None]
+        for start in range(0, len(point_ids), DELETE_BATCH_SIZE):
+            db.session.execute(delete(Point).where(Point.id.in_(point_ids[start:start + DELETE_BATCH_SIZE])))
+        
+        return len(live["id"])
 
@@ -0,0 +1,115 @@
+"""
+Repository for SampleBlock entity operations.
+"""
+
+from typing import Dict, Iterator, List, Optional
+from sqlalchemy import delete, func, select
+from db.models import SampleBlock, Subject, db
+from .base_repository import BaseRepository
+
+
+class SampleBlockRepository(BaseRepository[SampleBlock]):
+    """Repository for managing archived SampleBlock entities."""
+
+    def __init__(self):
+        super().__init__(SampleBlock)
+
+    def get_blocks(self, subject_id: int, after_id: Optional[int] = None) -> List[SampleBlock]:
+        """
+        Get the archived blocks of a subject, ordered by time.
+
+        Args:
+            subject_id: The ID of the subject
+            after_id: Only return blocks holding a measurement with a greater ID (optional)
+
+        Returns:
+            List of blocks
+        """
+        query = (
+            select(SampleBlock)
+            .where(SampleBlock.subject_id == subject_id)
+            .order_by(SampleBlock.first_sample_at, SampleBlock.id)
+        )
+        if after_id is not None:
+            query = query.where(SampleBlock.max_measurement_id > after_id)
+        return list(db.session.execute(query).scalars())
+
+    def iter_blocks(self, subject_id: Optional[int] = None, batch_size: int = 8) -> Iterator[SampleBlock]:
+        """
+        Iterate over archived blocks, ordered by subject and time.
+
+        Args:
+            subject_id: The ID of the subject (all subjects if None)
+            batch_size: Blocks fetched from the database at a time
+
+        Returns:
+            Iterator of blocks
+        """
+        query = (
+            select(SampleBlock)
+            .order_by(SampleBlock.subject_id, SampleBlock.first_sample_at, SampleBlock.id)
+            .execution_options(yield_per=batch_size)
+        )
+        if subject_id is not None:
+            query = query.where(SampleBlock.subject_id == subject_id)
+        yield from db.session.execute(query).scalars()
+
+    def get_blocks_by_study(self, study_id: int) -> List[SampleBlock]:
+        """
+        Get the archived blocks of every subject of a study.
+
+        Args:
+            study_id: The ID of the study
+
+        Returns:
+            List of blocks, ordered by subject and time
+        """
+        return list(
+            db.session.execute(
+                select(SampleBlock)
+                .join(Subject, Subject.id == SampleBlock.subject_id)
+                .where(Subject.study_id == study_id)
+                .order_by(SampleBlock.subject_id, SampleBlock.first_sample_at, SampleBlock.id)
+            ).scalars()
+        )
+
+    def has_blocks(self, subject_id: Optional[int] = None) -> bool:
+        """
+        Check whether a subject (or any subject) has archived samples.
+
+        Args:
+            subject_id: The ID of the subject (any subject if None)
+
+        Returns:
+            True if at least one block exists
+        """
+        query = select(SampleBlock.id).limit(1)
+        if subject_id is not None:
+            query = query.where(SampleBlock.subject_id == subject_id)
+        return db.session.execute(query).first() is not None
+
+    def count_samples(self, subject_id: int) -> int:
+        """
+        Count the archived samples of a subject without decoding its blocks.
+
+        Args:
+            subject_id: The ID of the subject
+
+        Returns:
+            Number of archived samples
+        """
+        return db.session.execute(
+            select(func.coalesce(func.sum(SampleBlock.sample_count), 0))
+            .where(SampleBlock.subject_id == subject_id)
+        ).scalar()
+
+    def replace_blocks(self, subject_id: int, rows: List[Dict]) -> None:
+        """
+        Replace the archived blocks of a subject. The caller commits.
+
+        Args:
+            subject_id: The ID of the subject
+            rows: Column values of each new block
+        """
+        db.session.execute(delete(SampleBlock).where(SampleBlock.subject_id == subject_id))
+        self.bulk_insert(rows)
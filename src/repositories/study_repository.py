@@ -1,9 +1,25 @@
 """Repository for Study model operations."""
 
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from datetime import datetime
-from db.models import Study, db
-from .base_repository import BaseRepository
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from db.models import Study, Subject, SubjectSummary, db
+from .base_repository import BaseRepository, upsert_insert
+from .maintenance_repository import MaintenanceRepository
+
+
+class StudyConfigConflictError(ValueError):
+    """Another study already uses the prototype configuration (HTTP 409)."""
+
+    def __init__(self, study_id: int, conflicting_study_id: Optional[int]):
+        self.study_id = study_id
+        self.conflicting_study_id = conflicting_study_id
+        super().__init__(
+            f"Study {conflicting_study_id} already uses this prototype configuration."
+            if conflicting_study_id is not None
+            else "Another study already uses this prototype configuration."
+        )
 
 
 class StudyRepository(BaseRepository[Study]):
@@ -30,6 +46,9 @@ class StudyRepository(BaseRepository[Study]):
 
         Returns:
             Created Study instance
+
+        Raises:
+            IntegrityError: If a study already exists for this configuration
         """
         study = Study(
             name=name,
@@ -37,11 +56,106 @@ class StudyRepository(BaseRepository[Study]):
             prototype_url=prototype_url,
             prototype_image_path=prototype_image_path,
             created_at=datetime.now(),
+            config_hash=Study.config_hash_for(prototype_url, prototype_image_path),
         )
         db.session.add(study)
         db.session.commit()
         return study
 
+    def get_study_by_config(
+        self, prototype_url: Optional[str], prototype_image_path: Optional[str]
+    ) -> Optional[Study]:
+        """
+        Get the study of a prototype configuration.
+
+        Args:
+            prototype_url: URL to the prototype
+            prototype_image_path: Path to a static image prototype
+
+        Returns:
+            The matching Study or None
+        """
+        config_hash = Study.config_hash_for(prototype_url, prototype_image_path)
+        return Study.query.filter_by(config_hash=config_hash).first()
+
+    def get_or_create_study(
+        self,
+        prototype_url: Optional[str],
+        prototype_image_path: Optional[str],
+        name: str,
+        description: Optional[str] = None,
+    ) -> Tuple[Study, bool]:
+        """
+        Get the study of a prototype configuration, creating it if needed.
+
+        Creation is an INSERT ... ON CONFLICT DO NOTHING on the unique
+        config hash, so workers starting at the same time all end up with
+        the same study instead of creating duplicates.
+
+        Args:
+            prototype_url: URL to the prototype
+            prototype_image_path: Path to a static image prototype
+            name: Name for the study if it is created
+            description: Description for the study if it is created
+
+        Returns:
+            Tuple of (study, whether it was created by this call)
+        """
+        study = self.get_study_by_config(prototype_url, prototype_image_path)
+        if study is not None:
+            return study, False
+
+        config_hash = Study.config_hash_for(prototype_url, prototype_image_path)
+        result = db.session.execute(
+            upsert_insert(Study)
+            .values(
+                name=name,
+                description=description,
+                prototype_url=prototype_url,
+                prototype_image_path=prototype_image_path,
+                created_at=datetime.now(),
+                config_hash=config_hash,
+            )
+            .on_conflict_do_nothing(index_elements=[Study.config_hash])
+        )
+        db.session.commit()
+        return self.get_study_by_config(prototype_url, prototype_image_path), result.rowcount == 1
+
+    def backfill_config_hashes(self) -> int:
+        """
+        Set the config hash of studies created before it existed.
+
+        When several old studies share a configuration, the newest one gets
+        the hash, since that is the one startup used to select.
+
+        Returns:
+            Number of studies updated
+        """
+        pending = db.session.execute(
+            select(Study.id, Study.prototype_url, Study.prototype_image_path)
+            .where(Study.config_hash.is_(None))
+            .order_by(Study.created_at.desc(), Study.id.desc())
+        ).all()
+        if not pending:
+            return 0
+
+        taken = set(db.session.scalars(select(Study.config_hash).where(Study.config_hash.is_not(None))))
+        updated = 0
+        for study_id, prototype_url, prototype_image_path in pending:
+            config_hash = Study.config_hash_for(prototype_url, prototype_image_path)
+            if config_hash in taken:
+                continue
+            taken.add(config_hash)
+            db.session.execute(
+                update(Study)
+                .where(Study.id == study_id, Study.config_hash.is_(None))
+                .values(config_hash=config_hash)
+            )
+            updated += 1
+
+        db.session.commit()
+        return updated
+
     def get_all_studies(self) -> List[Study]:
         """Get all studies ordered by creation date (newest first)."""
         return Study.query.order_by(Study.created_at.desc()).all()
@@ -74,6 +188,10 @@ class StudyRepository(BaseRepository[Study]):
 
         Returns:
             Updated Study instance or None if not found
+
+        Raises:
+            StudyConfigConflictError: If another study already uses the new
+                prototype configuration (nothing is changed)
         """
         study = self.get_study_by_id(study_id)
         if not study:
@@ -87,13 +205,27 @@ class StudyRepository(BaseRepository[Study]):
             study.prototype_url = prototype_url
         if prototype_image_path is not None:
             study.prototype_image_path = prototype_image_path
+        config_hash = Study.config_hash_for(study.prototype_url, study.prototype_image_path)
+        conflicting = db.session.scalar(
+            select(Study.id).where(Study.config_hash == config_hash, Study.id != study_id)
+        )
+        if conflicting is not None:
+            db.session.rollback()
+            raise StudyConfigConflictError(study_id, conflicting)
+        study.config_hash = config_hash
 
-        db.session.commit()
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Another worker took the configuration after the check
+            db.session.rollback()
+            raise StudyConfigConflictError(study_id, None)
         return study
 
     def delete_study(self, study_id: int) -> bool:
         """
-        Delete a study by its ID.
+        Delete a study by its ID, with its AOIs, subjects and everything
+        recorded for them (see ``MaintenanceRepository.delete_study``).
 
         Args:
             study_id: ID of the study to delete
@@ -105,10 +237,33 @@ class StudyRepository(BaseRepository[Study]):
         if not study:
             return False
 
-        db.session.delete(study)
-        db.session.commit()
+        db.session.expunge(study)
+        MaintenanceRepository().delete_study(study_id)
         return True
 
+    def get_inactive_studies(self, before: datetime) -> List[Study]:
+        """
+        Get the studies created before a time that have received no data since.
+
+        Args:
+            before: Studies whose subjects' summaries were all last updated
+                before this time are inactive
+
+        Returns:
+            Inactive studies, oldest first
+        """
+        recent = (
+            select(Subject.id)
+            .join(SubjectSummary, SubjectSummary.subject_id == Subject.id)
+            .where(Subject.study_id == Study.id, SubjectSummary.updated_at >= before)
+            .exists()
+        )
+        return list(
+            db.session.execute(
+                select(Study).where(Study.created_at < before, ~recent).order_by(Study.created_at)
+            ).scalars()
+        )
+
     def get_active_study(self) -> Optional[Study]:
         """
         Get the most recently created study (assumed to be the active one).
@@ -2,8 +2,10 @@
 Repository for Subject entity operations.
 """
 
-from typing import List, Optional
-from db.models import Subject
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import func, or_, select
+from sqlalchemy.orm import selectinload
+from db.models import Study, Subject, db
 from .base_repository import BaseRepository
 
 
@@ -50,3 +52,127 @@ class SubjectRepository(BaseRepository[Subject]):
             The subject if found, None otherwise
         """
         return self.get_by_id(subject_id)
+    
+    def update_screen(
+        self,
+        subject_id: int,
+        viewport_width: int,
+        viewport_height: int,
+        screen_width: Optional[int] = None,
+        screen_height: Optional[int] = None,
+        device_pixel_ratio: Optional[float] = None,
+    ) -> Optional[Subject]:
+        """
+        Store the screen a subject's session runs on.
+        
+        Args:
+            subject_id: The ID of the subject
+            viewport_width: Viewport width in CSS pixels
+            viewport_height: Viewport height in CSS pixels
+            screen_width: Screen width in CSS pixels (optional)
+            screen_height: Screen height in CSS pixels (optional)
+            device_pixel_ratio: Device pixels per CSS pixel (optional)
+            
+        Returns:
+            The updated subject, or None if it does not exist
+        """
+        subject = self.get_by_id(subject_id)
+        if subject is None:
+            return None
+        subject.viewport_width = viewport_width
+        subject.viewport_height = viewport_height
+        subject.screen_width = screen_width
+        subject.screen_height = screen_height
+        subject.device_pixel_ratio = device_pixel_ratio
+        return subject
+    
+    def get_viewport(self, subject_id: int) -> Optional[Tuple[int, int]]:
+        """
+        Get the viewport size of a subject without loading the entity.
+        
+        Args:
+            subject_id: The ID of the subject
+            
+        Returns:
+            (width, height) in CSS pixels, or None if unknown
+        """
+        row = db.session.execute(
+            select(Subject.viewport_width, Subject.viewport_height).where(Subject.id == subject_id)
+        ).first()
+        if row is None or not row[0] or not row[1]:
+            return None
+        return row[0], row[1]
+    
+    def paginate_subjects(
+        self,
+        page: int = 1,
+        per_page: int = 50,
+        search: Optional[str] = None,
+        study_id: Optional[int] = None,
+        without_study: bool = False,
+    ):
+        """
+        Get a page of subjects with their study and summary eagerly loaded.
+        
+        Args:
+            page: Page number, starting at 1
+            per_page: Number of subjects per page
+            search: Case-insensitive text matched against name, surname and study name
+            study_id: Restrict to subjects of this study
+            without_study: Restrict to subjects not assigned to any study
+            
+        Returns:
+            Flask-SQLAlchemy Pagination object with the subjects of the page
+        """
+        query = select(Subject).options(
+            selectinload(Subject.study), selectinload(Subject.summary)
+        )
+        
+        if without_study:
+            query = query.where(Subject.study_id.is_(None))
+        elif study_id is not None:
+            query = query.where(Subject.study_id == study_id)
+        
+        if search:
+            pattern = f"%{search}%"
+            query = query.outerjoin(Study, Study.id == Subject.study_id).where(
+                or_(
+                    Subject.name.ilike(pattern),
+                    Subject.surname.ilike(pattern),
+                    (Subject.name + " " + Subject.surname).ilike(pattern),
+                    Study.name.ilike(pattern),
+                )
+            )
+        
+        query = query.order_by(Subject.id.desc())
+        return db.paginate(
+            query, page=page, per_page=per_page, max_per_page=500, error_out=False
+        )
+    
+    def count_by_study(self) -> Dict[Optional[int], int]:
+        """
+        Count subjects per study with a single aggregate query.
+        
+        Returns:
+            Dictionary mapping study ID (None for unassigned subjects) to subject count
+        """
+        rows = db.session.execute(
+            select(Subject.study_id, func.count(Subject.id)).group_by(Subject.study_id)
+        ).all()
+        return {study_id: count for study_id, count in rows}
+    
+    def get_subject_ids_by_study(self, study_id: int) -> List[int]:
+        """
+        Get the IDs of the subjects of a study.
+        
+        Args:
+            study_id: The ID of the study
+            
+        Returns:
+            Subject IDs in ascending order
+        """
+        return list(
+            db.session.execute(
+                select(Subject.id).where(Subject.study_id == study_id).order_by(Subject.id)
+            ).scalars()
+        )
@@ -0,0 +1,271 @@
+"""
+Repository for SubjectSummary entity operations.
+"""
+
+from typing import Dict, Iterable, List, Optional
+from datetime import datetime
+from sqlalchemy import case, delete, exists, func, insert, literal, select
+from db.models import Measurement, Point, SampleBlock, Subject, SubjectSummary, TaskLog, db
+from .base_repository import BaseRepository, upsert_insert
+
+
+def _least_of(first, second):
+    """SQL expression for the smaller of two nullable expressions."""
+    return case((first.is_(None), second), (second.is_(None), first), (first < second, first), else_=second)
+
+
+def _greatest_of(first, second):
+    """SQL expression for the larger of two nullable expressions."""
+    return case((first.is_(None), second), (second.is_(None), first), (first > second, first), else_=second)
+
+
+class SubjectSummaryRepository(BaseRepository[SubjectSummary]):
+    """Repository for managing SubjectSummary entities."""
+
+    def __init__(self):
+        super().__init__(SubjectSummary)
+
+    def get_by_subject(self, subject_id: int) -> Optional[SubjectSummary]:
+        """
+        Get the summary of a subject.
+
+        Args:
+            subject_id: The ID of the subject
+
+        Returns:
+            The summary if one has been recorded, None otherwise
+        """
+        return db.session.get(SubjectSummary, subject_id)
+
+    def get_for_subjects(self, subject_ids: Iterable[int]) -> Dict[int, SubjectSummary]:
+        """
+        Get the summaries of several subjects with a single query.
+
+        Args:
+            subject_ids: IDs of the subjects
+
+        Returns:
+            Dictionary mapping subject ID to its summary
+        """
+        subject_ids = list(subject_ids)
+        if not subject_ids:
+            return {}
+        summaries = SubjectSummary.query.filter(
+            SubjectSummary.subject_id.in_(subject_ids)
+        ).all()
+        return {summary.subject_id: summary for summary in summaries}
+
+    def record_samples(
+        self,
+        subject_id: int,
+        count: int,
+        first_at: datetime,
+        last_at: datetime,
+        min_gaze_x: Optional[float] = None,
+        max_gaze_x: Optional[float] = None,
+        min_gaze_y: Optional[float] = None,
+        max_gaze_y: Optional[float] = None,
+    ) -> None:
+        """
+        Fold the statistics of a freshly ingested batch into the summary.
+
+        The summary is created or updated by a single INSERT ... ON
+        CONFLICT DO UPDATE with the arithmetic in SQL, so concurrent batches
+        for the same subject, including its first ones, neither overwrite
+        each other nor race to create the row. The caller commits.
+
+        Args:
+            subject_id: The ID of the subject
+            count: Number of samples in the batch
+            first_at: Earliest sample timestamp in the batch
+            last_at: Latest sample timestamp in the batch
+            min_gaze_x: Smallest gaze x in the batch (optional)
+            max_gaze_x: Largest gaze x in the batch (optional)
+            min_gaze_y: Smallest gaze y in the batch (optional)
+            max_gaze_y: Largest gaze y in the batch (optional)
+        """
+        if count <= 0:
+            return
+
+        statement = upsert_insert(SubjectSummary).values(
+            subject_id=subject_id,
+            sample_count=count,
+            first_sample_at=first_at,
+            last_sample_at=last_at,
+            min_gaze_x=min_gaze_x,
+            max_gaze_x=max_gaze_x,
+            min_gaze_y=min_gaze_y,
+            max_gaze_y=max_gaze_y,
+            task_count=0,
+            updated_at=datetime.now(),
+        )
+        batch = statement.excluded
+        db.session.execute(
+            statement.on_conflict_do_update(
+                index_elements=[SubjectSummary.subject_id],
+                set_={
+                    "sample_count": SubjectSummary.sample_count + batch.sample_count,
+                    "first_sample_at": _least_of(SubjectSummary.first_sample_at, batch.first_sample_at),
+                    "last_sample_at": _greatest_of(SubjectSummary.last_sample_at, batch.last_sample_at),
+                    "min_gaze_x": _least_of(SubjectSummary.min_gaze_x, batch.min_gaze_x),
+                    "max_gaze_x": _greatest_of(SubjectSummary.max_gaze_x, batch.max_gaze_x),
+                    "min_gaze_y": _least_of(SubjectSummary.min_gaze_y, batch.min_gaze_y),
+                    "max_gaze_y": _greatest_of(SubjectSummary.max_gaze_y, batch.max_gaze_y),
+                    "updated_at": batch.updated_at,
+                },
+            ).execution_options(synchronize_session=False)
+        )
+
+    def record_tasklogs(self, subject_id: int, count: int) -> None:
+        """
+        Add freshly ingested task logs to the summary. The caller commits.
+
+        Args:
+            subject_id: The ID of the subject
+            count: Number of task logs in the batch
+        """
+        if count <= 0:
+            return
+
+        statement = upsert_insert(SubjectSummary).values(
+            subject_id=subject_id,
+            sample_count=0,
+            task_count=count,
+            updated_at=datetime.now(),
+        )
+        db.session.execute(
+            statement.on_conflict_do_update(
+                index_elements=[SubjectSummary.subject_id],
+                set_={
+                    "task_count": SubjectSummary.task_count + statement.excluded.task_count,
+                    "updated_at": statement.excluded.updated_at,
+                },
+            ).execution_options(synchronize_session=False)
+        )
+
+    def rebuild(self, subject_ids: Optional[Iterable[int]] = None) -> int:
+        """
+        Recompute summaries from the measurement, sample block and task log tables.
+
+        This is a set-based INSERT ... SELECT, so the whole table can be
+        rebuilt in a single pass over the samples. Archived samples are
+        counted from the statistics stored with each block, without
+        decoding it. The caller commits.
+
+        Args:
+            subject_ids: Restrict the rebuild to these subjects (all if None)
+
+        Returns:
+            Number of summaries written
+        """
+        task_counts = (
+            select(func.count(TaskLog.id))
+            .where(TaskLog.subject_id == Subject.id)
+            .scalar_subquery()
+        )
+
+        blocks = (
+            select(
+                SampleBlock.subject_id,
+                func.sum(SampleBlock.sample_count).label("sample_count"),
+                func.min(SampleBlock.first_sample_at).label("first_sample_at"),
+                func.max(SampleBlock.last_sample_at).label("last_sample_at"),
+                func.min(SampleBlock.min_gaze_x).label("min_gaze_x"),
+                func.max(SampleBlock.max_gaze_x).label("max_gaze_x"),
+                func.min(SampleBlock.min_gaze_y).label("min_gaze_y"),
+                func.max(SampleBlock.max_gaze_y).label("max_gaze_y"),
+            )
+            .group_by(SampleBlock.subject_id)
+            .subquery()
+        )
+
+        # One block row per subject at most, so max() just carries it through the grouping
+        query = (
+            select(
+                Subject.id,
+                func.count(Measurement.id) + func.coalesce(func.max(blocks.c.sample_count), 0),
+                _least_of(func.min(Measurement.date), func.max(blocks.c.first_sample_at)),
+                _greatest_of(func.max(Measurement.date), func.max(blocks.c.last_sample_at)),
+                _least_of(func.min(Point.x), func.max(blocks.c.min_gaze_x)),
+                _greatest_of(func.max(Point.x), func.max(blocks.c.max_gaze_x)),
+                _least_of(func.min(Point.y), func.max(blocks.c.min_gaze_y)),
+                _greatest_of(func.max(Point.y), func.max(blocks.c.max_gaze_y)),
+                task_counts,
+                literal(datetime.now(), db.DateTime),
+            )
+            .select_from(Subject)
+            .outerjoin(Measurement, Measurement.subject_id == Subject.id)
+            .outerjoin(Point, Point.id == Measurement.gaze_point_id)
+            .outerjoin(blocks, blocks.c.subject_id == Subject.id)
+            .group_by(Subject.id)
+        )
+
+        clear = delete(SubjectSummary)
+        if subject_ids is not None:
+            subject_ids = list(subject_ids)
+            query = query.where(Subject.id.in_(subject_ids))
+            clear = clear.where(SubjectSummary.subject_id.in_(subject_ids))
+
+        db.session.execute(clear)
+        result = db.session.execute(
+            insert(SubjectSummary).from_select(
+                [
+                    SubjectSummary.subject_id,
+                    SubjectSummary.sample_count,
+                    SubjectSummary.first_sample_at,
+                    SubjectSummary.last_sample_at,
+                    SubjectSummary.min_gaze_x,
+                    SubjectSummary.max_gaze_x,
+                    SubjectSummary.min_gaze_y,
+                    SubjectSummary.max_gaze_y,
+                    SubjectSummary.task_count,
+                    SubjectSummary.updated_at,
+                ],
+                query,
+            )
+        )
+        return result.rowcount
+
+    def get_idle_subject_ids(self, before: datetime) -> List[int]:
+        """
+        Get the subjects with stored (not archived) samples and no activity since a time.
+
+        Args:
+            before: Subjects whose summary was last updated before this time are idle
+
+        Returns:
+            IDs of the idle subjects
+        """
+        has_rows = exists().where(Measurement.subject_id == SubjectSummary.subject_id)
+        return list(
+            db.session.execute(
+                select(SubjectSummary.subject_id)
+                .where(SubjectSummary.updated_at < before, has_rows)
+                .order_by(SubjectSummary.subject_id)
+            ).scalars()
+        )
+
+    def get_updated_since(self, since: datetime) -> List[SubjectSummary]:
+        """
+        Get the summaries of the subjects with activity since a time.
+
+        Args:
+            since: Summaries last updated at or after this time are returned
+
+        Returns:
+            List of summaries ordered by subject ID
+        """
+        return (
+            self.model.query.filter(SubjectSummary.updated_at >= since)
+            .order_by(SubjectSummary.subject_id)
+            .all()
+        )
+
+    def count_summaries(self) -> int:
+        """
+        Count stored summaries.
+
+        Returns:
+            Number of summaries
+        """
+        return self.model.query.count()
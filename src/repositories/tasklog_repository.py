@@ -2,7 +2,7 @@
 Repository for TaskLog entity operations.
 """
 
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from datetime import datetime
 from db.models import TaskLog
 from .base_repository import BaseRepository
@@ -42,9 +42,23 @@ class TaskLogRepository(BaseRepository[TaskLog]):
         self.add(tasklog)
         return tasklog
     
+    def bulk_create_tasklogs(self, rows: List[Dict[str, Any]]) -> int:
+        """
+        Create many task logs with a single bulk insert.
+        
+        Args:
+            rows: Column values for each task log (start_time, end_time,
+                response, subject_id and optional task details)
+            
+        Returns:
+            Number of task logs created
+        """
+        self.bulk_insert(rows)
+        return len(rows)
+    
     def get_tasklogs_by_subject(self, subject_id: int) -> List[TaskLog]:
         """
-        Get all task logs for a specific subject.
+        Get all task logs for a specific subject, in the order they started.
         
         Args:
             subject_id: The ID of the subject
@@ -52,7 +66,11 @@ class TaskLogRepository(BaseRepository[TaskLog]):
         Returns:
             List of task logs
         """
-        return self.model.query.filter_by(subject_id=subject_id).all()
+        return (
+            self.model.query.filter_by(subject_id=subject_id)
+            .order_by(TaskLog.start_time, TaskLog.id)
+            .all()
+        )
     
     def count_tasklogs_by_subject(self, subject_id: int) -> int:
         """
@@ -0,0 +1,113 @@
+"""
+Serving modes for the Flask application.
+
+- ``development``: Werkzeug dev server with debugger and reloader (``app.run``).
+- ``waitress``: multi-threaded production server, works on every platform.
+  It does not speak TLS, so HTTPS must be terminated by a reverse proxy.
+- ``gunicorn``: pre-forking multi-process production server (Linux/macOS)
+  with optional TLS.
+"""
+
+import os
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+SERVER_MODES = ("development", "waitress", "gunicorn")
+
+
+def _tls_files(certfile, keyfile):
+    """Return the certificate pair if both files exist, else None."""
+    if certfile and keyfile and os.path.exists(certfile) and os.path.exists(keyfile):
+        return certfile, keyfile
+    return None
+
+
+def serve(
+    app,
+    mode="development",
+    host="127.0.0.1",
+    port=5001,
+    workers=2,
+    threads=8,
+    certfile="cert.pem",
+    keyfile="key.pem",
+    behind_proxy=False,
+    on_worker_start=None,
+):
+    """
+    Run the application with the selected server.
+
+    Args:
+        app: Flask application instance
+        mode: One of ``SERVER_MODES``
+        host: Interface to bind
+        port: Port to bind
+        workers: Worker processes (gunicorn)
+        threads: Threads per worker (waitress, gunicorn)
+        certfile: TLS certificate; TLS is disabled if it does not exist
+        keyfile: TLS private key
+        behind_proxy: Trust X-Forwarded-* headers from a TLS-terminating proxy
+        on_worker_start: Callback run in every gunicorn worker after fork
+    """
+    if mode not in SERVER_MODES:
+        raise ValueError(f"Unknown server mode '{mode}'. Use one of: {', '.join(SERVER_MODES)}")
+
+    if behind_proxy:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_host=1)
+
+    tls = _tls_files(certfile, keyfile)
+
+    if mode == "development":
+        app.run(host=host, port=port, debug=True, ssl_context=tls)
+    elif mode == "waitress":
+        _serve_waitress(app, host, port, threads, tls, behind_proxy)
+    else:
+        _serve_gunicorn(app, host, port, workers, threads, tls, on_worker_start)
+
+
+def _serve_waitress(app, host, port, threads, tls, behind_proxy):
+    try:
+        from waitress import serve as waitress_serve
+    except ImportError:
+        raise SystemExit("❌ waitress is not installed. Run: pip install waitress")
+
+    if tls and not behind_proxy:
+        print("⚠️  waitress does not support TLS; serving plain HTTP.")
+        print("   Terminate HTTPS in a reverse proxy and set behind_proxy to true.")
+
+    print(f"🚀 Serving with waitress on http://{host}:{port} ({threads} threads)")
+    waitress_serve(app, host=host, port=port, threads=threads)
+
+
+def _serve_gunicorn(app, host, port, workers, threads, tls, on_worker_start):
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        raise SystemExit(
+            "❌ gunicorn is not installed (or not supported on this platform). "
+            "Run: pip install gunicorn, or use the waitress server."
+        )
+
+    options = {
+        "bind": f"{host}:{port}",
+        "workers": workers,
+        "threads": threads,
+        # The app is created once in the master and shared with the workers by fork
+        "preload_app": True,
+        "accesslog": "-",
+    }
+    if tls:
+        options["certfile"], options["keyfile"] = tls
+    if on_worker_start:
+        options["post_fork"] = lambda server, worker: on_worker_start()
+
+    class GazeTrackApplication(BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return app
+
+    scheme = "https" if tls else "http"
+    print(f"🚀 Serving with gunicorn on {scheme}://{host}:{port} ({workers} workers x {threads} threads)")
+    GazeTrackApplication().run()
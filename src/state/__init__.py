@@ -1,10 +1,15 @@
 """
-Configuration management module for the application.
-This module handles application configuration from JSON files.
+Application state: configuration and per-app component registry.
+Configuration is loaded from JSON files; services and repositories are
+created lazily per Flask app.
 """
 
 from .config_manager import ConfigManager
+from .registry import get_component, get_config_manager, set_config_manager
 
 __all__ = [
     'ConfigManager',
+    'get_component',
+    'get_config_manager',
+    'set_config_manager',
 ]
@@ -78,6 +78,80 @@ class ConfigManager:
         """
         return self._config.get(key, default)
     
+    def get_str(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        """
+        Get a string configuration value.
+        
+        Args:
+            key: The configuration key
+            default: Default value if the key is missing, empty or 'null'
+            
+        Returns:
+            The value as a string
+        """
+        value = self.get(key)
+        
+        if value is None or value == 'null' or value == '':
+            return default
+        
+        return str(value)
+    
+    def get_int(self, key: str, default: Optional[int] = None) -> Optional[int]:
+        """
+        Get an integer configuration value.
+        
+        Args:
+            key: The configuration key
+            default: Default value if the key is missing or 'null'
+            
+        Returns:
+            The value as an integer
+        """
+        value = self.get(key)
+        
+        if value is None or value == 'null' or value == '':
+            return default
+        
+        return int(value)
+    
+    def get_float(self, key: str, default: Optional[float] = None) -> Optional[float]:
+        """
+        Get a floating point configuration value.
+        
+        Args:
+            key: The configuration key
+            default: Default value if the key is missing or 'null'
+            
+        Returns:
+            The value as a float
+        """
+        value = self.get(key)
+        
+        if value is None or value == 'null' or value == '':
+            return default
+        
+        return float(value)
+    
+    def get_bool(self, key: str, default: bool = False) -> bool:
+        """
+        Get a boolean configuration value ("true"/"false" strings are accepted).
+        
+        Args:
+            key: The configuration key
+            default: Default value if the key is missing or 'null'
+            
+        Returns:
+            The value as a boolean
+        """
+        value = self.get(key)
+        
+        if value is None or value == 'null' or value == '':
+            return default
+        if isinstance(value, bool):
+            return value
+        
+        return str(value).strip().lower() in ('1', 'true', 'yes', 'y', 'si', 'sí')
+    
     def get_port(self, default: int = 5001) -> int:
         """
         Get the port from configuration.
@@ -99,13 +173,19 @@ class ConfigManager:
         """
         Get the database URI.
         
+        The ``GAZETRACK_DATABASE_PATH`` environment variable takes precedence
+        over the ``database_path`` configuration key.
+        
         Args:
             basedir: Base directory for relative database paths
             
         Returns:
             The database URI
         """
-        db_path = self.get('database_path', 'instance/usergazetrack.db')
+        db_path = os.environ.get('GAZETRACK_DATABASE_PATH') or self.get('database_path')
+        
+        if not db_path or db_path == 'null':
+            db_path = 'instance/usergazetrack.db'
         
         if not os.path.isabs(db_path):
             db_path = os.path.join(basedir, db_path)
@@ -0,0 +1,57 @@
+"""
+Per-application registry of services and repositories.
+
+Components are created the first time a request of a given app needs them
+and stored in ``app.extensions``, so importing a module never builds them
+and several apps in the same process each get their own instances.
+"""
+
+from typing import Type, TypeVar
+from flask import current_app
+
+T = TypeVar('T')
+
+_EXTENSION_KEY = 'gaze_track.components'
+_CONFIG_KEY = 'gaze_track.config'
+
+
+def get_component(component_class: Type[T]) -> T:
+    """
+    Get the current app's instance of a service or repository class.
+    
+    Args:
+        component_class: Class taking no constructor arguments
+        
+    Returns:
+        The instance, created on first use
+    """
+    components = current_app.extensions.setdefault(_EXTENSION_KEY, {})
+    component = components.get(component_class)
+    if component is None:
+        component = components[component_class] = component_class()
+    return component
+
+
+def set_config_manager(app, config_manager) -> None:
+    """
+    Attach the configuration manager an app was created with.
+    
+    Args:
+        app: Flask application instance
+        config_manager: Loaded ConfigManager
+    """
+    app.extensions[_CONFIG_KEY] = config_manager
+
+
+def get_config_manager(app=None):
+    """
+    Get the configuration manager of an app.
+    
+    Args:
+        app: Flask application instance (defaults to the current app)
+        
+    Returns:
+        The app's ConfigManager
+    """
+    app = app or current_app
+    return app.extensions[_CONFIG_KEY]
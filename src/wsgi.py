@@ -0,0 +1,20 @@
+"""
+WSGI entry point for production servers.
+
+    gunicorn --chdir src --workers 4 --threads 8 wsgi:application
+    cd src && waitress-serve --listen=0.0.0.0:5001 --threads=8 wsgi:application
+
+``python run.py --server gunicorn|waitress`` does the same from config.json.
+"""
+
+import os
+import sys
+
+basedir = os.path.abspath(os.path.dirname(__file__))
+if basedir not in sys.path:
+    sys.path.insert(0, basedir)
+
+from app import create_app
+from app.startup import prepare_app
+
+application = prepare_app(create_app())
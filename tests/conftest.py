@@ -0,0 +1,29 @@
+"""
+Shared fixtures: an application on a throwaway SQLite file.
+"""
+
+import os
+import sys
+import pytest
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+from app import create_app  # noqa: E402
+from app.startup import prepare_app  # noqa: E402
+
+
+@pytest.fixture
+def app(tmp_path):
+    database = tmp_path / "usergazetrack.db"
+    return prepare_app(create_app({
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{database}",
+        "SWAGGER_ENABLED": False,
+        "METRICS_ENABLED": False,
+    }))
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
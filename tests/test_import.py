@@ -0,0 +1,55 @@
+"""
+Importing the files written by /api/download-points, including damaged ones.
+"""
+
+from api.services import ImportService
+from db import Subject, db
+from state import get_component
+from test_maintenance import register_subject, save_points
+
+
+def download(client, subject_id):
+    response = client.get(f"/api/download-points?id={subject_id}")
+    assert response.status_code == 200
+    return response.get_data(as_text=True)
+
+
+def test_download_points_round_trip(app, client, tmp_path):
+    with app.app_context():
+        original = register_subject(client, "Ana")
+        save_points(client, original, 40)
+        exported = download(client, original)
+        path = tmp_path / "ana.csv"
+        path.write_text(exported, encoding="utf-8")
+
+        result = get_component(ImportService).import_points(
+            str(path), db.session.get(Subject, original).study_id
+        )
+
+        assert (result["imported"], result["skipped"], result["invalid"]) == (40, 0, 0)
+        (imported,) = result["subjects"].values()
+        assert download(client, imported) == exported
+
+
+def test_invalid_values_are_skipped_and_reported(app, client, tmp_path):
+    with app.app_context():
+        original = register_subject(client, "Ana")
+        save_points(client, original, 10)
+        lines = download(client, original).splitlines()
+        lines[3] = "2024-13-45 99:00:00" + lines[3][19:]
+        lines[5] = "notadate" + lines[5][19:]
+        header = lines[0].split(",")
+        values = lines[8].split(",")
+        values[header.index("x_gaze")] = "abc"
+        lines[8] = ",".join(values)
+        path = tmp_path / "ana.csv"
+        path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        subjects = Subject.query.count()
+
+        result = get_component(ImportService).import_points(
+            str(path), db.session.get(Subject, original).study_id, chunk_rows=4
+        )
+
+        assert (result["rows"], result["imported"], result["skipped"]) == (10, 7, 3)
+        assert (result["invalid"], result["invalid_lines"]) == (3, [4, 6, 9])
+        assert Subject.query.count() == subjects + 1
@@ -0,0 +1,107 @@
+"""
+Deleting and archiving subjects must never let their IDs be handed out again.
+"""
+
+import sqlite3
+import time
+from sqlalchemy import inspect
+from api.services import ArchiveService, MaintenanceService
+from app import create_app, get_db_manager
+from app.startup import prepare_app
+from db import Measurement, Subject, db
+from state import get_component
+
+
+def register_subject(client, name):
+    client.post("/", data={"nombre": name, "apellido": "Prueba", "edad": 30})
+    return db.session.execute(db.select(db.func.max(Subject.id))).scalar()
+
+
+def save_points(client, subject_id, count):
+    start = int(time.time() * 1000)
+    points = [
+        {"date": start + i * 33, "gaze": {"x": 100 + i, "y": 200}, "mouse": {"x": 1, "y": 2}}
+        for i in range(count)
+    ]
+    response = client.post("/api/save-points", json={"id": subject_id, "points": points})
+    assert response.status_code == 200
+
+
+def test_new_subject_after_delete_gets_fresh_id_and_no_data(app, client):
+    with app.app_context():
+        first = register_subject(client, "Ana")
+        deleted = register_subject(client, "Beto")
+        save_points(client, first, 5)
+        save_points(client, deleted, 5)
+
+        deleted_ids = [m.id for m in Measurement.query.filter_by(subject_id=deleted)]
+
+        counts = get_component(MaintenanceService).delete_subject(deleted)
+        assert counts["subject"] == 1
+        assert counts["measurement"] == 5
+        assert Measurement.query.filter_by(subject_id=deleted).count() == 0
+
+        new = register_subject(client, "Carla")
+        assert new > deleted
+        assert client.get(f"/api/get-user-points?id={new}").json["points"] == []
+
+        # Samples of the new subject do not reuse the deleted measurement IDs either
+        save_points(client, new, 1)
+        assert Measurement.query.filter_by(subject_id=new).one().id > max(deleted_ids)
+
+
+def test_archived_measurement_ids_are_not_reused(app, client):
+    with app.app_context():
+        subject_id = register_subject(client, "Ana")
+        save_points(client, subject_id, 10)
+        archived_ids = [m.id for m in Measurement.query.filter_by(subject_id=subject_id)]
+
+        result = get_component(ArchiveService).archive(subject_id, 0)
+        assert result["archived_samples"] == 10
+        assert Measurement.query.count() == 0
+
+        save_points(client, subject_id, 3)
+        new_ids = [m.id for m in Measurement.query.filter_by(subject_id=subject_id)]
+        assert min(new_ids) > max(archived_ids)
+        assert client.get(f"/api/get-subject-summary?id={subject_id}").status_code == 200
+
+
+def drop_autoincrement(path, table):
+    """Recreate a table the way older versions created it."""
+    connection = sqlite3.connect(path)
+    (sql,) = connection.execute("SELECT sql FROM sqlite_master WHERE name = ?", (table,)).fetchone()
+    with connection:
+        connection.execute(sql.replace(f"CREATE TABLE {table}", "CREATE TABLE _old").replace("AUTOINCREMENT", ""))
+        connection.execute(f"INSERT INTO _old SELECT * FROM {table}")
+        connection.execute(f"DROP TABLE {table}")
+        connection.execute(f"ALTER TABLE _old RENAME TO {table}")
+    connection.close()
+
+
+def test_autoincrement_migration_only_runs_on_demand(app, client, capsys):
+    with app.app_context():
+        subject_id = register_subject(client, "Ana")
+        save_points(client, subject_id, 5)
+        path = db.engine.url.database
+        db.session.remove()
+        db.engine.dispose()
+    drop_autoincrement(path, "subject")
+    drop_autoincrement(path, "measurement")
+
+    restarted = prepare_app(create_app({
+        "SQLALCHEMY_DATABASE_URI": app.config["SQLALCHEMY_DATABASE_URI"],
+        "SWAGGER_ENABLED": False,
+        "METRICS_ENABLED": False,
+    }))
+    db_manager = get_db_manager(restarted)
+
+    assert "manage.py migrate" in capsys.readouterr().out
+    assert db_manager.pending_autoincrement() == ["subject", "measurement"]
+
+    assert db_manager.add_autoincrement() == ["subject", "measurement"]
+    assert db_manager.pending_autoincrement() == []
+    with restarted.app_context():
+        indexes = {index["name"] for index in inspect(db.engine).get_indexes("measurement")}
+        assert {index.name for index in Measurement.__table__.indexes} <= indexes
+        assert db.session.get(Subject, subject_id).name == "Ana"
+        assert Measurement.query.filter_by(subject_id=subject_id).count() == 5
@@ -0,0 +1,79 @@
+"""
+Metrics shared through snapshot files must cover one server run only.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import textwrap
+from conftest import SRC_DIR
+from monitoring.metrics import Counter, Gauge, MetricsRegistry
+
+SERVER_RUN = textwrap.dedent("""
+    import sys
+    from app import create_app
+    from app.startup import prepare_app
+    from monitoring.metrics import REGISTRY
+
+    app = prepare_app(create_app({
+        "SQLALCHEMY_DATABASE_URI": "sqlite:///" + sys.argv[1],
+        "SWAGGER_ENABLED": False,
+        "METRICS_ENABLED": True,
+        "METRICS_DIR": sys.argv[2],
+    }))
+    client = app.test_client()
+    for _ in range(5):
+        client.get("/")
+    REGISTRY.write_snapshot()
+    print(sum(
+        float(line.rsplit(" ", 1)[1])
+        for line in REGISTRY.render().splitlines()
+        if line.startswith("gazetrack_http_requests_total{")
+    ))
+""")
+
+
+def finished_pid():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def test_restarted_server_does_not_add_earlier_runs(tmp_path):
+    database = tmp_path / "usergazetrack.db"
+    directory = tmp_path / "metrics"
+
+    totals = [
+        subprocess.run(
+            [sys.executable, "-c", SERVER_RUN, str(database), str(directory)],
+            cwd=SRC_DIR, capture_output=True, text=True, check=True,
+        ).stdout.split()[-1]
+        for _ in range(3)
+    ]
+
+    assert totals == ["5.0", "5.0", "5.0"]
+    assert len(os.listdir(directory)) == 1
+
+
+def test_exited_worker_keeps_counters_but_not_gauges(tmp_path):
+    registry = MetricsRegistry()
+    requests = registry.register(Counter("test_requests_total", "Requests.", ("endpoint",)))
+    started = registry.register(Gauge("test_start_time_seconds", "Start time."))
+    requests.inc(2, "index")
+    started.set(100.0)
+    registry.share(str(tmp_path))
+
+    worker = finished_pid()
+    snapshot = tmp_path / f"{registry._prefix()}{worker}.json"
+    earlier_run = tmp_path / f"{worker}.1_{worker}.json"
+    dump = {"test_requests_total": [[["index"], 3.0]], "test_start_time_seconds": [[[], 50.0]]}
+    for path in (snapshot, earlier_run):
+        path.write_text(json.dumps(dump), encoding="utf-8")
+
+    rendered = registry.render()
+
+    assert 'test_requests_total{endpoint="index"} 5' in rendered
+    assert "test_start_time_seconds 100" in rendered
+    assert not snapshot.exists() and not earlier_run.exists()
+    assert (tmp_path / f"{registry._prefix()}retired_{worker}.json").exists()
@@ -0,0 +1,99 @@
+"""
+Archived sample blocks must decode to the samples they were built from.
+"""
+
+import struct
+import zlib
+import numpy as np
+from api.services import ArchiveService, MeasurementService
+from db.sample_codec import COORDINATE_SCALE, NORMALIZED_SCALE, decode_samples, encode_samples
+from state import get_component
+from test_maintenance import register_subject, save_points
+
+
+def make_samples(count=500):
+    rng = np.random.default_rng(count)
+    samples = {
+        "id": np.arange(1, count + 1, dtype=np.int64) * 3,
+        "timestamp": 1_700_000_000_000_000 + np.cumsum(rng.integers(1, 40_000, count)),
+        "gaze_x": rng.uniform(0, 1920, count),
+        "gaze_y": rng.uniform(0, 1080, count),
+        "mouse_x": rng.uniform(0, 1920, count),
+        "mouse_y": rng.uniform(0, 1080, count),
+    }
+    samples["gaze_nx"] = samples["gaze_x"] / 1920
+    samples["gaze_ny"] = samples["gaze_y"] / 1080
+    samples["gaze_x"][::7] = samples["gaze_y"][::7] = np.nan
+    samples["mouse_x"][::5] = samples["mouse_y"][::5] = np.nan
+    # Samples stored before the viewport was reported have no normalized coordinates
+    samples["gaze_nx"][:50] = samples["gaze_ny"][:50] = np.nan
+    return samples
+
+
+def encode_version_1(samples):
+    """A block as written before normalized coordinates were stored."""
+    gaze = np.isfinite(samples["gaze_x"]) & np.isfinite(samples["gaze_y"])
+    mouse = np.isfinite(samples["mouse_x"]) & np.isfinite(samples["mouse_y"])
+    parts = [
+        struct.pack("<3sBIII", b"GZB", 1, len(samples["id"]), int(gaze.sum()), int(mouse.sum())),
+        np.packbits(gaze).tobytes(),
+        np.packbits(mouse).tobytes(),
+    ]
+    for values in (samples["id"], samples["timestamp"]):
+        parts.append(np.diff(values, prepend=0).astype("<i8").view(np.uint8).reshape(-1, 8).T.tobytes())
+    for name, present in (("gaze_x", gaze), ("gaze_y", gaze), ("mouse_x", mouse), ("mouse_y", mouse)):
+        quantized = np.round(samples[name][present] * COORDINATE_SCALE).astype(np.int64)
+        parts.append(np.diff(quantized, prepend=0).astype("<i8").view(np.uint8).reshape(-1, 8).T.tobytes())
+    return zlib.compress(b"".join(parts))
+
+
+def test_round_trip():
+    samples = make_samples()
+
+    codec, data = encode_samples(*samples.values())
+    decoded = decode_samples(codec, data)
+
+    np.testing.assert_array_equal(decoded["id"], samples["id"])
+    np.testing.assert_array_equal(decoded["timestamp"], samples["timestamp"])
+    for name in ("gaze_x", "gaze_y", "mouse_x", "mouse_y"):
+        np.testing.assert_allclose(decoded[name], samples[name], atol=0.5 / COORDINATE_SCALE)
+    for name in ("gaze_nx", "gaze_ny"):
+        np.testing.assert_allclose(decoded[name], samples[name], atol=0.5 / NORMALIZED_SCALE)
+
+
+def test_version_1_blocks_still_decode():
+    samples = make_samples()
+
+    decoded = decode_samples("zlib", encode_version_1(samples))
+
+    np.testing.assert_array_equal(decoded["id"], samples["id"])
+    np.testing.assert_allclose(decoded["gaze_x"], samples["gaze_x"], atol=0.5 / COORDINATE_SCALE)
+    assert np.isnan(decoded["gaze_nx"]).all() and np.isnan(decoded["gaze_ny"]).all()
+
+
+def save_viewport(client, subject_id, width, height):
+    response = client.post("/api/save-screen", json={
+        "subject_id": subject_id,
+        "viewport": {"width": width, "height": height},
+        "screen": {"width": width, "height": height},
+        "devicePixelRatio": 1,
+    })
+    assert response.status_code == 200
+
+
+def test_archiving_keeps_the_recorded_viewport(app, client):
+    with app.app_context():
+        subject_id = register_subject(client, "Ana")
+        save_points(client, subject_id, 20)
+        save_viewport(client, subject_id, 400, 400)
+        save_viewport(client, subject_id, 800, 800)
+        save_points(client, subject_id, 20)
+        service = get_component(MeasurementService)
+        study_id = service.subject_repository.get_subject_by_id(subject_id).study_id
+        before = service.get_study_heatmap(study_id, bins=(8, 8))
+
+        assert get_component(ArchiveService).archive(subject_id, 0)["archived_samples"] == 40
+        after = service.get_study_heatmap(study_id, bins=(8, 8))
+
+        assert after["normalized_samples"] == before["normalized_samples"] == 40
+        assert after == before
@@ -0,0 +1,111 @@
+"""
+The batched scanpath kernels against straightforward dynamic programming.
+"""
+
+import numpy as np
+import pytest
+from analysis.scanpath import dtw_distances, levenshtein_distances, similarity_matrix
+
+
+def naive_levenshtein(a, b):
+    table = np.zeros((len(a) + 1, len(b) + 1))
+    table[:, 0] = np.arange(len(a) + 1)
+    table[0, :] = np.arange(len(b) + 1)
+    for i in range(1, len(a) + 1):
+        for j in range(1, len(b) + 1):
+            table[i, j] = min(
+                table[i - 1, j] + 1,
+                table[i, j - 1] + 1,
+                table[i - 1, j - 1] + (a[i - 1] != b[j - 1]),
+            )
+    return table[-1, -1]
+
+
+def naive_dtw(a, b):
+    table = np.full((len(a) + 1, len(b) + 1), np.inf)
+    table[0, 0] = 0.0
+    for i in range(1, len(a) + 1):
+        for j in range(1, len(b) + 1):
+            cost = np.hypot(*(a[i - 1] - b[j - 1]))
+            table[i, j] = cost + min(table[i - 1, j], table[i, j - 1], table[i - 1, j - 1])
+    return table[-1, -1] / (len(a) + len(b))
+
+
+def all_pairs(count):
+    first, second = np.triu_indices(count, k=1)
+    return np.concatenate([first, second]), np.concatenate([second, first])
+
+
+@pytest.mark.parametrize("lengths", [
+    [1, 2, 5, 9, 17],
+    [63, 64, 65, 3],
+    [130, 129, 70, 1, 200],
+])
+def test_levenshtein_matches_naive(lengths):
+    rng = np.random.default_rng(sum(lengths))
+    sequences = [rng.integers(0, 4, length) for length in lengths]
+    first, second = all_pairs(len(sequences))
+
+    distances = levenshtein_distances(sequences, first, second)
+
+    expected = [naive_levenshtein(sequences[a], sequences[b]) for a, b in zip(first, second)]
+    np.testing.assert_array_equal(distances, expected)
+
+
+def test_levenshtein_patterns_longer_than_a_word():
+    base = np.arange(150) % 7
+    changed = base.copy()
+    changed[[0, 63, 64, 127, 149]] = 9
+    sequences = [base, changed, base[:80], np.concatenate([base, base])]
+    first, second = all_pairs(len(sequences))
+
+    distances = levenshtein_distances(sequences, first, second)
+
+    expected = [naive_levenshtein(sequences[a], sequences[b]) for a, b in zip(first, second)]
+    np.testing.assert_array_equal(distances, expected)
+
+
+def test_levenshtein_empty_sequences():
+    sequences = [np.empty(0, dtype=np.int64), np.array([1, 2, 3]), np.empty(0, dtype=np.int64)]
+    np.testing.assert_array_equal(levenshtein_distances(sequences, [0, 0, 1], [1, 2, 2]), [3, 0, 3])
+
+
+@pytest.mark.parametrize("rows", [1, 2, 7, 40])
+def test_dtw_matches_naive(rows):
+    rng = np.random.default_rng(rows)
+    points = rng.random((rows, 2))
+    others = [rng.random((length, 2)) for length in (1, 2, 3, rows, 25, 60)]
+
+    distances = dtw_distances(points, others)
+
+    expected = [naive_dtw(points, other) for other in others]
+    np.testing.assert_allclose(distances, expected, rtol=1e-5)
+
+
+@pytest.mark.parametrize("rows", [0, 1, 2, 5])
+def test_dtw_empty_sequences_are_nan(rows):
+    points = np.random.default_rng(0).random((rows, 2))
+    others = [np.empty((0, 2)), np.full((3, 2), 0.5), np.empty((0, 2))]
+
+    distances = dtw_distances(points, others)
+
+    assert np.isnan(distances[[0, 2]]).all()
+    assert np.isnan(distances[1]) == (rows == 0)
+
+
+@pytest.mark.parametrize("method", ["levenshtein", "dtw"])
+def test_similarity_is_nan_for_empty_and_missing_scanpaths(method):
+    if method == "levenshtein":
+        present = np.array([0, 1, 2])
+        empty = np.empty(0, dtype=np.int64)
+    else:
+        present = np.array([[0.1, 0.1], [0.5, 0.5], [0.9, 0.2]])
+        empty = np.empty((0, 2))
+    matrix = similarity_matrix([present, present, empty, empty, None], method)
+
+    assert matrix[0, 1] == pytest.approx(1.0)
+    assert np.isnan(matrix[0, 2:]).all()
+    assert np.isnan(matrix[2, 3])
+    assert np.isnan(matrix[:4, 4]).all()
+    np.testing.assert_array_equal(np.diag(matrix), [1.0, 1.0, np.nan, np.nan, np.nan])
+    np.testing.assert_array_equal(np.isnan(matrix), np.isnan(matrix.T))